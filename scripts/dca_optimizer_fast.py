@@ -1,14 +1,21 @@
+import os
+import sys
 import requests
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.dca_schedule import PurchaseSchedule, build_price_matrix, compile_schedule, simulate_dca
+from src.profiler import profile_session
+
 
 @dataclass
 class DCAParameters:
@@ -20,13 +27,17 @@ class DCAParameters:
 
 
 class FastDCAOptimizer:
-    def __init__(self, symbols: List[str], start_date: datetime, end_date: datetime, params: DCAParameters):
+    def __init__(self, symbols: List[str], start_date: datetime, end_date: datetime, params: DCAParameters,
+                 schedule: Optional[PurchaseSchedule] = None):
         self.symbols = symbols
         self.start_date = start_date
         self.end_date = end_date
         self.params = params
+        # Por defecto compras semanales en domingo (equivalente a freq='W')
+        self.schedule = schedule or PurchaseSchedule(frequency="weekly", weekday=6)
         self.historical_data = {}
         self._load_historical_data_parallel()
+        self._compile_price_matrix()
 
     def _get_binance_data(self, symbol: str) -> pd.DataFrame:
         """Obtiene datos históricos de Binance de forma eficiente"""
@@ -72,6 +83,27 @@ class FastDCAOptimizer:
                 if not data.empty
             }
 
+    def _compile_price_matrix(self):
+        """Construye la matriz de precios y compila el calendario de compras una sola vez"""
+        self.price_matrix = build_price_matrix(self.historical_data)
+        if self.price_matrix.empty:
+            self.schedule_rows = np.empty(0, dtype=np.intp)
+            return
+        self.schedule_rows = compile_schedule(self.price_matrix.index, self.schedule)
+
+    def evaluate_weights(self, weight_vectors: np.ndarray, symbols: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Evalúa miles de vectores de pesos contra el calendario precompilado"""
+        symbols = symbols or list(self.price_matrix.columns)
+        prices = self.price_matrix[symbols].to_numpy()
+        results = simulate_dca(prices, self.schedule_rows, weight_vectors, self.params.base_investment)
+        total_invested = results['invested'].sum(axis=-1)
+        total_value = results['final_value'].sum(axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            results['portfolio_roi'] = np.where(
+                total_invested > 0, (total_value - total_invested) / total_invested * 100, 0.0
+            )
+        return results
+
     def _calculate_metrics(self, data: pd.DataFrame) -> Dict:
         """Calcula métricas básicas de forma eficiente"""
         returns = data['close'].pct_change().dropna()
@@ -117,39 +149,29 @@ class FastDCAOptimizer:
         total_weight = sum(weights.values())
         weights = {k: v/total_weight for k, v in weights.items()}
         
-        # Simular inversiones
+        # Simular inversiones para todos los símbolos con un único gather
         results = {}
         weekly_investment = {s: w * self.params.base_investment for s, w in weights.items()}
-        
-        for symbol in top_symbols:
-            data = self.historical_data[symbol]
-            prices = data['close']
-            
-            # Calcular inversiones semanales
-            dates = pd.date_range(start=prices.index[0], end=prices.index[-1], freq='W')
-            investments = pd.Series(weekly_investment[symbol], index=dates)
-            
-            # Calcular compras
-            valid_investments = investments[investments.index.isin(prices.index)]
-            coins_bought = valid_investments / prices[valid_investments.index]
-            
-            total_investment = valid_investments.sum()
-            total_coins = coins_bought.sum()
-            
+        if not top_symbols:
+            return results
+
+        simulation = self.evaluate_weights(np.array([weights[s] for s in top_symbols]), top_symbols)
+
+        for i, symbol in enumerate(top_symbols):
+            total_investment = simulation['invested'][i]
+            total_coins = simulation['coins'][i]
+
             if total_investment > 0:
-                final_value = total_coins * prices.iloc[-1]
-                roi = (final_value - total_investment) / total_investment * 100
-                
                 results[symbol] = {
                     'weight': weights[symbol],
                     'weekly_investment': weekly_investment[symbol],
                     'total_investment': total_investment,
-                    'final_value': final_value,
-                    'roi': roi,
+                    'final_value': simulation['final_value'][i],
+                    'roi': simulation['roi'][i],
                     'volatility': metrics[symbol]['volatility'] * 100,
                     'sharpe': metrics[symbol]['sharpe'],
                     'volume_rank': metrics[symbol]['volume_rank'],
-                    'avg_price': total_investment / total_coins,
+                    'avg_price': simulation['avg_price'][i],
                     'total_coins': total_coins
                 }
         
@@ -230,7 +252,9 @@ def main():
     )
     
     optimizer = FastDCAOptimizer(symbols, start_date, end_date, params)
-    results = optimizer.optimize_portfolio()
+    # Perfilado opcional del barrido: DCA_PROFILE=1 o --profile
+    with profile_session("dca_optimizer_fast", enabled="--profile" in sys.argv or None):
+        results = optimizer.optimize_portfolio()
     
     if results:
         print("\nResultados del Portafolio Optimizado:")
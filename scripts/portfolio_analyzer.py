@@ -7,6 +7,12 @@ import os
 from typing import Dict, Tuple
 from datetime import datetime
 import logging
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tradingview_ingest import TRADINGVIEW_DIR, clean_numeric_series, load_screener
+from src.trade_analytics import pair_analytics
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, 
@@ -20,33 +26,14 @@ def load_portfolio_data() -> Tuple[pd.DataFrame, pd.DataFrame]:
                              comment='#', 
                              skipinitialspace=True)
     
-    # Cargar datos de TradingView
-    tecnicos_df = pd.read_csv('TradingViewData/Analizador de criptomonedas_2025-02-03-Datostecnicos.csv')
-    direcciones_df = pd.read_csv('TradingViewData/Analizador de criptomonedas_2025-02-03-Direcciones.csv')
-    pnl_df = pd.read_csv('TradingViewData/Analizador de criptomonedas_2025-02-03-PerdidasyGanancias.csv')
-    
-    # Combinar datos de TradingView
-    metrics_df = pd.merge(tecnicos_df, direcciones_df[['Moneda', 'Capitalización de mercado']], 
-                         on='Moneda', how='left')
-    metrics_df = pd.merge(metrics_df, pnl_df[['Moneda', 'Direcciones de beneficios %']], 
-                         on='Moneda', how='left')
+    # Cargar la foto del screener de TradingView (tipada, combinada y cacheada)
+    metrics_df = load_screener(TRADINGVIEW_DIR)
     
     return portfolio_df, metrics_df
 
-def clean_numeric_string(value):
-    """Limpia y convierte strings numéricos"""
-    if pd.isna(value):
-        return 0
-    if isinstance(value, (int, float)):
-        return value
-    try:
-        # Eliminar caracteres no numéricos excepto punto y coma
-        clean_str = ''.join(c for c in str(value) if c.isdigit() or c in '.,')
-        # Reemplazar coma por punto si hay coma
-        clean_str = clean_str.replace(',', '')
-        return float(clean_str)
-    except:
-        return 0
+def clean_numeric_column(values: pd.Series) -> pd.Series:
+    """Limpia y convierte una columna numérica de forma vectorizada (0 donde no es interpretable)"""
+    return clean_numeric_series(values).fillna(0)
 
 def analyze_portfolio(portfolio_df: pd.DataFrame, metrics_df: pd.DataFrame) -> Dict:
     """Analiza el portafolio y genera métricas"""
@@ -56,7 +43,7 @@ def analyze_portfolio(portfolio_df: pd.DataFrame, metrics_df: pd.DataFrame) -> D
         portfolio['Moneda'] = portfolio['Moneda'].str.upper()
         
         # Limpiar y calcular market cap
-        metrics_df['market_cap_clean'] = metrics_df['Capitalización de mercado'].apply(clean_numeric_string)
+        metrics_df['market_cap_clean'] = clean_numeric_column(metrics_df['Capitalización de mercado'])
         
         # Merge con métricas
         analysis = pd.merge(portfolio, metrics_df, 
@@ -188,6 +175,21 @@ def plot_portfolio_comparison(portfolio_df: pd.DataFrame, metrics_df: pd.DataFra
         print(f"Error en plot_portfolio_comparison: {str(e)}")
         raise
 
+def coin_report(analysis: pd.DataFrame, extra_columns: Dict[str, str] = None) -> Dict[str, Dict]:
+    """Reporte por moneda con recomendación calculada de forma vectorizada"""
+    signal = analysis['Rating técnico 1 día'].astype(str)
+    recommend = analysis['rsi'].between(30, 70) & (analysis['profit_ratio'] > 50) & signal.str.contains('Compra')
+    report = pd.DataFrame({
+        'rsi': analysis['rsi'].astype(float),
+        'señal_tecnica': analysis['Rating técnico 1 día'].astype(object),
+        'ratio_beneficios': analysis['profit_ratio'].astype(float),
+        'market_cap_usd': analysis['market_cap_clean'].astype(float),
+        **{key: analysis[column] for key, column in (extra_columns or {}).items()},
+        'recomendacion': np.where(recommend, 'Comprar', 'Monitorear')
+    })
+    report.index = analysis['Moneda']
+    return report.to_dict('index')
+
 def analyze_specific_coins(portfolio_df: pd.DataFrame, metrics_df: pd.DataFrame):
     """Analiza específicamente criptomonedas de interés"""
     coins_of_interest = ['XRP', 'XLM', 'ONDO', 'SUI', 'ADA']
@@ -198,7 +200,7 @@ def analyze_specific_coins(portfolio_df: pd.DataFrame, metrics_df: pd.DataFrame)
     # Limpiar y preparar datos
     specific_analysis['rsi'] = pd.to_numeric(specific_analysis['Índice de fuerza relativa (14) 1 día'], errors='coerce')
     specific_analysis['profit_ratio'] = pd.to_numeric(specific_analysis['Direcciones de beneficios %'], errors='coerce')
-    specific_analysis['market_cap_clean'] = specific_analysis['Capitalización de mercado'].apply(clean_numeric_string)
+    specific_analysis['market_cap_clean'] = clean_numeric_column(specific_analysis['Capitalización de mercado'])
     
     # Crear visualización específica
     plt.figure(figsize=(15, 10))
@@ -249,18 +251,7 @@ def analyze_specific_coins(portfolio_df: pd.DataFrame, metrics_df: pd.DataFrame)
         'proyectos_analizados': {}
     }
     
-    for _, row in specific_analysis.iterrows():
-        report['proyectos_analizados'][row['Moneda']] = {
-            'rsi': float(row['rsi']),
-            'señal_tecnica': row['Rating técnico 1 día'],
-            'ratio_beneficios': float(row['profit_ratio']),
-            'market_cap_usd': float(row['market_cap_clean']),
-            'recomendacion': 'Comprar' if (
-                30 <= float(row['rsi']) <= 70 and 
-                row['profit_ratio'] > 50 and 
-                'Compra' in str(row['Rating técnico 1 día'])
-            ) else 'Monitorear'
-        }
+    report['proyectos_analizados'] = coin_report(specific_analysis)
     
     # Guardar reporte
     with open('analisis/graficos/analisis_proyectos_especificos.json', 'w', encoding='utf-8') as f:
@@ -286,7 +277,7 @@ def analyze_popular_coins(metrics_df: pd.DataFrame):
     # Limpiar datos
     popular_analysis['rsi'] = pd.to_numeric(popular_analysis['Índice de fuerza relativa (14) 1 día'], errors='coerce')
     popular_analysis['profit_ratio'] = pd.to_numeric(popular_analysis['Direcciones de beneficios %'], errors='coerce')
-    popular_analysis['market_cap_clean'] = popular_analysis['Capitalización de mercado'].apply(clean_numeric_string)
+    popular_analysis['market_cap_clean'] = clean_numeric_column(popular_analysis['Capitalización de mercado'])
     
     # Crear visualización
     plt.figure(figsize=(20, 15))
@@ -322,9 +313,11 @@ def analyze_popular_coins(metrics_df: pd.DataFrame):
                s=100)
     
     # Añadir etiquetas para cada punto
-    for idx, row in popular_analysis.iterrows():
-        plt.annotate(row['Moneda'], 
-                    (row['market_cap_clean'] / 1e9, row['profit_ratio']),
+    for coin, market_cap, profit_ratio in zip(popular_analysis['Moneda'],
+                                              popular_analysis['market_cap_clean'],
+                                              popular_analysis['profit_ratio']):
+        plt.annotate(coin, 
+                    (market_cap / 1e9, profit_ratio),
                     xytext=(5, 5), textcoords='offset points')
     
     plt.xlabel('Market Cap (Billones USD)')
@@ -348,33 +341,17 @@ def analyze_popular_coins(metrics_df: pd.DataFrame):
     }
     
     # Analizar cada cripto
-    for _, row in popular_analysis.iterrows():
-        coin_data = {
-            'rsi': float(row['rsi']),
-            'señal_tecnica': row['Rating técnico 1 día'],
-            'ratio_beneficios': float(row['profit_ratio']),
-            'market_cap_usd': float(row['market_cap_clean']),
-            'momentum': row['Momentum (10) 1 día'],
-            'recomendacion': 'Comprar' if (
-                30 <= float(row['rsi']) <= 70 and 
-                row['profit_ratio'] > 50 and 
-                'Compra' in str(row['Rating técnico 1 día'])
-            ) else 'Monitorear'
-        }
-        
-        report['criptos_populares'][row['Moneda']] = coin_data
-        
-        # Añadir a recomendaciones si cumple criterios
-        if coin_data['recomendacion'] == 'Comprar':
-            report['resumen']['recomendaciones'].append(row['Moneda'])
+    report['criptos_populares'] = coin_report(popular_analysis, {'momentum': 'Momentum (10) 1 día'})
+    report['resumen']['recomendaciones'] = [
+        coin for coin, data in report['criptos_populares'].items() if data['recomendacion'] == 'Comprar'
+    ]
     
     # Encontrar mejores métricas
-    best_rsi = min(popular_analysis.iterrows(), key=lambda x: abs(x[1]['rsi'] - 50))
-    best_profit = max(popular_analysis.iterrows(), key=lambda x: x[1]['profit_ratio'])
-    best_tech = popular_analysis[popular_analysis['Rating técnico 1 día'].str.contains('Compra fuerte', na=False)]
+    popular_by_coin = popular_analysis.set_index('Moneda')
+    best_tech = popular_analysis[popular_analysis['Rating técnico 1 día'].astype(str).str.contains('Compra fuerte', na=False)]
     
-    report['resumen']['mejor_rsi'] = best_rsi[1]['Moneda']
-    report['resumen']['mejor_beneficio'] = best_profit[1]['Moneda']
+    report['resumen']['mejor_rsi'] = (popular_by_coin['rsi'] - 50).abs().idxmin()
+    report['resumen']['mejor_beneficio'] = popular_by_coin['profit_ratio'].idxmax()
     report['resumen']['mejores_tecnicos'] = best_tech['Moneda'].tolist()
     
     # Guardar reporte
@@ -408,79 +385,48 @@ def normalize_trading_pairs(df: pd.DataFrame) -> pd.DataFrame:
         logger.error(f"Error normalizando pares: {str(e)}")
         return df
 
-def analyze_trading_pair(transactions_df: pd.DataFrame, pair: str) -> Dict:
-    """Analiza un par de trading específico"""
-    try:
-        # Filtrar transacciones del par
-        pair_df = transactions_df[transactions_df['Pair'] == pair].copy()
-        
-        # Convertir columnas a números, reemplazando comas por puntos
-        pair_df['Amount'] = pair_df['Amount'].astype(str).str.replace(',', '.').astype(float)
-        pair_df['Price'] = pair_df['Price'].astype(str).str.replace(',', '.').astype(float)
-        pair_df['Fee'] = pair_df['Fee'].astype(str).str.replace(',', '.').astype(float)
-        
-        # Separar compras y ventas
-        buys = pair_df[pair_df['Type'] == 'BUY']
-        sells = pair_df[pair_df['Type'] == 'SELL']
-        
-        # Calcular métricas
-        metrics = {
-            'par': pair,
-            'compras': {
-                'cantidad_total': float(buys['Amount'].sum()),
-                'importe_total': float((buys['Amount'] * buys['Price']).sum()),
-                'precio_promedio': float((buys['Amount'] * buys['Price']).sum() / buys['Amount'].sum()) if not buys.empty else 0
-            },
-            'ventas': {
-                'cantidad_total': float(sells['Amount'].sum()),
-                'importe_total': float((sells['Amount'] * sells['Price']).sum()),
-                'precio_promedio': float((sells['Amount'] * sells['Price']).sum() / sells['Amount'].sum()) if not sells.empty else 0
-            },
-            'posicion': {
-                'cantidad': float(buys['Amount'].sum() - sells['Amount'].sum()),
-                'coste_total': float((buys['Amount'] * buys['Price']).sum() - (sells['Amount'] * sells['Price']).sum())
-            },
-            'comisiones': {
-                'total': float(pair_df['Fee'].sum()),
-                'moneda_fee': str(pair_df['Fee'].iloc[-1]) if not pair_df.empty else None
-            }
+def pair_metrics(pair: str, stats: Dict) -> Dict:
+    """Da formato de reporte a las métricas de un par calculadas por pair_analytics"""
+    return {
+        'par': pair,
+        'compras': {
+            'cantidad_total': float(stats['buy_qty']),
+            'importe_total': float(stats['buy_value']),
+            'precio_promedio': float(stats['buy_avg_price'])
+        },
+        'ventas': {
+            'cantidad_total': float(stats['sell_qty']),
+            'importe_total': float(stats['sell_value']),
+            'precio_promedio': float(stats['sell_avg_price'])
+        },
+        'posicion': {
+            'cantidad': float(stats['position_qty']),
+            'coste_total': float(stats['net_cost']),
+            'coste_medio': float(stats['avg_cost'])
+        },
+        'comisiones': {
+            'total': float(stats['fees']),
+            'moneda_fee': stats['fee_last']
+        },
+        'pnl_realizado': float(stats['realized_pnl']),
+        'pnl_no_realizado': float(stats['unrealized_pnl']),
+        'fifo': {
+            'cantidad_abierta': float(stats['fifo_open_qty']),
+            'coste_abierto': float(stats['fifo_open_cost']),
+            'coste_medio': float(stats['fifo_avg_cost']),
+            'pnl_realizado': float(stats['fifo_realized_pnl']),
+            'pnl_no_realizado': float(stats['fifo_unrealized_pnl']),
+            'ventas_sin_casar': float(stats['unmatched_sell_qty'])
+        },
+        'tenencia': {
+            'dias_promedio_vendido': float(stats['avg_holding_days']),
+            'dias_posicion_abierta': float(stats['open_age_days']),
+            'operaciones': int(stats['trades'])
         }
-        
-        # Calcular precio medio por posición
-        if metrics['posicion']['cantidad'] > 0:
-            metrics['posicion']['coste_medio'] = float(metrics['posicion']['coste_total'] / metrics['posicion']['cantidad'])
-        else:
-            metrics['posicion']['coste_medio'] = 0
-            
-        # Calcular PnL realizado
-        if not sells.empty:
-            precio_venta_promedio = metrics['ventas']['precio_promedio']
-            cantidad_vendida = metrics['ventas']['cantidad_total']
-            coste_promedio_compra = metrics['compras']['precio_promedio']
-            
-            pnl_realizado = float((precio_venta_promedio - coste_promedio_compra) * cantidad_vendida)
-            metrics['pnl_realizado'] = pnl_realizado
-        else:
-            metrics['pnl_realizado'] = 0
-            
-        # Calcular último precio y PnL no realizado
-        ultima_transaccion = pair_df.iloc[-1]
-        ultimo_precio = float(ultima_transaccion['Price'])
-        
-        if metrics['posicion']['cantidad'] > 0:
-            pnl_no_realizado = float((ultimo_precio - metrics['posicion']['coste_medio']) * metrics['posicion']['cantidad'])
-            metrics['pnl_no_realizado'] = pnl_no_realizado
-        else:
-            metrics['pnl_no_realizado'] = 0
-            
-        return metrics
-        
-    except Exception as e:
-        logger.error(f"Error analizando par {pair}: {str(e)}")
-        return None
+    }
 
 def analyze_portfolio_transactions(transactions_file: str) -> Dict:
-    """Analiza todas las transacciones del portafolio"""
+    """Analiza todas las transacciones del portafolio (todos los pares en una sola pasada)"""
     try:
         # Leer archivo de transacciones
         df = pd.read_csv(transactions_file, delimiter=';', decimal=',')
@@ -491,23 +437,13 @@ def analyze_portfolio_transactions(transactions_file: str) -> Dict:
         # Normalizar pares de trading
         df = normalize_trading_pairs(df)
         
-        # Obtener pares únicos
-        pares = df['Pair'].unique()
+        # Métricas de todos los pares a la vez
+        stats = pair_analytics(df)
+        portfolio_analysis = {pair: pair_metrics(pair, row) for pair, row in stats.to_dict('index').items()}
         
-        # Analizar cada par
-        portfolio_analysis = {}
-        total_portfolio_value = 0
-        total_pnl_realized = 0
-        total_pnl_unrealized = 0
-        
-        for par in pares:
-            metrics = analyze_trading_pair(df, par)
-            if metrics:
-                portfolio_analysis[par] = metrics
-                if metrics['posicion']['cantidad'] > 0:
-                    total_portfolio_value += metrics['posicion']['coste_total']
-                total_pnl_realized += metrics['pnl_realizado']
-                total_pnl_unrealized += metrics['pnl_no_realizado']
+        total_portfolio_value = stats['net_cost'].where(stats['position_qty'] > 0, 0).sum()
+        total_pnl_realized = stats['realized_pnl'].sum()
+        total_pnl_unrealized = stats['unrealized_pnl'].sum()
         
         # Crear resumen
         analysis_output = {
@@ -517,7 +453,10 @@ def analyze_portfolio_transactions(transactions_file: str) -> Dict:
                 'valor_total': float(total_portfolio_value),
                 'pnl_realizado_total': float(total_pnl_realized),
                 'pnl_no_realizado_total': float(total_pnl_unrealized),
-                'pnl_total': float(total_pnl_realized + total_pnl_unrealized)
+                'pnl_total': float(total_pnl_realized + total_pnl_unrealized),
+                'pnl_realizado_fifo_total': float(stats['fifo_realized_pnl'].sum()),
+                'pnl_no_realizado_fifo_total': float(stats['fifo_unrealized_pnl'].sum()),
+                'comisiones_total': float(stats['fees'].sum())
             }
         }
         
@@ -8,6 +8,11 @@ import json
 import traceback
 import os
 from datetime import datetime
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tradingview_ingest import TRADINGVIEW_DIR, load_screener
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,9 +23,7 @@ logger = logging.getLogger(__name__)
 
 class TradingViewOptimizer:
     def __init__(self):
-        self.tecnicos_df = None
-        self.direcciones_df = None
-        self.pnl_df = None
+        self.screener_df = None
         self.portfolio = {}
         
         # Configuración de criterios
@@ -38,125 +41,70 @@ class TradingViewOptimizer:
             'rank': 0.15,
             'active_addresses': 0.15
         }
+
+        # Tablas de reglas del score técnico
+        # Rating: el primer texto contenido en la etiqueta decide los puntos
+        self.rating_scores = {'Compra fuerte': 2, 'Comprar': 1, 'Venta fuerte': -2, 'Vender': -1}
+        # (mínimo, máximo, puntos, cierre) evaluadas en orden, más los puntos por defecto
+        self.rsi_rules = ([
+            (40, 60, 1, 'both'),
+            (70, np.inf, -1, 'neither'),
+            (-np.inf, 30, -1, 'neither')
+        ], 0)
+        self.momentum_rules = ([(0, np.inf, 1, 'neither')], -1)
         
     def load_data(self):
-        """Carga los datos más recientes de TradingView"""
+        """Carga la foto más reciente del screener de TradingView (tipada y combinada, con caché)"""
         try:
-            # Encontrar el directorio más reciente
-            tradingview_dir = "TradingViewData"
-            if not os.path.exists(tradingview_dir):
-                raise FileNotFoundError(f"Directorio {tradingview_dir} no encontrado")
-            
-            subdirs = [d for d in os.listdir(tradingview_dir) 
-                      if os.path.isdir(os.path.join(tradingview_dir, d)) 
-                      and d.startswith("TradingView_data_")]
-            
-            if not subdirs:
-                raise FileNotFoundError("No se encontraron directorios de datos")
-            
-            latest_dir = max(subdirs)
-            base_path = os.path.join(tradingview_dir, latest_dir)
-            
-            # Listar y verificar archivos
-            files = os.listdir(base_path)
-            logger.info(f"Archivos encontrados en {base_path}:")
-            logger.info(files)
-            
-            # Buscar archivos usando next() para manejo más seguro
-            tecnicos_file = next((f for f in files if "Datostecnicos_" in f), None)
-            if not tecnicos_file:
-                raise FileNotFoundError("Archivo de datos técnicos no encontrado")
-            
-            direcciones_file = next((f for f in files if "Direcciones_" in f), None)
-            if not direcciones_file:
-                raise FileNotFoundError("Archivo de direcciones no encontrado")
-            
-            pnl_file = next((f for f in files if "Perdidas_" in f), None)
-            if not pnl_file:
-                raise FileNotFoundError("Archivo de pérdidas y ganancias no encontrado")
-            
-            # Cargar los archivos
-            self.tecnicos_df = pd.read_csv(os.path.join(base_path, tecnicos_file))
-            self.direcciones_df = pd.read_csv(os.path.join(base_path, direcciones_file))
-            self.pnl_df = pd.read_csv(os.path.join(base_path, pnl_file))
-            
-            logger.info(f"Datos cargados: {len(self.tecnicos_df)} criptomonedas")
-            
-            # Mostrar información de las columnas
-            logger.info("Columnas en tecnicos_df:")
-            logger.info(list(self.tecnicos_df.columns))
-            logger.info("\nColumnas en direcciones_df:")
-            logger.info(list(self.direcciones_df.columns))
-            logger.info("\nColumnas en pnl_df:")
-            logger.info(list(self.pnl_df.columns))
+            self.screener_df = load_screener(TRADINGVIEW_DIR)
+            logger.info(f"Datos cargados: {len(self.screener_df)} criptomonedas")
+            logger.debug(f"Columnas del screener: {list(self.screener_df.columns)}")
             
         except Exception as e:
             logger.error(f"Error cargando datos: {str(e)}")
-            if 'base_path' in locals():
-                logger.error(f"Directorio base: {base_path}")
-                logger.error(f"Archivos disponibles: {os.listdir(base_path) if os.path.exists(base_path) else 'No disponible'}")
             raise
             
-    def calculate_technical_score(self, row):
-        """Calcula score técnico basado en indicadores"""
-        score = 0
-        
-        # Rating técnico
-        if 'Compra fuerte' in str(row['Rating técnico 1 día']):
-            score += 2
-        elif 'Comprar' in str(row['Rating técnico 1 día']):
-            score += 1
-        elif 'Venta fuerte' in str(row['Rating técnico 1 día']):
-            score -= 2
-        elif 'Vender' in str(row['Rating técnico 1 día']):
-            score -= 1
-            
-        # RSI
-        rsi = float(row['Índice de fuerza relativa (14) 1 día'])
-        if 40 <= rsi <= 60:
-            score += 1
-        elif rsi > 70 or rsi < 30:
-            score -= 1
-            
-        # Momentum
-        momentum = float(row['Momentum (10) 1 día'])
-        if momentum > 0:
-            score += 1
-        else:
-            score -= 1
-            
-        return score
-            
+    @staticmethod
+    def _score_by_rules(values: pd.Series, rules: List[Tuple], default: float) -> np.ndarray:
+        """Aplica una tabla de reglas (mínimo, máximo, puntos, cierre) con máscaras; gana la primera que encaja"""
+        x = values.to_numpy(dtype=float, na_value=np.nan)
+        conditions = []
+        for low, high, _, closed in rules:
+            above = x >= low if closed in ('both', 'left') else x > low
+            below = x <= high if closed in ('both', 'right') else x < high
+            conditions.append(above & below)
+        return np.select(conditions, [points for _, _, points, _ in rules], default=default)
+
+    def calculate_technical_scores(self, metrics: pd.DataFrame) -> pd.Series:
+        """
+        Calcula el score técnico de todos los activos de forma vectorizada
+
+        Args:
+            metrics: Screener con rating técnico, RSI y momentum
+
+        Returns:
+            Serie de scores alineada con metrics
+        """
+        # Rating técnico: cada categoría distinta se puntúa una vez y se propaga por sus códigos
+        ratings = metrics['Rating técnico 1 día'].astype('category')
+        category_scores = np.array([
+            next((points for label, points in self.rating_scores.items() if label in str(category)), 0)
+            for category in ratings.cat.categories
+        ] + [0])  # Código -1 (sin rating) -> 0
+        score = category_scores[ratings.cat.codes.to_numpy()].astype(float)
+
+        score += self._score_by_rules(metrics['Índice de fuerza relativa (14) 1 día'], *self.rsi_rules)
+        score += self._score_by_rules(metrics['Momentum (10) 1 día'], *self.momentum_rules)
+        return pd.Series(score, index=metrics.index)
+
     def calculate_metrics(self) -> pd.DataFrame:
         """Calcula métricas para cada activo"""
         try:
-            # Empezar con datos técnicos
-            metrics = self.tecnicos_df.copy()
-            
-            # Añadir datos de direcciones
-            metrics = pd.merge(
-                metrics,
-                self.direcciones_df[[
-                    'Moneda', 
-                    'Capitalización de mercado',
-                    'Direcciones activas diarias'
-                ]],
-                on='Moneda',
-                how='left'
-            )
+            # Datos técnicos, direcciones y PnL ya combinados y con columnas numéricas limpias
+            metrics = self.screener_df.copy()
             
-            # Añadir datos de PnL
-            metrics = pd.merge(
-                metrics,
-                self.pnl_df[['Moneda', 'Direcciones de beneficios %']],
-                on='Moneda',
-                how='left'
-            )
-            
-            # Limpiar y convertir market cap
-            metrics['market_cap_clean'] = metrics['Capitalización de mercado'].apply(
-                lambda x: float(str(x).replace(',', '')) if pd.notnull(x) and str(x).strip() != '' else 0
-            )
+            # Market cap numérico
+            metrics['market_cap_clean'] = metrics['Capitalización de mercado'].fillna(0)
             
             # Normalizar market cap
             max_cap = metrics['market_cap_clean'].max()
@@ -177,7 +125,7 @@ class TradingViewOptimizer:
             metrics['rank_score'] = 1 - (metrics['rank_num'] / len(metrics))
             
             # Score técnico
-            metrics['technical_score'] = metrics.apply(self.calculate_technical_score, axis=1)
+            metrics['technical_score'] = self.calculate_technical_scores(metrics)
             max_tech = metrics['technical_score'].max()
             min_tech = metrics['technical_score'].min()
             if max_tech > min_tech:
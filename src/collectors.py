@@ -0,0 +1,236 @@
+"""
+Colectores Asíncronos de Inteligencia de Mercado
+Cada fuente es un colector asíncrono con su propio timeout y presupuesto de
+concurrencia. En cada ciclo todos los colectores corren a la vez y sus lotes de
+insights se almacenan según llegan, de modo que una fuente lenta no retrasa a las
+demás (se corta al agotar su timeout) ni al siguiente ciclo. Los ciclos no se solapan:
+si uno sigue en curso cuando se dispara el siguiente, este se omite
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+Insight = Dict[str, Any]
+Sink = Callable[[List[Insight]], Any]
+
+def content_hash(content: str) -> str:
+    """Hash del contenido normalizado (minúsculas y espacios colapsados) para detectar repetidos"""
+    normalized = " ".join(str(content).lower().split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+class Collector(ABC):
+    """Fuente de insights; las subclases implementan collect() como generador asíncrono de lotes"""
+
+    def __init__(self, name: str, timeout: float = 30.0, max_concurrency: int = 4):
+        self.name = name
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+
+    @abstractmethod
+    async def collect(self, session: aiohttp.ClientSession) -> AsyncIterator[List[Insight]]:
+        """
+        Produce lotes de insights según se obtienen
+
+        Args:
+            session: Sesión HTTP compartida del ciclo
+
+        Yields:
+            Listas de insights (source, insight_type, content, url, tags...)
+        """
+        raise NotImplementedError
+
+class HTTPCollector(Collector):
+    """Descarga varias URLs en paralelo (hasta max_concurrency) y convierte cada respuesta en insights"""
+
+    def __init__(self, name: str, urls: List[str], timeout: float = 30.0, max_concurrency: int = 4,
+                 request_timeout: Optional[float] = None):
+        super().__init__(name, timeout, max_concurrency)
+        self.urls = urls
+        self.request_timeout = request_timeout or timeout
+
+    @abstractmethod
+    def parse(self, url: str, body: str) -> List[Insight]:
+        """Convierte el cuerpo de una respuesta en insights"""
+        raise NotImplementedError
+
+    async def _fetch(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, url: str) -> List[Insight]:
+        async with semaphore:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=self.request_timeout)) as response:
+                response.raise_for_status()
+                return self.parse(url, await response.text())
+
+    async def collect(self, session: aiohttp.ClientSession) -> AsyncIterator[List[Insight]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.ensure_future(self._fetch(session, semaphore, url)) for url in self.urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    batch = await next_done
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, ET.ParseError) as e:
+                    logger.warning(f"Colector {self.name}: error en una URL: {e}")
+                    continue
+                if batch:
+                    yield batch
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # Errores de descargas ya terminadas que no se llegaron a consumir
+
+class RSSCollector(HTTPCollector):
+    """Noticias de feeds RSS/Atom"""
+
+    def __init__(self, name: str, urls: List[str], tags: Optional[List[str]] = None, **kwargs):
+        super().__init__(name, urls, **kwargs)
+        self.tags = tags or []
+
+    def parse(self, url: str, body: str) -> List[Insight]:
+        root = ET.fromstring(body)
+        insights = []
+        for item in root.iter():
+            if item.tag.rsplit('}', 1)[-1] not in ('item', 'entry'):
+                continue
+            fields = {child.tag.rsplit('}', 1)[-1]: child for child in item}
+            title = (fields['title'].text or '').strip() if 'title' in fields else ''
+            summary_node = fields.get('description', fields.get('summary'))
+            summary = (summary_node.text or '').strip() if summary_node is not None else ''
+            link_node = fields.get('link')
+            link = None
+            if link_node is not None:
+                link = (link_node.text or '').strip() or link_node.get('href')
+            content = f"{title}. {summary}".strip('. ') if summary else title
+            if content:
+                insights.append({
+                    'source': self.name,
+                    'insight_type': 'news',
+                    'content': content,
+                    'url': link,
+                    'tags': list(self.tags)
+                })
+        return insights
+
+class FearGreedCollector(HTTPCollector):
+    """Índice Fear & Greed (API de alternative.me o compatible)"""
+
+    def parse(self, url: str, body: str) -> List[Insight]:
+        insights = []
+        for entry in json.loads(body).get('data', []):
+            value = int(entry['value'])
+            insights.append({
+                'source': self.name,
+                'insight_type': 'sentiment_index',
+                'content': f"Fear & Greed Index: {value} ({entry.get('value_classification', '')}) "
+                           f"- {datetime.fromtimestamp(int(entry.get('timestamp', 0))).date()}",
+                'sentiment_score': (value - 50) / 50,
+                'url': url,
+                'tags': ['fear_greed', 'sentiment']
+            })
+        return insights
+
+def default_collectors() -> List[Collector]:
+    """Fuentes públicas por defecto"""
+    return [
+        RSSCollector('coindesk', ['https://www.coindesk.com/arc/outboundfeeds/rss/'], tags=['news'], timeout=60),
+        RSSCollector('cointelegraph', ['https://cointelegraph.com/rss'], tags=['news'], timeout=60),
+        FearGreedCollector('fear_greed', ['https://api.alternative.me/fng/?limit=1'], timeout=20)
+    ]
+
+@dataclass
+class CollectorResult:
+    """Resultado de un colector en un ciclo"""
+    name: str
+    status: str = 'ok'  # ok, timeout, error
+    items: int = 0
+    stored: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+@dataclass
+class CycleReport:
+    """Resumen de un ciclo de recolección"""
+    started_at: datetime
+    seconds: float = 0.0
+    skipped: bool = False
+    results: Dict[str, CollectorResult] = field(default_factory=dict)
+
+    @property
+    def stored(self) -> int:
+        return sum(r.stored for r in self.results.values())
+
+class CollectorRunner:
+    """Ejecuta los colectores en paralelo y vuelca sus lotes al sink según llegan"""
+
+    def __init__(self, collectors: List[Collector], sink: Sink, user_agent: str = "EstrategiasDCA/1.0"):
+        self.collectors = collectors
+        self.sink = sink
+        self.user_agent = user_agent
+        self.skipped_cycles = 0
+        self._cycle_lock = threading.Lock()  # Compartido entre el hilo de APScheduler y asyncio
+
+    async def _store(self, batch: List[Insight]) -> int:
+        """Guarda un lote en un hilo para no bloquear el bucle (el sink puede ser síncrono)"""
+        stored = await asyncio.to_thread(self.sink, batch)
+        return stored if isinstance(stored, int) else len(batch)
+
+    async def _run_collector(self, collector: Collector, session: aiohttp.ClientSession) -> CollectorResult:
+        result = CollectorResult(collector.name)
+        start = time.perf_counter()
+
+        async def consume():
+            async for batch in collector.collect(session):
+                result.batches += 1
+                result.items += len(batch)
+                result.stored += await self._store(batch)
+
+        try:
+            await asyncio.wait_for(consume(), timeout=collector.timeout)
+        except asyncio.TimeoutError:
+            result.status = 'timeout'
+            logger.warning(f"Colector {collector.name} cortado tras {collector.timeout}s ({result.items} insights)")
+        except Exception as e:
+            result.status, result.error = 'error', str(e)
+            logger.error(f"Error en colector {collector.name}: {e}")
+        result.seconds = time.perf_counter() - start
+        return result
+
+    async def run_cycle(self) -> CycleReport:
+        """
+        Ejecuta un ciclo con todos los colectores a la vez
+
+        Returns:
+            Informe del ciclo (skipped=True si ya había un ciclo en curso)
+        """
+        report = CycleReport(started_at=datetime.now())
+        if not self._cycle_lock.acquire(blocking=False):
+            self.skipped_cycles += 1
+            report.skipped = True
+            logger.warning("Ciclo de recolección omitido: el anterior sigue en curso")
+            return report
+        start = time.perf_counter()
+        try:
+            async with aiohttp.ClientSession(headers={'User-Agent': self.user_agent}) as session:
+                results = await asyncio.gather(*(self._run_collector(c, session) for c in self.collectors))
+            report.results = {r.name: r for r in results}
+        finally:
+            self._cycle_lock.release()
+        report.seconds = time.perf_counter() - start
+        logger.info(f"Ciclo de recolección: {report.stored} insights nuevos en {report.seconds:.1f}s")
+        return report
+
+    def run_cycle_sync(self) -> CycleReport:
+        """Ejecuta un ciclo desde un hilo sin bucle de eventos (ej: job de APScheduler)"""
+        return asyncio.run(self.run_cycle())
@@ -1,33 +1,46 @@
+import re
 import sqlite3
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from src.collectors import Collector, CollectorRunner, CycleReport, content_hash, default_collectors
+from src.sentiment_scoring import SentimentScorer, score_pending_insights
+from src.storage import DB_PATH, database_url, get_storage, sqlite_path_from_url
 
 # Configuración del logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-DB_PATH = 'dca_trading.db'
-
 class DataMarketAgent:
-    def __init__(self, db_path: str = DB_PATH):
+    def __init__(self, db_path: Optional[str] = None, collectors: Optional[List[Collector]] = None,
+                 scorer: Optional[SentimentScorer] = None):
         """
         Inicializa el Agente de Inteligencia de Mercado.
-        - Establece la conexión a la base de datos.
+        - Establece la conexión a la base de datos (almacenamiento compartido con DatabaseManager).
         - Inicializa la tabla de insights si no existe.
+        - Registra los colectores (por defecto las fuentes públicas de default_collectors).
+        - Prepara el scoring de sentimiento de los insights nuevos.
         - Configura el scheduler para las tareas de recolección.
         """
-        self.db_path = db_path
+        # Por defecto, el archivo de DATABASE_URL (el mismo que DatabaseManager y MarketAnalyzer)
+        self.db_path = db_path or sqlite_path_from_url(database_url()) or DB_PATH
+        self.storage = get_storage(self.db_path)
         self.conn = self._create_connection()
         self._initialize_db()
+        self.collector_runner = CollectorRunner(
+            default_collectors() if collectors is None else collectors, self.store_insights
+        )
+        self.scorer = scorer or SentimentScorer()
         
         self.scheduler = BackgroundScheduler()
-        self.scheduler.add_job(self.run_collection_cycle, 'interval', minutes=15, id='market_intel_cycle')
+        self.scheduler.add_job(self.run_collection_cycle, 'interval', minutes=15, id='market_intel_cycle',
+                               max_instances=1, coalesce=True)
 
     def _create_connection(self):
-        """Crea y retorna una conexión a la base de datos SQLite."""
+        """Crea y retorna una conexión de lectura a la base de datos SQLite (las escrituras van al escritor compartido)."""
         try:
-            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn = self.storage.connect(read_only=True)
             logger.info(f"Conexión a la base de datos en '{self.db_path}' establecida.")
             return conn
         except sqlite3.Error as e:
@@ -36,28 +49,110 @@ class DataMarketAgent:
 
     def _initialize_db(self):
         """
-        Asegura que la tabla 'market_insights' exista en la base de datos.
+        Asegura que la tabla 'market_insights' exista en la base de datos, junto con
+        el hash de contenido para deduplicar, la tabla normalizada de tags y el índice
+        de texto completo (FTS5) sobre 'content'.
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS market_insights (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    source TEXT NOT NULL,
-                    insight_type TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    sentiment_score REAL,
-                    relevance_score REAL,
-                    url TEXT,
-                    tags TEXT,
-                    collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            self.conn.commit()
+            self.fts_enabled = self.storage.writer.run(self._migrate_schema)
             logger.info("Tabla 'market_insights' inicializada correctamente.")
         except sqlite3.Error as e:
+            self.fts_enabled = False
             logger.error(f"Error al inicializar la tabla 'market_insights': {e}")
-            
+
+    # Hash del contenido normalizado para detectar repetidos (compartido con el scoring de sentimiento)
+    content_hash = staticmethod(content_hash)
+
+    def _migrate_schema(self, conn: sqlite3.Connection) -> bool:
+        """Crea o actualiza el esquema; devuelve si el índice FTS5 está disponible."""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS market_insights (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                insight_type TEXT NOT NULL,
+                content TEXT NOT NULL,
+                sentiment_score REAL,
+                relevance_score REAL,
+                url TEXT,
+                tags TEXT,
+                collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                content_hash TEXT
+            );
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(market_insights)")}
+        if 'content_hash' not in columns:
+            conn.execute("ALTER TABLE market_insights ADD COLUMN content_hash TEXT")
+
+        # Filas antiguas: se asigna el hash al primer insight de cada contenido (los repetidos quedan en NULL)
+        pending = conn.execute(
+            "SELECT id, content FROM market_insights WHERE content_hash IS NULL ORDER BY id"
+        ).fetchall()
+        if pending:
+            known = {row[0] for row in conn.execute(
+                "SELECT content_hash FROM market_insights WHERE content_hash IS NOT NULL"
+            )}
+            updates = []
+            for insight_id, content in pending:
+                digest = self.content_hash(content)
+                if digest not in known:
+                    known.add(digest)
+                    updates.append((digest, insight_id))
+            conn.executemany("UPDATE market_insights SET content_hash = ? WHERE id = ?", updates)
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_market_insights_hash ON market_insights(content_hash)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_market_insights_collected ON market_insights(collected_at)"
+        )
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS insight_tags (
+                tag TEXT NOT NULL,
+                insight_id INTEGER NOT NULL REFERENCES market_insights(id) ON DELETE CASCADE,
+                PRIMARY KEY (tag, insight_id)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_insight_tags_insight ON insight_tags(insight_id)")
+        if pending:
+            tag_rows = [
+                (tag.strip().lower(), insight_id)
+                for insight_id, tags in conn.execute(
+                    "SELECT id, tags FROM market_insights WHERE tags IS NOT NULL AND tags != ''"
+                )
+                for tag in tags.split(',') if tag.strip()
+            ]
+            conn.executemany("INSERT OR IGNORE INTO insight_tags (tag, insight_id) VALUES (?, ?)", tag_rows)
+
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'market_insights_fts'"
+            ).fetchone()
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS market_insights_fts USING fts5(
+                    content, content='market_insights', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 no disponible, la búsqueda usará LIKE: {e}")
+            return False
+        for statement in (
+            """CREATE TRIGGER IF NOT EXISTS market_insights_ai AFTER INSERT ON market_insights BEGIN
+                   INSERT INTO market_insights_fts(rowid, content) VALUES (new.id, new.content);
+               END""",
+            """CREATE TRIGGER IF NOT EXISTS market_insights_ad AFTER DELETE ON market_insights BEGIN
+                   INSERT INTO market_insights_fts(market_insights_fts, rowid, content) VALUES ('delete', old.id, old.content);
+               END""",
+            """CREATE TRIGGER IF NOT EXISTS market_insights_au AFTER UPDATE OF content ON market_insights BEGIN
+                   INSERT INTO market_insights_fts(market_insights_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                   INSERT INTO market_insights_fts(rowid, content) VALUES (new.id, new.content);
+               END"""
+        ):
+            conn.execute(statement)
+        if not exists:
+            conn.execute("INSERT INTO market_insights_fts(market_insights_fts) VALUES ('rebuild')")
+        return True
+
     def start(self):
         """Inicia el scheduler del agente."""
         logger.info("Iniciando el Agente de Inteligencia de Mercado...")
@@ -66,50 +161,146 @@ class DataMarketAgent:
     def stop(self):
         """Detiene el scheduler del agente."""
         logger.info("Deteniendo el Agente de Inteligencia de Mercado...")
-        self.scheduler.shutdown()
+        if self.scheduler.running:
+            self.scheduler.shutdown()
+        self.scorer.close()
+        self.conn.close()
 
-    def run_collection_cycle(self):
+    def run_collection_cycle(self) -> CycleReport:
         """
         Ciclo principal de recolección y procesamiento.
-        Este método será el orquestador de todas las tareas.
+        Ejecuta todos los colectores a la vez y almacena sus insights según llegan;
+        si el ciclo anterior sigue en curso, este se omite. Después puntúa el
+        sentimiento de los insights nuevos.
         """
         logger.info("Iniciando ciclo de recolección de inteligencia de mercado...")
-        # Aquí llamaremos a los colectores y procesadores
-        # Ejemplo:
-        # news = self.collect_crypto_news()
-        # insights = self.process_news(news)
-        # self.store_insights(insights)
-        pass # Por ahora no hace nada
+        report = self.collector_runner.run_cycle_sync()
+        if not report.skipped:
+            self.score_insights()
+        return report
 
     # --- Métodos de Recolección (Web Scraping, APIs) ---
-    # (Se implementarán en el Paso 2)
+    # Cada fuente es un Collector de src/collectors.py
 
     # --- Métodos de Procesamiento (IA, Análisis de Sentimiento) ---
-    # (Se implementarán en el Paso 3)
 
-    def store_insights(self, insights: List[Dict[str, Any]]):
+    def score_insights(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Puntúa por lotes los insights sin sentimiento o relevancia (ver src/sentiment_scoring.py).
+
+        Args:
+            limit: Máximo de insights a puntuar
+
+        Returns:
+            Recuento de insights pendientes, servidos desde caché, puntuados y actualizados
         """
-        Almacena una lista de insights en la base de datos.
+        try:
+            return score_pending_insights(self.storage, self.scorer, limit)
+        except sqlite3.Error as e:
+            logger.error(f"Error al puntuar insights: {e}")
+            return {}
+
+    def store_insights(self, insights: List[Dict[str, Any]]) -> int:
         """
+        Almacena una lista de insights en la base de datos en una sola transacción.
+        Los contenidos ya almacenados (mismo hash) se ignoran y los tags se guardan
+        normalizados en 'insight_tags'.
+
+        Returns:
+            Número de insights nuevos almacenados
+        """
+        rows, tag_rows, seen = [], [], set()
+        for insight in insights:
+            if not insight.get('content'):
+                continue
+            digest = self.content_hash(insight['content'])
+            if digest in seen:
+                continue
+            seen.add(digest)
+            tags = [str(tag).strip() for tag in insight.get('tags') or [] if str(tag).strip()]
+            rows.append((
+                insight.get('source'),
+                insight.get('insight_type'),
+                insight.get('content'),
+                insight.get('sentiment_score'),
+                insight.get('relevance_score'),
+                insight.get('url'),
+                ",".join(tags) if tags else None,
+                digest
+            ))
+            tag_rows.extend((tag, digest) for tag in dict.fromkeys(tag.lower() for tag in tags))
+
+        def insert(conn: sqlite3.Connection) -> int:
+            inserted = conn.executemany("""
+                INSERT OR IGNORE INTO market_insights
+                    (source, insight_type, content, sentiment_score, relevance_score, url, tags, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows).rowcount
+            conn.executemany("""
+                INSERT OR IGNORE INTO insight_tags (tag, insight_id)
+                SELECT ?, id FROM market_insights WHERE content_hash = ?
+            """, tag_rows)
+            return inserted
+
+        if not rows:
+            return 0
         try:
-            cursor = self.conn.cursor()
-            for insight in insights:
-                cursor.execute("""
-                    INSERT INTO market_insights (source, insight_type, content, sentiment_score, relevance_score, url, tags)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    insight.get('source'),
-                    insight.get('insight_type'),
-                    insight.get('content'),
-                    insight.get('sentiment_score'),
-                    insight.get('relevance_score'),
-                    insight.get('url'),
-                    ",".join(insight.get('tags', [])) if insight.get('tags') else None
-                ))
-            self.conn.commit()
-            logger.info(f"{len(insights)} nuevos insights almacenados en la base de datos.")
+            inserted = self.storage.writer.run(insert)
+            logger.info(f"{inserted} nuevos insights almacenados en la base de datos "
+                        f"({len(insights) - inserted} repetidos ignorados).")
+            return inserted
         except sqlite3.Error as e:
             logger.error(f"Error al almacenar insights: {e}")
+            return 0
+
+    def search_insights(self, query: str, tag: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Busca insights por texto completo (FTS5, ordenados por relevancia bm25).
+        Si la consulta no es sintaxis FTS5 válida (ej: 'BTC-ETF', 'S&P 500') se buscan sus
+        palabras como términos literales.
+
+        Args:
+            query: Consulta en sintaxis FTS5 (ej: 'bitcoin AND etf') o texto libre
+            tag: Filtrar por tag
+            limit: Máximo de resultados
+
+        Returns:
+            Lista de insights como diccionarios
+        """
+        tag_filter = "AND i.id IN (SELECT insight_id FROM insight_tags WHERE tag = :tag)" if tag else ""
+        if self.fts_enabled:
+            sql = f"""
+                SELECT i.* FROM market_insights_fts f JOIN market_insights i ON i.id = f.rowid
+                WHERE market_insights_fts MATCH :query {tag_filter}
+                ORDER BY bm25(market_insights_fts) LIMIT :limit
+            """
+        else:
+            sql = f"""
+                SELECT i.* FROM market_insights i WHERE i.content LIKE '%' || :query || '%' {tag_filter}
+                ORDER BY i.collected_at DESC LIMIT :limit
+            """
+        params = {'query': query, 'tag': tag.strip().lower() if tag else None, 'limit': limit}
+        try:
+            cursor = self.conn.execute(sql, params)
+        except sqlite3.OperationalError:
+            if not self.fts_enabled:
+                raise
+            terms = re.findall(r'\w+', query)
+            if not terms:
+                return []
+            params['query'] = " ".join('"' + term + '"' for term in terms)
+            cursor = self.conn.execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def get_insights_by_tag(self, tag: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Insights más recientes con un tag (usa el índice de 'insight_tags')."""
+        cursor = self.conn.execute("""
+            SELECT i.* FROM insight_tags t JOIN market_insights i ON i.id = t.insight_id
+            WHERE t.tag = ? ORDER BY i.collected_at DESC, i.id DESC LIMIT ?
+        """, (tag.strip().lower(), limit))
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
 if __name__ == '__main__':
     # Ejemplo de uso y prueba
@@ -1,12 +1,14 @@
 import logging
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime
 import traceback
 import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, JSON
+from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, JSON, bindparam, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
+from src.performance_monitor import timed
+from src.storage import database_url, get_storage, sqlite_path_from_url
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -53,12 +55,18 @@ class MarketData(Base):
     volatility = Column(Float)  # Volatilidad
     momentum = Column(Float)  # Momentum
 
+# Clave natural de una transacción importada (para deduplicar)
+TRANSACTION_KEY = ('timestamp', 'symbol', 'type', 'amount', 'price')
+
 class DatabaseManager:
     def __init__(self, config: Optional[Dict] = None):
-        db_url = os.getenv('DATABASE_URL', 'sqlite:///dca_trading.db')
-        self.engine = create_engine(db_url)
-        Base.metadata.create_all(self.engine)
+        db_url = database_url()
+        # Con SQLite en archivo se comparte la fábrica de conexiones (WAL y pragmas) con DataMarketAgent
+        sqlite_path = sqlite_path_from_url(db_url)
+        self.storage = get_storage(sqlite_path) if sqlite_path else None
+        self.engine = self.storage.engine if self.storage else create_engine(db_url)
         self.Session = sessionmaker(bind=self.engine)
+        self._write(Base.metadata.create_all)
         
         # Store configuration if provided
         self.config = config or {}
@@ -78,31 +86,61 @@ class DatabaseManager:
             logger.info("Email notifications configured")
         except ImportError:
             logger.warning("Email notification module not available")
+
+    def _write(self, fn: Callable[[Any], Any]) -> Any:
+        """
+        Ejecuta fn(connection) en una transacción de escritura
+
+        Con SQLite en archivo se ejecuta en el hilo escritor compartido (sobre su conexión),
+        de modo que DatabaseManager y DataMarketAgent tienen un único escritor; con otros
+        motores, en una conexión propia del engine
+        """
+        if self.storage is None:
+            with self.engine.begin() as connection:
+                return fn(connection)
+        return self.storage.writer.run(self._writer_job, fn)
+
+    async def _write_async(self, fn: Callable[[Any], Any]) -> Any:
+        """Como _write, sin bloquear el bucle de eventos"""
+        if self.storage is None:
+            return self._write(fn)
+        return await self.storage.writer.run_async(self._writer_job, fn)
+
+    def _writer_job(self, conn, fn: Callable[[Any], Any]) -> Any:
+        """Trabajo del escritor: transacción de SQLAlchemy sobre la conexión del hilo escritor"""
+        with self.storage.writer_engine(conn).begin() as connection:
+            return fn(connection)
+
+    @staticmethod
+    def _in_session(fn: Callable[[Session], Any]) -> Callable[[Any], Any]:
+        """Adapta fn(session) a fn(connection): la sesión se vuelca en la transacción de la conexión"""
+        def run(connection):
+            with Session(bind=connection) as session:
+                result = fn(session)
+                session.flush()
+                return result
+        return run
     
+    @timed("db.save_portfolio_state")
     def save_portfolio_state(self, total_value: float, positions: Dict[str, float], 
                            weights: Dict[str, float]):
         """Guarda el estado actual del portfolio"""
         try:
-            session = self.Session()
             state = PortfolioState(
                 timestamp=datetime.now(),
                 total_value=total_value,
                 positions=positions,
                 weights=weights
             )
-            session.add(state)
-            session.commit()
+            self._write(self._in_session(lambda session: session.add(state)))
             logger.info("Estado del portfolio guardado exitosamente")
         except Exception as e:
             logger.error(f"Error guardando estado del portfolio: {str(e)}")
-            session.rollback()
-        finally:
-            session.close()
     
+    @timed("db.record_transaction")
     def record_transaction(self, symbol: str, type_: str, amount: float, price: float):
         """Registra una transacción"""
         try:
-            session = self.Session()
             transaction = Transaction(
                 timestamp=datetime.now(),
                 symbol=symbol,
@@ -110,20 +148,16 @@ class DatabaseManager:
                 amount=amount,
                 price=price
             )
-            session.add(transaction)
-            session.commit()
+            self._write(self._in_session(lambda session: session.add(transaction)))
             logger.info(f"Transacción registrada: {symbol} {type_} {amount} @ {price}")
         except Exception as e:
             logger.error(f"Error registrando transacción: {str(e)}")
-            session.rollback()
-        finally:
-            session.close()
     
+    @timed("db.save_market_data")
     def save_market_data(self, symbol: str, price: float, volume: float, 
                         market_cap: Optional[float] = None):
         """Guarda datos de mercado"""
         try:
-            session = self.Session()
             market_data = MarketData(
                 timestamp=datetime.now(),
                 symbol=symbol,
@@ -131,50 +165,46 @@ class DatabaseManager:
                 volume=volume,
                 market_cap=market_cap
             )
-            session.add(market_data)
-            session.commit()
+            self._write(self._in_session(lambda session: session.add(market_data)))
         except Exception as e:
             logger.error(f"Error guardando datos de mercado: {str(e)}")
-            session.rollback()
-        finally:
-            session.close()
             
+    @timed("db.save_market_data_bulk")
     def save_market_data_bulk(self, data_list: List[Dict]):
         """Guarda múltiples datos de mercado de forma eficiente"""
         try:
-            session = self.Session()
-            session.bulk_insert_mappings(MarketData, data_list)
-            session.commit()
+            self._write(self._in_session(lambda session: session.bulk_insert_mappings(MarketData, data_list)))
             logger.info(f"Guardados {len(data_list)} registros de mercado")
         except Exception as e:
             logger.error(f"Error guardando datos de mercado en bulk: {str(e)}")
-            session.rollback()
             raise
-        finally:
-            session.close()
             
+    @timed("db.save_portfolio_state_with_metrics")
     def save_portfolio_state_with_metrics(self, total_value: float, positions: Dict[str, float], 
                                         weights: Dict[str, float], metrics: Dict[str, Dict]):
         """Guarda el estado del portfolio con métricas adicionales"""
         try:
-            session = self.Session()
-            state = PortfolioState(
-                timestamp=datetime.now(),
-                total_value=total_value if total_value is not None else 0.0,
-                positions=positions if positions else {},
-                weights=weights if weights else {},
-                metrics=metrics if metrics else {}
-            )
-            session.add(state)
-            session.commit()
+            self._write(self._in_session(
+                lambda session: session.add(self._portfolio_state(total_value, positions, weights, metrics))
+            ))
             logger.info("Estado del portfolio guardado con métricas")
         except Exception as e:
             logger.error(f"Error guardando estado del portfolio: {str(e)}")
-            session.rollback()
             raise
-        finally:
-            session.close()
+
+    @staticmethod
+    def _portfolio_state(total_value: Optional[float], positions: Optional[Dict[str, float]],
+                         weights: Optional[Dict[str, float]], metrics: Optional[Dict]) -> PortfolioState:
+        """Estado del portfolio con valores por defecto para los campos vacíos"""
+        return PortfolioState(
+            timestamp=datetime.now(),
+            total_value=total_value if total_value is not None else 0.0,
+            positions=positions if positions else {},
+            weights=weights if weights else {},
+            metrics=metrics if metrics else {}
+        )
     
+    @timed("db.get_portfolio_history")
     def get_portfolio_history(self, start_date: Optional[datetime] = None, 
                             end_date: Optional[datetime] = None) -> pd.DataFrame:
         """Obtiene el historial del portfolio"""
@@ -193,6 +223,7 @@ class DatabaseManager:
             logger.error(f"Error obteniendo historial del portfolio: {str(e)}")
             return pd.DataFrame()
     
+    @timed("db.get_transaction_history")
     def get_transaction_history(self, symbol: Optional[str] = None) -> pd.DataFrame:
         """Obtiene el historial de transacciones"""
         try:
@@ -206,6 +237,7 @@ class DatabaseManager:
             logger.error(f"Error obteniendo historial de transacciones: {str(e)}")
             return pd.DataFrame()
     
+    @timed("db.get_market_data_history")
     def get_market_data_history(self, symbol: str, 
                               start_date: Optional[datetime] = None) -> pd.DataFrame:
         """Obtiene el historial de datos de mercado"""
@@ -228,102 +260,233 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"Error al cerrar la conexión a la base de datos: {str(e)}")
             
+    @timed("db.log_trading_session")
     async def log_trading_session(self, market_analysis: Dict, risk_assessment: Dict):
-        """Log trading session results"""
+        """Log trading session results (en el escritor compartido, sin bloquear el bucle de eventos)"""
         try:
-            session = self.Session()
-            
-            # Save portfolio state
-            portfolio_state = {
-                'total_value': risk_assessment.get('portfolio_value'),
-                'positions': risk_assessment.get('positions'),
-                'weights': risk_assessment.get('weights'),
-                'metrics': {
-                    'risk_score': risk_assessment.get('risk_score'),
-                    'market_conditions': market_analysis.get('market_conditions')
-                }
-            }
-            self.save_portfolio_state_with_metrics(**portfolio_state)
-            
-            # Save market data
-            for symbol, data in market_analysis.get('symbol_data', {}).items():
-                self.save_market_data(
-                    symbol=symbol,
-                    price=data.get('price'),
-                    volume=data.get('volume'),
-                    market_cap=data.get('market_cap')
-                )
-                
-            session.commit()
+            await self._write_async(self._in_session(
+                lambda session: self._log_trading_session(session, market_analysis, risk_assessment)
+            ))
             logger.info("Sesión de trading registrada exitosamente")
-            
         except Exception as e:
             logger.error(f"Error registrando sesión de trading: {str(e)}")
-            session.rollback()
             raise
-        finally:
-            session.close()
 
-    def import_from_exchange(self, file_path: str, exchange: str):
-        """Importa datos desde un archivo CSV de una bolsa de criptomonedas y actualiza el portafolio y transacciones."""
+    def _log_trading_session(self, session: Session, market_analysis: Dict, risk_assessment: Dict):
+        """Añade a la sesión el estado del portfolio y los datos de mercado de una sesión de trading"""
+        session.add(self._portfolio_state(
+            risk_assessment.get('portfolio_value'),
+            risk_assessment.get('positions'),
+            risk_assessment.get('weights'),
+            {
+                'risk_score': risk_assessment.get('risk_score'),
+                'market_conditions': market_analysis.get('market_conditions')
+            }
+        ))
+        now = datetime.now()
+        for symbol, data in market_analysis.get('symbol_data', {}).items():
+            session.add(MarketData(
+                timestamp=now,
+                symbol=symbol,
+                price=data.get('price'),
+                volume=data.get('volume'),
+                market_cap=data.get('market_cap')
+            ))
+
+    @staticmethod
+    def normalize_import_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Valida y normaliza de forma vectorizada un archivo de transacciones importado
+
+        Las filas sin fecha se descartan: sin ella la clave natural no es estable y
+        reimportar el archivo las duplicaría. Las filas idénticas se conservan, ya que
+        pueden ser ejecuciones parciales legítimas de la misma orden
+
+        Args:
+            df: Filas con date, symbol, amount, price y opcionalmente type y total
+
+        Returns:
+            DataFrame con timestamp, symbol, type, amount y price válidos
+        """
+        frame = df.rename(columns={c: str(c).strip().lower() for c in df.columns})
+        frame = frame.rename(columns={'side': 'type', 'date': 'timestamp'})
+        missing = [c for c in ('timestamp', 'symbol', 'amount', 'price') if c not in frame.columns]
+        if missing:
+            raise ValueError(f"Columnas obligatorias ausentes: {missing}")
+
+        normalized = pd.DataFrame({
+            'timestamp': pd.to_datetime(frame['timestamp'], errors='coerce'),
+            'symbol': frame['symbol'].astype('string').str.strip().str.upper(),
+            'type': frame['type'].astype('string').str.strip().str.lower() if 'type' in frame.columns else 'buy',
+            'amount': pd.to_numeric(frame['amount'], errors='coerce'),
+            'price': pd.to_numeric(frame['price'], errors='coerce')
+        })
+
+        valid = (
+            normalized['timestamp'].notna()
+            & normalized['symbol'].fillna('').str.len().gt(0)
+            & normalized['type'].isin(['buy', 'sell'])
+            & normalized['amount'].gt(0)
+            & normalized['price'].gt(0)
+        )
+        if (~valid).any():
+            logger.warning(f"Se descartan {int((~valid).sum())} filas no válidas (o sin fecha) en la importación")
+        return normalized[valid].reset_index(drop=True)
+
+    def _existing_transaction_keys(self, conn, frame: pd.DataFrame) -> pd.DataFrame:
+        """Claves naturales ya guardadas en el rango de fechas y símbolos importados"""
+        existing = pd.read_sql(
+            text("SELECT timestamp, symbol, type, amount, price FROM transactions "
+                 "WHERE timestamp BETWEEN :start AND :end"
+                 ).bindparams(bindparam('start', type_=DateTime), bindparam('end', type_=DateTime)),
+            conn,
+            params={'start': frame['timestamp'].min().to_pydatetime(), 'end': frame['timestamp'].max().to_pydatetime()}
+        )
+        existing = existing[existing['symbol'].isin(frame['symbol'].unique())]
+        existing['timestamp'] = pd.to_datetime(existing['timestamp'])
+        return existing
+
+    @staticmethod
+    def _key_frame(frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Clave natural con cantidades redondeadas para comparar floats leídos de la base de datos,
+        más el número de aparición de cada clave (las ejecuciones idénticas se comparan como multiconjunto)
+        """
+        keys = frame[list(TRANSACTION_KEY)].copy()
+        keys['amount'] = keys['amount'].astype(float).round(10)
+        keys['price'] = keys['price'].astype(float).round(10)
+        keys['occurrence'] = keys.groupby(list(TRANSACTION_KEY)).cumcount()
+        return keys
+
+    def _derive_portfolio_states(self, conn, start: datetime, source: str) -> List[Dict]:
+        """
+        Deriva un estado del portfolio por día con transacciones desde 'start' en una sola pasada
+
+        Parte de las posiciones anteriores a 'start' y recorre todas las transacciones guardadas
+        desde entonces (importadas o no); cada día se valora con el último precio conocido de
+        cada símbolo
+        """
+        params = {'start': start}
+        opening = pd.read_sql(
+            text("SELECT symbol, SUM(CASE WHEN type = 'sell' THEN -amount ELSE amount END) AS amount "
+                 "FROM transactions WHERE timestamp < :start GROUP BY symbol"
+                 ).bindparams(bindparam('start', type_=DateTime)),
+            conn, params=params
+        ).set_index('symbol')['amount']
+        opening_prices = pd.read_sql(
+            text("SELECT t.symbol, t.price FROM transactions t JOIN ("
+                 "SELECT symbol, MAX(timestamp) AS last FROM transactions WHERE timestamp < :start GROUP BY symbol"
+                 ") l ON t.symbol = l.symbol AND t.timestamp = l.last"
+                 ).bindparams(bindparam('start', type_=DateTime)),
+            conn, params=params
+        ).drop_duplicates('symbol', keep='last').set_index('symbol')['price']
+        window = pd.read_sql(
+            text("SELECT timestamp, symbol, type, amount, price FROM transactions "
+                 "WHERE timestamp >= :start ORDER BY timestamp, id").bindparams(bindparam('start', type_=DateTime)),
+            conn, params=params
+        )
+        if window.empty:
+            return []
+        window['timestamp'] = pd.to_datetime(window['timestamp'])
+
+        day = window['timestamp'].dt.normalize()
+        signed = window['amount'].where(window['type'] == 'buy', -window['amount'])
+        flows = signed.groupby([day, window['symbol']]).sum().unstack(fill_value=0.0)
+        symbols = flows.columns.union(opening.index)
+        positions = flows.reindex(columns=symbols, fill_value=0.0).cumsum() + opening.reindex(symbols).fillna(0.0)
+        day_prices = window.groupby([day, window['symbol']])['price'].last().unstack().reindex(columns=symbols)
+        # Los símbolos sin operaciones ese día se valoran con su último precio conocido
+        prices = pd.concat([opening_prices.reindex(symbols).to_frame().T, day_prices]).ffill().iloc[1:]
+        values = (positions * prices).fillna(0.0)
+        totals = values.sum(axis=1)
+        weights = values.div(totals.where(totals != 0), axis=0).fillna(0.0)
+
+        states = []
+        for date, position_row, weight_row, total in zip(
+            positions.index, positions.to_dict('records'), weights.to_dict('records'), totals
+        ):
+            held = {symbol: float(amount) for symbol, amount in position_row.items() if abs(amount) > 1e-12}
+            states.append({
+                'timestamp': date.to_pydatetime(),
+                'total_value': float(total),
+                'positions': held,
+                'weights': {symbol: float(weight_row[symbol]) for symbol in held},
+                'metrics': {'source': source, 'transactions': int((day == date).sum())}
+            })
+        return states
+
+    @timed("db.bulk_import_transactions")
+    def bulk_import_transactions(self, df: pd.DataFrame, source: str = 'import',
+                                 chunk_size: int = 5000) -> Dict[str, int]:
+        """
+        Importa transacciones en bloque en una sola transacción de base de datos
+
+        Normaliza y valida el DataFrame completo, descarta las filas ya guardadas por clave
+        natural (fecha, símbolo, tipo, cantidad, precio), inserta con executemany en bloques
+        y al final recalcula los estados diarios del portfolio desde el primer día importado,
+        sustituyendo los estados diarios ya derivados para esos días
+
+        Args:
+            df: Transacciones a importar
+            source: Origen (exchange o archivo) para las métricas del estado
+            chunk_size: Filas por executemany
+
+        Returns:
+            Recuento de filas leídas, válidas, duplicadas, insertadas y estados guardados
+        """
+        frame = self.normalize_import_frame(df)
+        summary = {'read': len(df), 'valid': len(frame), 'duplicates': 0, 'inserted': 0, 'states': 0}
+        if frame.empty:
+            return summary
+
+        def import_job(conn) -> List[Dict]:
+            nonlocal frame
+            existing = self._existing_transaction_keys(conn, frame)
+            if not existing.empty:
+                seen = self._key_frame(existing).drop_duplicates()
+                flagged = self._key_frame(frame).merge(seen, how='left', indicator=True)['_merge'] == 'both'
+                summary['duplicates'] = int(flagged.sum())
+                frame = frame[~flagged.to_numpy()].reset_index(drop=True)
+            if frame.empty:
+                return []
+
+            records = frame.assign(timestamp=frame['timestamp'].dt.to_pydatetime()).to_dict('records')
+            for start in range(0, len(records), chunk_size):
+                conn.execute(Transaction.__table__.insert(), records[start:start + chunk_size])
+            start = frame['timestamp'].min().normalize().to_pydatetime()
+            states = self._derive_portfolio_states(conn, start, source)
+            if states:
+                days = [state['timestamp'] for state in states]
+                conn.execute(PortfolioState.__table__.delete().where(PortfolioState.timestamp.in_(days)))
+                conn.execute(PortfolioState.__table__.insert(), states)
+            return states
+
+        states = self._write(import_job)
+        if frame.empty:
+            return summary
+
+        summary.update(inserted=len(frame), states=len(states))
+        logger.info(f"Importación {source}: {summary}")
+        return summary
+
+    @timed("db.import_from_exchange")
+    def import_from_exchange(self, file_path: str, exchange: str) -> Dict[str, int]:
+        """Importa transacciones desde el CSV de una bolsa de criptomonedas y actualiza el portafolio"""
         try:
-            import pandas as pd
-            
-            # Leer el archivo CSV
-            df = pd.read_csv(file_path)
-            
-            # Procesar cada fila
-            for _, row in df.iterrows():
-                # Extraer información de la transacción
-                symbol = row['symbol'].upper()
-                amount = float(row['amount'])
-                price = float(row['price'])
-                date = row['date']
-                
-                # Registrar transacción
-                self.record_transaction(symbol, 'buy', amount, price)
-                
-                # Actualizar estado del portafolio
-                portfolio_state = {
-                    'total_value': float(row['total'] or 0),
-                    'positions': {symbol: amount},
-                    'weights': {symbol: (amount * price) / float(row['total'] or 0)}
-                }
-                self.save_portfolio_state_with_metrics(**portfolio_state)
-            
-            logger.info(f"Se han importado {len(df)} transacciones de {exchange} correctamente")
+            summary = self.bulk_import_transactions(pd.read_csv(file_path), source=exchange)
+            logger.info(f"Se han importado {summary['inserted']} transacciones de {exchange} correctamente")
+            return summary
         except Exception as e:
             logger.error(f"Error al importar datos de {exchange}: {str(e)}")
             raise
 
-    def import_from_excel(self, file_path: str):
-        """Importa datos desde un archivo Excel y actualiza el portafolio y transacciones."""
+    @timed("db.import_from_excel")
+    def import_from_excel(self, file_path: str) -> Dict[str, int]:
+        """Importa transacciones desde un archivo Excel y actualiza el portafolio"""
         try:
-            import pandas as pd
-            
-            # Leer el archivo Excel
-            df = pd.read_excel(file_path)
-            
-            # Procesar cada fila
-            for _, row in df.iterrows():
-                # Extraer información de la transacción
-                symbol = row['symbol'].upper()
-                amount = float(row['amount'])
-                price = float(row['price'])
-                date = row['date']
-                
-                # Registrar transacción
-                self.record_transaction(symbol, 'buy', amount, price)
-                
-                # Actualizar estado del portafolio
-                portfolio_state = {
-                    'total_value': float(row['total'] or 0),
-                    'positions': {symbol: amount},
-                    'weights': {symbol: (amount * price) / float(row['total'] or 0)}
-                }
-                self.save_portfolio_state_with_metrics(**portfolio_state)
-            
-            logger.info(f"Se han importado {len(df)} transacciones correctamente")
+            summary = self.bulk_import_transactions(pd.read_excel(file_path), source=os.path.basename(file_path))
+            logger.info(f"Se han importado {summary['inserted']} transacciones correctamente")
+            return summary
         except Exception as e:
             logger.error(f"Error al importar datos desde Excel: {str(e)}")
             raise
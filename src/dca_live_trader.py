@@ -1,14 +1,18 @@
+import asyncio
 import logging
 import yaml
-from concurrent.futures import ThreadPoolExecutor
 import json
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple, List
 import requests
 from decimal import Decimal, ROUND_DOWN
 from dataclasses import dataclass
-from tqdm import tqdm
 from src.config_models import load_config
+from src.dca_schedule import next_execution_date
+from src.exchange_info import ExchangeInfoCache
+from src.order_executor import OrderExecutor, MockExchange
+from src.ticker_snapshot import TickerSnapshotProvider, get_shared_provider
+from src.performance_monitor import timed
 
 # Configurar logging
 logging.basicConfig(
@@ -51,6 +55,19 @@ class LiveDCATrader:
         self.portfolio_weights = params.get('portfolio_weights', {})
         self.next_execution_date = self._calculate_next_tuesday()
         self.current_prices = {}
+        self.price_snapshot: TickerSnapshotProvider = params.get('price_snapshot') or get_shared_provider()
+        # Antigüedad admitida de la foto compartida (None = la del proveedor); el scheduler la amplía
+        # para reutilizar la foto que el analizador tomó al inicio de la descarga anticipada
+        self.price_max_age: Optional[float] = params.get('price_max_age')
+        self.exchange_info = ExchangeInfoCache(
+            snapshot_path=params.get('exchange_info_path', "data/exchange_info.json"),
+            offline=params.get('exchange_info_offline', False)
+        )
+        self.order_executor = OrderExecutor(
+            params.get('exchange') or MockExchange(),
+            max_concurrency=params.get('max_concurrent_orders', 5),
+            max_orders_per_second=params.get('max_orders_per_second', 10)
+        )
 
         # Verificar que los pesos sumen 1
         if not validate_portfolio_weights(self.portfolio_weights):
@@ -58,11 +75,12 @@ class LiveDCATrader:
 
         logger.info(f"Próxima ejecución programada para: {self.next_execution_date}")
 
+    @timed("trader.execute_trades")
     async def execute_trades(self, market_analysis: Dict) -> Dict:
         """Execute trades based on market analysis and risk parameters"""
         try:
             # Update current prices
-            self._update_current_prices()
+            await self._update_current_prices()
 
             # Get current portfolio
             portfolio = await self._get_current_portfolio()
@@ -75,6 +93,9 @@ class LiveDCATrader:
 
             logger.debug(f"Current prices: {self.current_prices}")
 
+            # Recargar los filtros del exchange (si caducó el TTL) fuera del bucle de eventos
+            await self.exchange_info.refresh_async()
+
             # Generate trade orders with proper position sizing
             orders = self._generate_trade_orders(
                 portfolio,
@@ -209,9 +230,6 @@ class LiveDCATrader:
                     max_order_value = self.params.weekly_investment * self.params.max_position_size
                     order_value = min(abs(value_diff), max_order_value)
 
-                    # Round quantity to appropriate decimal places
-                    quantity = round(quantity, self._get_quantity_precision(symbol))
-
                     orders.append({
                         'symbol': symbol,
                         'type': order_type,
@@ -221,40 +239,38 @@ class LiveDCATrader:
                         'timestamp': datetime.now().isoformat()
                     })
 
-            logger.debug(f"Generated {len(orders)} trade orders")
+            # Ajustar el lote completo a LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL antes de enviarlo
+            orders, rejected = self.exchange_info.apply_filters(orders)
+
+            logger.debug(f"Generated {len(orders)} trade orders ({len(rejected)} rejected by exchange filters)")
             return orders
 
         except Exception as e:
             logger.error(f"Error generating trade orders: {str(e)}")
             return []
 
-    def _get_quantity_precision(self, symbol: str) -> int:
-        """Get quantity precision for a symbol based on exchange rules"""
-        # Binance typically uses 8 decimal places for most cryptocurrencies
-        # This could be enhanced by querying exchange info endpoint
-        return 8
+    def is_due(self, now: Optional[datetime] = None) -> bool:
+        """True si ya llegó la ejecución programada en curso (o sigue pendiente tras un lote con fallos)"""
+        return (now or datetime.now()) >= self.next_execution_date
 
-    async def _execute_orders(self, orders: List[Dict]) -> List[Dict]:
-        """Simulate order execution"""
-        results = []
+    @property
+    def run_id(self) -> str:
+        """Identificador de la ejecución programada en curso (base de los client order IDs)"""
+        return self.next_execution_date.strftime("%Y%m%d%H%M")
 
-        for order in orders:
-            # Simular una ejecución exitosa
-            results.append({
-                'status': 'success',
-                'order_id': f"sim_{datetime.now().timestamp()}",
-                'symbol': order['symbol'],
-                'executed_quantity': order['quantity'],
-                'cumulative_quote_qty': order['quantity'] * order['price'],
-                'status': 'FILLED',
-                'fills': [{
-                    'price': order['price'],
-                    'quantity': order['quantity'],
-                    'commission': 0.001 * order['quantity'] * order['price']  # 0.1% comisión simulada
-                }]
-            })
-
-        logger.debug(f"Simulated execution of {len(results)} orders successfully")
+    @timed("trader.submit_orders")
+    async def _execute_orders(self, orders: List[Dict]) -> List[Dict]:
+        """
+        Envía las órdenes en paralelo; el run_id de la ejecución programada hace idempotentes los reintentos.
+        Si todas se ejecutan se pasa a la siguiente ejecución programada; si alguna falla se
+        mantiene el run_id para que repetir el ciclo no duplique las órdenes ya ejecutadas.
+        """
+        results = await self.order_executor.execute(orders, self.run_id)
+        if all(r['status'] == 'success' for r in results):
+            self.next_execution_date = self._calculate_next_tuesday(max(datetime.now(), self.next_execution_date))
+            logger.info(f"Próxima ejecución programada para: {self.next_execution_date}")
+
+        logger.debug(f"Executed {len(results)} orders")
         return results
 
     async def _log_trade_execution(self, orders: List[Dict], results: List[Dict]):
@@ -296,21 +312,24 @@ class LiveDCATrader:
         except Exception as e:
             logger.error(f"Error logging trade execution: {str(e)}")
 
-    def _update_current_prices(self):
-        """Actualiza los precios actuales de los activos usando solicitudes en paralelo"""
+    async def _update_current_prices(self):
+        """Actualiza los precios actuales de todos los activos con una única foto de tickers (sin bloquear el bucle)"""
+        symbols = list(self.portfolio_weights.keys())
+        prices = {}
         try:
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = [executor.submit(self._get_current_price, symbol) for symbol in self.portfolio_weights.keys()]
-                for future in tqdm(futures, desc="Actualizando precios", unit="símbolo"):
-                    symbol, price = future.result()
-                    if price:
-                        self.current_prices[symbol] = price
-                    else:
-                        logger.warning(f"No se pudo obtener el precio para {symbol}")
+            snapshot = await self.price_snapshot.get_snapshot_async(symbols, self.price_max_age)
+            prices = {s: snapshot.prices[s] for s in symbols if s in snapshot.prices}
         except Exception as e:
-            error_msg = f"Error al obtener precios actuales: {str(e)}"
-            logger.error(error_msg)
-            raise
+            logger.warning(f"No se pudo obtener la foto de tickers ({e}); usando precios simulados")
+
+        for symbol in symbols:
+            if symbol not in prices:
+                _, price = self._get_current_price(symbol)
+                if price:
+                    prices[symbol] = price
+                else:
+                    logger.warning(f"No se pudo obtener el precio para {symbol}")
+        self.current_prices = prices
 
     def _get_current_price(self, symbol: str) -> Tuple[str, Optional[float]]:
         """Obtiene el precio actual de un activo desde el análisis de mercado"""
@@ -338,14 +357,9 @@ class LiveDCATrader:
             logger.warning(f"Error al obtener precio simulado para {symbol}: {str(e)}")
             return symbol, None
 
-    def _calculate_next_tuesday(self) -> datetime:
-        """Calcula la próxima fecha de ejecución (martes)"""
-        today = datetime.now()
-        days_until_tuesday = (1 - today.weekday()) % 7  # 1 = martes
-        if days_until_tuesday == 0 and today.hour >= 16:  # Si es martes después de las 16:00
-            days_until_tuesday = 7
-        next_tuesday = today + timedelta(days=days_until_tuesday)
-        return next_tuesday.replace(hour=16, minute=0, second=0, microsecond=0)
+    def _calculate_next_tuesday(self, after: Optional[datetime] = None) -> datetime:
+        """Calcula la próxima fecha de ejecución (martes) posterior a 'after' (por defecto, ahora)"""
+        return next_execution_date(after or datetime.now(), weekday=1, hour=16)  # 1 = martes, 16:00
 
     def _validate_balance(self, balance: float) -> bool:
         """Valida el saldo disponible"""
@@ -373,11 +387,11 @@ class LiveDCATrader:
         return investments
 
     def execute_dca_strategy(self, available_balance: float):
-        """Ejecuta la estrategia DCA con el saldo disponible"""
+        """Ejecuta la estrategia DCA con el saldo disponible (desde código sin bucle de eventos)"""
         if not self._validate_balance(available_balance):
             return
 
-        self._update_current_prices()
+        asyncio.run(self._update_current_prices())
         investments = self._calculate_investment_amounts(available_balance)
         self._log_recommendations(investments)
 
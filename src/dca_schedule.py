@@ -0,0 +1,149 @@
+"""
+Compilador de Calendarios de Compra DCA
+Convierte calendarios de compra (semanal, mensual, fechas personalizadas) en
+índices de fila sobre la matriz de precios, de forma que la simulación de
+compras para todos los símbolos se reduce a un gather y una división
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+WEEKDAY_CODES = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
+
+@dataclass
+class PurchaseSchedule:
+    """Definición de un calendario de compras DCA"""
+    frequency: str = "weekly"  # weekly, monthly, custom
+    weekday: int = 1  # 0 = lunes, 1 = martes (día de ejecución del trader en vivo)
+    day_of_month: int = 1  # Día de compra para frequency == "monthly"
+    dates: List[Union[str, datetime]] = field(default_factory=list)  # Para frequency == "custom"
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    roll_forward: bool = True  # Si la fecha no cotiza, comprar en la siguiente fila disponible
+
+def next_execution_date(now: Optional[datetime] = None, weekday: int = 1, hour: int = 16) -> datetime:
+    """Calcula la próxima fecha de ejecución para un día de la semana y hora dados"""
+    now = now or datetime.now()
+    days_until = (weekday - now.weekday()) % 7
+    if days_until == 0 and now.hour >= hour:  # Si es el día pero ya pasó la hora
+        days_until = 7
+    next_date = now + timedelta(days=days_until)
+    return next_date.replace(hour=hour, minute=0, second=0, microsecond=0)
+
+def build_price_matrix(historical_data: Dict[str, pd.DataFrame], column: str = 'close') -> pd.DataFrame:
+    """Alinea los históricos por símbolo en una matriz (fechas × símbolos)"""
+    series = {
+        symbol: data[column]
+        for symbol, data in historical_data.items()
+        if data is not None and not data.empty and column in data
+    }
+    if not series:
+        return pd.DataFrame()
+    matrix = pd.DataFrame(series).sort_index()
+    return matrix[~matrix.index.duplicated(keep='last')]
+
+def _schedule_dates(index: pd.DatetimeIndex, schedule: PurchaseSchedule) -> pd.DatetimeIndex:
+    """Genera las fechas nominales de compra del calendario dentro del rango del índice"""
+    first = pd.Timestamp(schedule.start_date) if schedule.start_date else index[0]
+    last = pd.Timestamp(schedule.end_date) if schedule.end_date else index[-1]
+    first = max(first, index[0])
+    last = min(last, index[-1])
+
+    if schedule.frequency == "weekly":
+        if not 0 <= schedule.weekday <= 6:
+            raise ValueError(f"Día de la semana inválido: {schedule.weekday}")
+        return pd.date_range(start=first.normalize(), end=last, freq=f"W-{WEEKDAY_CODES[schedule.weekday]}")
+
+    if schedule.frequency == "monthly":
+        months = pd.date_range(start=first.normalize().replace(day=1), end=last, freq="MS")
+        offsets = np.minimum(schedule.day_of_month, months.days_in_month) - 1
+        dates = months + pd.to_timedelta(offsets, unit="D")
+        return dates[(dates >= first.normalize()) & (dates <= last)]
+
+    if schedule.frequency == "custom":
+        dates = pd.DatetimeIndex(pd.to_datetime(schedule.dates)).sort_values()
+        return dates[(dates >= first.normalize()) & (dates <= last)]
+
+    raise ValueError(f"Frecuencia de compra '{schedule.frequency}' no soportada")
+
+def compile_schedule(index: pd.DatetimeIndex, schedule: PurchaseSchedule) -> np.ndarray:
+    """
+    Compilar un calendario de compras a índices enteros de fila
+
+    Args:
+        index: Índice temporal (ordenado) de la matriz de precios
+        schedule: Calendario de compras
+
+    Returns:
+        Array de índices de fila, uno por compra
+    """
+    index = pd.DatetimeIndex(index)
+    if len(index) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    dates = _schedule_dates(index, schedule)
+    rows = index.searchsorted(dates, side='left')
+    valid = rows < len(index)
+    if not schedule.roll_forward:
+        valid[valid] &= index[rows[valid]] == dates[valid]
+
+    rows = rows[valid].astype(np.intp)
+    logger.debug(f"Calendario {schedule.frequency} compilado: {len(rows)} compras")
+    return rows
+
+def simulate_dca(
+    prices: Union[pd.DataFrame, np.ndarray],
+    rows: np.ndarray,
+    weights: np.ndarray,
+    investment: float
+) -> Dict[str, np.ndarray]:
+    """
+    Simular compras DCA para uno o varios vectores de pesos
+
+    Las unidades compradas por unidad monetaria dependen solo del calendario y
+    los precios, así que se calculan una vez y se escalan por los pesos.
+
+    Args:
+        prices: Matriz de precios (fechas × símbolos); NaN = sin cotización
+        rows: Índices de fila devueltos por compile_schedule
+        weights: Pesos (símbolos,) o (vectores × símbolos)
+        investment: Inversión total por compra
+
+    Returns:
+        Dict con coins, invested, final_value, avg_price y roi por vector y símbolo
+    """
+    matrix = np.asarray(prices, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    purchase_prices = matrix[rows]  # (compras × símbolos)
+    tradable = np.isfinite(purchase_prices) & (purchase_prices > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coins_per_unit = np.where(tradable, 1.0 / purchase_prices, 0.0).sum(axis=0)
+    purchases = tradable.sum(axis=0)
+
+    # Último precio válido por símbolo
+    last_valid = np.where(np.isfinite(matrix), np.arange(len(matrix))[:, None], -1).max(axis=0)
+    final_prices = np.where(last_valid >= 0, matrix[np.maximum(last_valid, 0), np.arange(matrix.shape[1])], np.nan)
+
+    allocated = investment * weights
+    coins = allocated * coins_per_unit
+    invested = allocated * purchases
+    final_value = coins * np.nan_to_num(final_prices)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_price = np.where(coins > 0, invested / coins, 0.0)
+        roi = np.where(invested > 0, (final_value - invested) / invested * 100, 0.0)
+
+    return {
+        'coins': coins,
+        'invested': invested,
+        'final_value': final_value,
+        'avg_price': avg_price,
+        'roi': roi
+    }
@@ -1,23 +1,66 @@
 import asyncio
 import logging
+import math
+import os
+import sys
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from src.config_models import load_config
 from src.dca_live_trader import LiveDCATrader as DCALiveTrader
 from src.market_analysis import MarketAnalyzer
+from src.market_stream import BINANCE_STREAM_URL, MarketStream
+from src.performance_monitor import LatencyHistogram, get_monitor
+from src.profiler import profile_session, stage as profiler_stage
 from src.risk_manager import RiskManager
+from src.screener_archive import ScreenerArchive
+from src.tradingview_ingest import TRADINGVIEW_DIR
 from src.database_manager import DatabaseManager
 
 logger = logging.getLogger(__name__)
 
+class StageTimeoutError(Exception):
+    """Una etapa del ciclo superó su plazo"""
+
+DEFAULT_STAGE_DEADLINES = {
+    'analyze': 300.0,   # Descarga y análisis de mercado
+    'risk': 60.0,       # Evaluación de riesgo
+    'trade': 300.0,     # Ejecución de órdenes (plazo blando: no se cancela)
+    'persist': 120.0    # Registro de la sesión e informe
+}
+
 class DCAScheduler:
-    def __init__(self):
+    def __init__(
+        self,
+        cycle_seconds: float = 3600.0,
+        prefetch_lead_seconds: float = 120.0,
+        retry_delay_seconds: float = 600.0,
+        stage_deadlines: Optional[Dict[str, float]] = None,
+        metrics_dir: str = "logs"
+    ):
         self.config = load_config()
         self.analyzer = None
         self.risk_manager = None
         self.trader = None
         self.db_manager = None
+        self.stream = None
+
+        # Ciclos alineados al reloj: se inician en múltiplos exactos de cycle_seconds
+        self.cycle_seconds = cycle_seconds
+        self.prefetch_lead_seconds = min(prefetch_lead_seconds, cycle_seconds)
+        self.retry_delay_seconds = retry_delay_seconds
+        self.stage_deadlines = {**DEFAULT_STAGE_DEADLINES, **(stage_deadlines or {})}
+        self.stage_latency: Dict[str, LatencyHistogram] = {
+            name: LatencyHistogram() for name in [*self.stage_deadlines, 'cycle', 'start_lag']
+        }
+        self.stage_timeouts: Dict[str, int] = {name: 0 for name in self.stage_deadlines}
+        self.skipped_cycles = 0
+        self._background: set = set()
+        self.screener_archive = ScreenerArchive()
+        self._archive_task: Optional[asyncio.Task] = None
+        self.monitor = get_monitor()
+        self.metrics_dir = metrics_dir
 
     async def initialize_components(self):
         """Initialize all system components"""
@@ -42,7 +85,10 @@ class DCAScheduler:
             'weekly_investment': self.config.trading.weekly_investment,
             'portfolio_weights': self.config.portfolio_weights,
             'max_position_size': self.config.trading.max_position_size,
-            'rebalance_threshold': self.config.trading.rebalance_threshold
+            'rebalance_threshold': self.config.trading.rebalance_threshold,
+            # La foto de tickers se toma al inicio de la descarga anticipada: admitir su antigüedad
+            # hasta la etapa de trade para que el trader no repita la descarga
+            'price_max_age': self.prefetch_lead_seconds + self.stage_deadlines['risk']
         }
         self.trader = DCALiveTrader(trading_params)
         logger.info("Trader inicializado")
@@ -69,70 +115,252 @@ class DCAScheduler:
         self.db_manager = DatabaseManager(db_config)
         logger.info("Gestor de base de datos inicializado")
 
+    async def _run_stage(self, name: str, coro):
+        """
+        Ejecuta una etapa con su plazo y registra su latencia
+
+        Args:
+            name: Nombre de la etapa (analyze, risk, trade, persist)
+            coro: Corrutina de la etapa
+
+        Returns:
+            Resultado de la etapa
+        """
+        deadline = self.stage_deadlines.get(name)
+        start = time.perf_counter()
+        try:
+            with self.monitor.span(f"stage.{name}"), profiler_stage(name):
+                return await self._await_with_deadline(name, coro, deadline)
+        finally:
+            self.stage_latency[name].record(time.perf_counter() - start)
+
+    async def _await_with_deadline(self, name: str, coro, deadline: Optional[float]):
+        """Espera una etapa aplicando su plazo (blando para trade, con cancelación para el resto)"""
+        try:
+            if name == 'trade':
+                # Las órdenes en vuelo no se cancelan: el plazo solo se notifica
+                task = asyncio.ensure_future(coro)
+                done, _ = await asyncio.wait({task}, timeout=deadline)
+                if not done:
+                    self.stage_timeouts[name] += 1
+                    logger.warning(f"Etapa {name} supera su plazo de {deadline:.0f}s; esperando a las órdenes en curso")
+                return await task
+            return await asyncio.wait_for(coro, timeout=deadline)
+        except asyncio.TimeoutError:
+            self.stage_timeouts[name] += 1
+            raise StageTimeoutError(f"Etapa {name} cancelada tras {deadline:.0f}s")
+
+    def _spawn_background(self, coro):
+        """Lanza una tarea en segundo plano (registro/informe) que se solapa con el siguiente ciclo"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def _drain_background(self):
+        """Espera a que terminen las tareas en segundo plano pendientes"""
+        if self._background:
+            await asyncio.gather(*list(self._background), return_exceptions=True)
+
+    async def _process_cycle(self, market_analysis: Dict[str, Any]) -> bool:
+        """Evalúa riesgo y ejecuta operaciones; el registro se solapa con el ciclo siguiente. False si hubo error"""
+        if market_analysis.get('market_conditions') == 'error':
+            logger.error(f"Market analysis error: {market_analysis.get('error')}")
+            return False
+
+        # Evaluate risk parameters
+        risk_assessment = await self._run_stage('risk', self.risk_manager.evaluate_risk(market_analysis))
+
+        if risk_assessment.get('error'):
+            logger.error(f"Risk assessment error: {risk_assessment.get('error')}")
+            return False
+
+        # Execute trades if conditions are met (solo en la ejecución programada: su fecha es el run_id de las órdenes)
+        if risk_assessment.get('should_trade', False) and not self.trader.is_due():
+            logger.info(f"Market conditions favorable - next scheduled execution at {self.trader.next_execution_date}")
+        elif risk_assessment.get('should_trade', False):
+            logger.info("Market conditions favorable - executing trades")
+            trade_result = await self._run_stage('trade', self.trader.execute_trades(market_analysis))
+
+            if trade_result.get('error'):
+                logger.error(f"Trade execution error: {trade_result.get('error')}")
+            else:
+                logger.info(f"Trades executed successfully: {trade_result}")
+        else:
+            logger.info("Market conditions not favorable - skipping trades")
+
+        # Log results and print report without blocking the next cycle
+        self._spawn_background(self._persist_cycle(market_analysis, risk_assessment))
+        if self._archive_task is None or self._archive_task.done():
+            self._archive_task = self._spawn_background(self._archive_screener())
+        return True
+
+    async def _archive_screener(self):
+        """Archiva las fotos nuevas del screener de TradingView en un hilo, fuera del análisis"""
+        try:
+            dates = await asyncio.to_thread(self.screener_archive.ingest_all, TRADINGVIEW_DIR)
+            if dates:
+                logger.info(f"Fotos del screener archivadas: {dates}")
+        except Exception as e:
+            logger.error(f"Error archivando fotos del screener: {e}")
+
+    async def _persist_cycle(self, market_analysis: Dict[str, Any], risk_assessment: Dict[str, Any]):
+        """Registra la sesión en base de datos e imprime el informe del ciclo"""
+        try:
+            await self._run_stage('persist', self.db_manager.log_trading_session(market_analysis, risk_assessment))
+        except Exception as e:
+            logger.error(f"Error persisting trading session: {e}")
+
+        # Print market analysis and risk assessment to terminal
+        print("\n=== ANÁLISIS DE MERCADO ===")
+        print(f"Fecha: {datetime.utcnow().strftime('%Y-%m-%d')}")
+        print(f"Total activos analizados: {len(market_analysis.get('assets', []))}")
+        print(f"Recomendaciones generadas: {len(risk_assessment.get('recommendations', []))}")
+        print(f"Portafolio actual: {risk_assessment.get('portfolio_summary', {}).get('total_value', 0):.2f}€")
+        print(f"Rendimiento diario: {risk_assessment.get('portfolio_summary', {}).get('daily_performance', 0):.2f}%")
+        print("Condiciones de mercado:")
+        for asset, conditions in market_analysis.get('market_conditions', {}).items():
+            print(f"  {asset}: {conditions}")
+        print("Evaluación de riesgos:")
+        for recommendation in risk_assessment.get('recommendations', []):
+            print(f"  {recommendation}")
+        print("===============================\n")
+
+        self.export_metrics()
+
+    def export_metrics(self):
+        """Escribe las métricas de spans en metrics_dir (JSON y texto de Prometheus para un scraper local)"""
+        try:
+            self.monitor.increment('scheduler.cycles')
+            self.monitor.export_json(os.path.join(self.metrics_dir, 'metrics.json'))
+            self.monitor.export_prometheus(os.path.join(self.metrics_dir, 'metrics.prom'))
+            self.monitor.maybe_rollup()
+        except OSError as e:
+            logger.error(f"Error exporting metrics: {e}")
+
+    def _next_boundary(self, now: float) -> float:
+        """Siguiente inicio de ciclo alineado al reloj (epoch en segundos)"""
+        return (math.floor(now / self.cycle_seconds) + 1) * self.cycle_seconds
+
+    def get_stage_latency(self) -> Dict[str, Dict[str, float]]:
+        """
+        Histogramas de latencia por etapa
+
+        Returns:
+            Resumen (count, mean, min, max, p50, p90, p99) por etapa, más timeouts y ciclos saltados
+        """
+        summary = {name: hist.summary() for name, hist in self.stage_latency.items()}
+        for name, timeouts in self.stage_timeouts.items():
+            summary[name]['timeouts'] = timeouts
+        summary['cycle']['skipped'] = self.skipped_cycles
+        return summary
+
     async def run(self):
-        """Main execution loop"""
+        """Main execution loop: ciclos alineados al reloj con descarga anticipada y registro solapado"""
         logger.debug("Iniciando el bucle principal")
+        next_start = self._next_boundary(time.time())
         try:
             while True:
                 try:
-                    # Check market conditions
-                    market_analysis = await self.analyzer.analyze_market()
+                    # Descargar y analizar el mercado poco antes del inicio del ciclo,
+                    # mientras el registro del ciclo anterior sigue en segundo plano
+                    await asyncio.sleep(max(0.0, next_start - self.prefetch_lead_seconds - time.time()))
 
-                    if market_analysis.get('market_conditions') == 'error':
-                        logger.error(f"Market analysis error: {market_analysis.get('error')}")
-                        await asyncio.sleep(600)  # Wait 10 minutes before retrying
-                        continue
+                    # Perfilado opcional (DCA_PROFILE / --profile) desde la descarga anticipada,
+                    # para que el perfil incluya la etapa analyze
+                    with profile_session("scheduler_cycle", output_dir=self.metrics_dir):
+                        analysis_task = asyncio.create_task(
+                            self._run_stage('analyze', self.analyzer.analyze_market())
+                        )
+                        await asyncio.sleep(max(0.0, next_start - time.time()))
+                        cycle_start = time.time()
+                        self.stage_latency['start_lag'].record(max(0.0, cycle_start - next_start))
 
-                    # Evaluate risk parameters
-                    risk_assessment = await self.risk_manager.evaluate_risk(market_analysis)
+                        # Check market conditions
+                        market_analysis = await analysis_task
+                        ok = await self._process_cycle(market_analysis)
+                    self.monitor.record_success(ok)
+                    self.stage_latency['cycle'].record(time.time() - cycle_start)
+                    logger.debug(f"Latencias por etapa: {self.get_stage_latency()}")
 
-                    if risk_assessment.get('error'):
-                        logger.error(f"Risk assessment error: {risk_assessment.get('error')}")
-                        await asyncio.sleep(600)  # Wait 10 minutes before retrying
+                    if not ok:
+                        next_start = time.time() + self.retry_delay_seconds  # Wait 10 minutes before retrying
                         continue
 
-                    # Execute trades if conditions are met
-                    if risk_assessment.get('should_trade', False):
-                        logger.info("Market conditions favorable - executing trades")
-                        trade_result = await self.trader.execute_trades(market_analysis)
-
-                        if trade_result.get('error'):
-                            logger.error(f"Trade execution error: {trade_result.get('error')}")
-                        else:
-                            logger.info(f"Trades executed successfully: {trade_result}")
-                    else:
-                        logger.info("Market conditions not favorable - skipping trades")
-
-                    # Log results
-                    await self.db_manager.log_trading_session(market_analysis, risk_assessment)
-
-                    # Print market analysis and risk assessment to terminal
-                    print("\n=== ANÁLISIS DE MERCADO ===")
-                    print(f"Fecha: {datetime.utcnow().strftime('%Y-%m-%d')}")
-                    print(f"Total activos analizados: {len(market_analysis.get('assets', []))}")
-                    print(f"Recomendaciones generadas: {len(risk_assessment.get('recommendations', []))}")
-                    print(f"Portafolio actual: {risk_assessment.get('portfolio_summary', {}).get('total_value', 0):.2f}€")
-                    print(f"Rendimiento diario: {risk_assessment.get('portfolio_summary', {}).get('daily_performance', 0):.2f}%")
-                    print("Condiciones de mercado:")
-                    for asset, conditions in market_analysis.get('market_conditions', {}).items():
-                        print(f"  {asset}: {conditions}")
-                    print("Evaluación de riesgos:")
-                    for recommendation in risk_assessment.get('recommendations', []):
-                        print(f"  {recommendation}")
-                    print("===============================\n")
-
-                    # Wait for next cycle
-                    await asyncio.sleep(3600)  # Sleep for 1 hour between cycles
+                    # Siguiente límite de reloj; si el ciclo se alargó, se saltan los límites ya pasados
+                    following = self._next_boundary(time.time())
+                    missed = int(round((following - next_start) / self.cycle_seconds)) - 1
+                    if missed > 0:
+                        self.skipped_cycles += missed
+                        logger.warning(f"Ciclo excedió su ventana: {missed} ciclo(s) saltado(s)")
+                    next_start = following
 
                 except Exception as e:
                     logger.error(f"Error in trading cycle: {e}")
-                    await asyncio.sleep(600)  # Wait 10 minutes before retrying
+                    next_start = time.time() + self.retry_delay_seconds  # Wait 10 minutes before retrying
 
         except Exception as e:
             logger.error(f"Fatal error in main loop: {e}")
             raise
+        finally:
+            await self._drain_background()
+
+    async def run_streaming(
+        self,
+        interval: str = "1h",
+        stream_url: Optional[str] = None,
+        warmup: bool = True,
+        debounce_seconds: float = 2.0
+    ):
+        """
+        Bucle principal en modo streaming: analiza al cerrar cada vela en lugar de sondear REST cada hora
+
+        Args:
+            interval: Intervalo de las velas suscritas
+            stream_url: URL del stream (por defecto Binance; en pruebas, un servidor local de repetición)
+            warmup: Precargar los buffers por REST antes de suscribirse
+            debounce_seconds: Espera tras el primer cierre para agrupar los cierres de todos los símbolos
+        """
+        symbols = list(self.config.portfolio_weights.keys())
+        stream = MarketStream(
+            symbols,
+            interval=interval,
+            url=stream_url or BINANCE_STREAM_URL,
+            ticker_provider=self.analyzer.price_snapshot
+        )
+        self.stream = stream
+        if warmup:
+            await stream.warmup(limit=self.config.trading.lookback_period)
+
+        stream_task = asyncio.create_task(stream.run())
+        wait_task: Optional[asyncio.Future] = None
+        logger.info(f"Modo streaming activo para {len(symbols)} símbolos (velas {interval})")
+        try:
+            while True:
+                # Esperar al siguiente cierre de vela o a que el stream termine (o falle)
+                wait_task = asyncio.ensure_future(stream.candle_closed.wait())
+                await asyncio.wait({stream_task, wait_task}, return_when=asyncio.FIRST_COMPLETED)
+                if stream_task.done():
+                    stream_task.result()  # Re-lanza el error del stream
+                    logger.info("Stream detenido: fin del modo streaming")
+                    break
+                await asyncio.sleep(debounce_seconds)
+                stream.candle_closed.clear()
+                try:
+                    market_analysis = await self._run_stage(
+                        'analyze', self.analyzer.analyze_market_data(stream.market_data())
+                    )
+                    await self._process_cycle(market_analysis)
+                except Exception as e:
+                    logger.error(f"Error in streaming cycle: {e}")
+        finally:
+            if wait_task is not None:
+                wait_task.cancel()
+            stream.stop()
+            await asyncio.gather(stream_task, return_exceptions=True)
+            await self._drain_background()
 
-async def main():
+async def main(streaming: bool = False):
     """Main entry point"""
     try:
         # Initialize scheduler
@@ -140,7 +368,10 @@ async def main():
         await scheduler.initialize_components()
 
         # Start main loop
-        await scheduler.run()
+        if streaming:
+            await scheduler.run_streaming()
+        else:
+            await scheduler.run()
 
     except Exception as e:
         logger.error(f"Error fatal en el sistema: {e}")
@@ -151,4 +382,6 @@ if __name__ == "__main__":
         level=logging.DEBUG,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
-    asyncio.run(main())
+    if "--profile" in sys.argv:
+        os.environ.setdefault("DCA_PROFILE", "1")
+    asyncio.run(main(streaming="--stream" in sys.argv))
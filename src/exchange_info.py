@@ -0,0 +1,204 @@
+"""
+Caché de Metadatos del Exchange
+Carga exchangeInfo de Binance una sola vez (o desde un snapshot local sin
+conexión), indexa los filtros por símbolo y ajusta lotes completos de
+órdenes a LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL con aritmética Decimal exacta
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import requests
+
+logger = logging.getLogger(__name__)
+
+BINANCE_EXCHANGE_INFO_URL = "https://api.binance.com/api/v3/exchangeInfo"
+
+@dataclass(frozen=True)
+class SymbolFilters:
+    """Filtros de trading de un símbolo"""
+    symbol: str
+    status: str = "TRADING"
+    step_size: Decimal = Decimal("0.00000001")
+    min_qty: Decimal = Decimal("0")
+    max_qty: Decimal = Decimal("0")  # 0 = sin límite
+    tick_size: Decimal = Decimal("0.00000001")
+    min_price: Decimal = Decimal("0")
+    max_price: Decimal = Decimal("0")  # 0 = sin límite
+    min_notional: Decimal = Decimal("5")
+
+    def round_quantity(self, quantity: Union[float, str, Decimal]) -> Decimal:
+        """Redondea la cantidad hacia abajo al múltiplo de step_size"""
+        quantity = Decimal(str(quantity))
+        if self.step_size <= 0:
+            return quantity
+        return (quantity / self.step_size).to_integral_value(rounding=ROUND_DOWN) * self.step_size
+
+    def round_price(self, price: Union[float, str, Decimal], side: str = "BUY") -> Decimal:
+        """Ajusta el precio a tick_size (hacia abajo en compras, hacia arriba en ventas)"""
+        price = Decimal(str(price))
+        if self.tick_size <= 0:
+            return price
+        rounding = ROUND_DOWN if side.upper() == "BUY" else ROUND_UP
+        return (price / self.tick_size).to_integral_value(rounding=rounding) * self.tick_size
+
+def parse_exchange_info(data: Dict) -> Dict[str, SymbolFilters]:
+    """Indexa la respuesta de exchangeInfo por símbolo"""
+    filters_by_symbol = {}
+    for entry in data.get("symbols", []):
+        fields = {"symbol": entry["symbol"], "status": entry.get("status", "TRADING")}
+        for f in entry.get("filters", []):
+            kind = f.get("filterType")
+            if kind == "LOT_SIZE":
+                fields.update(step_size=Decimal(f["stepSize"]), min_qty=Decimal(f["minQty"]), max_qty=Decimal(f["maxQty"]))
+            elif kind == "PRICE_FILTER":
+                fields.update(tick_size=Decimal(f["tickSize"]), min_price=Decimal(f["minPrice"]), max_price=Decimal(f["maxPrice"]))
+            elif kind in ("MIN_NOTIONAL", "NOTIONAL"):
+                fields["min_notional"] = Decimal(f.get("minNotional", "0"))
+        filters_by_symbol[entry["symbol"]] = SymbolFilters(**fields)
+    return filters_by_symbol
+
+class ExchangeInfoCache:
+    """Caché con TTL de los filtros del exchange, con respaldo en archivo local"""
+
+    def __init__(
+        self,
+        snapshot_path: Union[str, Path] = "data/exchange_info.json",
+        ttl_seconds: float = 3600.0,
+        offline: bool = False,
+        fetcher: Optional[Callable[[], Dict]] = None
+    ):
+        self.snapshot_path = Path(snapshot_path)
+        self.ttl_seconds = ttl_seconds
+        self.offline = offline
+        self.fetcher = fetcher or self._fetch_from_binance
+        self._filters: Dict[str, SymbolFilters] = {}
+        self._loaded_at = 0.0
+        self._missing_logged = set()
+
+    @staticmethod
+    def _fetch_from_binance() -> Dict:
+        """Descarga exchangeInfo completo de Binance"""
+        response = requests.get(BINANCE_EXCHANGE_INFO_URL, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    def _snapshot_age(self) -> float:
+        """Segundos desde la última escritura del snapshot (inf si no existe)"""
+        if not self.snapshot_path.exists():
+            return float("inf")
+        return time.time() - self.snapshot_path.stat().st_mtime
+
+    def _load_snapshot(self) -> bool:
+        """Carga los filtros desde el snapshot local"""
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                self._filters = parse_exchange_info(json.load(f))
+            self._loaded_at = time.monotonic()
+            logger.info(f"Filtros del exchange cargados desde {self.snapshot_path}: {len(self._filters)} símbolos")
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"Error leyendo snapshot de exchangeInfo: {e}")
+            return False
+
+    def refresh(self, force: bool = False):
+        """
+        Recargar los filtros si el TTL ha expirado
+
+        Args:
+            force: Descargar aunque la caché siga vigente
+        """
+        if not force and self._filters and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return
+
+        # Un snapshot reciente evita la descarga (y permite trabajar sin conexión)
+        if self.offline or (not force and self._snapshot_age() < self.ttl_seconds):
+            if self._load_snapshot():
+                return
+            if self.offline:
+                logger.warning("Modo sin conexión sin snapshot de exchangeInfo: se usarán filtros por defecto")
+                self._loaded_at = time.monotonic()
+                return
+
+        try:
+            data = self.fetcher()
+            self._filters = parse_exchange_info(data)
+            self._loaded_at = time.monotonic()
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.snapshot_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            logger.info(f"exchangeInfo actualizado: {len(self._filters)} símbolos")
+        except Exception as e:
+            logger.warning(f"No se pudo descargar exchangeInfo ({e}); usando snapshot local")
+            if not self._load_snapshot():
+                self._loaded_at = time.monotonic()  # Evitar reintentos continuos hasta el próximo TTL
+
+    async def refresh_async(self, force: bool = False):
+        """Versión no bloqueante de refresh (la descarga de exchangeInfo va a un hilo)"""
+        await asyncio.to_thread(self.refresh, force)
+
+    def get(self, symbol: str) -> SymbolFilters:
+        """Filtros ya cargados de un símbolo (por defecto si el exchange no lo conoce); no recarga"""
+        filters = self._filters.get(symbol)
+        if filters is None:
+            if symbol not in self._missing_logged:
+                logger.warning(f"Sin filtros del exchange para {symbol}: se usan valores por defecto")
+                self._missing_logged.add(symbol)
+            return SymbolFilters(symbol=symbol)
+        return filters
+
+    def apply_filters(self, orders: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Ajustar un lote de órdenes a los filtros del exchange
+
+        Solo usa los filtros ya cargados (sin E/S): llamar antes a refresh o refresh_async
+
+        Args:
+            orders: Órdenes con symbol, type (BUY/SELL), quantity y price
+
+        Returns:
+            Tuple (órdenes válidas ajustadas con su nocional en 'notional', órdenes rechazadas con motivo)
+        """
+        accepted, rejected = [], []
+
+        for order in orders:
+            filters = self.get(order['symbol'])
+            side = order.get('type', 'BUY')
+            quantity = filters.round_quantity(order['quantity'])
+            price = filters.round_price(order['price'], side)
+            notional = quantity * price
+
+            reason = None
+            if filters.status != "TRADING":
+                reason = f"símbolo en estado {filters.status}"
+            elif quantity <= 0 or quantity < filters.min_qty:
+                reason = f"cantidad {quantity} < mínimo {filters.min_qty}"
+            elif filters.max_qty > 0 and quantity > filters.max_qty:
+                reason = f"cantidad {quantity} > máximo {filters.max_qty}"
+            elif notional < filters.min_notional:
+                reason = f"nocional {notional:.8f} < mínimo {filters.min_notional}"
+
+            if reason:
+                rejected.append({**order, 'reject_reason': reason})
+                continue
+
+            accepted.append({
+                **order,
+                'quantity': float(quantity),
+                'quantity_str': format(quantity.normalize(), 'f'),
+                'price': float(price),
+                'price_str': format(price.normalize(), 'f'),
+                'notional': float(notional)  # 'value' (tope de la estrategia) se conserva tal cual
+            })
+
+        if rejected:
+            logger.warning(f"{len(rejected)} órdenes descartadas por filtros del exchange: "
+                           f"{[(o['symbol'], o['reject_reason']) for o in rejected]}")
+        return accepted, rejected
@@ -9,6 +9,11 @@ from typing import Dict, Any, List, Tuple
 from dataclasses import dataclass
 import os
 import aiohttp
+from src.ticker_snapshot import TickerSnapshotProvider, get_shared_provider
+from src.performance_monitor import timed
+from src.tradingview_ingest import TRADINGVIEW_DIR, load_screener
+from src.sentiment_scoring import recent_news_sentiment
+from src.storage import get_default_storage
 
 @dataclass
 class MarketCondition:
@@ -118,27 +123,26 @@ class TechnicalIndicators:
         return atr.to_numpy()
 
 class MarketAnalyzer:
-    def __init__(self, config: Dict[str, Any] = None):
+    def __init__(self, config: Dict[str, Any] = None, price_snapshot: TickerSnapshotProvider = None):
         self.config = config
         self.market_data = {}
         self.session = None
+        self.price_snapshot = price_snapshot or get_shared_provider()
         logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
     async def _update_current_prices(self):
-        """Actualiza los precios actuales de los activos"""
+        """Actualiza los precios actuales de los activos desde la foto compartida de tickers"""
         try:
-            async with aiohttp.ClientSession() as session:
-                for symbol in self.market_data.keys():
-                    ticker_url = f"https://api.binance.com/api/v3/ticker/price?symbol={symbol}"
-                    async with session.get(ticker_url) as response:
-                        if response.status == 200:
-                            ticker_data = await response.json()
-                            self.market_data[symbol]['price'] = float(ticker_data['price'])
-                        else:
-                            logging.error(f"Error fetching current price for {symbol}: {response.status}")
+            snapshot = await self.price_snapshot.get_snapshot_async(list(self.market_data.keys()))
+            for symbol in self.market_data.keys():
+                if symbol in snapshot.prices:
+                    self.market_data[symbol]['price'] = snapshot.prices[symbol]
+                else:
+                    logging.error(f"Error fetching current price for {symbol}: sin ticker")
         except Exception as e:
             logging.error(f"Error updating current prices: {e}")
 
+    @timed("market.fetch")
     async def _fetch_market_data(self):
         """Fetch current and historical market data from Binance API"""
         try:
@@ -151,37 +155,36 @@ class MarketAnalyzer:
 
                 self.market_data = {}
 
+                # Precio actual y volumen 24h de todos los símbolos en una sola petición
+                snapshot = await self.price_snapshot.get_snapshot_async(symbols)
+
                 for symbol in symbols:
-                    # Obtener precio actual y volumen 24h
-                    ticker_url = f"https://api.binance.com/api/v3/ticker/24hr?symbol={symbol}"
-                    async with session.get(ticker_url) as response:
-                        if response.status == 200:
-                            ticker_data = await response.json()
-                            logging.debug(f"Fetched ticker data for {symbol}: {ticker_data}")
-                            self.market_data[symbol] = {
-                                'price': float(ticker_data['lastPrice']),
-                                'volume': float(ticker_data['volume']) * float(ticker_data['lastPrice']),
-                                'change_24h': float(ticker_data['priceChangePercent']),
-                                'market_cap': 0  # Binance no proporciona market cap
-                            }
-
-                            # Obtener datos históricos (klines/candlesticks)
-                            klines_url = f"https://api.binance.com/api/v3/klines"
-                            params = {
-                                'symbol': symbol,
-                                'interval': '1d',
-                                'limit': 30  # Últimos 30 días
-                            }
-
-                            async with session.get(klines_url, params=params) as hist_response:
-                                if hist_response.status == 200:
-                                    klines_data = await hist_response.json()
-                                    logging.debug(f"Fetched historical data for {symbol}: {klines_data}")
-                                    self.market_data[symbol]['historical'] = self._process_binance_klines(klines_data)
-                                else:
-                                    logging.error(f"Error fetching historical data for {symbol}: {hist_response.status}")
+                    if symbol not in snapshot.prices:
+                        logging.error(f"Error fetching ticker data for {symbol}: sin ticker")
+                        continue
+
+                    self.market_data[symbol] = {
+                        'price': snapshot.prices[symbol],
+                        'volume': snapshot.quote_volumes.get(symbol, 0.0),
+                        'change_24h': snapshot.change_24h.get(symbol, 0.0),
+                        'market_cap': 0  # Binance no proporciona market cap
+                    }
+
+                    # Obtener datos históricos (klines/candlesticks)
+                    klines_url = f"https://api.binance.com/api/v3/klines"
+                    params = {
+                        'symbol': symbol,
+                        'interval': '1d',
+                        'limit': 30  # Últimos 30 días
+                    }
+
+                    async with session.get(klines_url, params=params) as hist_response:
+                        if hist_response.status == 200:
+                            klines_data = await hist_response.json()
+                            logging.debug(f"Fetched historical data for {symbol}: {klines_data}")
+                            self.market_data[symbol]['historical'] = self._process_binance_klines(klines_data)
                         else:
-                            logging.error(f"Error fetching ticker data for {symbol}: {response.status}")
+                            logging.error(f"Error fetching historical data for {symbol}: {hist_response.status}")
 
         except Exception as e:
             logging.error(f"Error in market data fetch: {e}")
@@ -335,10 +338,19 @@ class MarketAnalyzer:
         hist_prices = data['historical']['prices']
         hist_volumes = data['historical']['volumes']
 
-        # Calcular indicadores técnicos
-        # rsi = TechnicalIndicators.calculate_rsi(hist_prices)[-1]
-        rsi = obb.ta.rsi(prices=hist_prices).df().iloc[-1]['rsi'] # Usando OpenBB
-        macd, signal = TechnicalIndicators.calculate_macd(hist_prices)
+        # Calcular indicadores técnicos; MACD y RSI llegan ya actualizados vela a vela
+        # desde el stream (MarketStream.market_data) y solo se recalculan del histórico si faltan
+        streamed = data.get('indicators') or {}
+        if streamed.get('rsi') is not None:
+            rsi = streamed['rsi']
+        else:
+            # rsi = TechnicalIndicators.calculate_rsi(hist_prices)[-1]
+            rsi = obb.ta.rsi(prices=hist_prices).df().iloc[-1]['rsi'] # Usando OpenBB
+        if streamed.get('macd') is not None and streamed.get('signal') is not None:
+            macd_value, signal_value = streamed['macd'], streamed['signal']
+        else:
+            macd, signal = TechnicalIndicators.calculate_macd(hist_prices)
+            macd_value, signal_value = macd[-1], signal[-1]
         upper, middle, lower = TechnicalIndicators.calculate_bollinger_bands(hist_prices)
         volatility = TechnicalIndicators.calculate_volatility(hist_prices)
         volume_trend = TechnicalIndicators.calculate_volume_profile(hist_volumes)
@@ -369,8 +381,8 @@ class MarketAnalyzer:
             'change_24h': data['change_24h'],
             'indicators': {
                 'rsi': float(rsi),
-                'macd': float(macd[-1]),
-                'macd_signal': float(signal[-1]),
+                'macd': float(macd_value),
+                'macd_signal': float(signal_value),
                 'bollinger': [float(upper[-1]), float(middle[-1]), float(lower[-1])],
                 'stochastic': [float(k[-1]), float(d[-1])],
                 'atr': float(atr)
@@ -384,6 +396,7 @@ class MarketAnalyzer:
             )
         }
 
+    @timed("market.analyze")
     async def analyze_market(self):
         """Analiza las condiciones actuales del mercado"""
         try:
@@ -401,7 +414,31 @@ class MarketAnalyzer:
                 'symbol_data': {},
                 'error': str(e)
             }
-    
+
+    @timed("market.analyze_stream")
+    async def analyze_market_data(self, market_data: Dict[str, Dict]):
+        """
+        Analiza datos de mercado ya disponibles (ej: buffers del stream WebSocket) sin peticiones REST
+
+        Args:
+            market_data: Datos por símbolo con price, volume, change_24h e historical
+
+        Returns:
+            Análisis con el mismo formato que analyze_market()
+        """
+        try:
+            if not market_data:
+                return {'market_conditions': 'N/A', 'symbol_data': {}, 'error': 'No market data available'}
+            self.market_data = market_data
+            return await self._analyze_symbols(market_data)
+        except Exception as e:
+            logging.error(f"Error analyzing streamed market data: {e}")
+            return {
+                'market_conditions': 'error',
+                'symbol_data': {},
+                'error': str(e)
+            }
+
     async def _analyze_symbols(self, market_data):
         analysis = {
             'market_conditions': {},
@@ -450,7 +487,8 @@ class MarketAnalyzer:
         sentiment = {
             'technical': self._analyze_technical_sentiment(),
             'fundamental': self._analyze_fundamental_sentiment(),
-            'holder': self._analyze_holder_sentiment()
+            'holder': self._analyze_holder_sentiment(),
+            'news': self._analyze_news_sentiment()
         }
         
         # Ajustar pesos DCA según sentimiento
@@ -463,28 +501,22 @@ class MarketAnalyzer:
         
         return sentiment
 
+    def _analyze_news_sentiment(self, hours: int = 24) -> float:
+        """Sentimiento de las noticias recientes (0 bajista, 1 alcista) ponderado por relevancia; 0.5 si no hay datos"""
+        storage = get_default_storage()  # La base de datos de DATABASE_URL, como DatabaseManager
+        if storage is None:
+            return 0.5
+        try:
+            sentiment = recent_news_sentiment(storage, hours)
+        except Exception as e:
+            logging.error(f"Error leyendo el sentimiento de noticias: {str(e)}")
+            return 0.5
+        return 0.5 if sentiment is None else sentiment
+
     def _load_tradingview_data(self) -> pd.DataFrame:
-        """Carga los datos más recientes de TradingView"""
+        """Carga la foto más reciente del screener de TradingView (tipada, combinada y cacheada)"""
         try:
-            # Encontrar el directorio más reciente
-            tradingview_dir = "TradingViewData"
-            latest_dir = max([d for d in os.listdir(tradingview_dir) 
-                             if d.startswith("TradingView_data_")])
-            
-            # Cargar datos técnicos
-            tecnicos_path = os.path.join(tradingview_dir, latest_dir, 
-                                       "Datostecnicos.csv")
-            df_tecnicos = pd.read_csv(tecnicos_path)
-            
-            # Cargar datos de direcciones
-            direcciones_path = os.path.join(tradingview_dir, latest_dir,
-                                          "Direcciones.csv")
-            df_direcciones = pd.read_csv(direcciones_path)
-            
-            # Combinar datos
-            df = pd.merge(df_tecnicos, df_direcciones, on='Moneda', how='left')
-            
-            return df
+            return load_screener(TRADINGVIEW_DIR)
             
         except Exception as e:
             logging.error(f"Error cargando datos de TradingView: {str(e)}")
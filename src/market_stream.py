@@ -0,0 +1,275 @@
+"""
+Stream de Mercado por WebSocket
+Se suscribe a los streams kline y miniTicker de Binance para el universo
+configurado, mantiene un buffer circular de velas por símbolo, actualiza
+indicadores de forma incremental y alimenta la foto compartida de tickers
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+import aiohttp
+import numpy as np
+
+from src.ticker_snapshot import TickerSnapshotProvider, get_shared_provider
+
+logger = logging.getLogger(__name__)
+
+BINANCE_STREAM_URL = "wss://stream.binance.com:9443/stream"
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+
+class CandleBuffer:
+    """Buffer circular de velas OHLCV de tamaño fijo"""
+
+    FIELDS = ("open_time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, capacity: int = 500):
+        self.capacity = capacity
+        self._data = np.zeros((capacity, len(self.FIELDS)))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _last_index(self) -> int:
+        return (self._start + self._size - 1) % self.capacity
+
+    def upsert(self, candle: Iterable[float]) -> bool:
+        """
+        Añade una vela o actualiza la última si tiene el mismo open_time
+
+        Returns:
+            True si se añadió una vela nueva
+        """
+        row = np.asarray(candle, dtype=float)
+        if self._size and self._data[self._last_index(), 0] == row[0]:
+            self._data[self._last_index()] = row
+            return False
+        if self._size < self.capacity:
+            self._data[(self._start + self._size) % self.capacity] = row
+            self._size += 1
+        else:
+            self._data[self._start] = row
+            self._start = (self._start + 1) % self.capacity
+        return True
+
+    def to_array(self) -> np.ndarray:
+        """Velas en orden cronológico (copia)"""
+        order = (self._start + np.arange(self._size)) % self.capacity
+        return self._data[order]
+
+    def column(self, name: str) -> np.ndarray:
+        """Una columna en orden cronológico"""
+        return self.to_array()[:, self.FIELDS.index(name)]
+
+class IncrementalIndicators:
+    """EMA/MACD y RSI de Wilder actualizados vela a vela en O(1)"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9, rsi_period: int = 14):
+        self.alpha_fast = 2 / (fast + 1)
+        self.alpha_slow = 2 / (slow + 1)
+        self.alpha_signal = 2 / (signal + 1)
+        self.rsi_period = rsi_period
+        self.ema_fast: Optional[float] = None
+        self.ema_slow: Optional[float] = None
+        self.signal: Optional[float] = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.last_close: Optional[float] = None
+        self.count = 0
+
+    def update(self, close: float):
+        """Incorpora el cierre de una vela cerrada"""
+        if self.last_close is None:
+            self.ema_fast = self.ema_slow = close
+            self.signal = 0.0
+        else:
+            self.ema_fast += self.alpha_fast * (close - self.ema_fast)
+            self.ema_slow += self.alpha_slow * (close - self.ema_slow)
+            self.signal += self.alpha_signal * (self.macd - self.signal)
+
+            delta = close - self.last_close
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if self.count <= self.rsi_period:
+                # Periodo de arranque: media simple de las primeras variaciones
+                self.avg_gain += gain / self.rsi_period
+                self.avg_loss += loss / self.rsi_period
+            else:
+                self.avg_gain = (self.avg_gain * (self.rsi_period - 1) + gain) / self.rsi_period
+                self.avg_loss = (self.avg_loss * (self.rsi_period - 1) + loss) / self.rsi_period
+        self.last_close = close
+        self.count += 1
+
+    @property
+    def macd(self) -> float:
+        return (self.ema_fast or 0.0) - (self.ema_slow or 0.0)
+
+    @property
+    def rsi(self) -> Optional[float]:
+        if self.count <= self.rsi_period:
+            return None
+        if self.avg_loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """Valores actuales de los indicadores"""
+        return {'macd': self.macd, 'signal': self.signal, 'rsi': self.rsi, 'candles': self.count}
+
+@dataclass
+class StreamSymbolState:
+    """Estado en memoria de un símbolo del stream"""
+    buffer: CandleBuffer
+    indicators: IncrementalIndicators
+    last_price: float = 0.0
+    quote_volume: float = 0.0
+    change_24h: float = 0.0
+
+class MarketStream:
+    """Cliente WebSocket de velas y tickers con reconexión automática"""
+
+    def __init__(
+        self,
+        symbols: List[str],
+        interval: str = "1h",
+        url: str = BINANCE_STREAM_URL,
+        buffer_size: int = 500,
+        ticker_provider: Optional[TickerSnapshotProvider] = None,
+        on_candle_closed: Optional[Callable[[str, np.ndarray], None]] = None
+    ):
+        self.symbols = [s.upper() for s in symbols]
+        self.interval = interval
+        self.url = url
+        self.ticker_provider = ticker_provider or get_shared_provider()
+        self.on_candle_closed = on_candle_closed
+        self.state: Dict[str, StreamSymbolState] = {
+            s: StreamSymbolState(CandleBuffer(buffer_size), IncrementalIndicators()) for s in self.symbols
+        }
+        self.candle_closed = asyncio.Event()
+        self.messages_received = 0
+        self._stop = asyncio.Event()
+
+    @property
+    def stream_url(self) -> str:
+        """URL del stream combinado para todo el universo"""
+        streams = []
+        for symbol in self.symbols:
+            streams += [f"{symbol.lower()}@kline_{self.interval}", f"{symbol.lower()}@miniTicker"]
+        return f"{self.url}?streams={'/'.join(streams)}"
+
+    async def warmup(self, limit: int = 200):
+        """Precarga el buffer con velas históricas por REST (una petición por símbolo, una sola vez)"""
+        async with aiohttp.ClientSession() as session:
+            async def _load(symbol: str):
+                params = {'symbol': symbol, 'interval': self.interval, 'limit': limit}
+                async with session.get(BINANCE_KLINES_URL, params=params) as response:
+                    if response.status != 200:
+                        logger.error(f"Error precargando velas de {symbol}: {response.status}")
+                        return
+                    self.apply_klines(symbol, await response.json())
+            await asyncio.gather(*(_load(s) for s in self.symbols))
+        logger.info(f"Buffers precargados para {len(self.symbols)} símbolos")
+
+    def apply_klines(self, symbol: str, klines: List[List], now_ms: Optional[float] = None):
+        """
+        Aplica velas del endpoint REST de klines
+
+        La última suele seguir abierta (close time en el futuro): se carga en el buffer
+        sin actualizar los indicadores, que la incorporarán cuando el stream la cierre
+
+        Args:
+            symbol: Símbolo
+            klines: Filas [open_time, open, high, low, close, volume, close_time, ...]
+            now_ms: Instante actual en milisegundos (por defecto, el reloj del sistema)
+        """
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        for kline in klines:
+            closed = len(kline) < 7 or float(kline[6]) < now_ms
+            self._apply_candle(symbol, [kline[0], *map(float, kline[1:6])], closed=closed)
+
+    def _apply_candle(self, symbol: str, candle: List[float], closed: bool):
+        """Actualiza buffer e indicadores con una vela"""
+        state = self.state.get(symbol)
+        if state is None:
+            return
+        state.buffer.upsert(candle)
+        state.last_price = candle[4]
+        if closed:
+            state.indicators.update(candle[4])
+            self.candle_closed.set()
+            if self.on_candle_closed:
+                self.on_candle_closed(symbol, state.buffer.to_array())
+
+    def handle_message(self, message: Dict):
+        """Procesa un mensaje del stream combinado ({"stream": ..., "data": ...})"""
+        data = message.get("data", message)
+        event = data.get("e")
+        symbol = data.get("s")
+        self.messages_received += 1
+
+        if event == "kline":
+            k = data["k"]
+            candle = [float(k["t"]), float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"])]
+            self._apply_candle(symbol, candle, closed=bool(k.get("x")))
+        elif event == "24hrMiniTicker" and symbol in self.state:
+            state = self.state[symbol]
+            state.last_price = float(data["c"])
+            state.quote_volume = float(data.get("q", 0.0))
+            open_price = float(data.get("o", 0.0))
+            state.change_24h = (state.last_price / open_price - 1) * 100 if open_price else 0.0
+            self.ticker_provider.update_tick(symbol, state.last_price, state.quote_volume, state.change_24h)
+
+    async def run(self, reconnect_delay: float = 1.0, max_delay: float = 60.0):
+        """Mantiene la conexión abierta hasta stop(), reconectando con backoff exponencial"""
+        delay = reconnect_delay
+        while not self._stop.is_set():
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(self.stream_url, heartbeat=30) as ws:
+                        logger.info(f"Stream conectado: {len(self.symbols)} símbolos, velas {self.interval}")
+                        delay = reconnect_delay
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self.handle_message(json.loads(msg.data))
+                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                break
+                            if self._stop.is_set():
+                                return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Stream desconectado ({e}); reintentando en {delay:.0f}s")
+            if self._stop.is_set():
+                return
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, max_delay)
+
+    def stop(self):
+        """Detiene el stream"""
+        self._stop.set()
+
+    def market_data(self) -> Dict[str, Dict]:
+        """Datos en el formato de MarketAnalyzer.market_data, construidos desde los buffers"""
+        data = {}
+        for symbol, state in self.state.items():
+            if not len(state.buffer):
+                continue
+            candles = state.buffer.to_array()
+            data[symbol] = {
+                'price': state.last_price,
+                'volume': state.quote_volume,
+                'change_24h': state.change_24h,
+                'market_cap': 0,
+                'historical': {
+                    'prices': candles[:, 4],
+                    'volumes': candles[:, 5],
+                    'timestamps': candles[:, 0].astype(np.int64).tolist()
+                },
+                'indicators': state.indicators.snapshot()
+            }
+        return data
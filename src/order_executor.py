@@ -0,0 +1,263 @@
+"""
+Ejecutor Concurrente de Órdenes
+Envía lotes de órdenes en paralelo con un límite de concurrencia y de
+peticiones por segundo, usando client order IDs deterministas para que los
+reintentos sean idempotentes. Incluye un exchange simulado para pruebas
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class OrderRejectedError(Exception):
+    """El exchange rechazó la orden (no se reintenta)"""
+
+def make_client_order_id(run_id: str, symbol: str, side: str) -> str:
+    """
+    Client order ID determinista para una orden de una ejecución
+
+    No depende de la posición de la orden en el lote, así que un reintento con
+    las órdenes en otro orden (o con menos órdenes) reutiliza los mismos IDs
+
+    Args:
+        run_id: Identificador de la ejecución DCA (ej: fecha programada)
+        symbol: Símbolo de la orden
+        side: BUY o SELL
+
+    Returns:
+        ID de 28 caracteres compatible con newClientOrderId de Binance
+    """
+    digest = hashlib.sha1(f"{run_id}|{symbol}|{side}".encode("utf-8")).hexdigest()
+    return f"dca_{digest[:24]}"
+
+class AsyncRateLimiter:
+    """Limitador de peticiones por ventana deslizante para corrutinas"""
+
+    def __init__(self, max_calls: int, period: float = 1.0):
+        self.max_calls = max_calls
+        self.period = period
+        self._calls: List[float] = []
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Espera hasta que haya hueco en la ventana actual"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._calls = [t for t in self._calls if now - t < self.period]
+                if len(self._calls) < self.max_calls:
+                    self._calls.append(now)
+                    return
+                await asyncio.sleep(self.period - (now - self._calls[0]))
+
+class ExchangeClient:
+    """
+    Interfaz del exchange que usa OrderExecutor
+
+    Como en Binance, un clientOrderId repetido solo se rechaza mientras la orden
+    sigue abierta: reenviar el de una orden de mercado ya ejecutada (FILLED) crea
+    otra orden. Por eso el ejecutor consulta get_order antes de cada envío
+    """
+
+    async def submit_order(self, order: Dict, client_order_id: str) -> Dict:
+        """Envía una orden de mercado con newClientOrderId=client_order_id"""
+        raise NotImplementedError
+
+    async def get_order(self, symbol: str, client_order_id: str) -> Optional[Dict]:
+        """Orden existente con origClientOrderId=client_order_id (None si el exchange no la conoce)"""
+        raise NotImplementedError
+
+class MockExchange(ExchangeClient):
+    """Exchange simulado: latencia configurable, fallos inyectables y las reglas de unicidad de Binance"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        commission_rate: float = 0.001,
+        transient_failures: int = 0,
+        lost_responses: int = 0
+    ):
+        self.latency = latency
+        self.commission_rate = commission_rate
+        self.transient_failures = transient_failures  # Fallos de red por orden antes de aceptarla
+        self.lost_responses = lost_responses  # Órdenes ejecutadas cuya respuesta se pierde (timeout)
+        self.orders: Dict[str, Dict] = {}  # Última orden por client order ID
+        self.executions: List[Dict] = []  # Todas las órdenes ejecutadas, incluidas las duplicadas
+        self.submissions = 0
+        self._failures: Dict[str, int] = {}
+        self._lost: Dict[str, int] = {}
+        self._next_order_id = 1
+
+    async def get_order(self, symbol: str, client_order_id: str) -> Optional[Dict]:
+        """Simula la consulta de una orden por origClientOrderId"""
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        order = self.orders.get(client_order_id)
+        return order if order is not None and order['symbol'] == symbol else None
+
+    async def submit_order(self, order: Dict, client_order_id: str) -> Dict:
+        """Simula el envío de una orden de mercado (se ejecuta al momento)"""
+        self.submissions += 1
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+
+        existing = self.orders.get(client_order_id)
+        if existing is not None and existing['order_status'] in ('NEW', 'PARTIALLY_FILLED'):
+            raise OrderRejectedError("Duplicate order sent.")
+
+        if self._failures.get(client_order_id, 0) < self.transient_failures:
+            self._failures[client_order_id] = self._failures.get(client_order_id, 0) + 1
+            raise ConnectionError("Timeout simulado del exchange")
+
+        quantity = float(order['quantity'])
+        price = float(order['price'])
+        if quantity <= 0:
+            raise OrderRejectedError(f"Cantidad inválida para {order['symbol']}")
+
+        result = {
+            'status': 'success',
+            'order_status': 'FILLED',
+            'order_id': f"sim_{self._next_order_id}",
+            'client_order_id': client_order_id,
+            'symbol': order['symbol'],
+            'side': order.get('type', 'BUY'),
+            'executed_quantity': quantity,
+            'cumulative_quote_qty': quantity * price,
+            'fills': [{
+                'price': price,
+                'quantity': quantity,
+                'commission': self.commission_rate * quantity * price
+            }]
+        }
+        self._next_order_id += 1
+        self.orders[client_order_id] = result
+        self.executions.append(result)
+
+        if self._lost.get(client_order_id, 0) < self.lost_responses:
+            self._lost[client_order_id] = self._lost.get(client_order_id, 0) + 1
+            raise ConnectionError("Timeout simulado tras ejecutar la orden")
+        return result
+
+class OrderExecutor:
+    """Envía lotes de órdenes en paralelo respetando concurrencia y límite de peticiones"""
+
+    RETRYABLE_ERRORS = (ConnectionError, asyncio.TimeoutError, OSError)
+
+    def __init__(
+        self,
+        exchange: ExchangeClient,
+        max_concurrency: int = 5,
+        max_orders_per_second: int = 10,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        order_timeout: float = 10.0
+    ):
+        self.exchange = exchange
+        self.max_concurrency = max_concurrency
+        self.max_orders_per_second = max_orders_per_second
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.order_timeout = order_timeout
+
+    async def _submit_with_retries(
+        self,
+        order: Dict,
+        client_order_id: str,
+        semaphore: asyncio.Semaphore,
+        limiter: AsyncRateLimiter
+    ) -> Dict:
+        """
+        Envía una orden reintentando errores transitorios con el mismo client order ID
+
+        Antes de cada envío se busca la orden por su client order ID: un timeout puede
+        llegar después de que el exchange la ejecutara, y reenviar una orden ya FILLED
+        la ejecutaría otra vez. La consulta también cubre repetir el lote de un run_id
+        en un ciclo posterior
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    await limiter.acquire()
+                    existing = await asyncio.wait_for(
+                        self.exchange.get_order(order['symbol'], client_order_id),
+                        timeout=self.order_timeout
+                    )
+                    if existing is not None:
+                        return existing
+                    await limiter.acquire()
+                    return await asyncio.wait_for(
+                        self.exchange.submit_order(order, client_order_id),
+                        timeout=self.order_timeout
+                    )
+            except OrderRejectedError as e:
+                return self._error_result(order, client_order_id, str(e))
+            except self.RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    return self._error_result(order, client_order_id, f"{e} tras {attempt + 1} intentos")
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"Reintentando {order['symbol']} ({client_order_id}) en {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _error_result(order: Dict, client_order_id: str, error: str) -> Dict:
+        """Resultado homogéneo para órdenes fallidas"""
+        logger.error(f"Orden {order['symbol']} ({client_order_id}) fallida: {error}")
+        return {
+            'status': 'error',
+            'client_order_id': client_order_id,
+            'symbol': order['symbol'],
+            'side': order.get('type', 'BUY'),
+            'executed_quantity': 0.0,
+            'cumulative_quote_qty': 0.0,
+            'fills': [],
+            'error': error
+        }
+
+    async def execute(
+        self,
+        orders: List[Dict],
+        run_id: str,
+        on_fill: Optional[Callable[[Dict], None]] = None
+    ) -> List[Dict]:
+        """
+        Ejecutar un lote de órdenes en paralelo
+
+        Args:
+            orders: Órdenes con symbol, type, quantity y price
+            run_id: Identificador de la ejecución (mismo run_id = mismos client order IDs)
+            on_fill: Callback invocado con cada resultado según va llegando
+
+        Returns:
+            Resultados en el mismo orden que las órdenes de entrada
+
+        Raises:
+            ValueError: Si el lote repite símbolo y lado (compartirían client order ID)
+        """
+        if not orders:
+            return []
+
+        client_ids = [make_client_order_id(run_id, o['symbol'], o.get('type', 'BUY')) for o in orders]
+        if len(set(client_ids)) != len(client_ids):
+            raise ValueError(f"El lote {run_id} repite símbolo y lado; agrupa esas órdenes en una sola")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = AsyncRateLimiter(self.max_orders_per_second, 1.0)
+
+        async def _run(index: int) -> tuple:
+            return index, await self._submit_with_retries(orders[index], client_ids[index], semaphore, limiter)
+
+        start = time.perf_counter()
+        results: List[Optional[Dict]] = [None] * len(orders)
+        for task in asyncio.as_completed([_run(i) for i in range(len(orders))]):
+            index, result = await task
+            results[index] = result
+            if on_fill:
+                on_fill(result)
+
+        success = sum(1 for r in results if r['status'] == 'success')
+        logger.info(f"Ejecutadas {success}/{len(orders)} órdenes en {time.perf_counter() - start:.2f}s "
+                    f"(concurrencia {self.max_concurrency})")
+        return results
@@ -1,11 +1,18 @@
 import logging
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from datetime import datetime, timedelta
 import time
 import psutil
 import numpy as np
 from dataclasses import dataclass
 import json
+import contextvars
+import functools
+import inspect
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,30 +25,315 @@ class PerformanceMetrics:
     execution_time: float
     success_rate: float
 
-class PerformanceMonitor:
-    def __init__(self):
-        self.metrics: Dict[str, List[float]] = {
-            'execution_times': [],
-            'cpu_usage': [],
-            'memory_usage': [],
-            'success_rates': []
+@dataclass(frozen=True)
+class OperationToken:
+    """Marca de inicio devuelta por start_operation; identifica una ejecución concreta"""
+    name: str
+    start: float
+
+class LatencyHistogram:
+    """Histograma de latencias de memoria fija con buckets logarítmicos"""
+
+    def __init__(self, min_value: float = 0.001, max_value: float = 3600.0, growth: float = 1.25):
+        self.min_value, self.max_value, self.growth = min_value, max_value, growth
+        n_buckets = int(np.ceil(np.log(max_value / min_value) / np.log(growth))) + 1
+        self.bounds = min_value * growth ** np.arange(n_buckets)  # Límite superior de cada bucket
+        self.counts = np.zeros(n_buckets + 1, dtype=np.int64)  # Último bucket: desbordamiento
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def record(self, value: float):
+        """Registra una observación en O(log buckets)"""
+        self.counts[np.searchsorted(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Percentil aproximado (límite superior del bucket, acotado por el máximo observado)"""
+        if not self.count:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), max(1.0, q / 100 * self.count)))
+        upper = self.bounds[index] if index < len(self.bounds) else self.max
+        return float(min(upper, self.max))
+
+    def summary(self) -> Dict[str, float]:
+        """Resumen con recuento, media, extremos y percentiles habituales"""
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99)
+        }
+
+    def cumulative_buckets(self) -> List[tuple]:
+        """Pares (límite superior, recuento acumulado) hasta el último bucket con datos"""
+        cumulative = np.cumsum(self.counts[:-1])
+        last = int(np.max(np.nonzero(self.counts[:-1])[0])) + 1 if cumulative[-1] else 0
+        return [(float(b), int(c)) for b, c in zip(self.bounds[:last], cumulative[:last])]
+
+    def to_dict(self) -> Dict:
+        """Estado serializable (permite restaurar con from_dict)"""
+        return {
+            'min_value': self.min_value, 'max_value': self.max_value, 'growth': self.growth,
+            'counts': self.counts.tolist(), 'count': self.count, 'total': self.total,
+            'min': self.min if self.count else None, 'max': self.max
         }
-        self.operation_times: Dict[str, float] = {}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        hist = cls(data['min_value'], data['max_value'], data['growth'])
+        hist.counts = np.asarray(data['counts'], dtype=np.int64)
+        hist.count = data['count']
+        hist.total = data['total']
+        hist.min = data['min'] if data['min'] is not None else float('inf')
+        hist.max = data['max']
+        return hist
+
+class RunningStats:
+    """Estadísticos acumulados en O(1): media y varianza (Welford), EWMA, extremos y último valor"""
+
+    __slots__ = ('alpha', 'count', 'mean', '_m2', 'ewma', 'last', 'min', 'max')
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.ewma = 0.0
+        self.last = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def update(self, value: float):
+        """Incorpora una observación"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.ewma = value if self.count == 1 else self.ewma + self.alpha * (value - self.ewma)
+        self.last = value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def to_dict(self) -> Dict[str, float]:
+        """Estado serializable (permite restaurar con from_dict)"""
+        return {
+            'count': self.count, 'mean': self.mean, 'm2': self._m2, 'ewma': self.ewma, 'last': self.last,
+            'min': self.min if self.count else None, 'max': self.max if self.count else None, 'alpha': self.alpha
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RunningStats':
+        stats = cls(data.get('alpha', 0.1))
+        stats.count = data['count']
+        stats.mean = data['mean']
+        stats._m2 = data['m2']
+        stats.ewma = data['ewma']
+        stats.last = data['last']
+        stats.min = data['min'] if data['min'] is not None else float('inf')
+        stats.max = data['max'] if data['max'] is not None else float('-inf')
+        return stats
+
+# Ruta de spans activos en la tarea/hilo actual (cada tarea asyncio hereda una copia)
+_current_path: contextvars.ContextVar = contextvars.ContextVar('performance_span_path', default=())
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class PerformanceMonitor:
+    METRIC_NAMES = ('execution_times', 'cpu_usage', 'memory_usage', 'success_rates')
+
+    def __init__(
+        self,
+        history_size: int = 100,
+        rollup_interval_seconds: float = 3600.0,
+        rollup_path: str = 'logs/performance_rollup.jsonl',
+        metrics_file: str = 'performance_metrics.json',
+        rollup_max_bytes: int = 5 * 1024 * 1024,
+        rollup_backups: int = 3
+    ):
+        # Memoria fija: últimas history_size muestras por métrica + estadísticos acumulados
+        self.history_size = history_size
+        self.metrics: Dict[str, deque] = {name: deque(maxlen=history_size) for name in self.METRIC_NAMES}
+        self.metric_stats: Dict[str, RunningStats] = {name: RunningStats() for name in self.METRIC_NAMES}
+        self.operation_times: Dict[str, RunningStats] = {}
+        self.rollup_interval_seconds = rollup_interval_seconds
+        self.rollup_path = rollup_path
+        self.rollup_max_bytes = rollup_max_bytes  # Al superarlo el histórico se rota (.1, .2, ...)
+        self.rollup_backups = rollup_backups
+        self.metrics_file = metrics_file
+        self._last_rollup = time.monotonic()
         self.alerts: List[str] = []
-        self.start_times: Dict[str, float] = {}
-        
-    def start_operation(self, operation_name: str):
-        """Inicia el cronómetro para una operación"""
-        self.start_times[operation_name] = time.time()
-    
-    def end_operation(self, operation_name: str):
-        """Finaliza el cronómetro y registra el tiempo de ejecución"""
-        if operation_name in self.start_times:
-            duration = time.time() - self.start_times[operation_name]
-            if operation_name not in self.operation_times:
-                self.operation_times[operation_name] = []
-            self.operation_times[operation_name].append(duration)
-            logger.info(f"Operación {operation_name} completada en {duration:.2f} segundos")
+        self.spans: Dict[str, LatencyHistogram] = {}  # Clave: ruta de spans ("padre/hijo")
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def start_operation(self, operation_name: str) -> OperationToken:
+        """
+        Inicia el cronómetro para una operación
+
+        Args:
+            operation_name: Nombre de la operación
+
+        Returns:
+            Token que se pasa a end_operation (las ejecuciones solapadas del mismo nombre no se confunden)
+        """
+        return OperationToken(operation_name, time.perf_counter())
+
+    def end_operation(self, token: OperationToken) -> float:
+        """Finaliza el cronómetro de la ejecución del token y registra su tiempo"""
+        duration = time.perf_counter() - token.start
+        self._record(token.name, duration)
+        logger.info(f"Operación {token.name} completada en {duration:.2f} segundos")
+        return duration
+
+    def _record(self, path: str, duration: float):
+        """Registra una duración en el histograma de la ruta y en el historial de la operación"""
+        name = path.rsplit('/', 1)[-1]
+        with self._lock:
+            if path not in self.spans:
+                self.spans[path] = LatencyHistogram()
+            self.spans[path].record(duration)
+            if name not in self.operation_times:
+                self.operation_times[name] = RunningStats()
+            self.operation_times[name].update(duration)
+        self.add_metric('execution_times', duration)
+
+    def add_metric(self, name: str, value: float):
+        """Añade una muestra a una métrica en O(1) (ventana acotada + estadísticos acumulados)"""
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = deque(maxlen=self.history_size)
+                self.metric_stats[name] = RunningStats()
+            self.metrics[name].append(value)
+            self.metric_stats[name].update(value)
+
+    def record_success(self, success: bool):
+        """Registra el resultado de una operación para la tasa de éxito"""
+        self.add_metric('success_rates', 100.0 if success else 0.0)
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        Context manager que mide un bloque; los spans anidados se registran con su ruta
+
+        Args:
+            name: Nombre del span (ej: market.analyze)
+        """
+        path = _current_path.get() + (name,)
+        token = _current_path.set(path)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment(f"{name}.errors")
+            raise
+        finally:
+            _current_path.reset(token)
+            self._record('/'.join(path), time.perf_counter() - start)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorador que mide cada llamada a una función síncrona o asíncrona"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def increment(self, name: str, value: float = 1.0):
+        """Incrementa un contador"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0.0) + value
+
+    def export_json(self, filename: Optional[str] = None) -> Dict:
+        """
+        Exporta spans y contadores en JSON
+
+        Args:
+            filename: Archivo de salida (opcional)
+
+        Returns:
+            Diccionario con el resumen por ruta de span y los contadores
+        """
+        with self._lock:
+            data = {
+                'timestamp': datetime.now().isoformat(),
+                'spans': {path: hist.summary() for path, hist in self.spans.items()},
+                'counters': dict(self.counters)
+            }
+        if filename:
+            self._atomic_write(filename, json.dumps(data, indent=2))
+        return data
+
+    def export_prometheus(self, filename: Optional[str] = None) -> str:
+        """
+        Exporta spans y contadores en formato de texto de Prometheus (para node_exporter textfile o un scraper local)
+
+        Args:
+            filename: Archivo .prom de salida (opcional)
+
+        Returns:
+            Texto en formato de exposición de Prometheus
+        """
+        lines = [
+            '# HELP dca_span_duration_seconds Duración de las operaciones instrumentadas',
+            '# TYPE dca_span_duration_seconds histogram'
+        ]
+        with self._lock:
+            for path, hist in sorted(self.spans.items()):
+                labels = f'span="{_escape_label(path.rsplit("/", 1)[-1])}",path="{_escape_label(path)}"'
+                for bound, count in hist.cumulative_buckets():
+                    lines.append(f'dca_span_duration_seconds_bucket{{{labels},le="{bound:.6g}"}} {count}')
+                lines.append(f'dca_span_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f'dca_span_duration_seconds_sum{{{labels}}} {hist.total:.9g}')
+                lines.append(f'dca_span_duration_seconds_count{{{labels}}} {hist.count}')
+            lines += ['# HELP dca_events_total Contadores de eventos', '# TYPE dca_events_total counter']
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'dca_events_total{{name="{_escape_label(name)}"}} {value:.9g}')
+        text = '\n'.join(lines) + '\n'
+        if filename:
+            self._atomic_write(filename, text)
+        return text
+
+    @staticmethod
+    def _atomic_write(filename: str, content: str):
+        """Escribe a un temporal y lo renombra para que el scraper nunca lea un archivo a medias"""
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{filename}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(content)
+        os.replace(tmp, filename)
     
     def track_system_metrics(self) -> PerformanceMetrics:
         """Registra métricas del sistema"""
@@ -50,14 +342,14 @@ class PerformanceMonitor:
             memory = psutil.virtual_memory().percent
             disk = psutil.disk_usage('/').percent
             
-            self.metrics['cpu_usage'].append(cpu)
-            self.metrics['memory_usage'].append(memory)
+            self.add_metric('cpu_usage', cpu)
+            self.add_metric('memory_usage', memory)
             
-            # Calcular tasa de éxito (últimas 100 operaciones)
+            # Calcular tasa de éxito (EWMA de los resultados registrados)
             success_rate = self._calculate_success_rate()
             
             # Calcular tiempo medio de ejecución
-            execution_time = np.mean(self.metrics['execution_times'][-100:]) if self.metrics['execution_times'] else 0
+            execution_time = self.metric_stats['execution_times'].ewma
             
             return PerformanceMetrics(
                 cpu_usage=cpu,
@@ -72,10 +364,8 @@ class PerformanceMonitor:
     
     def _calculate_success_rate(self) -> float:
         """Calcula la tasa de éxito de las operaciones"""
-        if not self.metrics['success_rates']:
-            return 100.0
-        recent_rates = self.metrics['success_rates'][-100:]
-        return sum(recent_rates) / len(recent_rates) if recent_rates else 0
+        stats = self.metric_stats['success_rates']
+        return stats.ewma if stats.count else 100.0
     
     def check_performance(self) -> List[str]:
         """Verifica el rendimiento y genera alertas si es necesario"""
@@ -96,10 +386,10 @@ class PerformanceMonitor:
                 alerts.append(f"Alto uso de disco: {metrics.disk_usage}%")
             
             # Verificar tiempos de ejecución
-            for operation, times in self.operation_times.items():
-                if len(times) > 1:
-                    avg_time = np.mean(times)
-                    last_time = times[-1]
+            for operation, stats in self.operation_times.items():
+                if stats.count > 1:
+                    avg_time = stats.mean
+                    last_time = stats.last
                     if last_time > avg_time * 2:
                         alerts.append(
                             f"Tiempo de ejecución anormal en {operation}: "
@@ -111,6 +401,7 @@ class PerformanceMonitor:
                 alerts.append(f"Baja tasa de éxito: {metrics.success_rate:.2f}%")
             
             self.alerts = alerts
+            self.maybe_rollup()
             return alerts
             
         except Exception as e:
@@ -132,15 +423,12 @@ class PerformanceMonitor:
             report += f"* Tasa de Éxito: {metrics.success_rate:.1f}%\n\n"
             
             report += "## Tiempos de Ejecución\n"
-            for operation, times in self.operation_times.items():
-                if times:
-                    avg_time = np.mean(times)
-                    max_time = np.max(times)
-                    min_time = np.min(times)
+            for operation, stats in self.operation_times.items():
+                if stats.count:
                     report += f"### {operation}\n"
-                    report += f"* Promedio: {avg_time:.2f}s\n"
-                    report += f"* Máximo: {max_time:.2f}s\n"
-                    report += f"* Mínimo: {min_time:.2f}s\n\n"
+                    report += f"* Promedio: {stats.mean:.2f}s (σ {stats.std:.2f}s, EWMA {stats.ewma:.2f}s)\n"
+                    report += f"* Máximo: {stats.max:.2f}s\n"
+                    report += f"* Mínimo: {stats.min:.2f}s\n\n"
             
             if self.alerts:
                 report += "## Alertas Activas\n"
@@ -153,35 +441,125 @@ class PerformanceMonitor:
             logger.error(f"Error generating performance report: {str(e)}")
             return "Error al generar reporte de rendimiento"
     
-    def save_metrics(self, filename: str = 'performance_metrics.json'):
-        """Guarda las métricas en un archivo JSON"""
+    def save_metrics(self, filename: Optional[str] = None):
+        """Guarda las métricas (ventanas acotadas y estadísticos acumulados) en un archivo JSON"""
+        filename = filename or self.metrics_file
         try:
-            metrics_dict = {
-                'timestamp': datetime.now().isoformat(),
-                'metrics': self.metrics,
-                'operation_times': self.operation_times,
-                'alerts': self.alerts
-            }
-            
-            with open(filename, 'w') as f:
-                json.dump(metrics_dict, f, indent=2)
-                
+            with self._lock:
+                metrics_dict = {
+                    'timestamp': datetime.now().isoformat(),
+                    'metrics': {name: list(values) for name, values in self.metrics.items()},
+                    'metric_stats': {name: stats.to_dict() for name, stats in self.metric_stats.items()},
+                    'operation_times': {name: stats.to_dict() for name, stats in self.operation_times.items()},
+                    'spans': {path: hist.to_dict() for path, hist in self.spans.items()},
+                    'counters': dict(self.counters),
+                    'alerts': self.alerts
+                }
+            self._atomic_write(filename, json.dumps(metrics_dict, indent=2))
             logger.info(f"Métricas guardadas en {filename}")
             
         except Exception as e:
             logger.error(f"Error saving metrics: {str(e)}")
     
-    def load_metrics(self, filename: str = 'performance_metrics.json'):
+    def load_metrics(self, filename: Optional[str] = None):
         """Carga métricas desde un archivo JSON"""
+        filename = filename or self.metrics_file
         try:
             with open(filename, 'r') as f:
                 data = json.load(f)
-                
-            self.metrics = data['metrics']
-            self.operation_times = data['operation_times']
-            self.alerts = data['alerts']
+
+            with self._lock:
+                self.metrics = {
+                    name: deque(values, maxlen=self.history_size) for name, values in data['metrics'].items()
+                }
+                self.metric_stats = {
+                    name: RunningStats.from_dict(stats) for name, stats in data.get('metric_stats', {}).items()
+                }
+                for name in self.metrics:
+                    self.metric_stats.setdefault(name, RunningStats())
+                self.operation_times = {
+                    name: RunningStats.from_dict(stats) for name, stats in data['operation_times'].items()
+                    if isinstance(stats, dict)
+                }
+                self.spans = {
+                    path: LatencyHistogram.from_dict(hist) for path, hist in data.get('spans', {}).items()
+                    if 'counts' in hist  # Los archivos antiguos solo guardaban el resumen
+                }
+                self.counters = data.get('counters', {})
+                self.alerts = data['alerts']
             
             logger.info(f"Métricas cargadas desde {filename}")
             
         except Exception as e:
-            logger.error(f"Error loading metrics: {str(e)}") 
\ No newline at end of file
+            logger.error(f"Error loading metrics: {str(e)}")
+
+    def maybe_rollup(self, force: bool = False) -> bool:
+        """
+        Vuelca periódicamente las métricas a disco: guarda el estado con save_metrics y
+        añade una línea de resumen al histórico JSONL (tamaño en memoria constante)
+
+        Args:
+            force: Volcar aunque no haya pasado rollup_interval_seconds
+
+        Returns:
+            True si se realizó el volcado
+        """
+        now = time.monotonic()
+        if not force and now - self._last_rollup < self.rollup_interval_seconds:
+            return False
+        self._last_rollup = now
+        self.save_metrics()
+        try:
+            with self._lock:
+                line = {
+                    'timestamp': datetime.now().isoformat(),
+                    'metrics': {
+                        name: {'mean': stats.mean, 'std': stats.std, 'ewma': stats.ewma, 'count': stats.count}
+                        for name, stats in self.metric_stats.items() if stats.count
+                    },
+                    'operations': {
+                        name: {'mean': stats.mean, 'ewma': stats.ewma, 'max': stats.max, 'count': stats.count}
+                        for name, stats in self.operation_times.items()
+                    },
+                    'spans': {path: hist.summary() for path, hist in self.spans.items()}
+                }
+            directory = os.path.dirname(self.rollup_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._rotate_rollup()
+            with open(self.rollup_path, 'a') as f:
+                f.write(json.dumps(line) + '\n')
+        except Exception as e:
+            logger.error(f"Error writing metrics rollup: {str(e)}")
+        return True
+
+    def _rotate_rollup(self):
+        """Rota el histórico JSONL al superar rollup_max_bytes conservando rollup_backups copias"""
+        if not os.path.exists(self.rollup_path) or os.path.getsize(self.rollup_path) < self.rollup_max_bytes:
+            return
+        if self.rollup_backups <= 0:
+            os.remove(self.rollup_path)
+            return
+        for i in range(self.rollup_backups - 1, 0, -1):
+            if os.path.exists(f"{self.rollup_path}.{i}"):
+                os.replace(f"{self.rollup_path}.{i}", f"{self.rollup_path}.{i + 1}")
+        os.replace(self.rollup_path, f"{self.rollup_path}.1")
+
+_shared_monitor: Optional[PerformanceMonitor] = None
+_shared_monitor_lock = threading.Lock()
+
+def get_monitor() -> PerformanceMonitor:
+    """Monitor único del proceso, compartido por scheduler, analizador, trader y base de datos"""
+    global _shared_monitor
+    with _shared_monitor_lock:
+        if _shared_monitor is None:
+            _shared_monitor = PerformanceMonitor()
+        return _shared_monitor
+
+def span(name: str):
+    """Atajo: span en el monitor compartido"""
+    return get_monitor().span(name)
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Atajo: decorador de tiempos sobre el monitor compartido"""
+    return get_monitor().timed(name)
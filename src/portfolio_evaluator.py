@@ -0,0 +1,177 @@
+"""
+Evaluador en Lote de Portafolios
+Simula DCA para todas las definiciones activas en una sola pasada vectorizada:
+las asignaciones se apilan en una matriz (portafolios × activos) y las curvas
+de capital salen de un único producto matricial contra la matriz de precios
+"""
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dca_schedule import PurchaseSchedule, compile_schedule
+from price_store import PriceStore
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class BatchEvaluationResult:
+    """Resultado de la evaluación conjunta de portafolios"""
+    summary: pd.DataFrame  # Una fila por portafolio
+    equity_curves: pd.DataFrame  # (fechas × portafolios)
+    invested: pd.Series  # Capital aportado acumulado por fecha
+
+def stack_allocations(definitions: List) -> pd.DataFrame:
+    """Apila las asignaciones en una matriz de pesos (portafolios × activos)"""
+    weights = pd.DataFrame(
+        [d.allocation for d in definitions],
+        index=[d.id for d in definitions]
+    ).fillna(0.0)
+    return weights.reindex(columns=sorted(weights.columns))
+
+class PortfolioBatchEvaluator:
+    """Evalúa todas las definiciones de portafolio contra el almacén de precios"""
+
+    def __init__(
+        self,
+        definitions: Optional[List] = None,
+        price_store: Optional[PriceStore] = None,
+        schedule: Optional[PurchaseSchedule] = None,
+        weekly_investment: float = 100.0
+    ):
+        if definitions is None:
+            from portfolio_manager import PortfolioManager
+            definitions = PortfolioManager().get_active_portfolios()
+
+        self.definitions = definitions
+        self.price_store = price_store or PriceStore()
+        self.schedule = schedule or PurchaseSchedule(frequency="weekly", weekday=1)
+        self.weekly_investment = weekly_investment
+        self.names = {d.id: d.name for d in definitions}
+
+        logger.info(f"Evaluador en lote inicializado con {len(definitions)} portafolios")
+
+    def _load_prices(self, symbols: List[str], start_date: Optional[str], end_date: Optional[str]) -> pd.DataFrame:
+        """
+        Carga la matriz de precios sin recortarla al activo más joven
+
+        Los precios quedan en NaN mientras un activo no cotiza: evaluate() mantiene en
+        efectivo la parte de cada compra asignada a activos aún sin cotización
+        """
+        prices = self.price_store.get_price_matrix(symbols, start_date, end_date, common_window=False)
+        prices = prices.reindex(columns=symbols)
+        missing = [s for s in symbols if prices[s].isna().all()]
+        if missing:
+            logger.warning(f"Sin precios para {missing}: se valoran como efectivo")
+        return prices.ffill()
+
+    def evaluate(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> BatchEvaluationResult:
+        """
+        Ejecutar la simulación DCA compartida para todos los portafolios
+
+        Args:
+            start_date: Fecha inicial opcional
+            end_date: Fecha final opcional
+
+        Returns:
+            BatchEvaluationResult con tabla comparativa y curvas de capital
+        """
+        weights = stack_allocations(self.definitions)
+        prices = self._load_prices(list(weights.columns), start_date, end_date)
+        if prices.empty:
+            raise ValueError("No hay precios disponibles para el periodo solicitado")
+
+        matrix = prices.to_numpy()
+        listed = np.isfinite(matrix) & (matrix > 0)
+        rows = compile_schedule(prices.index, self.schedule)
+
+        # Unidades compradas por unidad monetaria invertida (fechas × activos); la parte de un
+        # activo que aún no cotiza se guarda como efectivo y no se convierte al empezar a cotizar
+        bought = listed[rows]
+        units_per_unit = np.zeros_like(matrix)
+        np.add.at(units_per_unit, rows, np.where(bought, 1.0 / np.where(bought, matrix[rows], 1.0), 0.0))
+        cash_per_unit = np.zeros_like(matrix)
+        np.add.at(cash_per_unit, rows, (~bought).astype(float))
+        holdings = np.cumsum(units_per_unit, axis=0) * np.where(listed, matrix, 0.0) + np.cumsum(cash_per_unit, axis=0)
+
+        # Curvas de capital (fechas × portafolios) en un único producto matricial
+        equity = self.weekly_investment * holdings @ weights.to_numpy().T
+
+        contributions = np.zeros(len(matrix))
+        np.add.at(contributions, rows, self.weekly_investment)
+        invested = np.cumsum(contributions)
+
+        equity_curves = pd.DataFrame(equity, index=prices.index, columns=weights.index)
+        invested_series = pd.Series(invested, index=prices.index, name="invested")
+        summary = self._summarize(equity_curves, invested_series, contributions)
+
+        logger.info(f"Evaluados {len(weights)} portafolios sobre {len(prices)} días y {len(rows)} compras")
+        return BatchEvaluationResult(summary=summary, equity_curves=equity_curves, invested=invested_series)
+
+    def _summarize(self, equity: pd.DataFrame, invested: pd.Series, contributions: np.ndarray) -> pd.DataFrame:
+        """Construye la tabla comparativa a partir de las curvas de capital"""
+        values = equity.to_numpy()
+        previous = np.vstack([np.full((1, values.shape[1]), np.nan), values[:-1]])
+
+        # Rentabilidad diaria ponderada en el tiempo (descontando aportaciones)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            daily_returns = np.where(previous > 0, (values - contributions[:, None]) / previous - 1, np.nan)
+        growth = np.nancumprod(np.nan_to_num(daily_returns, nan=0.0) + 1, axis=0)
+        drawdown = growth / np.maximum.accumulate(growth, axis=0) - 1
+
+        volatility = np.nanstd(daily_returns, axis=0) * np.sqrt(365)
+        mean_return = np.nanmean(daily_returns, axis=0) * 365
+        total_invested = invested.iloc[-1]
+        final_value = values[-1]
+
+        summary = pd.DataFrame({
+            'name': [self.names.get(pid, pid) for pid in equity.columns],
+            'total_invested': total_invested,
+            'final_value': final_value,
+            'roi': (final_value - total_invested) / total_invested * 100 if total_invested > 0 else 0.0,
+            'twr': (growth[-1] - 1) * 100,
+            'volatility': volatility * 100,
+            'sharpe': np.where(volatility > 0, mean_return / volatility, 0.0),
+            'max_drawdown': drawdown.min(axis=0) * 100
+        }, index=equity.columns)
+        summary.index.name = 'portfolio_id'
+        return summary.sort_values('roi', ascending=False)
+
+    def save_results(self, result: BatchEvaluationResult, output_dir: str = "portfolios/performance/batch_evaluation") -> Path:
+        """Guardar tabla comparativa y curvas de capital en CSV"""
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        result.summary.to_csv(output_path / "comparison.csv")
+        equity = result.equity_curves.copy()
+        equity['invested'] = result.invested
+        equity.to_csv(output_path / "equity_curves.csv", index_label="date")
+        logger.info(f"Resultados de evaluación guardados en {output_path}")
+        return output_path
+
+def main():
+    """Evaluar todos los portafolios activos y mostrar la comparativa"""
+    print("📊 Evaluando portafolios en lote...")
+
+    evaluator = PortfolioBatchEvaluator()
+    result = evaluator.evaluate()
+    evaluator.save_results(result)
+
+    print("\n📈 COMPARATIVA DE PORTAFOLIOS:")
+    print("="*50)
+    for portfolio_id, row in result.summary.iterrows():
+        print(f"📋 {row['name']} ({portfolio_id})")
+        print(f"   Invertido: {row['total_invested']:.2f} | Valor final: {row['final_value']:.2f}")
+        print(f"   ROI: {row['roi']:.2f}% | Sharpe: {row['sharpe']:.2f} | Max DD: {row['max_drawdown']:.2f}%")
+
+    return result
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,8 @@ import json
 import logging
 import os
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+from dataclasses import dataclass, asdict, replace
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -17,6 +17,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config_models import load_config
+from snapshot_store import SnapshotStore
+from portfolio_registry import get_registry
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -65,8 +67,42 @@ class PortfolioManager:
         self.active_dir = self.portfolios_dir / "active"
         
         self._ensure_directories()
-        self.portfolios: Dict[str, PortfolioDefinition] = {}
-        self.load_all_portfolios()
+        self.snapshot_store = SnapshotStore(self.performance_dir / "snapshots.db")
+
+        # Las definiciones se cargan bajo demanda desde el registro compartido del proceso
+        self.registry = get_registry(self.definitions_dir, PortfolioDefinition)
+        self._portfolios: Dict[str, PortfolioDefinition] = {}
+        self._sources: Dict[str, PortfolioDefinition] = {}  # {portfolio_id: definición del registro copiada}
+        self._registry_version = -1
+
+    @property
+    def portfolios(self) -> Dict[str, PortfolioDefinition]:
+        """Copias locales (modificables) de las definiciones, sincronizadas con el registro"""
+        view = self.registry.view()
+        if self.registry.version != self._registry_version:
+            self._sync_from_registry(view)
+        return self._portfolios
+
+    def _sync_from_registry(self, view: Mapping[str, PortfolioDefinition]):
+        """Copia solo las definiciones que cambiaron en el registro desde la última sincronización"""
+        for portfolio_id, definition in view.items():
+            if self._sources.get(portfolio_id) is not definition:
+                self._portfolios[portfolio_id] = replace(definition, allocation=dict(definition.allocation))
+                self._sources[portfolio_id] = definition
+
+        for portfolio_id in [pid for pid in self._sources if pid not in view]:
+            del self._sources[portfolio_id]
+            self._portfolios.pop(portfolio_id, None)
+
+        self._registry_version = self.registry.version
+
+    def definitions_view(self) -> Mapping[str, PortfolioDefinition]:
+        """Vista de solo lectura compartida, sin copias (para consumidores que no modifican)"""
+        return self.registry.view()
+
+    def watch_definitions(self, callback: Callable[[List[str], List[str]], None], interval: float = 5.0):
+        """Notificar cambios en portfolios/definitions con callback(cambiados, eliminados)"""
+        self.registry.watch(callback, interval)
     
     def _ensure_directories(self):
         """Crear directorios necesarios si no existen"""
@@ -147,6 +183,11 @@ class PortfolioManager:
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(asdict(portfolio), f, indent=4, ensure_ascii=False)
         
+        # Publicar en el registro sin volver a parsear el archivo
+        registered = replace(portfolio, allocation=dict(portfolio.allocation))
+        self.registry.update(portfolio_id, registered)
+        self._sources[portfolio_id] = registered
+        
         logger.info(f"Portafolio guardado: {file_path}")
     
     def load_portfolio(self, portfolio_id: str) -> Optional[PortfolioDefinition]:
@@ -157,25 +198,12 @@ class PortfolioManager:
             logger.warning(f"Archivo de portafolio no encontrado: {file_path}")
             return None
         
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                portfolio = PortfolioDefinition(**data)
-                self.portfolios[portfolio_id] = portfolio
-                return portfolio
-        except Exception as e:
-            logger.error(f"Error cargando portafolio {portfolio_id}: {e}")
-            return None
+        self.registry.refresh(force=True)
+        return self.portfolios.get(portfolio_id)
     
     def load_all_portfolios(self):
-        """Cargar todos los portafolios desde disco"""
-        if not self.definitions_dir.exists():
-            return
-        
-        for file_path in self.definitions_dir.glob("*.json"):
-            portfolio_id = file_path.stem
-            self.load_portfolio(portfolio_id)
-        
+        """Forzar la recarga de los portafolios modificados en disco"""
+        self.registry.refresh(force=True)
         logger.info(f"Cargados {len(self.portfolios)} portafolios")
     
     def get_active_portfolios(self) -> List[PortfolioDefinition]:
@@ -214,14 +242,24 @@ class PortfolioManager:
     
     def save_snapshot(self, snapshot: PortfolioSnapshot):
         """Guardar snapshot del portafolio"""
-        date_str = datetime.fromisoformat(snapshot.timestamp).strftime("%Y-%m-%d")
-        snapshot_dir = self.performance_dir / "daily_snapshots" / date_str
-        snapshot_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_path = snapshot_dir / f"{snapshot.portfolio_id}_snapshot.json"
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(asdict(snapshot), f, indent=4, ensure_ascii=False)
+        self.snapshot_store.save_snapshots([snapshot])
+    
+    def save_snapshots(self, snapshots: List[PortfolioSnapshot]) -> int:
+        """Guardar snapshots de varios portafolios en una sola escritura"""
+        return self.snapshot_store.save_snapshots(snapshots)
+    
+    def get_snapshot_history(
+        self,
+        portfolio_id: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> pd.DataFrame:
+        """Obtener el historial de snapshots como DataFrame"""
+        return self.snapshot_store.get_history(portfolio_id, start_date, end_date)
+    
+    def migrate_json_snapshots(self) -> int:
+        """Importar los snapshots JSON diarios antiguos al almacén indexado"""
+        return self.snapshot_store.import_json_snapshots(self.performance_dir / "daily_snapshots")
     
     def get_portfolio_summary(self) -> Dict:
         """Obtener resumen de todos los portafolios"""
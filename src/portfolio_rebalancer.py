@@ -17,6 +17,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from portfolio_manager import PortfolioManager, PortfolioDefinition, PortfolioSnapshot
+from price_feed import PriceProvider, LocalStorePriceProvider
+from rebalance_planner import RebalancePlanner, FeeModel
 from config_models import load_config
 
 # Configurar logging
@@ -45,12 +47,23 @@ class RebalanceExecution:
     execution_status: str  # "planned", "executed", "failed"
     execution_notes: str
 
+@dataclass
+class DriftReport:
+    """Desviaciones de todos los portafolios calculadas en una única pasada"""
+    timestamp: str
+    prices: Dict[str, float]
+    target_weights: pd.DataFrame  # (portafolios × activos)
+    current_weights: pd.DataFrame  # (portafolios × activos)
+    total_values: pd.Series
+    summary: pd.DataFrame  # Ordenado por urgencia de rebalanceo
+
 class PortfolioRebalancer:
     """Sistema de rebalanceo automático para múltiples portafolios"""
     
-    def __init__(self):
+    def __init__(self, price_provider: Optional[PriceProvider] = None):
         self.config = load_config()
         self.pm = PortfolioManager()
+        self.price_provider = price_provider or LocalStorePriceProvider()
         self.rebalance_dir = Path("portfolios/performance/rebalancing_history")
         self.rebalance_dir.mkdir(parents=True, exist_ok=True)
         
@@ -58,15 +71,149 @@ class PortfolioRebalancer:
         self.min_rebalance_interval = timedelta(days=7)  # Mínimo 7 días entre rebalanceos
         self.max_rebalance_interval = timedelta(days=30)  # Máximo 30 días sin rebalancear
         self.min_trade_value = 10.0  # Mínimo valor de trade en USD
+        self.simulated_balance = 10000.0  # Balance supuesto para portafolios sin posiciones reales
+        self.band_ratio = 0.5  # Se opera hasta la mitad del umbral, no hasta el objetivo exacto
+        self.dca_inflow = self.config.trading.weekly_investment  # Aportación semanal que absorbe desviaciones
+        self.planner = RebalancePlanner(FeeModel(min_notional=self.min_trade_value))
         
         logger.info("Sistema de rebalanceo automático inicializado")
     
-    def check_rebalance_needed(self, portfolio_id: str) -> Tuple[bool, float, str]:
+    def compute_drift(
+        self,
+        portfolio_ids: Optional[List[str]] = None,
+        prices: Optional[Dict[str, float]] = None
+    ) -> DriftReport:
+        """
+        Calcular las desviaciones de varios portafolios como operación matricial
+        
+        Las tenencias salen del último snapshot con valor; si no existe, se asume
+        que el portafolio estaba en sus pesos objetivo en la fecha del último
+        rebalanceo (o de creación) y se deja derivar con los precios desde entonces.
+        
+        Args:
+            portfolio_ids: IDs a evaluar (None = todos los activos)
+            prices: Foto de precios ya tomada (None = consultar el proveedor una vez)
+            
+        Returns:
+            DriftReport con la tabla ordenada de portafolios
+        """
+        if portfolio_ids is None:
+            portfolios = self.pm.get_active_portfolios()
+        else:
+            portfolios = [self.pm.portfolios[pid] for pid in portfolio_ids if pid in self.pm.portfolios]
+        ids = [p.id for p in portfolios]
+        
+        targets = pd.DataFrame([p.allocation for p in portfolios], index=ids).fillna(0.0)
+        holdings = self._load_holdings(ids)
+        symbols = sorted(set(targets.columns) | set(holdings.columns))
+        targets = targets.reindex(columns=symbols, fill_value=0.0)
+        
+        if prices is None:
+            prices = self.price_provider.get_prices(symbols)
+        price_now = self.price_provider.get_price_vector(symbols, prices)
+        
+        now = datetime.now()
+        reference_dates = [self._reference_date(p) for p in portfolios]
+        days_since = np.array([self._time_since_last_rebalance(pid, now).total_seconds() / 86400 for pid in ids])
+        
+        # Unidades por portafolio: reales si hay snapshot con valor, hipotéticas si no
+        weights = targets.to_numpy()
+        price_ref = self.price_provider.get_reference_prices(symbols, reference_dates)
+        price_ref = np.where(np.isnan(price_ref), price_now, price_ref)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            units = np.where(price_ref > 0, self.simulated_balance * weights / price_ref, 0.0)
+        
+        held = holdings.reindex(index=ids, columns=symbols, fill_value=0.0).fillna(0.0).to_numpy()
+        has_holdings = (held * np.nan_to_num(price_now)).sum(axis=1) > 0
+        units[has_holdings] = held[has_holdings]
+        
+        # Activos sin precio actual no derivan: se valoran a su precio de referencia
+        valuation = np.where(np.isnan(price_now), price_ref, price_now)
+        values = np.nan_to_num(units * valuation)
+        total_values = values.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            current = np.where(total_values[:, None] > 0, values / total_values[:, None], 0.0)
+        
+        deviations = np.abs(current - weights)
+        max_deviation = deviations.max(axis=1) if symbols else np.zeros(len(ids))
+        total_deviation = deviations.sum(axis=1)
+        
+        summary = self._classify(portfolios, max_deviation, total_deviation, days_since)
+        summary['total_value'] = total_values
+        summary = summary.sort_values(['needs_rebalance', 'urgency'], ascending=[False, False])
+        
+        missing = [s for s, p in zip(symbols, price_now) if np.isnan(p)]
+        if missing:
+            logger.warning(f"Sin precio actual para {missing}: se asume sin desviación")
+        
+        return DriftReport(
+            timestamp=now.isoformat(),
+            prices=prices,
+            target_weights=targets,
+            current_weights=pd.DataFrame(current, index=ids, columns=symbols),
+            total_values=pd.Series(total_values, index=ids),
+            summary=summary
+        )
+    
+    def _load_holdings(self, portfolio_ids: List[str]) -> pd.DataFrame:
+        """Cantidades por activo del último snapshot de cada portafolio (portafolios × activos)"""
+        latest = self.pm.snapshot_store.get_latest(portfolio_ids)
+        amounts = {
+            pid: {symbol: position.get("amount", 0.0) for symbol, position in positions.items()}
+            for pid, positions in latest["positions"].items()
+        } if not latest.empty else {}
+        return pd.DataFrame.from_dict(amounts, orient='index').reindex(index=portfolio_ids)
+    
+    def _classify(
+        self,
+        portfolios: List[PortfolioDefinition],
+        max_deviation: np.ndarray,
+        total_deviation: np.ndarray,
+        days_since: np.ndarray
+    ) -> pd.DataFrame:
+        """Aplica las reglas de umbral e intervalo a todos los portafolios a la vez"""
+        thresholds = np.array([p.rebalance_threshold for p in portfolios], dtype=float)
+        
+        by_max = max_deviation > thresholds
+        by_total = ~by_max & (total_deviation > thresholds * 2)
+        by_time = ~by_max & ~by_total & (days_since > self.max_rebalance_interval.days)
+        triggered = by_max | by_total | by_time
+        too_soon = triggered & (days_since < self.min_rebalance_interval.days)
+        
+        reasons = []
+        for i in range(len(portfolios)):
+            if too_soon[i]:
+                reasons.append(f"Intervalo mínimo no cumplido: {int(days_since[i])} < {self.min_rebalance_interval.days} días")
+            elif by_max[i]:
+                reasons.append(f"Desviación máxima: {max_deviation[i]:.3f} > {thresholds[i]:.3f}")
+            elif by_total[i]:
+                reasons.append(f"Desviación total: {total_deviation[i]:.3f} > {thresholds[i] * 2:.3f}")
+            elif by_time[i]:
+                reasons.append(f"Tiempo desde último rebalanceo > {self.max_rebalance_interval.days} días")
+            else:
+                reasons.append("")
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            urgency = np.where(thresholds > 0, max_deviation / thresholds, 0.0)
+        
+        return pd.DataFrame({
+            'name': [p.name for p in portfolios],
+            'needs_rebalance': triggered & ~too_soon,
+            'max_deviation': max_deviation,
+            'total_deviation': total_deviation,
+            'urgency': urgency,
+            'rebalance_threshold': thresholds,
+            'days_since_last_rebalance': days_since.astype(int),
+            'reason': reasons
+        }, index=[p.id for p in portfolios])
+    
+    def check_rebalance_needed(self, portfolio_id: str, report: Optional[DriftReport] = None) -> Tuple[bool, float, str]:
         """
         Verificar si un portafolio necesita rebalanceo
         
         Args:
             portfolio_id: ID del portafolio
+            report: Informe de desviaciones ya calculado (opcional)
             
         Returns:
             Tuple (needs_rebalance, total_deviation, reason)
@@ -74,100 +221,33 @@ class PortfolioRebalancer:
         if portfolio_id not in self.pm.portfolios:
             return False, 0.0, "Portfolio not found"
         
-        portfolio = self.pm.portfolios[portfolio_id]
-        
-        # Obtener snapshot actual (simulado con precios mock)
-        current_snapshot = self._get_current_snapshot(portfolio_id)
-        
-        if not current_snapshot:
-            return False, 0.0, "No current snapshot available"
-        
-        # Calcular desviaciones
-        total_deviation = 0.0
-        max_deviation = 0.0
-        deviations = {}
-        
-        for symbol, target_weight in portfolio.allocation.items():
-            current_weight = 0.0
-            if symbol in current_snapshot.positions:
-                current_weight = current_snapshot.positions[symbol].get("weight", 0.0)
-            
-            deviation = abs(current_weight - target_weight)
-            deviations[symbol] = deviation
-            total_deviation += deviation
-            max_deviation = max(max_deviation, deviation)
-        
-        # Determinar si necesita rebalanceo
-        needs_rebalance = False
-        reason = ""
-        
-        if max_deviation > portfolio.rebalance_threshold:
-            needs_rebalance = True
-            reason = f"Desviación máxima: {max_deviation:.3f} > {portfolio.rebalance_threshold:.3f}"
-        elif total_deviation > portfolio.rebalance_threshold * 2:
-            needs_rebalance = True
-            reason = f"Desviación total: {total_deviation:.3f} > {portfolio.rebalance_threshold * 2:.3f}"
-        elif self._time_since_last_rebalance(portfolio_id) > self.max_rebalance_interval:
-            needs_rebalance = True
-            reason = f"Tiempo desde último rebalanceo > {self.max_rebalance_interval.days} días"
-        
-        # Verificar intervalo mínimo
-        if needs_rebalance:
-            time_since_last = self._time_since_last_rebalance(portfolio_id)
-            if time_since_last < self.min_rebalance_interval:
-                needs_rebalance = False
-                reason = f"Intervalo mínimo no cumplido: {time_since_last.days} < {self.min_rebalance_interval.days} días"
-        
-        return needs_rebalance, total_deviation, reason
+        report = report or self.compute_drift([portfolio_id])
+        row = report.summary.loc[portfolio_id]
+        return bool(row['needs_rebalance']), float(row['total_deviation']), row['reason']
     
-    def _get_current_snapshot(self, portfolio_id: str) -> Optional[PortfolioSnapshot]:
-        """Obtener snapshot actual del portafolio (simulado con precios mock)"""
+    def _get_current_snapshot(self, portfolio_id: str, report: Optional[DriftReport] = None) -> Optional[PortfolioSnapshot]:
+        """Obtener snapshot actual del portafolio a partir del informe de desviaciones"""
         if portfolio_id not in self.pm.portfolios:
             return None
         
-        portfolio = self.pm.portfolios[portfolio_id]
-        
-        # Precios mock para simulación
-        mock_prices = {
-            "BTC": 45000.0,
-            "ETH": 3200.0,
-            "BNB": 350.0,
-            "ADA": 0.45,
-            "DOT": 6.5,
-            "LINK": 15.0,
-            "UNI": 8.0,
-            "MATIC": 0.85,
-            "ATOM": 12.0,
-            "AVAX": 35.0,
-            "USDT": 1.0,
-            "USDC": 1.0
-        }
+        report = report or self.compute_drift([portfolio_id])
+        total_value = float(report.total_values[portfolio_id])
+        weights = report.current_weights.loc[portfolio_id]
         
-        # Simular balance inicial de $10,000 para cálculos
-        simulated_balance = 10000.0
         positions = {}
-        
-        for symbol, target_weight in portfolio.allocation.items():
-            price = mock_prices.get(symbol, 1.0)
-            target_value = simulated_balance * target_weight
-            amount = target_value / price
-            
-            # Simular variación de precios ±5%
-            price_variation = np.random.uniform(-0.05, 0.05)
-            current_price = price * (1 + price_variation)
-            current_value = amount * current_price
-            current_weight = current_value / simulated_balance
-            
+        for symbol, weight in weights[weights > 0].items():
+            value = weight * total_value
+            price = report.prices.get(symbol)
             positions[symbol] = {
-                "amount": amount,
-                "value": current_value,
-                "weight": current_weight
+                "amount": value / price if price else 0.0,
+                "value": value,
+                "weight": float(weight)
             }
         
         return PortfolioSnapshot(
             portfolio_id=portfolio_id,
-            timestamp=datetime.now().isoformat(),
-            total_value=simulated_balance,
+            timestamp=report.timestamp,
+            total_value=total_value,
             positions=positions,
             cash_balance=0.0,
             daily_pnl=0.0,
@@ -175,83 +255,101 @@ class PortfolioRebalancer:
             metrics={}
         )
     
-    def _time_since_last_rebalance(self, portfolio_id: str) -> timedelta:
-        """Obtener tiempo desde el último rebalanceo"""
+    @staticmethod
+    def _reference_date(portfolio: PortfolioDefinition) -> str:
+        """Fecha del último rebalanceo o, si nunca se ha rebalanceado, de creación"""
+        return portfolio.last_rebalance or portfolio.created_date
+    
+    def _time_since_last_rebalance(self, portfolio_id: str, now: Optional[datetime] = None) -> timedelta:
+        """Obtener tiempo desde el último rebalanceo (999 días si no hay fecha de referencia)"""
         if portfolio_id not in self.pm.portfolios:
             return timedelta(days=999)
         
-        portfolio = self.pm.portfolios[portfolio_id]
-        
-        if not portfolio.last_rebalance:
-            # Si nunca se ha rebalanceado, usar fecha de creación
-            created_date = datetime.fromisoformat(portfolio.created_date)
-            return datetime.now() - created_date
+        reference = self._reference_date(self.pm.portfolios[portfolio_id])
+        if not reference:
+            return timedelta(days=999)
+        return (now or datetime.now()) - datetime.fromisoformat(reference)
+    
+    def plan_rebalances(
+        self,
+        report: DriftReport,
+        portfolio_ids: Optional[List[str]] = None
+    ) -> Dict[str, RebalanceExecution]:
+        """
+        Planificar en lote el rebalanceo de mínima rotación de varios portafolios
         
-        last_rebalance = datetime.fromisoformat(portfolio.last_rebalance)
-        return datetime.now() - last_rebalance
+        Args:
+            report: Informe de desviaciones de la ejecución actual
+            portfolio_ids: IDs a planificar (None = todos los que lo necesitan)
+            
+        Returns:
+            Dict {portfolio_id: plan} solo para portafolios que necesitan rebalanceo
+        """
+        summary = report.summary
+        if portfolio_ids is None:
+            portfolio_ids = list(summary.index[summary['needs_rebalance']])
+        else:
+            portfolio_ids = [pid for pid in portfolio_ids if pid in summary.index and summary.at[pid, 'needs_rebalance']]
+        if not portfolio_ids:
+            return {}
+        
+        current_weights = report.current_weights.loc[portfolio_ids]
+        target_weights = report.target_weights.loc[portfolio_ids]
+        values = current_weights.mul(report.total_values[portfolio_ids], axis=0)
+        bands = summary.loc[portfolio_ids, 'rebalance_threshold'] * self.band_ratio
+        
+        trade_plan = self.planner.plan(values, target_weights, bands, inflows=self.dca_inflow)
+        
+        plans = {}
+        for portfolio_id in portfolio_ids:
+            orders = trade_plan.orders(portfolio_id)
+            actions = []
+            for order in orders.itertuples(index=False):
+                current = float(current_weights.at[portfolio_id, order.symbol])
+                target = float(target_weights.at[portfolio_id, order.symbol])
+                actions.append(RebalanceAction(
+                    symbol=order.symbol,
+                    current_weight=current,
+                    target_weight=target,
+                    deviation=current - target,
+                    action=order.side,
+                    amount_change=float(order.notional),
+                    priority=1 if abs(current - target) > 0.05 else 2  # Alta prioridad si > 5%
+                ))
+            
+            # Ventas primero para financiar las compras, luego por prioridad
+            actions.sort(key=lambda x: (x.action != "sell", x.priority))
+            
+            plans[portfolio_id] = RebalanceExecution(
+                portfolio_id=portfolio_id,
+                execution_date=datetime.now().isoformat(),
+                trigger_reason=summary.at[portfolio_id, 'reason'],
+                actions=actions,
+                total_deviation=float(summary.at[portfolio_id, 'total_deviation']),
+                execution_status="planned",
+                execution_notes=(f"Comisiones estimadas: {trade_plan.fees[portfolio_id]:.2f} USD, "
+                                 f"rotación: {trade_plan.turnover[portfolio_id]:.2%}, "
+                                 f"aportación DCA usada: {trade_plan.inflow_used[portfolio_id]:.2f} USD")
+            )
+        
+        return plans
     
-    def plan_rebalance(self, portfolio_id: str) -> Optional[RebalanceExecution]:
+    def plan_rebalance(self, portfolio_id: str, report: Optional[DriftReport] = None) -> Optional[RebalanceExecution]:
         """
         Planificar rebalanceo para un portafolio
         
         Args:
             portfolio_id: ID del portafolio
+            report: Informe de desviaciones ya calculado (opcional)
             
         Returns:
             Plan de rebalanceo o None si no es necesario
         """
-        needs_rebalance, total_deviation, reason = self.check_rebalance_needed(portfolio_id)
-        
-        if not needs_rebalance:
-            return None
-        
-        portfolio = self.pm.portfolios[portfolio_id]
-        current_snapshot = self._get_current_snapshot(portfolio_id)
-        
-        if not current_snapshot:
+        if portfolio_id not in self.pm.portfolios:
             return None
         
-        # Planificar acciones de rebalanceo
-        actions = []
-        
-        for symbol, target_weight in portfolio.allocation.items():
-            current_weight = 0.0
-            if symbol in current_snapshot.positions:
-                current_weight = current_snapshot.positions[symbol]["weight"]
-            
-            deviation = current_weight - target_weight
-            
-            if abs(deviation) > 0.01:  # Solo si desviación > 1%
-                action_type = "sell" if deviation > 0 else "buy"
-                amount_change = abs(deviation) * current_snapshot.total_value
-                
-                # Determinar prioridad
-                priority = 1 if abs(deviation) > 0.05 else 2  # Alta prioridad si > 5%
-                if amount_change < self.min_trade_value:
-                    priority = 5  # Baja prioridad si monto es muy pequeño
-                
-                actions.append(RebalanceAction(
-                    symbol=symbol,
-                    current_weight=current_weight,
-                    target_weight=target_weight,
-                    deviation=deviation,
-                    action=action_type,
-                    amount_change=amount_change,
-                    priority=priority
-                ))
-        
-        # Ordenar por prioridad
-        actions.sort(key=lambda x: x.priority)
-        
-        return RebalanceExecution(
-            portfolio_id=portfolio_id,
-            execution_date=datetime.now().isoformat(),
-            trigger_reason=reason,
-            actions=actions,
-            total_deviation=total_deviation,
-            execution_status="planned",
-            execution_notes=""
-        )
+        report = report or self.compute_drift([portfolio_id])
+        return self.plan_rebalances(report, [portfolio_id]).get(portfolio_id)
     
     def execute_rebalance(self, rebalance_plan: RebalanceExecution) -> bool:
         """
@@ -280,7 +378,9 @@ class PortfolioRebalancer:
             
             # Actualizar estado del plan
             rebalance_plan.execution_status = "executed"
-            rebalance_plan.execution_notes = f"Ejecutadas {total_trades} acciones de rebalanceo"
+            rebalance_plan.execution_notes = " | ".join(
+                filter(None, [f"Ejecutadas {total_trades} acciones de rebalanceo", rebalance_plan.execution_notes])
+            )
             
             # Guardar registro
             self._save_rebalance_record(rebalance_plan)
@@ -318,60 +418,56 @@ class PortfolioRebalancer:
             Dict con resultados por portafolio
         """
         results = {}
-        active_portfolios = self.pm.get_active_portfolios()
+        report = self.compute_drift()
+        plans = self.plan_rebalances(report)
         
-        logger.info(f"Iniciando rebalanceo automático para {len(active_portfolios)} portafolios")
+        logger.info(f"Iniciando rebalanceo automático para {len(report.summary)} portafolios")
         
-        for portfolio in active_portfolios:
+        for portfolio_id, row in report.summary.iterrows():
             try:
                 # Verificar si necesita rebalanceo
-                needs_rebalance, deviation, reason = self.check_rebalance_needed(portfolio.id)
-                
-                if not needs_rebalance:
-                    results[portfolio.id] = f"No necesita rebalanceo: {reason}"
+                if not row['needs_rebalance']:
+                    results[portfolio_id] = f"No necesita rebalanceo: {row['reason']}"
                     continue
                 
-                # Planificar rebalanceo
-                rebalance_plan = self.plan_rebalance(portfolio.id)
+                # Plan calculado en lote con la misma foto de precios
+                rebalance_plan = plans.get(portfolio_id)
                 
                 if not rebalance_plan:
-                    results[portfolio.id] = "No se pudo planificar el rebalanceo"
+                    results[portfolio_id] = "No se pudo planificar el rebalanceo"
                     continue
                 
                 # Ejecutar rebalanceo
                 success = self.execute_rebalance(rebalance_plan)
                 
                 if success:
-                    results[portfolio.id] = f"Rebalanceo exitoso: {len(rebalance_plan.actions)} acciones"
+                    results[portfolio_id] = f"Rebalanceo exitoso: {len(rebalance_plan.actions)} acciones"
                 else:
-                    results[portfolio.id] = "Rebalanceo fallido"
+                    results[portfolio_id] = "Rebalanceo fallido"
                 
             except Exception as e:
-                logger.error(f"Error en rebalanceo automático para {portfolio.id}: {e}")
-                results[portfolio.id] = f"Error: {str(e)}"
+                logger.error(f"Error en rebalanceo automático para {portfolio_id}: {e}")
+                results[portfolio_id] = f"Error: {str(e)}"
         
         return results
     
     def get_rebalance_summary(self) -> Dict:
-        """Obtener resumen del estado de rebalanceo"""
-        active_portfolios = self.pm.get_active_portfolios()
+        """Obtener resumen del estado de rebalanceo, ordenado por urgencia"""
+        report = self.compute_drift()
         summary = {
-            "summary_date": datetime.now().isoformat(),
-            "total_portfolios": len(active_portfolios),
+            "summary_date": report.timestamp,
+            "total_portfolios": len(report.summary),
             "portfolios_status": {}
         }
         
-        for portfolio in active_portfolios:
-            needs_rebalance, deviation, reason = self.check_rebalance_needed(portfolio.id)
-            time_since_last = self._time_since_last_rebalance(portfolio.id)
-            
-            summary["portfolios_status"][portfolio.id] = {
-                "name": portfolio.name,
-                "needs_rebalance": needs_rebalance,
-                "total_deviation": round(deviation, 4),
-                "reason": reason,
-                "days_since_last_rebalance": time_since_last.days,
-                "rebalance_threshold": portfolio.rebalance_threshold
+        for portfolio_id, row in report.summary.iterrows():
+            summary["portfolios_status"][portfolio_id] = {
+                "name": row['name'],
+                "needs_rebalance": bool(row['needs_rebalance']),
+                "total_deviation": round(float(row['total_deviation']), 4),
+                "reason": row['reason'],
+                "days_since_last_rebalance": int(row['days_since_last_rebalance']),
+                "rebalance_threshold": float(row['rebalance_threshold'])
             }
         
         return summary
@@ -0,0 +1,144 @@
+"""
+Registro de Definiciones de Portafolio
+Caché compartida por proceso de los JSON de portfolios/definitions: carga
+perezosa, memoización por mtime de archivo, vistas de solo lectura y
+vigilancia opcional de cambios en disco
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+import time
+
+logger = logging.getLogger(__name__)
+
+_registries: Dict[Path, "PortfolioRegistry"] = {}
+_registries_lock = threading.Lock()
+
+class PortfolioRegistry:
+    """Caché de definiciones memoizada por mtime y compartida entre consumidores"""
+
+    def __init__(self, definitions_dir: Path, factory: Callable[..., Any], check_interval: float = 1.0):
+        self.definitions_dir = Path(definitions_dir)
+        self.factory = factory
+        self.check_interval = check_interval  # Segundos mínimos entre comprobaciones de disco
+        self.version = 0  # Se incrementa con cada cambio detectado
+
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Tuple[int, Any]] = {}  # {portfolio_id: (mtime_ns, definición)}
+        self._view: Mapping[str, Any] = MappingProxyType({})
+        self._loaded = False
+        self._last_check = 0.0
+        self._watch_thread: Optional[threading.Thread] = None
+        self._watch_stop = threading.Event()
+
+    def _load_file(self, file_path: Path) -> Optional[Any]:
+        """Parsea una definición desde disco"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return self.factory(**json.load(f))
+        except Exception as e:
+            logger.error(f"Error cargando portafolio {file_path.stem}: {e}")
+            return None
+
+    def refresh(self, force: bool = False) -> Tuple[List[str], List[str]]:
+        """
+        Sincronizar la caché con disco, parseando solo los archivos modificados
+
+        Args:
+            force: Ignorar el intervalo mínimo entre comprobaciones
+
+        Returns:
+            Tuple (ids modificados o nuevos, ids eliminados)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded and not force and now - self._last_check < self.check_interval:
+                return [], []
+            self._last_check = now
+
+            current: Dict[str, Path] = {}
+            if self.definitions_dir.exists():
+                current = {p.stem: p for p in self.definitions_dir.glob("*.json")}
+
+            changed = []
+            for portfolio_id, file_path in current.items():
+                try:
+                    mtime = file_path.stat().st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                cached = self._entries.get(portfolio_id)
+                if cached and cached[0] == mtime:
+                    continue
+                definition = self._load_file(file_path)
+                if definition is not None:
+                    self._entries[portfolio_id] = (mtime, definition)
+                    changed.append(portfolio_id)
+
+            removed = [pid for pid in self._entries if pid not in current]
+            for portfolio_id in removed:
+                del self._entries[portfolio_id]
+
+            if changed or removed or not self._loaded:
+                self._view = MappingProxyType({pid: d for pid, (_, d) in self._entries.items()})
+                self.version += 1
+                if self._loaded:
+                    logger.info(f"Definiciones actualizadas: {len(changed)} cambiadas, {len(removed)} eliminadas")
+                else:
+                    logger.info(f"Cargados {len(self._entries)} portafolios")
+            self._loaded = True
+            return changed, removed
+
+    def view(self) -> Mapping[str, Any]:
+        """Vista de solo lectura {portfolio_id: definición} (carga perezosa)"""
+        self.refresh()
+        return self._view
+
+    def get(self, portfolio_id: str) -> Optional[Any]:
+        """Obtener una definición por ID"""
+        return self.view().get(portfolio_id)
+
+    def update(self, portfolio_id: str, definition: Any):
+        """Registrar una definición recién guardada sin volver a parsearla"""
+        file_path = self.definitions_dir / f"{portfolio_id}.json"
+        with self._lock:
+            self._entries[portfolio_id] = (file_path.stat().st_mtime_ns, definition)
+            self._view = MappingProxyType({pid: d for pid, (_, d) in self._entries.items()})
+            self.version += 1
+
+    def watch(self, callback: Callable[[List[str], List[str]], None], interval: float = 5.0):
+        """Vigilar el directorio en segundo plano y notificar cambios"""
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+
+        def _poll():
+            while not self._watch_stop.wait(interval):
+                changed, removed = self.refresh(force=True)
+                if changed or removed:
+                    try:
+                        callback(changed, removed)
+                    except Exception as e:
+                        logger.error(f"Error en callback de vigilancia de portafolios: {e}")
+
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=_poll, name="portfolio-registry-watch", daemon=True)
+        self._watch_thread.start()
+        logger.info(f"Vigilando cambios en {self.definitions_dir} cada {interval}s")
+
+    def stop_watching(self):
+        """Detener la vigilancia en segundo plano"""
+        self._watch_stop.set()
+        if self._watch_thread:
+            self._watch_thread.join(timeout=1.0)
+            self._watch_thread = None
+
+def get_registry(definitions_dir: Path, factory: Callable[..., Any]) -> PortfolioRegistry:
+    """Obtener el registro compartido del proceso para un directorio de definiciones"""
+    key = Path(definitions_dir).resolve()
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = PortfolioRegistry(key, factory)
+        return _registries[key]
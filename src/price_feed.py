@@ -0,0 +1,122 @@
+"""
+Proveedores de Precios
+Interfaz común para obtener precios actuales y de referencia, de forma que
+los consumidores (rebalanceador, evaluadores) tomen una única foto de
+precios por ejecución en lugar de consultar símbolo a símbolo
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_store import PriceStore, STABLECOINS
+from ticker_snapshot import TickerSnapshotProvider, get_shared_provider
+
+logger = logging.getLogger(__name__)
+
+DateLike = Union[str, datetime, pd.Timestamp]
+
+class PriceProvider:
+    """Interfaz base de un proveedor de precios"""
+
+    def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Precio actual por símbolo (los símbolos sin precio se omiten)"""
+        raise NotImplementedError
+
+    def get_reference_prices(self, symbols: List[str], dates: Sequence[Optional[DateLike]]) -> np.ndarray:
+        """
+        Precios de cierre vigentes en varias fechas
+
+        Args:
+            symbols: Lista de símbolos
+            dates: Una fecha por fila (None = sin referencia)
+
+        Returns:
+            Matriz (fechas × símbolos); NaN donde no hay precio conocido
+        """
+        return np.full((len(dates), len(symbols)), np.nan)
+
+    def get_price_vector(self, symbols: List[str], prices: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Vector de precios alineado con symbols (NaN si falta)"""
+        prices = self.get_prices(symbols) if prices is None else prices
+        return np.array([prices.get(s, np.nan) for s in symbols], dtype=float)
+
+class StaticPriceProvider(PriceProvider):
+    """Proveedor con precios fijos (y un histórico opcional), útil para pruebas y simulaciones"""
+
+    def __init__(self, prices: Dict[str, float], history: Optional[pd.DataFrame] = None):
+        self.prices = dict(prices)
+        self.history = history.sort_index() if history is not None else None
+
+    def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        return {s: float(self.prices[s]) for s in symbols if s in self.prices}
+
+    def get_reference_prices(self, symbols: List[str], dates: Sequence[Optional[DateLike]]) -> np.ndarray:
+        if self.history is None:
+            return super().get_reference_prices(symbols, dates)
+        return _asof_matrix(self.history.reindex(columns=symbols), dates)
+
+class LocalStorePriceProvider(PriceProvider):
+    """Proveedor basado en los cierres diarios de data/historical"""
+
+    def __init__(self, price_store: Optional[PriceStore] = None):
+        self.price_store = price_store or PriceStore()
+
+    def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        return self.price_store.get_latest_prices(symbols)
+
+    def get_reference_prices(self, symbols: List[str], dates: Sequence[Optional[DateLike]]) -> np.ndarray:
+        matrix = self.price_store.get_price_matrix(symbols, common_window=False)
+        return _asof_matrix(matrix, dates)
+
+class TickerPriceProvider(PriceProvider):
+    """Proveedor con precios en vivo de la foto compartida de tickers e histórico local como referencia"""
+
+    def __init__(
+        self,
+        snapshot_provider: Optional[TickerSnapshotProvider] = None,
+        price_store: Optional[PriceStore] = None,
+        quote_asset: str = "USDT"
+    ):
+        self.snapshot_provider = snapshot_provider or get_shared_provider()
+        self.local = LocalStorePriceProvider(price_store)
+        self.quote_asset = quote_asset
+
+    def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        pairs = {s: f"{s}{self.quote_asset}" for s in symbols if s not in STABLECOINS}
+        live = self.snapshot_provider.get_prices(list(pairs.values()))
+        prices = {s: live[pair] for s, pair in pairs.items() if pair in live}
+        prices.update({s: 1.0 for s in symbols if s in STABLECOINS})
+        return prices
+
+    def get_reference_prices(self, symbols: List[str], dates: Sequence[Optional[DateLike]]) -> np.ndarray:
+        return self.local.get_reference_prices(symbols, dates)
+
+def _asof_matrix(history: pd.DataFrame, dates: Sequence[Optional[DateLike]]) -> np.ndarray:
+    """Último cierre en o antes de cada fecha, para todos los símbolos a la vez"""
+    result = np.full((len(dates), history.shape[1]), np.nan)
+    if history.empty or not len(dates):
+        return result
+
+    valid = [i for i, d in enumerate(dates) if d]
+    if not valid:
+        return result
+    targets = pd.DatetimeIndex([pd.Timestamp(dates[i]) for i in valid]).normalize()
+    positions = history.index.searchsorted(targets, side="right") - 1
+
+    values = history.to_numpy(dtype=float)
+    found = positions >= 0
+    rows = np.array(valid)[found]
+    result[rows] = values[positions[found]]
+
+    # Stablecoins sin histórico mantienen la paridad
+    for j, symbol in enumerate(history.columns):
+        if PriceStore._base_symbol(symbol) in STABLECOINS:
+            column = result[valid, j]
+            result[valid, j] = np.where(np.isnan(column), 1.0, column)
+    return result
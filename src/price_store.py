@@ -0,0 +1,115 @@
+"""
+Almacén Local de Precios Históricos
+Lee los CSV diarios de data/historical y los expone como matriz (fechas × símbolos)
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+STABLECOINS = {"USDT", "USDC", "BUSD", "DAI", "FDUSD"}
+
+class PriceStore:
+    """Acceso cacheado a los precios de cierre diarios del directorio local"""
+
+    FILE_PATTERNS = [
+        "{symbol}_historical_data.csv",
+        "{symbol}USDT_historical_data.csv",
+        "{symbol}USDT_history.csv",
+    ]
+
+    def __init__(self, data_dir: str = "data/historical"):
+        self.data_dir = Path(data_dir)
+        self._cache: Dict[str, pd.Series] = {}
+
+    @staticmethod
+    def _base_symbol(symbol: str) -> str:
+        """Normaliza BTCUSDT -> BTC (los stablecoins se dejan tal cual)"""
+        symbol = symbol.upper()
+        if symbol not in STABLECOINS and symbol.endswith("USDT") and len(symbol) > 4:
+            return symbol[:-4]
+        return symbol
+
+    def _resolve_file(self, symbol: str) -> Optional[Path]:
+        """Busca el CSV histórico de un símbolo"""
+        for pattern in self.FILE_PATTERNS:
+            path = self.data_dir / pattern.format(symbol=symbol)
+            if path.exists():
+                return path
+        return None
+
+    def load_symbol(self, symbol: str) -> pd.Series:
+        """Carga la serie de cierres diarios de un símbolo (vacía si no hay datos)"""
+        base = self._base_symbol(symbol)
+        if base in self._cache:
+            return self._cache[base]
+
+        path = self._resolve_file(base)
+        if path is None:
+            logger.warning(f"Sin histórico local para {base}")
+            series = pd.Series(dtype=float, name=base)
+        else:
+            df = pd.read_csv(path, usecols=["timestamp", "close"])
+            index = pd.to_datetime(df["timestamp"]).dt.normalize()
+            series = pd.Series(pd.to_numeric(df["close"], errors="coerce").to_numpy(), index=index, name=base)
+            series = series[~series.index.duplicated(keep="last")].sort_index()
+
+        self._cache[base] = series
+        return series
+
+    def get_price_matrix(
+        self,
+        symbols: List[str],
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        common_window: bool = True
+    ) -> pd.DataFrame:
+        """
+        Construir la matriz de cierres diarios para varios símbolos
+
+        Args:
+            symbols: Lista de símbolos (BTC o BTCUSDT)
+            start_date: Fecha inicial opcional
+            end_date: Fecha final opcional
+            common_window: Recortar al periodo en el que todos los símbolos cotizan
+
+        Returns:
+            DataFrame (fechas × símbolos) con huecos rellenados hacia delante
+        """
+        columns = {symbol: self.load_symbol(symbol) for symbol in symbols}
+        quoted = {s: c for s, c in columns.items() if not c.empty}
+        if not quoted:
+            return pd.DataFrame(columns=symbols, dtype=float)
+
+        matrix = pd.DataFrame(quoted).sort_index()
+        full_index = pd.date_range(matrix.index[0], matrix.index[-1], freq="D")
+        matrix = matrix.reindex(full_index).ffill()
+
+        # Stablecoins sin histórico cotizan a 1.0
+        for symbol, series in columns.items():
+            if series.empty and self._base_symbol(symbol) in STABLECOINS:
+                matrix[symbol] = 1.0
+
+        if common_window:
+            first_valid = max(matrix[c].first_valid_index() or matrix.index[-1] for c in matrix.columns)
+            matrix = matrix.loc[first_valid:]
+        if start_date:
+            matrix = matrix.loc[pd.Timestamp(start_date):]
+        if end_date:
+            matrix = matrix.loc[:pd.Timestamp(end_date)]
+
+        return matrix.reindex(columns=symbols)
+
+    def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Último cierre disponible por símbolo"""
+        prices = {}
+        for symbol in symbols:
+            series = self.load_symbol(symbol).dropna()
+            if not series.empty:
+                prices[symbol] = float(series.iloc[-1])
+            elif self._base_symbol(symbol) in STABLECOINS:
+                prices[symbol] = 1.0
+        return prices
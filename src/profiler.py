@@ -0,0 +1,219 @@
+"""
+Profiler por Muestreo
+Toma muestras periódicas de las pilas de todos los hilos con sys._current_frames()
+desde un hilo en segundo plano, sin instrumentar el código, y las etiqueta con la
+etapa del pipeline activa. Escribe la salida en formato collapsed-stack (flamegraph.pl,
+speedscope) y JSON de speedscope en logs/. Se activa con DCA_PROFILE=1 y
+DCA_PROFILE_RATE controla la fracción de ciclos perfilados (ej: 0.01 en producción)
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = "DCA_PROFILE"
+PROFILE_RATE_ENV = "DCA_PROFILE_RATE"
+PROFILE_INTERVAL_ENV = "DCA_PROFILE_INTERVAL_MS"
+
+FrameKey = Tuple[str, str, int]  # (función, archivo, primera línea)
+
+# Etapas activas por hilo; con varias corrutinas en el mismo hilo se etiqueta con la última iniciada.
+# Lo modifican todos los hilos instrumentados y lo lee el hilo de muestreo: se accede con _stages_lock
+_stages: Dict[int, List[str]] = {}
+_stages_lock = threading.Lock()
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Marca la etapa del pipeline activa en el hilo actual para etiquetar las muestras"""
+    thread_id = threading.get_ident()
+    with _stages_lock:
+        _stages.setdefault(thread_id, []).append(name)
+    try:
+        yield
+    finally:
+        with _stages_lock:
+            active = _stages.get(thread_id, [])
+            # Las etapas de corrutinas solapadas pueden terminar en cualquier orden
+            for i in range(len(active) - 1, -1, -1):
+                if active[i] == name:
+                    del active[i]
+                    break
+            if not active:
+                _stages.pop(thread_id, None)  # Los hilos terminados no dejan entradas
+
+def current_stage(thread_id: Optional[int] = None) -> Optional[str]:
+    """Etapa activa de un hilo (por defecto el actual)"""
+    with _stages_lock:
+        active = _stages.get(thread_id if thread_id is not None else threading.get_ident())
+        return active[-1] if active else None
+
+class SamplingProfiler:
+    """Muestrea las pilas de los hilos del proceso a intervalos fijos"""
+
+    # Muestras del bucle de eventos esperando E/S: no consumen CPU
+    IDLE_FILES = ("selectors.py",)
+
+    def __init__(self, interval: float = 0.01, output_dir: str = "logs", max_depth: int = 128,
+                 include_idle: bool = False):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.max_depth = max_depth
+        self.include_idle = include_idle
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Arranca el hilo de muestreo"""
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el muestreo"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.perf_counter() - self.started_at
+
+    def __enter__(self) -> 'SamplingProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Toma una muestra de la pila de cada hilo (salvo el del profiler)"""
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack: List[FrameKey] = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if not stack or (not self.include_idle and stack[0][1].endswith(self.IDLE_FILES)):
+                continue
+            tag = current_stage(thread_id) or "other"
+            self.samples[(tag, tuple(reversed(stack)))] += 1
+            self.sample_count += 1
+
+    @staticmethod
+    def _frame_name(frame: FrameKey) -> str:
+        name, filename, line = frame
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def to_collapsed(self) -> str:
+        """Pilas en formato collapsed: 'stage:x;raíz;...;hoja N' por línea"""
+        lines = []
+        for (tag, stack), count in self.samples.most_common():
+            frames = ";".join(self._frame_name(f).replace(";", ",") for f in stack)
+            lines.append(f"stage:{tag};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, label: str) -> Dict:
+        """Perfil 'sampled' de speedscope (un perfil por etapa)"""
+        frames: List[Dict] = []
+        index: Dict[FrameKey, int] = {}
+        profiles: Dict[str, Dict] = {}
+        for (tag, stack), count in self.samples.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            profile = profiles.setdefault(tag, {
+                "type": "sampled", "name": f"{label} [{tag}]", "unit": "seconds",
+                "startValue": 0, "endValue": 0.0, "samples": [], "weights": []
+            })
+            profile["samples"].append(ids)
+            profile["weights"].append(count * self.interval)
+            profile["endValue"] += count * self.interval
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+            "name": label,
+            "exporter": "EstrategiasDCA sampling profiler"
+        }
+
+    def write(self, label: str) -> Dict[str, str]:
+        """
+        Guarda el perfil en output_dir
+
+        Args:
+            label: Nombre del perfil (ej: scheduler_cycle)
+
+        Returns:
+            Rutas de los archivos collapsed y speedscope
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile_{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        paths = {'collapsed': f"{base}.collapsed", 'speedscope': f"{base}.speedscope.json"}
+        with open(paths['collapsed'], "w") as f:
+            f.write(self.to_collapsed())
+        with open(paths['speedscope'], "w") as f:
+            json.dump(self.to_speedscope(label), f)
+        logger.info(f"Perfil '{label}': {self.sample_count} muestras en {self.duration:.2f}s -> {base}.*")
+        return paths
+
+def profiling_enabled() -> bool:
+    """Indica si el profiling está activado por entorno"""
+    return os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+@contextmanager
+def profile_session(label: str, output_dir: str = "logs", enabled: Optional[bool] = None,
+                    rate: Optional[float] = None, interval: Optional[float] = None) -> Iterator[Optional[SamplingProfiler]]:
+    """
+    Perfila el bloque si el profiling está activo y el sorteo por rate lo selecciona
+
+    Args:
+        label: Nombre del perfil
+        output_dir: Directorio de salida
+        enabled: Fuerza activar/desactivar (por defecto DCA_PROFILE)
+        rate: Fracción de sesiones perfiladas (por defecto DCA_PROFILE_RATE o 1.0)
+        interval: Segundos entre muestras (por defecto DCA_PROFILE_INTERVAL_MS o 10ms)
+
+    Yields:
+        El profiler activo o None si esta sesión no se perfila
+    """
+    enabled = profiling_enabled() if enabled is None else enabled
+    rate = float(os.environ.get(PROFILE_RATE_ENV, 1.0)) if rate is None else rate
+    if not enabled or random.random() >= rate:
+        yield None
+        return
+
+    interval = float(os.environ.get(PROFILE_INTERVAL_ENV, 10)) / 1000 if interval is None else interval
+    profiler = SamplingProfiler(interval=interval, output_dir=output_dir)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        try:
+            profiler.write(label)
+        except OSError as e:
+            logger.error(f"Error guardando perfil '{label}': {e}")
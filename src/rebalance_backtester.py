@@ -0,0 +1,292 @@
+"""
+Backtester de Políticas de Rebalanceo
+Reproduce el histórico del almacén de precios y compara políticas de
+rebalanceo (calendario, umbral, banda y la política actual del
+rebalanceador) para todas las definiciones de portafolio. La rejilla
+completa (políticas × portafolios) se apila en una sola matriz y se
+recorre el tiempo una única vez
+"""
+
+import logging
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dca_schedule import PurchaseSchedule, compile_schedule
+from price_store import PriceStore
+from portfolio_evaluator import stack_allocations
+from rebalance_planner import RebalancePlanner, FeeModel
+from profiler import profile_session
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RebalancePolicy:
+    """Política de rebalanceo a evaluar"""
+    name: str
+    period_days: int = 0  # Rebalanceo por calendario cada N días (0 = desactivado)
+    threshold: Optional[float] = float("inf")  # Desviación máxima que dispara el rebalanceo (None = la del portafolio)
+    band_ratio: float = 0.0  # Banda interior hasta la que se opera (fracción del umbral; 0 = hasta el objetivo)
+    min_interval_days: int = 0  # Días mínimos entre rebalanceos
+    total_threshold_ratio: float = 0.0  # Dispara también si la desviación total supera ratio × umbral (0 = desactivado)
+
+def default_policy_grid() -> List[RebalancePolicy]:
+    """Rejilla estándar de políticas, incluida la configuración actual del rebalanceador"""
+    return [
+        RebalancePolicy("sin_rebalanceo"),
+        RebalancePolicy("calendario_7d", period_days=7),
+        RebalancePolicy("calendario_30d", period_days=30),
+        RebalancePolicy("calendario_90d", period_days=90),
+        RebalancePolicy("umbral_3%", threshold=0.03),
+        RebalancePolicy("umbral_5%", threshold=0.05),
+        RebalancePolicy("umbral_10%", threshold=0.10),
+        RebalancePolicy("banda_5%", threshold=0.05, band_ratio=0.5),
+        RebalancePolicy("banda_10%", threshold=0.10, band_ratio=0.5),
+        RebalancePolicy("actual", period_days=30, threshold=None, band_ratio=0.5, min_interval_days=7,
+                        total_threshold_ratio=2.0),
+    ]
+
+@dataclass
+class BacktestResult:
+    """Resultado del backtest de la rejilla de políticas"""
+    summary: pd.DataFrame  # Índice (policy, portfolio_id)
+    equity_curves: pd.DataFrame  # (fechas × (policy, portfolio_id))
+
+    def best_policies(self, metric: str = "twr") -> pd.DataFrame:
+        """Mejor política por portafolio según una métrica"""
+        ranked = self.summary.reset_index().sort_values(metric, ascending=False)
+        return ranked.groupby("portfolio_id", sort=False).head(1).set_index("portfolio_id")
+
+class RebalanceBacktester:
+    """Evalúa una rejilla de políticas de rebalanceo sobre todas las definiciones"""
+
+    def __init__(
+        self,
+        definitions: Optional[List] = None,
+        policies: Optional[List[RebalancePolicy]] = None,
+        price_store: Optional[PriceStore] = None,
+        fee_model: Optional[FeeModel] = None,
+        initial_capital: float = 10000.0,
+        weekly_investment: float = 0.0,
+        schedule: Optional[PurchaseSchedule] = None
+    ):
+        if definitions is None:
+            from portfolio_manager import PortfolioManager
+            definitions = PortfolioManager().get_active_portfolios()
+
+        self.definitions = definitions
+        self.policies = policies or default_policy_grid()
+        self.price_store = price_store or PriceStore()
+        self.planner = RebalancePlanner(fee_model or FeeModel())
+        self.initial_capital = initial_capital
+        self.weekly_investment = weekly_investment
+        self.schedule = schedule or PurchaseSchedule(frequency="weekly", weekday=1)
+
+        logger.info(f"Backtester inicializado: {len(self.policies)} políticas × {len(definitions)} portafolios")
+
+    def _load_prices(self, symbols: List[str], start_date: Optional[str], end_date: Optional[str]) -> pd.DataFrame:
+        """
+        Carga la matriz de precios sin recortarla al activo más joven
+
+        Como en portfolio_evaluator, los precios quedan en NaN mientras un activo no
+        cotiza y run() mantiene en efectivo la parte asignada a ese activo
+        """
+        prices = self.price_store.get_price_matrix(symbols, start_date, end_date, common_window=False)
+        prices = prices.reindex(columns=symbols)
+        missing = [s for s in symbols if prices[s].isna().all()]
+        if missing:
+            logger.warning(f"Sin precios para {missing}: se valoran como efectivo")
+        return prices.ffill()
+
+    def run(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> BacktestResult:
+        """
+        Ejecutar el backtest de toda la rejilla
+
+        Args:
+            start_date: Fecha inicial opcional
+            end_date: Fecha final opcional
+
+        Returns:
+            BacktestResult con métricas por (política, portafolio)
+        """
+        weights = stack_allocations(self.definitions)
+        prices = self._load_prices(list(weights.columns), start_date, end_date)
+        if len(prices) < 2:
+            raise ValueError("No hay suficientes precios para el periodo solicitado")
+
+        P, Q = len(weights), len(self.policies)
+        matrix = prices.to_numpy()
+        T = len(matrix)
+
+        # Filas apiladas: fila k = política k // P, portafolio k % P
+        W = np.tile(weights.to_numpy(), (Q, 1))
+        own_thresholds = np.array([d.rebalance_threshold for d in self.definitions], dtype=float)
+        thresholds = np.concatenate([
+            own_thresholds if p.threshold is None else np.full(P, p.threshold) for p in self.policies
+        ])
+        period = np.repeat([p.period_days for p in self.policies], P)
+        min_interval = np.repeat([p.min_interval_days for p in self.policies], P)
+        bands = np.where(np.isfinite(thresholds), thresholds, 0.0) * np.repeat([p.band_ratio for p in self.policies], P)
+        total_ratio = np.repeat([p.total_threshold_ratio for p in self.policies], P)
+        with np.errstate(invalid='ignore'):
+            total_limits = np.where(total_ratio > 0, thresholds * total_ratio, np.inf)
+
+        inflows = np.zeros(T)
+        if self.weekly_investment > 0:
+            inflows[compile_schedule(prices.index, self.schedule)] = self.weekly_investment
+        inflows[0] = 0.0
+
+        fee_rate = self.planner.fee_model.taker_rate
+        min_notional = self.planner.fee_model.min_notional_vector(list(weights.columns))
+
+        def listed_targets(price: np.ndarray):
+            """Pesos objetivo de los activos que ya cotizan (el resto queda en efectivo) y su versión normalizada"""
+            listed = np.isfinite(price) & (price > 0)
+            W_listed = W * listed
+            share = W_listed.sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                W_norm = np.where(share[:, None] > 0, W_listed / share[:, None], 0.0)
+            return np.where(listed, price, 0.0), np.where(listed, price, 1.0), W_listed, W_norm
+
+        K = Q * P
+        mark, trade_price, W_listed, _ = listed_targets(matrix[0])
+        invested = self.initial_capital * W_listed.sum(axis=1)
+        units = self.initial_capital * W_listed / trade_price * (1 - fee_rate)
+        cash = self.initial_capital - invested
+        last_rebalance = np.zeros(K, dtype=int)
+        rebalances = np.zeros(K, dtype=int)
+        fees = invested * fee_rate
+        sold = np.zeros(K)
+        equity = np.empty((T, K))
+        equity[0] = (units * mark).sum(axis=1) + cash
+
+        for t in range(1, T):
+            mark, trade_price, W_listed, W_norm = listed_targets(matrix[t])
+            cash += inflows[t]
+            values = units * mark
+            invested_value = values.sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                current = np.where(invested_value[:, None] > 0, values / invested_value[:, None], 0.0)
+            gaps = np.abs(current - W_norm)
+            deviation = gaps.max(axis=1)
+            total_deviation = gaps.sum(axis=1)
+            since = t - last_rebalance
+
+            # Mismas reglas que el rebalanceador: desviación máxima, desviación total y calendario
+            triggered = (
+                (deviation > thresholds)
+                | (total_deviation > total_limits)
+                | ((period > 0) & (since >= period))
+            )
+            due = triggered & (since >= min_interval)
+            if due.any():
+                buys, sells, trade_fees, residual = self.planner.plan_arrays(
+                    values[due], W_listed[due], bands[due], cash[due], min_notional
+                )
+                units[due] += (buys - sells) / trade_price
+                cash[due] = residual
+                fees[due] += trade_fees
+                sold[due] += sells.sum(axis=1)
+                # Solo cuenta (y reinicia el intervalo) si se ejecutó alguna orden
+                executed = np.flatnonzero(due)[(buys > 0).any(axis=1) | (sells > 0).any(axis=1)]
+                rebalances[executed] += 1
+                last_rebalance[executed] = t
+
+            # Aportaciones DCA fuera de rebalanceo: compra a pesos objetivo, salvo la parte
+            # de los activos que aún no cotizan, que se mantiene en efectivo
+            idle = ~due & (cash > 0)
+            if inflows[t] > 0 and idle.any():
+                reserve = (1 - W_listed.sum(axis=1)) * (invested_value + cash)
+                spend = np.where(idle, np.clip(cash - reserve, 0.0, None), 0.0)
+                fees += spend * fee_rate
+                units += (spend * (1 - fee_rate))[:, None] * W_norm / trade_price
+                cash -= spend
+
+            equity[t] = (units * mark).sum(axis=1) + cash
+
+        columns = pd.MultiIndex.from_product(
+            [[p.name for p in self.policies], list(weights.index)], names=["policy", "portfolio_id"]
+        )
+        equity_curves = pd.DataFrame(equity, index=prices.index, columns=columns)
+        summary = self._summarize(equity, inflows, matrix, W, fees, sold, rebalances, columns)
+
+        logger.info(f"Backtest completado: {K} combinaciones sobre {T} días")
+        return BacktestResult(summary=summary, equity_curves=equity_curves)
+
+    def _summarize(
+        self,
+        equity: np.ndarray,
+        inflows: np.ndarray,
+        matrix: np.ndarray,
+        W: np.ndarray,
+        fees: np.ndarray,
+        sold: np.ndarray,
+        rebalances: np.ndarray,
+        columns: pd.MultiIndex
+    ) -> pd.DataFrame:
+        """Métricas por combinación: rentabilidad, volatilidad, tracking error, rotación y costes"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = (equity[1:] - inflows[1:, None]) / equity[:-1] - 1
+            # Referencia: cartera objetivo rebalanceada a diario sin costes
+            benchmark = (matrix[1:] / matrix[:-1] - 1) @ W.T
+        returns = np.nan_to_num(returns)
+        benchmark = np.nan_to_num(benchmark)
+
+        invested = self.initial_capital + inflows.sum()
+        final_value = equity[-1]
+        twr = np.prod(1 + returns, axis=0) - 1
+        benchmark_twr = np.prod(1 + benchmark, axis=0) - 1
+        years = len(returns) / 365
+
+        summary = pd.DataFrame({
+            'final_value': final_value,
+            'total_invested': invested,
+            'roi': (final_value - invested) / invested * 100,
+            'twr': twr * 100,
+            'cagr': (np.power(1 + twr, 1 / years) - 1) * 100 if years > 0 else 0.0,
+            'volatility': returns.std(axis=0) * np.sqrt(365) * 100,
+            'tracking_error': (returns - benchmark).std(axis=0) * np.sqrt(365) * 100,
+            'excess_vs_benchmark': (twr - benchmark_twr) * 100,
+            'turnover': sold / equity.mean(axis=0),
+            'fees': fees,
+            'rebalances': rebalances
+        }, index=columns)
+        return summary
+
+    def save_results(self, result: BacktestResult, output_dir: str = "portfolios/performance/rebalance_backtest") -> Path:
+        """Guardar métricas, mejores políticas y la rejilla evaluada"""
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        result.summary.to_csv(output_path / "policy_grid.csv")
+        result.best_policies().to_csv(output_path / "best_policies.csv")
+        pd.DataFrame([asdict(p) for p in self.policies]).to_csv(output_path / "policies.csv", index=False)
+        logger.info(f"Resultados del backtest guardados en {output_path}")
+        return output_path
+
+def main():
+    """Comparar las políticas de rebalanceo para todos los portafolios activos"""
+    print("🔄 Backtest de políticas de rebalanceo...")
+
+    backtester = RebalanceBacktester()
+    with profile_session("rebalance_backtest", enabled="--profile" in sys.argv or None):
+        result = backtester.run()
+    backtester.save_results(result)
+
+    print("\n📈 RESUMEN POR POLÍTICA (media de portafolios):")
+    print("="*50)
+    by_policy = result.summary.groupby(level="policy").mean()
+    for policy, row in by_policy.sort_values('twr', ascending=False).iterrows():
+        print(f"📋 {policy}: TWR {row['twr']:.2f}% | TE {row['tracking_error']:.2f}% | "
+              f"Rotación {row['turnover']:.2f} | Comisiones {row['fees']:.2f} | Rebalanceos {row['rebalances']:.0f}")
+
+    return result
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Planificador de Rebalanceo Consciente de Costes
+Calcula el conjunto de órdenes de menor rotación para devolver los
+portafolios a sus bandas de tolerancia: primero se reparte la aportación
+DCA entre los activos infraponderados, después se opera solo hasta el borde
+de la banda, y se descartan las órdenes por debajo del nocional mínimo.
+Todos los portafolios se planifican a la vez como matrices (portafolios × activos)
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class FeeModel:
+    """Modelo de comisiones y restricciones del exchange"""
+    taker_rate: float = 0.001  # 0.1% por operación
+    fixed_fee: float = 0.0  # Coste fijo por orden (USD)
+    min_notional: Union[float, Dict[str, float]] = 10.0  # Nocional mínimo global o por símbolo
+
+    def min_notional_vector(self, symbols: List[str]) -> np.ndarray:
+        """Nocional mínimo alineado con symbols"""
+        if isinstance(self.min_notional, dict):
+            default = self.min_notional.get("default", 10.0)
+            return np.array([self.min_notional.get(s, default) for s in symbols], dtype=float)
+        return np.full(len(symbols), float(self.min_notional))
+
+    def cost(self, notional: np.ndarray) -> np.ndarray:
+        """Coste estimado de cada orden (0 donde no hay orden)"""
+        return np.where(notional > 0, notional * self.taker_rate + self.fixed_fee, 0.0)
+
+@dataclass
+class BatchTradePlan:
+    """Órdenes planificadas para varios portafolios"""
+    buys: pd.DataFrame  # Nocional a comprar (portafolios × activos)
+    sells: pd.DataFrame  # Nocional a vender (portafolios × activos)
+    fees: pd.Series  # Comisiones estimadas por portafolio
+    inflow_used: pd.Series  # Aportación DCA invertida por portafolio
+    residual_cash: pd.Series  # Efectivo sin invertir tras el plan
+    turnover: pd.Series  # Nocional vendido / valor del portafolio
+    post_weights: pd.DataFrame  # Pesos resultantes tras ejecutar el plan
+
+    def orders(self, portfolio_id: str) -> pd.DataFrame:
+        """Órdenes de un portafolio con columnas side y notional (las ventas primero)"""
+        sells = self.sells.loc[portfolio_id]
+        buys = self.buys.loc[portfolio_id]
+        rows = [("sell", s, v) for s, v in sells[sells > 0].items()]
+        rows += [("buy", s, v) for s, v in buys[buys > 0].items()]
+        return pd.DataFrame(rows, columns=["side", "symbol", "notional"])
+
+    @property
+    def order_count(self) -> int:
+        """Número total de órdenes del lote"""
+        return int((self.buys.to_numpy() > 0).sum() + (self.sells.to_numpy() > 0).sum())
+
+class RebalancePlanner:
+    """Planificador de órdenes de rebalanceo de mínima rotación"""
+
+    def __init__(self, fee_model: Optional[FeeModel] = None):
+        self.fee_model = fee_model or FeeModel()
+
+    def plan(
+        self,
+        values: pd.DataFrame,
+        targets: pd.DataFrame,
+        bands: Union[float, pd.Series],
+        inflows: Union[float, pd.Series] = 0.0
+    ) -> BatchTradePlan:
+        """
+        Planificar el rebalanceo de todos los portafolios
+
+        Args:
+            values: Valor actual de cada posición (portafolios × activos)
+            targets: Pesos objetivo (portafolios × activos)
+            bands: Tolerancia absoluta de peso por portafolio (ej: 0.05)
+            inflows: Aportación DCA disponible por portafolio
+
+        Returns:
+            BatchTradePlan con compras, ventas y costes
+        """
+        symbols = sorted(set(values.columns) | set(targets.columns))
+        index = targets.index
+        V = values.reindex(index=index, columns=symbols).fillna(0.0).to_numpy(dtype=float)
+        W = targets.reindex(columns=symbols).fillna(0.0).to_numpy(dtype=float)
+        band = self._as_vector(bands, index)
+        cash = self._as_vector(inflows, index)
+
+        min_notional = self.fee_model.min_notional_vector(symbols)
+        total_buys, sells, fees, residual = self.plan_arrays(V, W, band, cash, min_notional)
+        spent = total_buys.sum(axis=1)
+        total = V.sum(axis=1) + cash
+
+        post = V + total_buys - sells
+        post_total = post.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            post_weights = np.where(post_total[:, None] > 0, post / post_total[:, None], 0.0)
+            turnover = np.where(total > 0, sells.sum(axis=1) / total, 0.0)
+
+        plan = BatchTradePlan(
+            buys=pd.DataFrame(total_buys, index=index, columns=symbols),
+            sells=pd.DataFrame(sells, index=index, columns=symbols),
+            fees=pd.Series(fees, index=index),
+            inflow_used=pd.Series(np.minimum(spent, cash), index=index),
+            residual_cash=pd.Series(residual, index=index),
+            turnover=pd.Series(turnover, index=index),
+            post_weights=pd.DataFrame(post_weights, index=index, columns=symbols)
+        )
+        logger.info(f"Plan de rebalanceo: {len(index)} portafolios, {plan.order_count} órdenes, "
+                    f"comisiones estimadas {plan.fees.sum():.2f}")
+        return plan
+
+    def plan_arrays(
+        self,
+        V: np.ndarray,
+        W: np.ndarray,
+        band: np.ndarray,
+        cash: np.ndarray,
+        min_notional: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Núcleo matricial del planificador (sin pandas), reutilizado por el backtester
+
+        Args:
+            V: Valor de las posiciones (filas × activos)
+            W: Pesos objetivo (filas × activos)
+            band: Tolerancia de peso por fila
+            cash: Efectivo disponible por fila
+            min_notional: Nocional mínimo por activo
+
+        Returns:
+            Tuple (compras, ventas, comisiones, efectivo residual)
+        """
+        band = band[:, None]
+        total = V.sum(axis=1) + cash
+        target_value = W * total[:, None]
+        lower = np.clip(W - band, 0.0, None) * total[:, None]
+        upper = np.where(W > 0, W + band, 0.0) * total[:, None]  # Activos fuera de la asignación se liquidan
+
+        # 1. La aportación DCA cubre primero los déficits respecto al objetivo
+        deficit = np.clip(target_value - V, 0.0, None)
+        inflow_buys = self._distribute(cash, deficit, fallback=W)
+        held = V + inflow_buys
+
+        # 2. Operar solo hasta el borde de la banda
+        sells = np.clip(held - upper, 0.0, None)
+        buys = np.clip(lower - held, 0.0, None)
+
+        # 3. Cuadrar ventas y compras sin cruzar el objetivo
+        gap = sells.sum(axis=1) - buys.sum(axis=1)
+        buy_room = np.clip(target_value - held - buys, 0.0, None)
+        sell_room = np.clip(held - target_value - sells, 0.0, None)
+        buys += self._distribute(np.clip(gap, 0.0, None), buy_room)
+        sells += self._distribute(np.clip(-gap, 0.0, None), sell_room)
+
+        # 4. Descartar órdenes por debajo del nocional mínimo y reajustar el efectivo
+        total_buys = buys + inflow_buys
+        total_buys = np.where(total_buys >= min_notional[None, :], total_buys, 0.0)
+        sells = np.where(sells >= min_notional[None, :], sells, 0.0)
+
+        fees = self.fee_model.cost(sells).sum(axis=1) + self.fee_model.cost(total_buys).sum(axis=1)
+        available = cash + sells.sum(axis=1) - fees
+        spent = total_buys.sum(axis=1)
+        scale = np.where(spent > available, np.clip(available, 0.0, None) / np.where(spent > 0, spent, 1.0), 1.0)
+        total_buys *= scale[:, None]
+        residual = available - total_buys.sum(axis=1)
+        return total_buys, sells, fees, residual
+
+    @staticmethod
+    def _as_vector(value: Union[float, pd.Series], index: pd.Index) -> np.ndarray:
+        """Convierte un escalar o Series en vector alineado con index"""
+        if isinstance(value, pd.Series):
+            return value.reindex(index).fillna(0.0).to_numpy(dtype=float)
+        return np.full(len(index), float(value))
+
+    @staticmethod
+    def _distribute(amount: np.ndarray, room: np.ndarray, fallback: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Reparte amount por fila proporcionalmente a room sin superarlo;
+        el sobrante se reparte según fallback (si se indica)
+        """
+        capacity = room.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(capacity[:, None] > 0, room / capacity[:, None], 0.0)
+        filled = share * np.minimum(amount, capacity)[:, None]
+        if fallback is not None:
+            leftover = np.clip(amount - capacity, 0.0, None)
+            filled += fallback * leftover[:, None]
+        return filled
@@ -3,14 +3,17 @@ from typing import Dict, Optional
 from dataclasses import dataclass
 import numpy as np
 from src.config_models import load_config
+from src.ticker_snapshot import TickerSnapshot, TickerSnapshotProvider, get_shared_provider
+from src.performance_monitor import timed
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class RiskManager:
-    def __init__(self):
+    def __init__(self, price_snapshot: Optional[TickerSnapshotProvider] = None):
         self.config = load_config()
         self.params = self.config.risk
+        self.price_snapshot = price_snapshot or get_shared_provider()
         self.position_limits: Dict[str, float] = {}
         self.asset_correlations: Dict[str, Dict[str, float]] = {}
         
@@ -32,15 +35,22 @@ class RiskManager:
             logger.error(f"Error calculando tamaño de posición para {symbol}: {str(e)}")
             return 0.0
     
-    def check_portfolio_risk(self, positions: Dict[str, float], 
-                           current_prices: Dict[str, float],
-                           historical_prices: Dict[str, np.ndarray]) -> Dict[str, bool]:
+    async def check_portfolio_risk(self, positions: Dict[str, float],
+                                   current_prices: Dict[str, float],
+                                   historical_prices: Dict[str, np.ndarray]) -> Dict[str, bool]:
         """Evalúa los riesgos del portfolio actual"""
         risk_flags = {}
         try:
             portfolio_value = sum(pos * current_prices.get(sym, 0) 
                                 for sym, pos in positions.items())
             
+            # Una sola foto de tickers para la liquidez de todas las posiciones (sin bloquear el bucle)
+            snapshot = None
+            try:
+                snapshot = await self.price_snapshot.get_snapshot_async(list(positions.keys()))
+            except Exception as e:
+                logger.warning(f"No se pudo obtener la foto de tickers: {str(e)}")
+            
             for symbol, position in positions.items():
                 # Verificar tamaño de posición
                 position_value = position * current_prices.get(symbol, 0)
@@ -50,7 +60,7 @@ class RiskManager:
                     'size_exceeded': position_weight > self.params.max_position_size,
                     'high_volatility': self._check_volatility(historical_prices.get(symbol, [])),
                     'correlation_risk': self._check_correlation(symbol, historical_prices),
-                    'liquidity_risk': self._check_liquidity(symbol, current_prices.get(symbol, 0))
+                    'liquidity_risk': self._check_liquidity(symbol, snapshot)
                 }
                 
             return risk_flags
@@ -110,42 +120,19 @@ class RiskManager:
             logger.error(f"Error calculando correlaciones para {symbol}: {str(e)}")
             return False
     
-    import requests
-    from dataclasses import dataclass
-    
-    # Definimos una dataclass para configurar la API
-    @dataclass
-    class APIClientConfig:
-        base_url: str
-        api_key: str = None
-        secret_key: str = None
-    
-    # Configuración de la API de Binance
-    binance_api_config = APIClientConfig(base_url='https://api.binance.com')
-    
-    def get_24hr_ticker_price_change(symbol: str, config: APIClientConfig):
-        """Obtiene el cambio de precio en las últimas 24 horas"""
-        url = f"{config.base_url}/api/v3/ticker/24hr?symbol={symbol}"
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception("Error al obtener datos de la API de Binance")
-    
-    class RiskManager:
-        # ... Otros métodos ...
-    
-        def _check_liquidity(self, symbol: str, current_price: float) -> bool:
-            """Verifica si el activo cumple con los requisitos mínimos de liquidez"""
-            try:
-                # Obtener datos de Binance
-                ticker = get_24hr_ticker_price_change(symbol, binance_api_config)
-                daily_volume = float(ticker.get('quoteVolume', 0))
-                return daily_volume < self.params.min_liquidity
-            except Exception as e:
-                logger.error(f"Error verificando liquidez para {symbol}: {str(e)}")
-                return True  # Por seguridad, asumimos riesgo de liquidez si hay error
+    def _check_liquidity(self, symbol: str, snapshot: Optional[TickerSnapshot]) -> bool:
+        """Verifica si el activo cumple con los requisitos mínimos de liquidez"""
+        try:
+            # Volumen 24h desde la foto de tickers compartida del ciclo
+            if snapshot is None:
+                raise ValueError("sin foto de tickers")
+            daily_volume = snapshot.quote_volumes.get(symbol, 0.0)
+            return daily_volume < self.params.min_liquidity
+        except Exception as e:
+            logger.error(f"Error verificando liquidez para {symbol}: {str(e)}")
+            return True  # Por seguridad, asumimos riesgo de liquidez si hay error
             
+    @timed("risk.evaluate")
     async def evaluate_risk(self, market_analysis: Dict) -> Dict:
         """Evalúa el riesgo basado en el análisis de mercado"""
         try:
@@ -0,0 +1,216 @@
+"""
+Archivo Histórico del Screener de TradingView
+Guarda cada foto fechada del screener en un almacén columnar particionado por
+fecha: una matriz float (monedas × campos, orden de columnas) por partición,
+abierta con memory-map para leer solo los campos pedidos. Los campos de texto
+(ej: rating técnico) se guardan como códigos de un diccionario global.
+Permite consultas históricas ("RSI y % de direcciones en beneficio de estas
+monedas en las últimas 90 fotos") sin volver a procesar los CSV
+"""
+
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from src.tradingview_ingest import TRADINGVIEW_DIR, find_all_exports, load_screener, sources_hash
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = "data/screener_archive"
+
+class ScreenerArchive:
+    """Almacén particionado por fecha de las fotos del screener"""
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self.manifest_path = os.path.join(archive_dir, "manifest.json")
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        # fields: nombre -> índice global; categories: campo de texto -> etiquetas
+        return {'fields': {}, 'categories': {}, 'snapshots': {}}
+
+    def _save_manifest(self):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    @property
+    def dates(self) -> List[str]:
+        """Fechas archivadas en orden cronológico"""
+        return sorted(self.manifest['snapshots'])
+
+    @property
+    def fields(self) -> List[str]:
+        """Campos conocidos en el archivo"""
+        return list(self.manifest['fields'])
+
+    def _partition_dir(self, date: str) -> str:
+        return os.path.join(self.archive_dir, f"date={date}")
+
+    def _encode(self, screener: pd.DataFrame) -> tuple:
+        """Convierte una foto en (monedas, índices de campo, matriz float en orden Fortran)"""
+        coins = screener['Moneda'].astype(str).tolist()
+        columns = [c for c in screener.columns if c != 'Moneda']
+        matrix = np.full((len(coins), len(columns)), np.nan, order='F')
+        field_ids = []
+        for j, column in enumerate(columns):
+            field_ids.append(self.manifest['fields'].setdefault(column, len(self.manifest['fields'])))
+            values = screener[column]
+            if pd.api.types.is_numeric_dtype(values):
+                matrix[:, j] = values.to_numpy(dtype=float, na_value=np.nan)
+            else:
+                # Texto/categoría: códigos en un diccionario global estable entre fotos
+                categories = self.manifest['categories'].setdefault(column, [])
+                lookup = {label: i for i, label in enumerate(categories)}
+                for label in pd.unique(values.dropna().astype(str)):
+                    if label not in lookup:
+                        lookup[label] = len(categories)
+                        categories.append(label)
+                codes = values.astype(str).map(lookup).where(values.notna())
+                matrix[:, j] = codes.to_numpy(dtype=float, na_value=np.nan)
+        return coins, field_ids, matrix
+
+    def ingest(self, date: str, screener: pd.DataFrame, source: Optional[Dict] = None) -> bool:
+        """
+        Archiva una foto del screener (reemplaza la partición si la fecha ya existía)
+
+        Args:
+            date: Fecha de la foto (YYYY-MM-DD)
+            screener: Foto combinada con columna 'Moneda'
+            source: Metadatos de origen (hash y firmas de archivos)
+
+        Returns:
+            True si se escribió la partición
+        """
+        coins, field_ids, matrix = self._encode(screener)
+        partition = self._partition_dir(date)
+        os.makedirs(partition, exist_ok=True)
+        np.save(os.path.join(partition, "values.npy"), matrix)
+        with open(os.path.join(partition, "coins.json"), 'w', encoding='utf-8') as f:
+            json.dump(coins, f)
+        self.manifest['snapshots'][date] = {'fields': field_ids, 'rows': len(coins), **(source or {})}
+        self._save_manifest()
+        logger.info(f"Foto del screener {date} archivada: {len(coins)} monedas × {len(field_ids)} campos")
+        return True
+
+    def ingest_all(self, base_dir: str = TRADINGVIEW_DIR) -> List[str]:
+        """
+        Archiva todas las fotos fechadas que aún no estén (o cuyo contenido haya cambiado)
+
+        Args:
+            base_dir: Directorio raíz de las exportaciones de TradingView
+
+        Returns:
+            Fechas archivadas en esta llamada
+        """
+        ingested = []
+        for date, paths in find_all_exports(base_dir).items():
+            signature = {kind: [os.path.getsize(p), os.stat(p).st_mtime_ns] for kind, p in sorted(paths.items())}
+            known = self.manifest['snapshots'].get(date)
+            if known and known.get('signature') == signature:
+                continue  # Sin cambios: no se vuelve a leer ni a hashear
+            content_hash = sources_hash(paths)
+            if known and known.get('hash') == content_hash:
+                known['signature'] = signature
+                self._save_manifest()
+                continue
+            screener = load_screener(paths=paths, cache_dir=None)
+            self.ingest(date, screener, {'hash': content_hash, 'signature': signature})
+            ingested.append(date)
+        return ingested
+
+    def _select_dates(self, last_n: Optional[int], start: Optional[str], end: Optional[str]) -> List[str]:
+        dates = [d for d in self.dates if (start is None or d >= start) and (end is None or d <= end)]
+        return dates[-last_n:] if last_n else dates
+
+    def query(
+        self,
+        fields: List[str],
+        coins: Optional[List[str]] = None,
+        last_n: Optional[int] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        decode: bool = True
+    ) -> pd.DataFrame:
+        """
+        Consulta campos de varias fotos leyendo solo las columnas pedidas de cada partición
+
+        Args:
+            fields: Campos a devolver
+            coins: Monedas a filtrar (None = todas)
+            last_n: Últimas N fotos (tras aplicar start/end)
+            start: Fecha mínima (YYYY-MM-DD, inclusive)
+            end: Fecha máxima (inclusive)
+            decode: Devolver etiquetas en lugar de códigos para campos de texto
+
+        Returns:
+            DataFrame con índice (date, Moneda) y una columna por campo
+        """
+        missing = [f for f in fields if f not in self.manifest['fields']]
+        if missing:
+            raise KeyError(f"Campos no archivados: {missing}")
+        wanted = [self.manifest['fields'][f] for f in fields]
+        coin_set = set(coins) if coins else None
+
+        blocks = []
+        for date in self._select_dates(last_n, start, end):
+            partition = self._partition_dir(date)
+            with open(os.path.join(partition, "coins.json"), 'r', encoding='utf-8') as f:
+                partition_coins = json.load(f)
+            rows = np.arange(len(partition_coins)) if coin_set is None else \
+                np.array([i for i, c in enumerate(partition_coins) if c in coin_set], dtype=int)
+            if not len(rows):
+                continue
+            matrix = np.load(os.path.join(partition, "values.npy"), mmap_mode='r')
+            position = {field_id: j for j, field_id in enumerate(self.manifest['snapshots'][date]['fields'])}
+            block = np.full((len(rows), len(fields)), np.nan)
+            for k, field_id in enumerate(wanted):
+                if field_id in position:
+                    block[:, k] = matrix[rows, position[field_id]]  # Columna contigua: solo se leen sus páginas
+            index = pd.MultiIndex.from_arrays(
+                [[date] * len(rows), [partition_coins[i] for i in rows]], names=['date', 'Moneda']
+            )
+            blocks.append(pd.DataFrame(block, index=index, columns=fields))
+
+        if not blocks:
+            return pd.DataFrame(columns=fields, index=pd.MultiIndex.from_arrays([[], []], names=['date', 'Moneda']))
+        result = pd.concat(blocks)
+        if decode:
+            for field in fields:
+                categories = self.manifest['categories'].get(field)
+                if categories is not None:
+                    codes = result[field]
+                    labels = pd.Categorical.from_codes(codes.fillna(-1).astype(int), categories=categories)
+                    result[field] = labels
+        return result
+
+    def field_history(self, field: str, coins: Optional[List[str]] = None, last_n: Optional[int] = None) -> pd.DataFrame:
+        """Histórico de un campo como tabla fechas × monedas"""
+        return self.query([field], coins, last_n)[field].unstack('Moneda')
+
+    def snapshot(self, date: str) -> pd.DataFrame:
+        """Foto completa de una fecha"""
+        fields = [f for f, i in self.manifest['fields'].items() if i in set(self.manifest['snapshots'][date]['fields'])]
+        return self.query(fields, start=date, end=date).droplevel('date').reset_index()
+
+def main():
+    """Archivar todas las fotos nuevas del screener (ej: tras descargar exportaciones)"""
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else TRADINGVIEW_DIR
+    archive = ScreenerArchive()
+    ingested = archive.ingest_all(base_dir)
+    print(f"📦 {len(ingested)} fotos nuevas archivadas ({len(archive.dates)} en total)")
+    return ingested
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
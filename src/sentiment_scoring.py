@@ -0,0 +1,320 @@
+"""
+Scoring de Sentimiento de Insights
+Etapa solo-CPU que calcula sentiment_score (-1 a 1) y relevance_score (0 a 1) de
+los insights de market_insights: un léxico cripto en español e inglés con negaciones
+e intensificadores, combinado opcionalmente con un modelo lineal local sobre
+n-gramas hasheados (NumPy, sin dependencias). Los textos se puntúan por lotes en un
+pool de procesos, las puntuaciones se cachean por hash de contenido y versión del
+scorer, y se escriben de vuelta en bloque por el escritor compartido
+"""
+
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import re
+import unicodedata
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from src.collectors import content_hash
+from src.storage import SQLiteStorage
+
+logger = logging.getLogger(__name__)
+
+LEXICON_VERSION = 1
+MODEL_PATH = "data/models/sentiment_model.npz"
+
+LEXICON: Dict[str, float] = {
+    # Positivas
+    'bullish': 1.0, 'alcista': 1.0, 'rally': 0.8, 'sube': 0.6, 'suben': 0.6, 'subida': 0.6, 'surge': 0.7,
+    'soars': 0.9, 'gain': 0.5, 'gains': 0.5, 'ganancias': 0.5, 'maximo': 0.6, 'maximos': 0.6, 'record': 0.5,
+    'ath': 0.8, 'aprobado': 0.7, 'aprueba': 0.7, 'approval': 0.7, 'approved': 0.7, 'approves': 0.7,
+    'adoption': 0.6, 'adopcion': 0.6, 'partnership': 0.5, 'alianza': 0.5, 'upgrade': 0.4, 'breakout': 0.7,
+    'recovery': 0.5, 'recupera': 0.5, 'inflows': 0.6, 'entradas': 0.3, 'optimism': 0.6, 'optimismo': 0.6,
+    'buy': 0.3, 'compra': 0.3, 'greed': 0.3, 'launch': 0.3, 'lanza': 0.3,
+    # Negativas
+    'bearish': -1.0, 'bajista': -1.0, 'crash': -1.0, 'desplome': -1.0, 'cae': -0.6, 'caen': -0.6,
+    'caida': -0.6, 'drops': -0.6, 'falls': -0.6, 'plunge': -0.9, 'plunges': -0.9, 'plummets': -0.9,
+    'hack': -1.0, 'hacked': -1.0, 'hackeo': -1.0, 'exploit': -0.9, 'scam': -1.0, 'estafa': -1.0,
+    'fraud': -1.0, 'fraude': -1.0, 'lawsuit': -0.7, 'demanda': -0.5, 'ban': -0.8, 'prohibe': -0.8,
+    'prohibicion': -0.8, 'liquidations': -0.6, 'liquidaciones': -0.6, 'outflows': -0.6, 'salidas': -0.3,
+    'fear': -0.4, 'miedo': -0.4, 'sell': -0.3, 'venta': -0.3, 'rejected': -0.7, 'rechaza': -0.7,
+    'rechazado': -0.7, 'bankruptcy': -1.0, 'quiebra': -1.0, 'insolvency': -0.9, 'losses': -0.5,
+    'perdidas': -0.5, 'minimo': -0.5, 'minimos': -0.5, 'delisting': -0.7
+}
+NEGATORS = {'no', 'not', 'never', 'nunca', 'sin', 'ni', 'without', "isn't", "doesn't", "won't"}
+INTENSIFIERS = {'muy': 1.5, 'very': 1.5, 'extremely': 2.0, 'extremadamente': 2.0, 'fuerte': 1.3, 'strong': 1.3,
+                'massive': 1.6, 'masivo': 1.6, 'huge': 1.5, 'enorme': 1.5}
+CRYPTO_TERMS = {
+    'bitcoin', 'btc', 'ethereum', 'eth', 'crypto', 'cripto', 'criptomoneda', 'criptomonedas', 'blockchain',
+    'etf', 'defi', 'token', 'tokens', 'altcoin', 'altcoins', 'stablecoin', 'stablecoins', 'exchange',
+    'binance', 'coinbase', 'solana', 'sol', 'xrp', 'halving', 'staking', 'nft', 'layer', 'mining', 'mineria'
+}
+NEGATION_WINDOW = 3
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas sin tildes, separado en palabras"""
+    stripped = unicodedata.normalize('NFKD', str(text).lower()).encode('ascii', 'ignore').decode('ascii')
+    return _TOKEN.findall(stripped)
+
+def lexicon_score(tokens: List[str]) -> float:
+    """Sentimiento léxico en (-1, 1) con negación (3 palabras) e intensificadores"""
+    total, negate_until, boost = 0.0, -1, 1.0
+    for i, token in enumerate(tokens):
+        if token in NEGATORS:
+            negate_until = i + NEGATION_WINDOW
+            continue
+        if token in INTENSIFIERS:
+            boost = INTENSIFIERS[token]
+            continue
+        weight = LEXICON.get(token)
+        if weight is not None:
+            total += weight * boost * (-0.75 if i <= negate_until else 1.0)
+        boost = 1.0
+    # Normalización tipo VADER: satura suavemente con muchas palabras
+    return total / math.sqrt(total * total + 4.0) if total else 0.0
+
+def relevance_score(tokens: List[str], symbols: Iterable[str] = ()) -> float:
+    """Relevancia en [0, 1]: menciones de símbolos seguidos (peso doble) y términos cripto"""
+    symbol_set = set(symbols)
+    hits = sum(2 if t in symbol_set else 1 for t in tokens if t in symbol_set or t in CRYPTO_TERMS)
+    return 1.0 - math.exp(-hits / 3.0)
+
+class HashedLinearModel:
+    """Regresión logística sobre unigramas y bigramas hasheados (crc32, estable entre procesos)"""
+
+    def __init__(self, n_features: int = 1 << 18):
+        self.n_features = n_features
+        self.weights = np.zeros(n_features, dtype=np.float32)
+        self.bias = 0.0
+
+    def features(self, tokens: List[str]) -> np.ndarray:
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return np.unique(np.fromiter((zlib.crc32(g.encode()) % self.n_features for g in grams),
+                                     dtype=np.int64, count=len(grams)))
+
+    def predict_tokens(self, tokens: List[str]) -> float:
+        """Sentimiento en (-1, 1) de un texto tokenizado"""
+        index = self.features(tokens)
+        if not len(index):
+            return 0.0
+        z = float(self.weights[index].sum()) / math.sqrt(len(index)) + self.bias
+        return 2.0 / (1.0 + math.exp(-z)) - 1.0
+
+    def fit(self, texts: List[str], labels: List[float], epochs: int = 5, learning_rate: float = 0.5,
+            l2: float = 1e-4) -> 'HashedLinearModel':
+        """
+        Entrena con SGD
+
+        Args:
+            texts: Textos de entrenamiento
+            labels: Sentimiento objetivo en [-1, 1]
+            epochs: Pasadas sobre los datos
+            learning_rate: Tasa de aprendizaje
+            l2: Regularización
+
+        Returns:
+            El propio modelo
+        """
+        rows = [self.features(tokenize(t)) for t in texts]
+        targets = (np.asarray(labels, dtype=float) + 1) / 2
+        rng = np.random.default_rng(0)
+        for _ in range(epochs):
+            for i in rng.permutation(len(rows)):
+                index = rows[i]
+                if not len(index):
+                    continue
+                scale = 1 / math.sqrt(len(index))
+                p = 1 / (1 + math.exp(-(float(self.weights[index].sum()) * scale + self.bias)))
+                gradient = p - targets[i]
+                self.weights[index] -= learning_rate * (gradient * scale + l2 * self.weights[index])
+                self.bias -= learning_rate * gradient
+        return self
+
+    @property
+    def version(self) -> str:
+        digest = hashlib.blake2b(self.weights.tobytes(), digest_size=6)
+        digest.update(str(self.bias).encode())
+        return digest.hexdigest()
+
+    def save(self, path: str = MODEL_PATH):
+        """Guarda los pesos en un .npz"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=np.array(self.bias))
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> 'HashedLinearModel':
+        """Carga un modelo guardado con save()"""
+        with np.load(path) as data:
+            model = cls(len(data['weights']))
+            model.weights = data['weights'].astype(np.float32)
+            model.bias = float(data['bias'])
+        return model
+
+# Estado de cada proceso del pool (se envía una vez con el initializer, no con cada lote)
+_worker_state: Dict = {}
+
+def _init_worker(model: Optional[HashedLinearModel], model_weight: float, symbols: Tuple[str, ...]):
+    _worker_state.update(model=model, model_weight=model_weight, symbols=symbols)
+
+def _score_batch(texts: List[str]) -> List[Tuple[float, float]]:
+    model = _worker_state.get('model')
+    model_weight = _worker_state.get('model_weight', 0.0)
+    symbols = _worker_state.get('symbols', ())
+    scores = []
+    for text in texts:
+        tokens = tokenize(text)
+        sentiment = lexicon_score(tokens)
+        if model is not None:
+            sentiment = (1 - model_weight) * sentiment + model_weight * model.predict_tokens(tokens)
+        scores.append((sentiment, relevance_score(tokens, symbols)))
+    return scores
+
+class SentimentScorer:
+    """Puntúa textos por lotes, en paralelo a partir de cierto tamaño"""
+
+    def __init__(self, symbols: Iterable[str] = (), model_path: Optional[str] = MODEL_PATH,
+                 model_weight: float = 0.5, workers: Optional[int] = None,
+                 batch_size: int = 256, min_parallel: int = 512):
+        self.symbols = tuple(sorted({s.lower() for s in symbols}))
+        self.model = HashedLinearModel.load(model_path) if model_path and os.path.exists(model_path) else None
+        self.model_weight = model_weight if self.model is not None else 0.0
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.batch_size = batch_size
+        self.min_parallel = min_parallel
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def version(self) -> str:
+        """Identifica léxico, modelo y símbolos: cambia si cambia cualquiera de ellos"""
+        symbols = hashlib.blake2b(",".join(self.symbols).encode(), digest_size=4).hexdigest()
+        model = self.model.version if self.model is not None else 'none'
+        return f"lex{LEXICON_VERSION}-{model}-{self.model_weight:g}-{symbols}"
+
+    def _initargs(self) -> tuple:
+        return (self.model, self.model_weight, self.symbols)
+
+    def score_texts(self, texts: List[str]) -> List[Tuple[float, float]]:
+        """
+        Puntúa textos (la caché persistente por hash la gestiona score_pending_insights)
+
+        Args:
+            texts: Textos a puntuar
+
+        Returns:
+            Lista de (sentiment_score, relevance_score)
+        """
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(texts) < self.min_parallel or self.workers == 1:
+            _init_worker(*self._initargs())
+            return [score for batch in batches for score in _score_batch(batch)]
+        if self._pool is None:
+            # spawn: un fork desde un proceso con hilos (escritor SQLite, APScheduler) puede heredar locks tomados
+            self._pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=self._initargs()
+            )
+        return [score for batch_scores in self._pool.map(_score_batch, batches) for score in batch_scores]
+
+    def close(self):
+        """Cierra el pool de procesos"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+def _ensure_cache_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sentiment_cache (
+            content_hash TEXT NOT NULL,
+            scorer_version TEXT NOT NULL,
+            sentiment_score REAL NOT NULL,
+            relevance_score REAL NOT NULL,
+            PRIMARY KEY (content_hash, scorer_version)
+        ) WITHOUT ROWID
+    """)
+
+def score_pending_insights(storage: SQLiteStorage, scorer: SentimentScorer, limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    Puntúa los insights sin sentiment_score o relevance_score y los actualiza en bloque
+
+    Las puntuaciones ya presentes (ej: las del índice Fear & Greed) se conservan
+
+    Args:
+        storage: Almacenamiento compartido de dca_trading.db
+        scorer: Scorer a utilizar
+        limit: Máximo de insights por llamada
+
+    Returns:
+        Recuento de insights pendientes, servidos desde caché, puntuados y actualizados
+    """
+    storage.writer.run(_ensure_cache_table)
+    sql = ("SELECT id, content, content_hash FROM market_insights "
+           "WHERE sentiment_score IS NULL OR relevance_score IS NULL ORDER BY id")
+    rows = storage.reader().execute(sql + (f" LIMIT {int(limit)}" if limit else "")).fetchall()
+    summary = {'pending': len(rows), 'cached': 0, 'scored': 0, 'updated': 0}
+    if not rows:
+        return summary
+
+    hashes = [h or content_hash(content) for _, content, h in rows]
+    version = scorer.version
+    cached: Dict[str, Tuple[float, float]] = {}
+    unique = list(dict.fromkeys(hashes))
+    for start in range(0, len(unique), 500):  # Límite de parámetros de SQLite
+        chunk = unique[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cached.update({
+            h: (s, r) for h, s, r in storage.reader().execute(
+                f"SELECT content_hash, sentiment_score, relevance_score FROM sentiment_cache "
+                f"WHERE scorer_version = ? AND content_hash IN ({placeholders})", [version, *chunk]
+            )
+        })
+
+    to_score = {h: content for (_, content, _), h in zip(rows, hashes) if h not in cached}
+    fresh = dict(zip(to_score, scorer.score_texts(list(to_score.values())))) if to_score else {}
+    summary['cached'] = sum(1 for h in hashes if h in cached)
+    summary['scored'] = len(fresh)
+    scores = {**cached, **fresh}
+
+    def write(conn) -> int:
+        conn.executemany(
+            "INSERT OR REPLACE INTO sentiment_cache (content_hash, scorer_version, sentiment_score, relevance_score) "
+            "VALUES (?, ?, ?, ?)",
+            [(h, version, s, r) for h, (s, r) in fresh.items()]
+        )
+        return conn.executemany(
+            "UPDATE market_insights SET sentiment_score = COALESCE(sentiment_score, ?), "
+            "relevance_score = COALESCE(relevance_score, ?) WHERE id = ?",
+            [(*scores[h], insight_id) for (insight_id, _, _), h in zip(rows, hashes)]
+        ).rowcount
+
+    summary['updated'] = storage.writer.run(write)
+    logger.info(f"Scoring de insights: {summary}")
+    return summary
+
+def recent_news_sentiment(storage: SQLiteStorage, hours: int = 24) -> Optional[float]:
+    """
+    Sentimiento medio de los insights recientes ponderado por relevancia, en [0, 1]
+
+    Args:
+        storage: Almacenamiento compartido
+        hours: Ventana en horas
+
+    Returns:
+        Sentimiento (0 bajista, 0.5 neutral, 1 alcista) o None si no hay insights puntuados
+    """
+    row = storage.reader().execute(
+        "SELECT SUM(sentiment_score * relevance_score), SUM(relevance_score) FROM market_insights "
+        "WHERE sentiment_score IS NOT NULL AND relevance_score > 0 AND collected_at >= datetime('now', ?)",
+        (f"-{int(hours)} hours",)
+    ).fetchone()
+    if not row or not row[1]:
+        return None
+    return (row[0] / row[1] + 1) / 2
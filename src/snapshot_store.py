@@ -0,0 +1,191 @@
+"""
+Almacén Indexado de Snapshots de Portafolios
+Guarda los snapshots diarios en SQLite con índice (portfolio_id, timestamp)
+en lugar de un JSON por portafolio y día
+"""
+
+import json
+import logging
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLUMNS = [
+    "portfolio_id", "timestamp", "total_value", "cash_balance",
+    "daily_pnl", "total_pnl", "positions", "metrics"
+]
+
+class SnapshotStore:
+    """Almacén SQLite de snapshots con escrituras en lote y consultas por rango"""
+
+    def __init__(self, db_path: Union[str, Path] = "portfolios/performance/snapshots.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._initialize_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Abre una conexión transaccional que se cierra al salir"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize_db(self):
+        """Crea la tabla de snapshots si no existe"""
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS portfolio_snapshots (
+                    portfolio_id TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    total_value REAL NOT NULL,
+                    cash_balance REAL NOT NULL,
+                    daily_pnl REAL NOT NULL,
+                    total_pnl REAL NOT NULL,
+                    positions TEXT NOT NULL,
+                    metrics TEXT NOT NULL,
+                    PRIMARY KEY (portfolio_id, timestamp)
+                ) WITHOUT ROWID;
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_snapshots_timestamp ON portfolio_snapshots (timestamp)"
+            )
+
+    @staticmethod
+    def _normalize_timestamp(value: Union[str, datetime]) -> str:
+        """Normaliza timestamps a ISO con microsegundos para que el orden textual sea cronológico"""
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return value.isoformat(timespec="microseconds")
+
+    def _to_row(self, snapshot: Any) -> tuple:
+        """Convierte un PortfolioSnapshot (o dict equivalente) en fila SQL"""
+        data = asdict(snapshot) if is_dataclass(snapshot) else dict(snapshot)
+        return (
+            data["portfolio_id"],
+            self._normalize_timestamp(data["timestamp"]),
+            float(data.get("total_value") or 0.0),
+            float(data.get("cash_balance") or 0.0),
+            float(data.get("daily_pnl") or 0.0),
+            float(data.get("total_pnl") or 0.0),
+            json.dumps(data.get("positions") or {}, ensure_ascii=False, separators=(",", ":")),
+            json.dumps(data.get("metrics") or {}, ensure_ascii=False, separators=(",", ":"))
+        )
+
+    def save_snapshots(self, snapshots: Iterable[Any]) -> int:
+        """
+        Guardar varios snapshots en una sola transacción
+
+        Args:
+            snapshots: Iterable de PortfolioSnapshot o dicts con los mismos campos
+
+        Returns:
+            Número de snapshots escritos
+        """
+        rows = [self._to_row(s) for s in snapshots]
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO portfolio_snapshots ({', '.join(SNAPSHOT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(SNAPSHOT_COLUMNS))})",
+                rows
+            )
+        logger.debug(f"Guardados {len(rows)} snapshots en {self.db_path}")
+        return len(rows)
+
+    def get_history(
+        self,
+        portfolio_ids: Optional[Union[str, List[str]]] = None,
+        start_date: Optional[Union[str, datetime]] = None,
+        end_date: Optional[Union[str, datetime]] = None,
+        decode: bool = True
+    ) -> pd.DataFrame:
+        """
+        Consultar snapshots por portafolio y rango de fechas
+
+        Args:
+            portfolio_ids: ID o lista de IDs (None = todos)
+            start_date: Fecha inicial inclusiva
+            end_date: Fecha final inclusiva
+            decode: Decodificar las columnas JSON positions/metrics
+
+        Returns:
+            DataFrame ordenado por portfolio_id y timestamp
+        """
+        clauses, params = [], []
+        if isinstance(portfolio_ids, str):
+            portfolio_ids = [portfolio_ids]
+        if portfolio_ids:
+            clauses.append(f"portfolio_id IN ({', '.join('?' * len(portfolio_ids))})")
+            params.extend(portfolio_ids)
+        if start_date:
+            clauses.append("timestamp >= ?")
+            params.append(self._normalize_timestamp(start_date))
+        if end_date:
+            end = end_date if isinstance(end_date, datetime) else datetime.fromisoformat(end_date)
+            if isinstance(end_date, str) and len(end_date) == 10:  # Fecha sin hora: incluir el día completo
+                end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
+            clauses.append("timestamp <= ?")
+            params.append(self._normalize_timestamp(end))
+
+        query = f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM portfolio_snapshots"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY portfolio_id, timestamp"
+
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        if decode and not df.empty:
+            df["positions"] = df["positions"].map(json.loads)
+            df["metrics"] = df["metrics"].map(json.loads)
+        return df
+
+    def get_latest(self, portfolio_ids: Optional[List[str]] = None) -> pd.DataFrame:
+        """Último snapshot de cada portafolio"""
+        query = f"""
+            SELECT {', '.join('s.' + c for c in SNAPSHOT_COLUMNS)}
+            FROM portfolio_snapshots s
+            JOIN (
+                SELECT portfolio_id, MAX(timestamp) AS timestamp
+                FROM portfolio_snapshots GROUP BY portfolio_id
+            ) latest USING (portfolio_id, timestamp)
+        """
+        params: List[str] = []
+        if portfolio_ids:
+            query += f" WHERE s.portfolio_id IN ({', '.join('?' * len(portfolio_ids))})"
+            params.extend(portfolio_ids)
+
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        if not df.empty:
+            df["positions"] = df["positions"].map(json.loads)
+            df["metrics"] = df["metrics"].map(json.loads)
+        return df.set_index("portfolio_id")
+
+    def import_json_snapshots(self, snapshots_dir: Union[str, Path]) -> int:
+        """Migra los snapshots JSON antiguos (<fecha>/<id>_snapshot.json) al almacén"""
+        snapshots_dir = Path(snapshots_dir)
+        snapshots: List[Dict] = []
+        for file_path in sorted(snapshots_dir.glob("*/*_snapshot.json")):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except Exception as e:
+                logger.error(f"Error leyendo snapshot {file_path}: {e}")
+
+        imported = self.save_snapshots(snapshots)
+        logger.info(f"Importados {imported} snapshots desde {snapshots_dir}")
+        return imported
@@ -0,0 +1,237 @@
+"""
+Capa de Almacenamiento SQLite Compartida
+Una única fábrica de conexiones para dca_trading.db con el perfil de pragmas (WAL,
+synchronous=NORMAL, caché y mmap ampliados, busy_timeout), lectores por hilo y una
+cola con un único hilo escritor. DatabaseManager (SQLAlchemy) y DataMarketAgent
+(sqlite3) comparten la misma instancia por archivo, de modo que las escrituras del
+scheduler de APScheduler y del scheduler asyncio se serializan sin bloquearse y las
+lecturas nunca esperan a un escritor
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'dca_trading.db'
+DATABASE_URL_ENV = 'DATABASE_URL'
+
+# Perfil de pragmas aplicado a cada conexión
+PRAGMAS = {
+    'journal_mode': 'WAL',           # Lectores concurrentes con un escritor
+    'synchronous': 'NORMAL',         # Seguro con WAL; fsync solo en checkpoints
+    'cache_size': -65536,            # 64 MiB de caché de páginas
+    'mmap_size': 268435456,          # 256 MiB mapeados en memoria
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,            # ms de espera ante un bloqueo en lugar de fallar
+    'foreign_keys': 'ON'
+}
+
+def configure_connection(conn: sqlite3.Connection, read_only: bool = False) -> sqlite3.Connection:
+    """
+    Aplica el perfil de pragmas a una conexión
+
+    Args:
+        conn: Conexión sqlite3
+        read_only: Marcar la conexión como solo lectura (query_only)
+
+    Returns:
+        La misma conexión
+    """
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+def sqlite_path_from_url(url: str) -> Optional[str]:
+    """Ruta del archivo de una URL sqlite:///ruta (None si no es SQLite en archivo)"""
+    prefix = 'sqlite:///'
+    if not url.startswith(prefix) or url[len(prefix):] in ('', ':memory:'):
+        return None
+    return url[len(prefix):]
+
+def database_url() -> str:
+    """URL de la base de datos del proceso (DATABASE_URL o dca_trading.db)"""
+    return os.getenv(DATABASE_URL_ENV, f'sqlite:///{DB_PATH}')
+
+class WriterQueue:
+    """Hilo escritor único: ejecuta en orden los trabajos de escritura sobre su conexión"""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], name: str = "sqlite-writer"):
+        self._connect = connect
+        self._jobs: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                future, fn, args, kwargs = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with conn:  # Una transacción por trabajo: commit o rollback
+                        result = fn(conn, *args, **kwargs)
+                    future.set_result(result)
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            conn.close()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Encola un trabajo fn(conn, *args, **kwargs) que se ejecuta en una transacción
+
+        Returns:
+            Future con el resultado del trabajo
+        """
+        future: Future = Future()
+        self._jobs.put((future, fn, args, kwargs))
+        return future
+
+    def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Ejecuta un trabajo de escritura y espera su resultado"""
+        return self.submit(fn, *args, **kwargs).result(timeout)
+
+    async def run_async(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecuta un trabajo de escritura sin bloquear el bucle de eventos"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def execute(self, sql: str, params: Sequence = ()) -> int:
+        """Ejecuta una sentencia de escritura y devuelve las filas afectadas"""
+        return self.run(lambda conn: conn.execute(sql, params).rowcount)
+
+    def executemany(self, sql: str, rows: Iterable[Sequence]) -> int:
+        """Ejecuta una sentencia para muchas filas en una sola transacción"""
+        return self.run(lambda conn: conn.executemany(sql, rows).rowcount)
+
+    def close(self, timeout: Optional[float] = None):
+        """Procesa los trabajos pendientes y detiene el hilo escritor"""
+        if self._thread.is_alive():
+            self._jobs.put(None)
+            self._thread.join(timeout)
+
+class SQLiteStorage:
+    """Fábrica de conexiones, lectores por hilo y escritor único para un archivo SQLite"""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._engine = None
+        self._writer: Optional[WriterQueue] = None
+        self._writer_engine: Optional[tuple] = None  # (conexión del escritor, engine sobre ella)
+        self._lock = threading.Lock()
+
+    def connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """
+        Crea una conexión nueva con el perfil de pragmas aplicado
+
+        Args:
+            read_only: Conexión de solo lectura
+
+        Returns:
+            Conexión sqlite3 utilizable desde cualquier hilo
+        """
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=PRAGMAS['busy_timeout'] / 1000)
+        return configure_connection(conn, read_only=read_only)
+
+    def reader(self) -> sqlite3.Connection:
+        """Conexión de solo lectura reutilizada por el hilo actual"""
+        conn = getattr(self._local, 'reader', None)
+        if conn is None:
+            conn = self._local.reader = self.connect(read_only=True)
+        return conn
+
+    @property
+    def writer(self) -> WriterQueue:
+        """Cola de escritura compartida (se arranca en el primer uso)"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = WriterQueue(self.connect, name=f"sqlite-writer:{os.path.basename(self.path)}")
+            return self._writer
+
+    @property
+    def engine(self):
+        """Engine de SQLAlchemy de solo lectura (las escrituras van por writer y writer_engine)"""
+        with self._lock:
+            if self._engine is None:
+                from sqlalchemy import create_engine
+                self._engine = create_engine(f"sqlite:///{self.path}", creator=lambda: self.connect(read_only=True))
+            return self._engine
+
+    def writer_engine(self, conn: sqlite3.Connection):
+        """
+        Engine de SQLAlchemy sobre la conexión del hilo escritor
+
+        Solo debe usarse dentro de un trabajo del escritor: permite que los componentes
+        basados en SQLAlchemy (ej: DatabaseManager) escriban por la misma conexión y
+        transacción que el resto de trabajos de la cola
+
+        Args:
+            conn: Conexión recibida por el trabajo del escritor
+
+        Returns:
+            Engine (StaticPool) cuya única conexión es 'conn'
+        """
+        if self._writer_engine is None or self._writer_engine[0] is not conn:
+            from sqlalchemy import create_engine
+            from sqlalchemy.pool import StaticPool
+            engine = create_engine(f"sqlite:///{self.path}", creator=lambda: conn, poolclass=StaticPool)
+            self._writer_engine = (conn, engine)
+        return self._writer_engine[1]
+
+    def close(self):
+        """Detiene el escritor y libera el pool de SQLAlchemy"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+            engine, self._engine = self._engine, None
+            self._writer_engine = None  # Su conexión la cierra el propio hilo escritor
+        if writer:
+            writer.close()
+        if engine is not None:
+            engine.dispose()
+        reader = getattr(self._local, 'reader', None)
+        if reader is not None:
+            reader.close()
+            self._local.reader = None
+
+_storages: Dict[str, SQLiteStorage] = {}
+_storages_lock = threading.Lock()
+
+def get_storage(path: str = DB_PATH) -> SQLiteStorage:
+    """
+    Instancia compartida de almacenamiento para un archivo (una por ruta absoluta)
+
+    Args:
+        path: Ruta del archivo SQLite
+
+    Returns:
+        SQLiteStorage compartido por todos los componentes del proceso
+    """
+    key = os.path.abspath(path)
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is None:
+            storage = _storages[key] = SQLiteStorage(path)
+        return storage
+
+def get_default_storage() -> Optional[SQLiteStorage]:
+    """
+    Almacenamiento compartido de la base de datos configurada (la misma que usa DatabaseManager)
+
+    Returns:
+        SQLiteStorage de la ruta de DATABASE_URL o None si no es SQLite en archivo
+    """
+    path = sqlite_path_from_url(database_url())
+    return get_storage(path) if path else None
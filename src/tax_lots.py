@@ -0,0 +1,406 @@
+"""
+Motor de Lotes Fiscales
+Casa compras y ventas por símbolo con política FIFO, LIFO o HIFO manteniendo los
+lotes abiertos en arrays NumPy preasignados (cantidad, coste unitario, fecha) y
+calcula la ganancia realizada de cada venta. El estado es incremental: se pueden
+procesar fills nuevos en cualquier momento y guardar/restaurar un checkpoint en
+lugar de reprocesar todo el historial. Los fills ya procesados se reconocen por id
+(base de datos) o por su clave natural (exports sin id), y un fill nuevo anterior a
+la marca de agua exige reprocesar desde el principio
+"""
+
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('fifo', 'lifo', 'hifo')
+QTY_EPSILON = 1e-12
+CHECKPOINT_VERSION = 2
+
+# Columnas de la tabla de ventas realizadas
+REALIZED_COLUMNS = ['timestamp', 'symbol', 'quantity', 'proceeds', 'cost_basis', 'gain',
+                    'holding_days', 'unmatched_qty']
+
+# Columnas que identifican un fill sin id (junto con su ocurrencia entre fills idénticos)
+NATURAL_KEY = ['timestamp', 'symbol', 'side', 'amount', 'price', 'fee']
+
+class ReplayRequiredError(ValueError):
+    """Hay fills nuevos anteriores a la marca de agua: el estado debe reconstruirse desde cero"""
+
+class LotBook:
+    """Lotes abiertos de un símbolo en arrays contiguos; los vivos ocupan [head, tail)"""
+
+    __slots__ = ('qty', 'cost', 'time', 'head', 'tail')
+
+    def __init__(self, capacity: int = 64):
+        self.qty = np.zeros(capacity)
+        self.cost = np.zeros(capacity)  # Coste unitario (incluye comisión de compra)
+        self.time = np.zeros(capacity, dtype=np.int64)  # Nanosegundos desde epoch
+        self.head = 0
+        self.tail = 0
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    def _reserve(self):
+        """Garantiza un hueco al final: compacta si media capacidad está libre, si no duplica"""
+        capacity = len(self.qty)
+        if self.tail < capacity:
+            return
+        live = slice(self.head, self.tail)
+        if self.head >= capacity // 2:
+            size = len(self)
+            for name in ('qty', 'cost', 'time'):
+                array = getattr(self, name)
+                array[:size] = array[live]
+            self.head, self.tail = 0, size
+            return
+        for name in ('qty', 'cost', 'time'):
+            array = getattr(self, name)
+            grown = np.zeros(capacity * 2, dtype=array.dtype)
+            grown[:len(self)] = array[live]
+            setattr(self, name, grown)
+        self.head, self.tail = 0, self.tail - self.head
+
+    def add(self, qty: float, unit_cost: float, time: int, by_cost: bool = False):
+        """
+        Añade un lote
+
+        Args:
+            qty: Cantidad comprada
+            unit_cost: Coste unitario
+            time: Fecha en nanosegundos
+            by_cost: Mantener los lotes ordenados por coste (HIFO)
+        """
+        self._reserve()
+        position = self.tail
+        if by_cost:
+            position = self.head + int(np.searchsorted(self.cost[self.head:self.tail], unit_cost, side='right'))
+            if position < self.tail:
+                for array in (self.qty, self.cost, self.time):
+                    array[position + 1:self.tail + 1] = array[position:self.tail]
+        self.qty[position] = qty
+        self.cost[position] = unit_cost
+        self.time[position] = time
+        self.tail += 1
+
+    def consume(self, qty: float, from_head: bool) -> Tuple[float, float, float]:
+        """
+        Retira cantidad de los lotes desde el principio (FIFO) o desde el final (LIFO/HIFO)
+
+        Args:
+            qty: Cantidad vendida
+            from_head: True para consumir los lotes más antiguos primero
+
+        Returns:
+            (cantidad casada, coste base, suma de cantidad × fecha de compra en días)
+        """
+        remaining = qty
+        matched = cost = weighted_time = 0.0
+        while remaining > QTY_EPSILON and self.tail > self.head:
+            i = self.head if from_head else self.tail - 1
+            lot_qty = float(self.qty[i])
+            take = lot_qty if lot_qty <= remaining else remaining
+            matched += take
+            cost += take * float(self.cost[i])
+            weighted_time += take * (int(self.time[i]) / 86400e9)
+            remaining -= take
+            if lot_qty - take <= QTY_EPSILON:
+                if from_head:
+                    self.head += 1
+                else:
+                    self.tail -= 1
+            else:
+                self.qty[i] = lot_qty - take
+        if self.head == self.tail:
+            self.head = self.tail = 0
+        return matched, cost, weighted_time
+
+    def open_quantity(self) -> float:
+        return float(self.qty[self.head:self.tail].sum())
+
+    def open_cost(self) -> float:
+        live = slice(self.head, self.tail)
+        return float(np.dot(self.qty[live], self.cost[live]))
+
+def normalize_fills(fills: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza fills de la base de datos (timestamp, symbol, type, amount, price) o del
+    export del exchange (Data, Pair, Type, Amount, Price, Fee) al mismo esquema
+
+    Args:
+        fills: Transacciones en cualquiera de los dos formatos
+
+    Returns:
+        DataFrame con timestamp, symbol, side ('buy'/'sell'), amount, price, fee (e id si existe)
+        ordenado cronológicamente
+    """
+    renamed = {c: c.lower() for c in fills.columns}
+    df = fills.rename(columns=renamed).rename(columns={
+        'data': 'timestamp', 'date': 'timestamp', 'pair': 'symbol', 'type': 'side'
+    })
+    for column in ('amount', 'price', 'fee'):
+        if column not in df.columns:
+            df[column] = 0.0
+        elif not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    df['amount'] = df['amount'].abs().fillna(0.0)
+    df['price'] = df['price'].fillna(0.0)
+    df['fee'] = df['fee'].fillna(0.0)
+    df['side'] = df['side'].astype(str).str.strip().str.lower()
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    order = ['timestamp', 'id'] if 'id' in df.columns else ['timestamp']
+    columns = ['timestamp', 'symbol', 'side', 'amount', 'price', 'fee'] + (['id'] if 'id' in df.columns else [])
+    return df.sort_values(order, kind='mergesort')[columns].reset_index(drop=True)
+
+def fill_keys(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hash de la clave natural de cada fill normalizado; los fills idénticos se
+    distinguen por su ocurrencia, de modo que las parciales repetidas no se pierden
+
+    Args:
+        df: Fills devueltos por normalize_fills
+
+    Returns:
+        Array uint64 con una clave por fila
+    """
+    keys = df[NATURAL_KEY].assign(occurrence=df.groupby(NATURAL_KEY, sort=False).cumcount())
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy(dtype=np.uint64)
+
+class TaxLotEngine:
+    """Casado incremental de lotes fiscales por símbolo"""
+
+    def __init__(self, policy: str = 'fifo', initial_capacity: int = 64):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de lotes desconocida: {policy} (opciones: {POLICIES})")
+        self.policy = policy
+        self.initial_capacity = initial_capacity
+        self.books: Dict[str, LotBook] = {}
+        self.realized: List[tuple] = []
+        self.fills_processed = 0
+        self.last_id: Optional[int] = None
+        self.last_timestamp: Optional[pd.Timestamp] = None
+        self.seen_keys = np.zeros(0, dtype=np.uint64)  # Claves naturales de los fills procesados
+
+    def _book(self, symbol: str) -> LotBook:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = LotBook(self.initial_capacity)
+        return book
+
+    def process_fill(self, symbol: str, side: str, amount: float, price: float,
+                     time: int, fee: float = 0.0) -> Optional[float]:
+        """
+        Procesa un fill
+
+        Args:
+            symbol: Símbolo
+            side: 'buy' o 'sell'
+            amount: Cantidad
+            price: Precio unitario
+            time: Fecha en nanosegundos desde epoch
+            fee: Comisión en moneda de cotización (suma al coste o resta a los ingresos)
+
+        Returns:
+            Ganancia realizada si es una venta, None si es una compra
+        """
+        self.fills_processed += 1
+        if amount <= QTY_EPSILON:
+            return None
+        if side == 'buy':
+            self._book(symbol).add(amount, price + fee / amount, time, by_cost=self.policy == 'hifo')
+            return None
+        if side != 'sell':
+            raise ValueError(f"Tipo de fill desconocido: {side}")
+
+        matched, cost, weighted_time = self._book(symbol).consume(amount, from_head=self.policy == 'fifo')
+        # Solo se reconocen ingresos de la parte casada; el resto queda registrado como no casado
+        proceeds = matched * price - fee * (matched / amount)
+        holding = (matched * time / 86400e9 - weighted_time) / matched if matched > 0 else 0.0
+        gain = proceeds - cost
+        self.realized.append((time, symbol, matched, proceeds, cost, gain, holding, amount - matched))
+        return gain
+
+    def process(self, fills: pd.DataFrame) -> pd.DataFrame:
+        """
+        Procesa un lote de fills en orden cronológico, saltando los ya procesados
+        (por id si la entrada lo trae, si no por clave natural)
+
+        Args:
+            fills: Fills en formato de base de datos o de export del exchange
+
+        Returns:
+            Ventas realizadas en este lote
+
+        Raises:
+            ReplayRequiredError: Si algún fill nuevo es anterior a la marca de agua
+        """
+        df = normalize_fills(fills)
+        keys = None
+        if 'id' in df.columns:
+            if self.last_id is not None:
+                df = df[df['id'] > self.last_id]
+        else:
+            keys = fill_keys(df)
+            new = ~np.isin(keys, self.seen_keys)
+            df, keys = df[new], keys[new]
+        if df.empty:
+            return pd.DataFrame(columns=REALIZED_COLUMNS)
+
+        # Un fill anterior a la marca de agua (ej: importación de fills antiguos) cambiaría
+        # el casado de ventas ya realizadas: no se puede aplicar de forma incremental
+        if self.last_timestamp is not None and df['timestamp'].iloc[0] < self.last_timestamp:
+            late = int((df['timestamp'] < self.last_timestamp).sum())
+            raise ReplayRequiredError(
+                f"{late} fills nuevos anteriores a la marca de agua {self.last_timestamp}: "
+                f"reprocesar el historial completo con un motor nuevo"
+            )
+
+        start = len(self.realized)
+        times = df['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        for symbol, side, amount, price, fee, time in zip(
+            df['symbol'].to_numpy(), df['side'].to_numpy(), df['amount'].to_numpy(),
+            df['price'].to_numpy(), df['fee'].to_numpy(), times
+        ):
+            self.process_fill(symbol, side, amount, price, int(time), fee)
+
+        if 'id' in df.columns:
+            self.last_id = int(df['id'].max())
+        self.last_timestamp = df['timestamp'].iloc[-1]
+        if keys is not None:
+            self.seen_keys = np.concatenate([self.seen_keys, keys])
+        return self._realized_frame(self.realized[start:])
+
+    def sync_from_database(self, db_manager) -> pd.DataFrame:
+        """
+        Procesa las transacciones nuevas de DatabaseManager desde el último id procesado
+
+        Args:
+            db_manager: DatabaseManager con la tabla transactions
+
+        Returns:
+            Ventas realizadas en la sincronización
+        """
+        query = "SELECT * FROM transactions"
+        if self.last_id is not None:
+            query += f" WHERE id > {int(self.last_id)}"
+        return self.process(pd.read_sql(query + " ORDER BY id", db_manager.engine))
+
+    @staticmethod
+    def _realized_frame(records: List[tuple]) -> pd.DataFrame:
+        frame = pd.DataFrame.from_records(records, columns=REALIZED_COLUMNS)
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='ns')
+        return frame
+
+    def realized_gains(self) -> pd.DataFrame:
+        """Todas las ventas realizadas con su coste base, ganancia y tenencia media"""
+        return self._realized_frame(self.realized)
+
+    def open_lots(self, symbol: Optional[str] = None) -> pd.DataFrame:
+        """Lotes abiertos (de un símbolo o de todos)"""
+        frames = []
+        for name in ([symbol] if symbol else sorted(self.books)):
+            book = self.books.get(name)
+            if book is None or not len(book):
+                continue
+            live = slice(book.head, book.tail)
+            frames.append(pd.DataFrame({
+                'symbol': name,
+                'quantity': book.qty[live],
+                'unit_cost': book.cost[live],
+                'acquired': pd.to_datetime(book.time[live], unit='ns')
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['symbol', 'quantity', 'unit_cost', 'acquired'])
+        return pd.concat(frames, ignore_index=True)
+
+    def positions(self) -> Dict[str, Dict[str, float]]:
+        """Cantidad abierta, coste base y coste medio por símbolo"""
+        positions = {}
+        for symbol, book in self.books.items():
+            if len(book):
+                qty, cost = book.open_quantity(), book.open_cost()
+                positions[symbol] = {'quantity': qty, 'cost_basis': cost, 'average_cost': cost / qty if qty else 0.0}
+        return positions
+
+    def save_checkpoint(self, path: str):
+        """
+        Guarda el estado (lotes abiertos, ventas realizadas y marca de agua) en un .npz
+
+        Args:
+            path: Ruta del checkpoint
+        """
+        symbols = [s for s in sorted(self.books) if len(self.books[s])]
+        sizes = np.array([len(self.books[s]) for s in symbols], dtype=np.int64)
+
+        def lots(name: str) -> np.ndarray:
+            parts = [getattr(self.books[s], name)[self.books[s].head:self.books[s].tail] for s in symbols]
+            return np.concatenate(parts) if parts else np.zeros(0)
+
+        realized = self.realized_gains()
+        meta = {
+            'version': CHECKPOINT_VERSION,
+            'policy': self.policy,
+            'symbols': symbols,
+            'fills_processed': self.fills_processed,
+            'last_id': self.last_id,
+            'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp is not None else None
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps(meta)),
+                sizes=sizes,
+                qty=lots('qty'), cost=lots('cost'), time=lots('time').astype(np.int64),
+                seen_keys=self.seen_keys,
+                realized_time=realized['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64),
+                realized_symbol=realized['symbol'].to_numpy(dtype=str),
+                realized_values=realized[REALIZED_COLUMNS[2:]].to_numpy(dtype=float)
+            )
+        os.replace(tmp_path, path)
+        logger.info(f"Checkpoint de lotes guardado: {path} ({int(sizes.sum())} lotes abiertos)")
+
+    @classmethod
+    def load_checkpoint(cls, path: str, initial_capacity: int = 64) -> 'TaxLotEngine':
+        """
+        Restaura un motor desde un checkpoint
+
+        Args:
+            path: Ruta del checkpoint
+            initial_capacity: Capacidad mínima de los arrays de cada símbolo
+
+        Returns:
+            Motor listo para procesar fills nuevos
+        """
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['version'] != CHECKPOINT_VERSION:
+                raise ValueError(f"Versión de checkpoint no soportada: {meta['version']}")
+            engine = cls(meta['policy'], initial_capacity)
+            offsets = np.r_[0, np.cumsum(data['sizes'])]
+            for i, symbol in enumerate(meta['symbols']):
+                size = int(data['sizes'][i])
+                book = LotBook(max(initial_capacity, 2 * size))
+                for name in ('qty', 'cost', 'time'):
+                    getattr(book, name)[:size] = data[name][offsets[i]:offsets[i + 1]]
+                book.tail = size
+                engine.books[symbol] = book
+            values = data['realized_values']
+            engine.realized = [
+                (int(t), str(s), *map(float, v))
+                for t, s, v in zip(data['realized_time'], data['realized_symbol'], values)
+            ]
+            engine.seen_keys = data['seen_keys'].astype(np.uint64)
+        engine.fills_processed = meta['fills_processed']
+        engine.last_id = meta['last_id']
+        engine.last_timestamp = pd.Timestamp(meta['last_timestamp']) if meta['last_timestamp'] else None
+        return engine
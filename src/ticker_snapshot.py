@@ -0,0 +1,163 @@
+"""
+Foto Compartida de Tickers
+Obtiene precio, volumen y variación 24h de todos los símbolos con una sola
+petición batch a Binance y la cachea con un límite de antigüedad, para que
+el trader, el analizador de mercado y el gestor de riesgo usen la misma foto
+en cada ciclo. Un stream WebSocket puede alimentarla con update_tick()
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+import requests
+
+logger = logging.getLogger(__name__)
+
+BINANCE_TICKER_24H_URL = "https://api.binance.com/api/v3/ticker/24hr"
+
+@dataclass
+class TickerSnapshot:
+    """Foto de tickers tomada en un instante"""
+    taken_at: float  # time.monotonic() de la captura REST completa
+    timestamp: str
+    symbol_taken_at: Dict[str, float] = field(default_factory=dict)  # time.monotonic() del último dato por símbolo
+    prices: Dict[str, float] = field(default_factory=dict)
+    quote_volumes: Dict[str, float] = field(default_factory=dict)  # Volumen 24h en moneda de cotización
+    change_24h: Dict[str, float] = field(default_factory=dict)  # Variación 24h en %
+    missing: set = field(default_factory=set)  # Símbolos pedidos sin ticker (no se vuelven a pedir)
+
+    @property
+    def age(self) -> float:
+        """Segundos desde la captura"""
+        return time.monotonic() - self.taken_at
+
+    def symbol_age(self, symbol: str) -> float:
+        """Segundos desde el último dato de un símbolo (captura REST o tick)"""
+        return time.monotonic() - self.symbol_taken_at.get(symbol, self.taken_at)
+
+    def is_fresh(self, symbols: Iterable[str], max_age: float) -> bool:
+        """Indica si los datos de todos los símbolos (o la captura, si no se piden) son recientes"""
+        symbols = list(symbols)
+        if not symbols:
+            return self.age <= max_age
+        return all(self.symbol_age(s) <= max_age for s in symbols if s not in self.missing)
+
+    def covers(self, symbols: Iterable[str]) -> bool:
+        """Indica si la foto incluye (o ya descartó) todos los símbolos"""
+        return all(s in self.prices or s in self.missing for s in symbols)
+
+def parse_tickers(tickers: List[Dict]) -> TickerSnapshot:
+    """Convierte la respuesta de /ticker/24hr en una foto"""
+    snapshot = TickerSnapshot(taken_at=time.monotonic(), timestamp=datetime.now().isoformat())
+    for ticker in tickers:
+        symbol = ticker['symbol']
+        snapshot.prices[symbol] = float(ticker['lastPrice'])
+        snapshot.quote_volumes[symbol] = float(ticker.get('quoteVolume', 0.0))
+        snapshot.change_24h[symbol] = float(ticker.get('priceChangePercent', 0.0))
+        snapshot.symbol_taken_at[symbol] = snapshot.taken_at
+    return snapshot
+
+def fetch_tickers(symbols: Optional[List[str]] = None, timeout: float = 10.0) -> List[Dict]:
+    """
+    Descarga los tickers 24h en una única petición
+
+    Args:
+        symbols: Símbolos a pedir (None = todos los del exchange)
+        timeout: Timeout de la petición en segundos
+
+    Returns:
+        Lista de tickers tal como los devuelve Binance
+    """
+    params = {'symbols': json.dumps(sorted(symbols), separators=(',', ':'))} if symbols else None
+    response = requests.get(BINANCE_TICKER_24H_URL, params=params, timeout=timeout)
+    if response.status_code == 400 and symbols:
+        # Algún símbolo no existe: pedir todos y filtrar en local
+        logger.warning("Lista de símbolos rechazada por Binance; se descargan todos los tickers")
+        wanted = set(symbols)
+        return [t for t in fetch_tickers(None, timeout) if t['symbol'] in wanted]
+    response.raise_for_status()
+    return response.json()
+
+class TickerSnapshotProvider:
+    """Proveedor cacheado de fotos de tickers con límite de antigüedad"""
+
+    def __init__(
+        self,
+        max_age_seconds: float = 30.0,
+        fetcher: Optional[Callable[[Optional[List[str]]], List[Dict]]] = None
+    ):
+        self.max_age_seconds = max_age_seconds
+        self.fetcher = fetcher or fetch_tickers
+        self._snapshot: Optional[TickerSnapshot] = None
+        self._symbols: set = set()
+        self._lock = threading.Lock()
+
+    def get_snapshot(self, symbols: Optional[Iterable[str]] = None, max_age: Optional[float] = None) -> TickerSnapshot:
+        """
+        Obtener la foto vigente, descargándola solo si está caducada o incompleta
+
+        Args:
+            symbols: Símbolos necesarios
+            max_age: Antigüedad máxima admitida (por defecto la del proveedor)
+
+        Returns:
+            TickerSnapshot compartido
+        """
+        symbols = list(symbols or [])
+        max_age = self.max_age_seconds if max_age is None else max_age
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot and snapshot.covers(symbols) and snapshot.is_fresh(symbols, max_age):
+                return snapshot
+
+            # Pedir la unión de símbolos ya conocidos para que todos los consumidores compartan la foto
+            self._symbols.update(symbols)
+            tickers = self.fetcher(sorted(self._symbols) if self._symbols else None)
+            self._snapshot = parse_tickers(tickers)
+            missing = [s for s in symbols if s not in self._snapshot.prices]
+            if missing:
+                logger.warning(f"Sin ticker para {missing}")
+                self._symbols.difference_update(missing)
+                self._snapshot.missing.update(missing)
+            logger.debug(f"Foto de tickers actualizada: {len(self._snapshot.prices)} símbolos")
+            return self._snapshot
+
+    async def get_snapshot_async(self, symbols: Optional[Iterable[str]] = None, max_age: Optional[float] = None) -> TickerSnapshot:
+        """Versión no bloqueante de get_snapshot para código asíncrono"""
+        return await asyncio.to_thread(self.get_snapshot, symbols, max_age)
+
+    def get_prices(self, symbols: Iterable[str], max_age: Optional[float] = None) -> Dict[str, float]:
+        """Precios de los símbolos pedidos presentes en la foto"""
+        symbols = list(symbols)
+        snapshot = self.get_snapshot(symbols, max_age)
+        return {s: snapshot.prices[s] for s in symbols if s in snapshot.prices}
+
+    def update_tick(self, symbol: str, price: float, quote_volume: Optional[float] = None,
+                    change_24h: Optional[float] = None):
+        """Actualiza la foto con un tick recibido por streaming (solo refresca la antigüedad de ese símbolo)"""
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = TickerSnapshot(taken_at=time.monotonic(), timestamp=datetime.now().isoformat())
+            self._snapshot.prices[symbol] = price
+            if quote_volume is not None:
+                self._snapshot.quote_volumes[symbol] = quote_volume
+            if change_24h is not None:
+                self._snapshot.change_24h[symbol] = change_24h
+            self._snapshot.symbol_taken_at[symbol] = time.monotonic()
+            self._symbols.add(symbol)
+
+_shared_provider: Optional[TickerSnapshotProvider] = None
+_shared_lock = threading.Lock()
+
+def get_shared_provider() -> TickerSnapshotProvider:
+    """Proveedor único del proceso, compartido por trader, analizador y gestor de riesgo"""
+    global _shared_provider
+    with _shared_lock:
+        if _shared_provider is None:
+            _shared_provider = TickerSnapshotProvider()
+        return _shared_provider
@@ -0,0 +1,164 @@
+"""
+Analítica de Transacciones por Par
+Calcula en una sola pasada agrupada, para todos los pares a la vez, las métricas de
+compras/ventas, coste medio ponderado y FIFO, PnL realizado y no realizado, comisiones
+y periodos de tenencia. El casado FIFO se resuelve sin bucles: el coste acumulado de las
+compras de cada par es una función lineal a trozos de la cantidad comprada acumulada,
+y el coste de lo vendido se obtiene interpolándola en la cantidad vendida acumulada
+"""
+
+import logging
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_COLUMNS = ('Amount', 'Price', 'Fee')
+
+def prepare_transactions(transactions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza tipos y orden de las transacciones (Data, Pair, Type, Amount, Price, Fee)
+
+    Args:
+        transactions: Transacciones tal como vienen del export del exchange
+
+    Returns:
+        Copia con columnas numéricas float, Type en mayúsculas y ordenada por par y fecha
+    """
+    df = transactions.copy()
+    for column in NUMERIC_COLUMNS:
+        if column not in df.columns:
+            df[column] = 0.0
+        elif not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    df['Type'] = df['Type'].astype(str).str.strip().str.upper()
+    if 'Data' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['Data']):
+        df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
+    # Orden estable: a igual fecha se respeta el orden del export
+    sort_by = ['Pair', 'Data'] if 'Data' in df.columns else ['Pair']
+    return df.sort_values(sort_by, kind='mergesort').reset_index(drop=True)
+
+def _group_cumsum(values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    return pd.Series(values).groupby(codes).cumsum().to_numpy()
+
+def _group_diff(values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    return pd.Series(values).groupby(codes).diff().fillna(pd.Series(values)).to_numpy()
+
+def pair_analytics(
+    transactions: pd.DataFrame,
+    prices: Optional[Dict[str, float]] = None,
+    as_of: Optional[pd.Timestamp] = None
+) -> pd.DataFrame:
+    """
+    Métricas de todos los pares en una pasada
+
+    Args:
+        transactions: Transacciones con columnas Data, Pair, Type (BUY/SELL), Amount, Price y Fee
+        prices: Precio actual por par (por defecto el de la última transacción del par)
+        as_of: Fecha de referencia para la antigüedad de la posición abierta (por defecto ahora)
+
+    Returns:
+        DataFrame indexado por par con cantidades, importes, costes medios, PnL
+        (ponderado y FIFO), comisiones y periodos de tenencia en días
+    """
+    df = prepare_transactions(transactions)
+    codes, pairs = pd.factorize(df['Pair'], sort=True)
+    n_pairs = len(pairs)
+    if not n_pairs:
+        return pd.DataFrame()
+
+    is_buy = (df['Type'] == 'BUY').to_numpy()
+    is_sell = (df['Type'] == 'SELL').to_numpy()
+    qty = df['Amount'].abs().fillna(0).to_numpy()
+    price = df['Price'].fillna(0).to_numpy()
+    buy_qty = np.where(is_buy, qty, 0.0)
+    sell_qty = np.where(is_sell, qty, 0.0)
+    buy_value = buy_qty * price
+    sell_value = sell_qty * price
+
+    def per_pair(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(codes, weights=weights, minlength=n_pairs)
+
+    last_row = np.r_[np.flatnonzero(np.diff(codes)), len(codes) - 1]
+    first_row = np.r_[0, last_row[:-1] + 1]
+
+    stats = pd.DataFrame(index=pd.Index(pairs, name='Pair'))
+    stats['trades'] = np.bincount(codes, minlength=n_pairs)
+    stats['buy_qty'] = per_pair(buy_qty)
+    stats['buy_value'] = per_pair(buy_value)
+    stats['sell_qty'] = per_pair(sell_qty)
+    stats['sell_value'] = per_pair(sell_value)
+    stats['fees'] = per_pair(df['Fee'].fillna(0).to_numpy())
+    stats['fee_last'] = df['Fee'].astype(str).to_numpy()[last_row]
+    last_price = pd.Series(price[last_row], index=stats.index)
+    if prices:
+        last_price = pd.Series(prices).reindex(stats.index).fillna(last_price)
+    stats['last_price'] = last_price
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats['buy_avg_price'] = np.where(stats['buy_qty'] > 0, stats['buy_value'] / stats['buy_qty'], 0.0)
+        stats['sell_avg_price'] = np.where(stats['sell_qty'] > 0, stats['sell_value'] / stats['sell_qty'], 0.0)
+
+    # Método ponderado: coste medio de todas las compras frente a precio medio de venta
+    stats['position_qty'] = stats['buy_qty'] - stats['sell_qty']
+    stats['net_cost'] = stats['buy_value'] - stats['sell_value']
+    long = stats['position_qty'] > 0
+    stats['avg_cost'] = np.where(long, stats['net_cost'] / stats['position_qty'].where(long, 1), 0.0)
+    stats['realized_pnl'] = (stats['sell_avg_price'] - stats['buy_avg_price']) * stats['sell_qty']
+    stats['unrealized_pnl'] = np.where(long, (stats['last_price'] - stats['avg_cost']) * stats['position_qty'], 0.0)
+
+    # FIFO: cada par ocupa el tramo [2k, 2k+1] del eje x (cantidad comprada acumulada normalizada)
+    cum_buy = _group_cumsum(buy_qty, codes)
+    cum_sell = _group_cumsum(sell_qty, codes)
+    # Lo vendido sin inventario previo queda sin casar (sin coste base) y se descarta:
+    # el exceso acumulado es el máximo corrido de (vendido - comprado)
+    shortfall = pd.Series(np.maximum(cum_sell - cum_buy, 0.0)).groupby(codes).cummax().to_numpy()
+    consumed = cum_sell - shortfall
+    total_buy = stats['buy_qty'].to_numpy()
+    scale = np.where(total_buy > 0, total_buy, 1.0)[codes]
+
+    dates = df['Data'] if 'Data' in df.columns else pd.Series(pd.NaT, index=df.index)
+    first_date = dates.to_numpy()[first_row]
+    days = ((dates - pd.Series(first_date[codes])).dt.total_seconds() / 86400).fillna(0).to_numpy()
+
+    x_rows = 2 * codes + cum_buy / scale
+    xp = np.r_[2.0 * np.arange(n_pairs), x_rows]
+    order = np.argsort(xp, kind='stable')
+    xp = xp[order]
+    cost_curve = np.r_[np.zeros(n_pairs), _group_cumsum(buy_value, codes)][order]
+    time_curve = np.r_[np.zeros(n_pairs), _group_cumsum(buy_qty * days, codes)][order]
+
+    x_consumed = 2 * codes + consumed / scale
+    consumed_cost = np.interp(x_consumed, xp, cost_curve)
+    consumed_time = np.interp(x_consumed, xp, time_curve)
+    matched_qty = _group_diff(consumed, codes)
+    matched_time = _group_diff(consumed_time, codes)
+
+    matched_total = consumed[last_row]
+    cost_total = consumed_cost[last_row]
+    stats['fifo_realized_pnl'] = per_pair(matched_qty * price) - cost_total
+    stats['unmatched_sell_qty'] = stats['sell_qty'] - matched_total
+    stats['fifo_open_qty'] = total_buy - matched_total
+    stats['fifo_open_cost'] = stats['buy_value'] - cost_total
+    open_lots = stats['fifo_open_qty'] > 1e-12
+    safe_open = stats['fifo_open_qty'].where(open_lots, 1)
+    stats['fifo_avg_cost'] = np.where(open_lots, stats['fifo_open_cost'] / safe_open, 0.0)
+    stats['fifo_unrealized_pnl'] = np.where(
+        open_lots, stats['fifo_open_qty'] * stats['last_price'] - stats['fifo_open_cost'], 0.0
+    )
+
+    # Tenencia: días ponderados por cantidad entre compra y venta de las unidades casadas
+    held_days = per_pair(matched_qty * days - matched_time)
+    stats['avg_holding_days'] = np.where(matched_total > 0, held_days / np.where(matched_total > 0, matched_total, 1), 0.0)
+    as_of = pd.Timestamp.now() if as_of is None else pd.Timestamp(as_of)
+    as_of_days = ((as_of - pd.Series(first_date, index=stats.index)).dt.total_seconds() / 86400).fillna(0)
+    open_time = per_pair(buy_qty * days) - consumed_time[last_row]
+    stats['open_age_days'] = np.where(open_lots, as_of_days - open_time / safe_open, 0.0)
+
+    stats['first_trade'] = first_date
+    stats['last_trade'] = dates.to_numpy()[last_row]
+    unmatched = stats.index[stats['unmatched_sell_qty'] > 1e-12]
+    if len(unmatched):
+        logger.warning(f"Ventas sin compras previas en {len(unmatched)} pares (ej: {unmatched[:5].tolist()})")
+    return stats
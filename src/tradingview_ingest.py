@@ -0,0 +1,272 @@
+"""
+Ingesta de Exportaciones del Screener de TradingView
+Lee las tres exportaciones (Datostecnicos, Direcciones, PerdidasyGanancias) con
+tipos explícitos, limpia las columnas numéricas en formato español de forma
+vectorizada, las combina una sola vez por 'Moneda' y cachea el resultado en un
+archivo binario columnar (parquet si hay pyarrow/fastparquet, si no pickle)
+indexado por el hash del contenido de los archivos fuente
+"""
+
+import glob
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TRADINGVIEW_DIR = "TradingViewData"
+CACHE_DIR = "data/cache/tradingview"
+CACHE_VERSION = 2  # Incrementar si cambia el esquema de salida
+
+# Tipo de exportación -> fragmento del nombre de archivo
+EXPORT_KINDS = {
+    'tecnicos': 'Datostecnicos',
+    'direcciones': 'Direcciones',
+    'pnl': 'Perdidas'
+}
+
+# Columnas no numéricas conocidas; el resto (salvo las de texto detectadas) se limpia como número
+TEXT_COLUMNS = {
+    'Moneda': 'string',
+    'Descripción': 'string',
+    'Rating técnico 1 día': 'category',
+    'Categoría': 'category',
+    'Sector': 'category'
+}
+
+_SUFFIXES = {'K': 1e3, 'M': 1e6, 'B': 1e9, 'T': 1e12}
+# Un único separador seguido de exactamente 3 dígitos (450.000, 1,234): miles o decimal según el formato
+_AMBIGUOUS_SEPARATOR = re.compile(r'^-?[1-9]\d{0,2}[.,]\d{3}$')
+DEFAULT_DECIMAL = ','  # Las exportaciones del screener están en formato español
+
+def clean_numeric_series(series: pd.Series, decimal: Optional[str] = None) -> pd.Series:
+    """
+    Convierte a float una columna de texto con formato de TradingView de forma vectorizada
+
+    Admite separadores de miles y decimales en formato español o inglés, signo menos
+    tipográfico, símbolos de moneda/porcentaje y sufijos K/M/B/T. Los valores que se
+    interpretan solos (con ambos separadores, separadores repetidos o grupos que no son
+    de 3 dígitos) fijan su separador decimal; los ambiguos ('450.000', '1,234') usan el
+    separador decimal de la columna, detectado una vez a partir de los no ambiguos
+
+    Args:
+        series: Columna de texto o numérica
+        decimal: Separador decimal de la columna (None = detectarlo; si no hay
+            valores concluyentes se usa DEFAULT_DECIMAL)
+
+    Returns:
+        Serie float64 (NaN donde el valor no es interpretable)
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
+
+    s = series.astype('string').str.strip()
+    s = s.str.replace('−', '-', regex=False).str.replace(r'[\s  $€%USD]', '', regex=True)
+
+    # Sufijos de magnitud (1.23B, 4,5 M)
+    suffix = s.str[-1].str.upper()
+    multiplier = suffix.map(_SUFFIXES).astype('float64').fillna(1.0)
+    s = s.where(~suffix.isin(list(_SUFFIXES)).fillna(False).astype(bool), s.str[:-1])
+
+    commas = s.str.count(',').fillna(0).to_numpy()
+    dots = s.str.count(r'\.').fillna(0).to_numpy()
+    comma_last = (s.str.rfind(',') > s.str.rfind('.')).fillna(False).to_numpy(dtype=bool)
+    ambiguous = s.str.match(_AMBIGUOUS_SEPARATOR).fillna(False).to_numpy(dtype=bool)
+
+    # Separador decimal de cada valor que se interpreta solo ('' si no tiene separadores o es ambiguo)
+    value_decimal = np.select(
+        [
+            (commas > 0) & (dots > 0),   # Con ambos separadores, el último es el decimal
+            (commas > 1) & (dots == 0),  # Comas repetidas: miles (1,234,567)
+            (dots > 1) & (commas == 0),  # Puntos repetidos: miles (1.234.567)
+            (commas == 1) & (dots == 0) & ~ambiguous,
+            (dots == 1) & (commas == 0) & ~ambiguous,
+        ],
+        [np.where(comma_last, ',', '.'), '.', ',', ',', '.'],
+        default=''
+    )
+    if decimal is None:
+        comma_votes, dot_votes = int((value_decimal == ',').sum()), int((value_decimal == '.').sum())
+        decimal = ',' if comma_votes > dot_votes else '.' if dot_votes > comma_votes else DEFAULT_DECIMAL
+    value_decimal = np.where(ambiguous, decimal, value_decimal)
+
+    comma_decimal = pd.Series(value_decimal == ',', index=s.index)
+    dot_decimal = pd.Series(value_decimal == '.', index=s.index)
+    cleaned = s.where(~comma_decimal, s.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    cleaned = cleaned.where(~dot_decimal, cleaned.str.replace(',', '', regex=False))
+
+    values = pd.to_numeric(cleaned, errors='coerce').astype('float64')
+    return values * multiplier.to_numpy()
+
+def find_latest_exports(base_dir: str = TRADINGVIEW_DIR) -> Dict[str, str]:
+    """
+    Localiza las exportaciones más recientes de cada tipo
+
+    Busca en el último subdirectorio TradingView_data_* y, si no existe, en los archivos
+    'Analizador de criptomonedas_<fecha>-<Tipo>.csv' del directorio base
+
+    Args:
+        base_dir: Directorio raíz de las exportaciones
+
+    Returns:
+        Diccionario tipo -> ruta del CSV
+    """
+    if not os.path.exists(base_dir):
+        raise FileNotFoundError(f"Directorio {base_dir} no encontrado")
+
+    subdirs = sorted(d for d in os.listdir(base_dir)
+                     if d.startswith("TradingView_data_") and os.path.isdir(os.path.join(base_dir, d)))
+    search_dirs = [os.path.join(base_dir, subdirs[-1])] if subdirs else [base_dir]
+
+    exports = {}
+    for kind, fragment in EXPORT_KINDS.items():
+        candidates = []
+        for directory in search_dirs:
+            candidates += glob.glob(os.path.join(directory, f"*{fragment}*.csv"))
+        if not candidates:
+            raise FileNotFoundError(f"Exportación '{fragment}' no encontrada en {search_dirs}")
+        exports[kind] = max(candidates)  # Los nombres llevan la fecha: el mayor es el más reciente
+    return exports
+
+_DATE_PATTERN = re.compile(r'(\d{4})-?(\d{2})-?(\d{2})')
+
+def snapshot_date(name: str) -> Optional[str]:
+    """Fecha (YYYY-MM-DD) contenida en el nombre de un directorio o archivo de exportación"""
+    match = _DATE_PATTERN.search(os.path.basename(name))
+    return '-'.join(match.groups()) if match else None
+
+def find_all_exports(base_dir: str = TRADINGVIEW_DIR) -> Dict[str, Dict[str, str]]:
+    """
+    Localiza todas las fotos del screener disponibles, completas (con los tres tipos)
+
+    Args:
+        base_dir: Directorio raíz de las exportaciones
+
+    Returns:
+        Diccionario ordenado fecha -> {tipo: ruta}; si hay varias fotos el mismo día gana la última
+    """
+    if not os.path.exists(base_dir):
+        raise FileNotFoundError(f"Directorio {base_dir} no encontrado")
+
+    candidates = []
+    for entry in sorted(os.listdir(base_dir)):
+        path = os.path.join(base_dir, entry)
+        if entry.startswith("TradingView_data_") and os.path.isdir(path):
+            candidates += glob.glob(os.path.join(path, "*.csv"))
+        elif entry.endswith(".csv"):
+            candidates.append(path)
+
+    snapshots: Dict[str, Dict[str, str]] = {}
+    for path in sorted(candidates):
+        date = snapshot_date(os.path.dirname(path)) if os.path.dirname(path) != base_dir else None
+        date = date or snapshot_date(path)
+        kind = next((k for k, fragment in EXPORT_KINDS.items() if fragment in os.path.basename(path)), None)
+        if date and kind:
+            snapshots.setdefault(date, {})[kind] = path
+    return {date: paths for date, paths in sorted(snapshots.items()) if len(paths) == len(EXPORT_KINDS)}
+
+def sources_hash(paths: Dict[str, str]) -> str:
+    """Hash del contenido de los archivos fuente (y de la versión del esquema)"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(CACHE_VERSION).encode())
+    for kind in sorted(paths):
+        digest.update(kind.encode())
+        with open(paths[kind], 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def _parquet_available() -> bool:
+    for module in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            continue
+    return False
+
+def parse_export(path: str) -> pd.DataFrame:
+    """
+    Lee una exportación con tipos explícitos y columnas numéricas ya limpias
+
+    Args:
+        path: Ruta del CSV
+
+    Returns:
+        DataFrame con Moneda como texto, columnas categóricas y numéricas float64
+    """
+    df = pd.read_csv(path, dtype='string', keep_default_na=True)
+    df.columns = [c.strip() for c in df.columns]
+    for column in df.columns:
+        if column in TEXT_COLUMNS:
+            df[column] = df[column].astype(TEXT_COLUMNS[column])
+            continue
+        values = clean_numeric_series(df[column])
+        present = df[column].notna().sum()
+        # Columnas de texto no catalogadas: se conservan si casi nada es numérico
+        if present and values.notna().sum() < 0.5 * present:
+            df[column] = df[column].astype('string')
+        else:
+            df[column] = values
+    return df
+
+def merge_exports(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Combina las exportaciones por 'Moneda' partiendo de los datos técnicos (sin columnas duplicadas)"""
+    merged = frames['tecnicos'].drop_duplicates('Moneda')
+    for kind in ('direcciones', 'pnl'):
+        extra = frames[kind].drop_duplicates('Moneda')
+        columns = ['Moneda'] + [c for c in extra.columns if c not in merged.columns]
+        merged = merged.merge(extra[columns], on='Moneda', how='left')
+    return merged.reset_index(drop=True)
+
+def load_screener(
+    base_dir: str = TRADINGVIEW_DIR,
+    cache_dir: Optional[str] = CACHE_DIR,
+    paths: Optional[Dict[str, str]] = None
+) -> pd.DataFrame:
+    """
+    Carga la foto del screener combinada y tipada, desde caché si los archivos no han cambiado
+
+    Args:
+        base_dir: Directorio raíz de las exportaciones
+        cache_dir: Directorio de caché (None para desactivarla)
+        paths: Rutas explícitas por tipo (tecnicos, direcciones, pnl)
+
+    Returns:
+        DataFrame combinado con una fila por moneda
+    """
+    paths = paths or find_latest_exports(base_dir)
+    key = sources_hash(paths)
+    use_parquet = _parquet_available()
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"screener_{key}.{'parquet' if use_parquet else 'pkl'}")
+        if os.path.exists(cache_path):
+            logger.debug(f"Screener cargado desde caché: {cache_path}")
+            return pd.read_parquet(cache_path) if use_parquet else pd.read_pickle(cache_path)
+
+    frames = {kind: parse_export(path) for kind, path in paths.items()}
+    screener = merge_exports(frames)
+    logger.info(f"Screener procesado: {len(screener)} monedas de {len(paths)} exportaciones")
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        if use_parquet:
+            screener.to_parquet(tmp_path, index=False)
+        else:
+            screener.to_pickle(tmp_path)
+        os.replace(tmp_path, cache_path)
+    return screener
+
+def load_screener_frames(base_dir: str = TRADINGVIEW_DIR) -> Dict[str, pd.DataFrame]:
+    """Exportaciones tipadas por separado (sin combinar), para código que las necesite sueltas"""
+    return {kind: parse_export(path) for kind, path in find_latest_exports(base_dir).items()}
+
+def numeric_columns(df: pd.DataFrame) -> List[str]:
+    """Columnas numéricas del screener"""
+    return [c for c in df.columns if np.issubdtype(df[c].dtype, np.number)]
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import socket
+from typing import Dict, List, Optional
+
+import numpy as np
+from aiohttp import web
+
+def bind_socket(host: str, port: int = 0) -> socket.socket:
+    """Socket TCP enlazado a host:port (0 = puerto libre) para servirlo con web.SockSite"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind((host, port))
+    return sock
+
+class FixtureServer:
+    """Servidor HTTP local con respuestas fijas (y retardos opcionales) que sustituye a las fuentes reales."""
+
+    def __init__(self, routes: Dict[str, str], delays: Optional[Dict[str, float]] = None, host: str = "127.0.0.1"):
+        self.routes = routes
+        self.delays = delays or {}
+        self.host = host
+        self.base_url = ""
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handler(self, request: web.Request) -> web.Response:
+        path = request.path
+        if self.delays.get(path):
+            await asyncio.sleep(self.delays[path])
+        content_type = "application/json" if path.endswith(".json") else "application/xml"
+        return web.Response(text=self.routes[path], content_type=content_type)
+
+    async def start(self) -> str:
+        """Arranca el servidor en un puerto libre y devuelve su URL base."""
+        app = web.Application()
+        for path in self.routes:
+            app.router.add_get(path, self._handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        sock = bind_socket(self.host)
+        await web.SockSite(self._runner, sock).start()
+        self.base_url = f"http://{self.host}:{sock.getsockname()[1]}"
+        return self.base_url
+
+    async def stop(self):
+        """Detiene el servidor."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+def kline_messages(symbol: str, candles: np.ndarray, interval: str = "1h") -> List[Dict]:
+    """Genera mensajes kline cerrados (formato stream combinado) a partir de velas OHLCV."""
+    messages = []
+    for candle in candles:
+        open_time, o, h, l, c, v = candle[:6]
+        messages.append({
+            "stream": f"{symbol.lower()}@kline_{interval}",
+            "data": {"e": "kline", "s": symbol, "k": {
+                "t": int(open_time), "i": interval, "o": str(o), "h": str(h), "l": str(l),
+                "c": str(c), "v": str(v), "x": True
+            }}
+        })
+    return messages
+
+class ReplayServer:
+    """Servidor WebSocket local que reproduce mensajes grabados como si fuera el exchange."""
+
+    def __init__(self, messages: List[Dict], delay: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.messages = messages
+        self.delay = delay
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handler(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        for message in self.messages:
+            await ws.send_str(json.dumps(message))
+            if self.delay:
+                await asyncio.sleep(self.delay)
+        await ws.close()
+        return ws
+
+    async def start(self) -> str:
+        """Arranca el servidor y devuelve la URL del stream."""
+        app = web.Application()
+        app.router.add_get("/stream", self._handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        sock = bind_socket(self.host, self.port)
+        await web.SockSite(self._runner, sock).start()
+        return f"http://{self.host}:{sock.getsockname()[1]}/stream"
+
+    async def stop(self):
+        """Detiene el servidor."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import logging
+import unittest
+
+from src.collectors import Collector, CollectorRunner, FearGreedCollector, HTTPCollector, RSSCollector
+from tests.fixture_server import FixtureServer
+
+RSS = """<?xml version="1.0"?>
+<rss version="2.0"><channel>
+  <item><title>Bitcoin sube</title><description>Nuevo máximo</description><link>http://x/1</link></item>
+  <item><title>Ethereum baja</title><link>http://x/2</link></item>
+</channel></rss>"""
+
+FNG = json.dumps({"data": [{"value": "75", "value_classification": "Greed", "timestamp": "1700000000"}]})
+
+class EventLog(logging.Handler):
+    """Registra los avisos de timeout en la misma secuencia que los lotes guardados."""
+    def __init__(self, events):
+        super().__init__(logging.WARNING)
+        self.events = events
+
+    def emit(self, record):
+        if "cortado" in record.getMessage():
+            self.events.append(("timeout", record.getMessage()))
+
+class TestCollectorRunner(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.handler = EventLog(self.events)
+        logging.getLogger("src.collectors").addHandler(self.handler)
+
+    def tearDown(self):
+        logging.getLogger("src.collectors").removeHandler(self.handler)
+
+    def sink(self, batch):
+        self.events.append(("batch", batch))
+        return len(batch)
+
+    async def run_with_server(self, coroutine_factory):
+        server = FixtureServer({"/news.xml": RSS, "/fng.json": FNG, "/slow.xml": RSS}, delays={"/slow.xml": 1.5})
+        base = await server.start()
+        try:
+            return await coroutine_factory(base)
+        finally:
+            await server.stop()
+
+    def test_slow_source_is_cut_without_delaying_others(self):
+        """Las fuentes rápidas se guardan según llegan y la lenta se corta en su timeout."""
+        async def scenario(base):
+            runner = CollectorRunner([
+                RSSCollector("news", [f"{base}/news.xml"], tags=["news"]),
+                FearGreedCollector("fng", [f"{base}/fng.json"]),
+                RSSCollector("slow", [f"{base}/slow.xml"], timeout=0.5),
+            ], self.sink)
+            return await runner.run_cycle()
+
+        report = asyncio.run(self.run_with_server(scenario))
+        self.assertEqual(report.results["news"].items, 2)
+        self.assertEqual(report.results["fng"].stored, 1)
+        self.assertEqual(report.results["slow"].status, "timeout")
+        self.assertLess(report.seconds, 2)
+        # Los lotes rápidos llegan al sink antes de que venza el timeout de la fuente lenta
+        kinds = [kind for kind, _ in self.events]
+        self.assertEqual(kinds, ["batch", "batch", "timeout"])
+        batches = {payload[0]["source"]: payload for kind, payload in self.events if kind == "batch"}
+        self.assertAlmostEqual(batches["fng"][0]["sentiment_score"], 0.5)
+
+    def test_overlapping_cycles_are_skipped(self):
+        """Un ciclo lanzado mientras otro sigue en curso se omite."""
+        async def scenario(base):
+            runner = CollectorRunner([RSSCollector("slow", [f"{base}/slow.xml"], timeout=0.3)], self.sink)
+            first, second = await asyncio.gather(runner.run_cycle(), runner.run_cycle())
+            return runner, first, second
+
+        runner, first, second = asyncio.run(self.run_with_server(scenario))
+        self.assertFalse(first.skipped)
+        self.assertTrue(second.skipped)
+        self.assertEqual(runner.skipped_cycles, 1)
+
+class TestCollectorInterface(unittest.TestCase):
+    def test_base_classes_are_abstract(self):
+        """Collector y HTTPCollector no se instancian sin implementar collect() y parse()."""
+        with self.assertRaises(TypeError):
+            Collector("x")
+        with self.assertRaises(TypeError):
+            HTTPCollector("x", [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.storage import get_storage
+
+@unittest.skipUnless(importlib.util.find_spec("apscheduler"), "apscheduler no instalado")
+class TestStoreInsights(unittest.TestCase):
+    def setUp(self):
+        from src.data_market_agent import DataMarketAgent
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "agent.db")
+        self.agent_class = DataMarketAgent
+
+    def tearDown(self):
+        get_storage(self.path).close()
+        self.tmp.cleanup()
+
+    def test_dedup_tags_and_full_text_search(self):
+        """Los contenidos repetidos se ignoran, los tags se normalizan y el texto se indexa."""
+        agent = self.agent_class(self.path)
+        insights = [
+            {"source": "rss", "insight_type": "news", "content": "Bitcoin ETF aprobado por la SEC", "tags": ["BTC", "ETF"]},
+            {"source": "rss", "insight_type": "news", "content": "bitcoin  ETF aprobado por la SEC", "tags": ["btc"]},
+            {"source": "rss", "insight_type": "news", "content": "Solana supera máximos", "tags": ["SOL"]},
+        ]
+        self.assertEqual(agent.store_insights(insights), 2)
+        self.assertEqual(agent.store_insights(insights), 0)
+
+        self.assertEqual([i["content"] for i in agent.get_insights_by_tag("Btc")], ["Bitcoin ETF aprobado por la SEC"])
+        self.assertEqual(len(agent.search_insights("maximos")), 1)
+        self.assertEqual(len(agent.search_insights("etf", tag="sol")), 0)
+        agent.stop()
+
+    def test_search_accepts_free_text(self):
+        """Las consultas que no son sintaxis FTS5 válida se buscan como términos literales."""
+        agent = self.agent_class(self.path)
+        agent.store_insights([
+            {"source": "rss", "insight_type": "news", "content": "El BTC-ETF supera al S&P 500"},
+            {"source": "rss", "insight_type": "news", "content": "Ethereum sube"},
+        ])
+        for query in ("BTC-ETF", "S&P 500", 'ETF "btc', "BTC AND ETF"):
+            self.assertEqual(len(agent.search_insights(query)), 1, query)
+        self.assertEqual(agent.search_insights('"'), [])
+        agent.stop()
+
+    def test_legacy_table_is_migrated(self):
+        """Una tabla creada con el esquema anterior recibe hashes, tags e índice de texto."""
+        conn = sqlite3.connect(self.path)
+        conn.execute("""
+            CREATE TABLE market_insights (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, insight_type TEXT NOT NULL,
+                content TEXT NOT NULL, sentiment_score REAL, relevance_score REAL, url TEXT, tags TEXT,
+                collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("INSERT INTO market_insights (source, insight_type, content, tags) "
+                     "VALUES ('rss', 'news', 'Ethereum sube', 'ETH,l1')")
+        conn.commit()
+        conn.close()
+
+        agent = self.agent_class(self.path)
+        self.assertEqual(len(agent.search_insights("ethereum", tag="eth")), 1)
+        self.assertEqual(agent.store_insights([{"source": "x", "insight_type": "news", "content": "ethereum SUBE"}]), 0)
+        agent.stop()
+
+    def test_default_path_comes_from_database_url(self):
+        """Sin db_path, el agente usa el archivo de DATABASE_URL y su almacenamiento compartido."""
+        with patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{self.path}"}):
+            agent = self.agent_class(collectors=[])
+        self.assertEqual(agent.db_path, self.path)
+        self.assertIs(agent.storage, get_storage(self.path))
+        self.assertEqual(agent.store_insights([{"source": "rss", "insight_type": "news", "content": "Bitcoin sube"}]), 1)
+        agent.stop()
+
+    def test_collection_cycle_stores_collector_results(self):
+        """El ciclo del agente ejecuta los colectores y guarda sus insights."""
+        from src.collectors import RSSCollector
+        from tests.fixture_server import FixtureServer
+        from tests.test_collectors import RSS
+
+        async def scenario():
+            server = FixtureServer({"/news.xml": RSS})
+            base = await server.start()
+            agent = self.agent_class(self.path, collectors=[RSSCollector("news", [f"{base}/news.xml"])])
+            try:
+                # El agente lanza su propio bucle desde el hilo de APScheduler
+                return agent, await asyncio.to_thread(agent.run_collection_cycle)
+            finally:
+                await server.stop()
+
+        agent, report = asyncio.run(scenario())
+        self.assertEqual(report.stored, 2)
+        self.assertEqual(len(agent.search_insights("bitcoin")), 1)
+        agent.stop()
+
+if __name__ == "__main__":
+    unittest.main()
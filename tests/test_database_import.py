@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from src.database_manager import DatabaseManager
+
+class TestBulkImport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.tmp.name, 'test.db')}"
+        with patch.dict(os.environ, {"DATABASE_URL": url}):
+            self.db = DatabaseManager()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_import_validates_deduplicates_and_derives_states(self):
+        """Se descartan filas no válidas y ya guardadas, se conservan las parciales idénticas y se guarda un estado por día."""
+        fills = pd.DataFrame({
+            "Date": ["2024-01-01 10:00", "2024-01-01 12:00", "2024-01-02 09:00", "2024-01-02 09:00", "2024-01-03", None],
+            "Symbol": ["btcusdt", "ETHUSDT", "BTCUSDT", "BTCUSDT", "ETHUSDT", "BTCUSDT"],
+            "Side": ["buy", "buy", "sell", "sell", "buy", "buy"],
+            "Amount": [1.0, 2.0, 0.25, 0.25, -1, 1.0],
+            "Price": [100.0, 10.0, 120.0, 120.0, 11.0, 100.0],
+        })
+        summary = self.db.bulk_import_transactions(fills, source="binance")
+        self.assertEqual(summary, {"read": 6, "valid": 4, "duplicates": 0, "inserted": 4, "states": 2})
+
+        states = self.db.get_portfolio_history()
+        self.assertEqual(len(states), 2)
+        last = json.loads(states.iloc[-1]["positions"])
+        self.assertAlmostEqual(last["BTCUSDT"], 0.5)
+        self.assertAlmostEqual(last["ETHUSDT"], 2.0)
+        self.assertAlmostEqual(states.iloc[-1]["total_value"], 0.5 * 120 + 2 * 10)
+
+        # Reimportar el mismo archivo no duplica transacciones (tampoco las parciales idénticas)
+        again = self.db.bulk_import_transactions(fills, source="binance")
+        self.assertEqual((again["duplicates"], again["inserted"]), (4, 0))
+        self.assertEqual(len(self.db.get_transaction_history()), 4)
+
+    def test_states_include_stored_transactions_inside_the_window(self):
+        """Los estados se recalculan con las transacciones ya guardadas dentro y después del rango importado."""
+        self.db.bulk_import_transactions(pd.DataFrame({
+            "Date": ["2024-01-02"], "Symbol": ["BTC"], "Amount": [5.0], "Price": [100.0]
+        }))
+        summary = self.db.bulk_import_transactions(pd.DataFrame({
+            "Date": ["2024-01-01", "2024-01-03"], "Symbol": ["BTC", "BTC"], "Amount": [1.0, 1.0], "Price": [90.0, 110.0]
+        }))
+        self.assertEqual(summary["states"], 3)
+
+        states = self.db.get_portfolio_history().sort_values("timestamp")
+        self.assertEqual(len(states), 3)
+        positions = [json.loads(p)["BTC"] for p in states["positions"]]
+        self.assertEqual(positions, [1.0, 6.0, 7.0])
+        self.assertAlmostEqual(states.iloc[-1]["total_value"], 7 * 110)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from src.dca_schedule import (
+    PurchaseSchedule, build_price_matrix, compile_schedule, next_execution_date, simulate_dca
+)
+
+class TestCompileSchedule(unittest.TestCase):
+    def setUp(self):
+        """Índice diario de prueba (enero-marzo 2024)."""
+        self.index = pd.date_range('2024-01-01', '2024-03-31', freq='D')
+
+    def test_weekly_matches_pandas_weekly(self):
+        """El calendario semanal en domingo equivale a freq='W'."""
+        rows = compile_schedule(self.index, PurchaseSchedule(frequency='weekly', weekday=6))
+        expected = pd.date_range(self.index[0], self.index[-1], freq='W')
+        self.assertTrue((self.index[rows] == expected).all())
+
+    def test_weekly_tuesday(self):
+        """Todas las compras caen en martes."""
+        rows = compile_schedule(self.index, PurchaseSchedule(frequency='weekly', weekday=1))
+        self.assertTrue(all(d.weekday() == 1 for d in self.index[rows]))
+
+    def test_monthly_clips_to_month_end(self):
+        """El día 31 se ajusta al último día de cada mes."""
+        rows = compile_schedule(self.index, PurchaseSchedule(frequency='monthly', day_of_month=31))
+        self.assertEqual(list(self.index[rows].strftime('%Y-%m-%d')), ['2024-01-31', '2024-02-29', '2024-03-31'])
+
+    def test_custom_dates_roll_forward(self):
+        """Las fechas sin cotización pasan a la siguiente fila disponible."""
+        index = self.index.drop(pd.Timestamp('2024-01-10'))
+        schedule = PurchaseSchedule(frequency='custom', dates=['2024-01-10', '2024-02-01'])
+        rows = compile_schedule(index, schedule)
+        self.assertEqual(list(index[rows].strftime('%Y-%m-%d')), ['2024-01-11', '2024-02-01'])
+
+        schedule.roll_forward = False
+        rows = compile_schedule(index, schedule)
+        self.assertEqual(list(index[rows].strftime('%Y-%m-%d')), ['2024-02-01'])
+
+    def test_next_execution_date(self):
+        """Martes después de las 16:00 pasa al martes siguiente."""
+        tuesday_evening = datetime(2025, 1, 7, 17, 0)
+        self.assertEqual(next_execution_date(tuesday_evening, weekday=1), datetime(2025, 1, 14, 16, 0))
+        monday = datetime(2025, 1, 6, 9, 0)
+        self.assertEqual(next_execution_date(monday, weekday=1), datetime(2025, 1, 7, 16, 0))
+
+class TestSimulateDCA(unittest.TestCase):
+    def setUp(self):
+        """Matriz de precios con un activo que empieza a cotizar tarde."""
+        index = pd.date_range('2024-01-01', periods=4, freq='D')
+        self.prices = build_price_matrix({
+            'AAA': pd.DataFrame({'close': [10.0, 20.0, 40.0, 20.0]}, index=index),
+            'BBB': pd.DataFrame({'close': [5.0, 5.0]}, index=index[2:])
+        })
+        self.rows = np.arange(4)
+
+    def test_matches_per_symbol_loop(self):
+        """El resultado vectorizado coincide con el bucle por símbolo."""
+        result = simulate_dca(self.prices, self.rows, np.array([0.5, 0.5]), 100.0)
+        self.assertAlmostEqual(result['coins'][0], 50 / 10 + 50 / 20 + 50 / 40 + 50 / 20)
+        self.assertAlmostEqual(result['invested'][0], 200.0)
+        self.assertAlmostEqual(result['invested'][1], 100.0)  # Solo 2 compras válidas
+        self.assertAlmostEqual(result['final_value'][1], 20 * 5.0)
+
+    def test_many_weight_vectors(self):
+        """Se pueden evaluar muchos vectores de pesos a la vez."""
+        weights = np.random.dirichlet(np.ones(2), size=1000)
+        result = simulate_dca(self.prices, self.rows, weights, 100.0)
+        self.assertEqual(result['coins'].shape, (1000, 2))
+        single = simulate_dca(self.prices, self.rows, weights[7], 100.0)
+        np.testing.assert_allclose(result['final_value'][7], single['final_value'])
+
+if __name__ == "__main__":
+    unittest.main()
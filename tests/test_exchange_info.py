@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from decimal import Decimal
+
+from src.exchange_info import ExchangeInfoCache
+
+EXCHANGE_INFO = {
+    "symbols": [{
+        "symbol": "BTCUSDT",
+        "status": "TRADING",
+        "filters": [
+            {"filterType": "PRICE_FILTER", "minPrice": "0.01", "maxPrice": "1000000.00", "tickSize": "0.01"},
+            {"filterType": "LOT_SIZE", "minQty": "0.00001", "maxQty": "9000.00000", "stepSize": "0.00001"},
+            {"filterType": "NOTIONAL", "minNotional": "5.00"}
+        ]
+    }]
+}
+
+class TestExchangeInfoCache(unittest.TestCase):
+    def setUp(self):
+        """Caché sin conexión a partir de un snapshot local."""
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "exchange_info.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(EXCHANGE_INFO, f)
+        self.cache = ExchangeInfoCache(path, offline=True)
+        self.cache.refresh()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_quantity_and_price_rounding_is_exact(self):
+        """Cantidad y precio se ajustan a step y tick sin errores de coma flotante."""
+        filters = self.cache.get("BTCUSDT")
+        self.assertEqual(filters.round_quantity(0.000299999), Decimal("0.00029"))
+        self.assertEqual(filters.round_price("42000.019", "BUY"), Decimal("42000.01"))
+        self.assertEqual(filters.round_price("42000.011", "SELL"), Decimal("42000.02"))
+
+    def test_batch_filters_reject_small_orders(self):
+        """El lote se ajusta y las órdenes bajo el nocional mínimo se rechazan."""
+        accepted, rejected = self.cache.apply_filters([
+            {"symbol": "BTCUSDT", "type": "BUY", "quantity": 0.0012345, "price": 42000.0, "value": 30.0},
+            {"symbol": "BTCUSDT", "type": "BUY", "quantity": 0.0001, "price": 42000.0},
+        ])
+        self.assertEqual(len(accepted), 1)
+        self.assertEqual(accepted[0]["quantity_str"], "0.00123")
+        self.assertAlmostEqual(accepted[0]["notional"], 0.00123 * 42000)
+        self.assertEqual(accepted[0]["value"], 30.0)  # El tope de la estrategia no se sobrescribe
+        self.assertEqual(len(rejected), 1)
+        self.assertIn("nocional", rejected[0]["reject_reason"])
+
+    def test_fetch_failure_falls_back_to_snapshot(self):
+        """Si la descarga falla se usa el snapshot aunque haya caducado."""
+        def failing_fetch():
+            raise ConnectionError("sin red")
+        cache = ExchangeInfoCache(self.cache.snapshot_path, ttl_seconds=0, fetcher=failing_fetch)
+        cache.refresh()
+        self.assertEqual(cache.get("BTCUSDT").step_size, Decimal("0.00001"))
+
+    def test_filters_do_not_fetch_and_refresh_runs_off_the_loop(self):
+        """apply_filters no descarga nada; refresh_async descarga en un hilo aparte."""
+        threads = []
+        def fetch():
+            threads.append(threading.current_thread())
+            return EXCHANGE_INFO
+        cache = ExchangeInfoCache(os.path.join(self.tmp.name, "fresh.json"), fetcher=fetch)
+        order = {"symbol": "BTCUSDT", "type": "BUY", "quantity": 0.0012345, "price": 42000.0}
+
+        accepted, _ = cache.apply_filters([order])
+        self.assertEqual(threads, [])
+        self.assertEqual(accepted[0]["quantity_str"], "0.0012345")  # Filtros por defecto
+
+        asyncio.run(cache.refresh_async())
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+        self.assertEqual(cache.apply_filters([order])[0][0]["quantity_str"], "0.00123")
+
+if __name__ == "__main__":
+    unittest.main()
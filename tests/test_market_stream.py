@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.market_stream import CandleBuffer, IncrementalIndicators, MarketStream
+from src.ticker_snapshot import TickerSnapshotProvider
+from tests.fixture_server import ReplayServer, kline_messages
+
+def make_candles(count: int, start_price: float = 100.0) -> np.ndarray:
+    """Velas horarias sintéticas con paseo aleatorio."""
+    rng = np.random.default_rng(7)
+    closes = start_price * np.cumprod(1 + rng.normal(0, 0.01, count))
+    open_times = 1_700_000_000_000 + np.arange(count) * 3_600_000
+    return np.column_stack([open_times, closes, closes * 1.01, closes * 0.99, closes, rng.uniform(1, 10, count)])
+
+class TestCandleBuffer(unittest.TestCase):
+    def test_ring_buffer_keeps_latest_in_order(self):
+        """El buffer conserva las últimas velas en orden y actualiza la vela abierta."""
+        buffer = CandleBuffer(capacity=3)
+        for t in range(5):
+            buffer.upsert([t, 1, 1, 1, t, 1])
+        self.assertFalse(buffer.upsert([4, 1, 1, 1, 9, 1]))
+        np.testing.assert_array_equal(buffer.column("open_time"), [2, 3, 4])
+        np.testing.assert_array_equal(buffer.column("close"), [2, 3, 9])
+
+class TestIncrementalIndicators(unittest.TestCase):
+    def test_macd_matches_pandas_ewm(self):
+        """El MACD incremental coincide con el cálculo completo de pandas."""
+        closes = make_candles(120)[:, 4]
+        indicators = IncrementalIndicators()
+        for close in closes:
+            indicators.update(close)
+
+        series = pd.Series(closes)
+        macd = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+        signal = macd.ewm(span=9, adjust=False).mean()
+        self.assertAlmostEqual(indicators.macd, macd.iloc[-1], places=8)
+        self.assertAlmostEqual(indicators.signal, signal.iloc[-1], places=8)
+        self.assertTrue(0 <= indicators.rsi <= 100)
+
+class TestMarketStream(unittest.TestCase):
+    def test_replay_server_feeds_buffers_and_ticker(self):
+        """Un servidor de repetición local alimenta buffers, indicadores y la foto de tickers."""
+        candles = make_candles(50)
+        messages = kline_messages("BTCUSDT", candles)
+        messages.append({"stream": "btcusdt@miniTicker", "data": {
+            "e": "24hrMiniTicker", "s": "BTCUSDT", "c": "105.0", "o": "100.0", "q": "123456.0"
+        }})
+        provider = TickerSnapshotProvider(fetcher=lambda symbols: [])
+
+        async def scenario():
+            server = ReplayServer(messages)
+            url = await server.start()
+            stream = MarketStream(["BTCUSDT"], url=url, buffer_size=40, ticker_provider=provider)
+            task = asyncio.create_task(stream.run(reconnect_delay=0.05))
+            try:
+                for _ in range(200):
+                    if stream.messages_received >= len(messages):
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                stream.stop()
+                await asyncio.gather(task, return_exceptions=True)
+                await server.stop()
+            return stream
+
+        stream = asyncio.run(scenario())
+        data = stream.market_data()["BTCUSDT"]
+        self.assertEqual(len(data["historical"]["prices"]), 40)
+        np.testing.assert_allclose(data["historical"]["prices"], candles[-40:, 4])
+        self.assertEqual(data["indicators"]["candles"], 50)
+        self.assertAlmostEqual(data["change_24h"], 5.0)
+        self.assertEqual(provider.get_prices(["BTCUSDT"]), {"BTCUSDT": 105.0})
+
+    def test_warmup_keeps_open_kline_out_of_indicators(self):
+        """La última vela REST sigue abierta: entra en el buffer y cuenta una sola vez al cerrarla el stream."""
+        candles = make_candles(30)
+        klines = [[int(c[0]), *map(str, c[1:6]), int(c[0]) + 3_599_999] for c in candles]
+        now_ms = candles[-1, 0] + 1_000
+        stream = MarketStream(["BTCUSDT"], ticker_provider=TickerSnapshotProvider(fetcher=lambda symbols: []))
+        stream.apply_klines("BTCUSDT", klines, now_ms=now_ms)
+        self.assertEqual(len(stream.state["BTCUSDT"].buffer), 30)
+        self.assertEqual(stream.state["BTCUSDT"].indicators.count, 29)
+
+        for message in kline_messages("BTCUSDT", candles[-1:]):
+            stream.handle_message(message)
+        self.assertEqual(stream.state["BTCUSDT"].indicators.count, 30)
+        self.assertEqual(len(stream.state["BTCUSDT"].buffer), 30)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from src.order_executor import MockExchange, OrderExecutor, OrderRejectedError, make_client_order_id
+
+def make_orders(count: int) -> list:
+    """Lote de órdenes de compra simuladas."""
+    return [
+        {"symbol": f"SYM{i}USDT", "type": "BUY", "quantity": 1.0 + i, "price": 10.0}
+        for i in range(count)
+    ]
+
+class TestOrderExecutor(unittest.TestCase):
+    def test_client_ids_are_deterministic(self):
+        """El mismo run_id produce los mismos client order IDs."""
+        first = make_client_order_id("202507081600", "BTCUSDT", "BUY")
+        self.assertEqual(first, make_client_order_id("202507081600", "BTCUSDT", "BUY"))
+        self.assertNotEqual(first, make_client_order_id("202507081600", "BTCUSDT", "SELL"))
+        self.assertNotEqual(first, make_client_order_id("202507151600", "BTCUSDT", "BUY"))
+        self.assertLessEqual(len(first), 36)
+
+    def test_orders_run_concurrently_and_keep_order(self):
+        """Las órdenes se envían en paralelo y los resultados respetan el orden de entrada."""
+        exchange = MockExchange(latency=0.1)
+        executor = OrderExecutor(exchange, max_concurrency=10, max_orders_per_second=100)
+        orders = make_orders(10)
+
+        start = time.perf_counter()
+        results = asyncio.run(executor.execute(orders, "run1"))
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.6)  # En serie serían ~1s
+        self.assertEqual([r["symbol"] for r in results], [o["symbol"] for o in orders])
+        self.assertTrue(all(r["status"] == "success" for r in results))
+
+    def test_retries_are_idempotent(self):
+        """Los reintentos reutilizan el client order ID y no duplican ejecuciones."""
+        exchange = MockExchange(latency=0.0, transient_failures=2)
+        executor = OrderExecutor(exchange, max_retries=3, retry_backoff=0.0)
+        orders = make_orders(3)
+
+        results = asyncio.run(executor.execute(orders, "run2"))
+        self.assertTrue(all(r["status"] == "success" for r in results))
+        self.assertEqual(len(exchange.orders), 3)
+
+        # Reenviar el mismo lote devuelve las ejecuciones existentes
+        again = asyncio.run(executor.execute(orders, "run2"))
+        self.assertEqual([r["order_id"] for r in again], [r["order_id"] for r in results])
+        self.assertEqual(len(exchange.orders), 3)
+        self.assertEqual(len(exchange.executions), 3)
+
+    def test_lost_response_is_not_executed_twice(self):
+        """Si el timeout llega tras ejecutarse la orden, el reintento la encuentra en lugar de reenviarla."""
+        exchange = MockExchange(latency=0.0, lost_responses=1)
+        executor = OrderExecutor(exchange, max_retries=3, retry_backoff=0.0)
+
+        results = asyncio.run(executor.execute(make_orders(3), "run5"))
+        self.assertTrue(all(r["status"] == "success" for r in results))
+        self.assertEqual(len(exchange.executions), 3)
+
+    def test_mock_accepts_reused_id_of_filled_order(self):
+        """Como Binance, el mock solo rechaza un client order ID repetido mientras la orden está abierta."""
+        exchange = MockExchange(latency=0.0)
+        order = make_orders(1)[0]
+
+        async def scenario():
+            await exchange.submit_order(order, "dca_x")
+            await exchange.submit_order(order, "dca_x")
+            exchange.orders["dca_x"]["order_status"] = "NEW"
+            await exchange.submit_order(order, "dca_x")
+
+        with self.assertRaises(OrderRejectedError):
+            asyncio.run(scenario())
+        self.assertEqual(len(exchange.executions), 2)
+
+    def test_retry_with_reordered_batch_reuses_ids(self):
+        """Un reintento con las órdenes reordenadas (o un lote más corto) reutiliza los mismos IDs."""
+        exchange = MockExchange(latency=0.0)
+        executor = OrderExecutor(exchange)
+        orders = make_orders(4)
+
+        first = asyncio.run(executor.execute(orders, "run3"))
+        retry = asyncio.run(executor.execute(list(reversed(orders[1:])), "run3"))
+        ids = {r["symbol"]: r["client_order_id"] for r in first}
+        self.assertEqual({r["symbol"]: r["client_order_id"] for r in retry}, {s: ids[s] for s in ids if s != "SYM0USDT"})
+        self.assertEqual(len(exchange.orders), 4)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(executor.execute(orders[:1] * 2, "run4"))
+
+class TestLiveTraderCycles(unittest.TestCase):
+    def setUp(self):
+        try:
+            from src.dca_live_trader import LiveDCATrader
+        except Exception as e:  # La configuración por defecto de config_models puede no validar
+            self.skipTest(f"src.dca_live_trader no importable: {e}")
+        self.exchange = MockExchange(latency=0.0)
+        self.trader = LiveDCATrader({
+            "portfolio_weights": {"BTCUSDT": 0.5, "ETHUSDT": 0.5},
+            "exchange": self.exchange,
+            "exchange_info_offline": True,
+            "exchange_info_path": "/nonexistent/exchange_info.json"
+        })
+        self.orders = [
+            {"symbol": "BTCUSDT", "type": "BUY", "quantity": 0.001, "price": 42000.0},
+            {"symbol": "ETHUSDT", "type": "BUY", "quantity": 0.02, "price": 2200.0},
+        ]
+
+    def test_consecutive_cycles_use_distinct_ids(self):
+        """Cada ejecución programada usa su propio run_id y la siguiente no reutiliza las órdenes anteriores."""
+        self.trader.next_execution_date = datetime(2025, 1, 7, 16, 0)
+        first = asyncio.run(self.trader._execute_orders(self.orders))
+        second = asyncio.run(self.trader._execute_orders(self.orders))
+
+        self.assertGreater(self.trader.next_execution_date, datetime(2025, 1, 7, 16, 0))
+        self.assertTrue({r["client_order_id"] for r in first}.isdisjoint(r["client_order_id"] for r in second))
+        self.assertEqual(len(self.exchange.orders), 4)
+
+    def test_successful_batch_waits_for_next_schedule(self):
+        """Tras un lote completo la ejecución deja de estar pendiente hasta el siguiente martes."""
+        self.trader.next_execution_date = datetime(2025, 1, 7, 16, 0)
+        self.assertTrue(self.trader.is_due())
+        self.assertFalse(self.trader.is_due(datetime(2025, 1, 7, 15, 59)))
+
+        asyncio.run(self.trader._execute_orders(self.orders))
+        self.assertFalse(self.trader.is_due())
+        self.assertEqual(self.trader.next_execution_date.weekday(), 1)
+        self.assertLess(self.trader.next_execution_date - datetime.now(), timedelta(days=7))
+
+    def test_prices_reuse_prefetched_snapshot_off_the_loop(self):
+        """Con price_max_age el trader reutiliza la foto de la descarga anticipada y no bloquea el bucle."""
+        from src.dca_live_trader import LiveDCATrader
+        from src.ticker_snapshot import TickerSnapshotProvider
+        threads = []
+
+        def fetcher(symbols):
+            threads.append(threading.current_thread())
+            return [{"symbol": s, "lastPrice": "10"} for s in symbols or []]
+
+        provider = TickerSnapshotProvider(max_age_seconds=30, fetcher=fetcher)
+        snapshot = provider.get_snapshot(["BTCUSDT", "ETHUSDT"])
+        snapshot.taken_at -= 150  # Foto tomada al inicio de la descarga anticipada
+        snapshot.symbol_taken_at = {s: t - 150 for s, t in snapshot.symbol_taken_at.items()}
+        trader = LiveDCATrader({
+            "portfolio_weights": {"BTCUSDT": 0.5, "ETHUSDT": 0.5},
+            "price_snapshot": provider,
+            "price_max_age": 240,
+            "exchange_info_offline": True,
+            "exchange_info_path": "/nonexistent/exchange_info.json"
+        })
+
+        asyncio.run(trader._update_current_prices())
+        self.assertEqual(trader.current_prices, {"BTCUSDT": 10.0, "ETHUSDT": 10.0})
+        self.assertEqual(len(threads), 1)
+
+        trader.price_max_age = None  # Con la antigüedad del proveedor se descarga de nuevo, en un hilo
+        asyncio.run(trader._update_current_prices())
+        self.assertEqual(len(threads), 2)
+        self.assertIsNot(threads[1], threading.main_thread())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from src.performance_monitor import LatencyHistogram, PerformanceMonitor, RunningStats
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles_are_within_bucket_resolution(self):
+        """Los percentiles aproximados quedan dentro de la resolución de un bucket."""
+        values = np.random.default_rng(3).lognormal(mean=-2, sigma=1, size=5000)
+        hist = LatencyHistogram()
+        for value in values:
+            hist.record(value)
+
+        self.assertEqual(hist.count, 5000)
+        self.assertAlmostEqual(hist.mean, values.mean(), places=9)
+        for q in (50, 90, 99):
+            exact = np.percentile(values, q)
+            self.assertGreaterEqual(hist.percentile(q), exact * 0.99)
+            self.assertLessEqual(hist.percentile(q), exact * 1.25 * 1.01)
+
+    def test_memory_is_fixed(self):
+        """El número de buckets no crece con las observaciones."""
+        hist = LatencyHistogram()
+        buckets = len(hist.counts)
+        for value in (0.0001, 5.0, 10_000.0):
+            hist.record(value)
+        self.assertEqual(len(hist.counts), buckets)
+        self.assertEqual(hist.summary()["max"], 10_000.0)
+
+class TestSpans(unittest.TestCase):
+    def setUp(self):
+        self.monitor = PerformanceMonitor()
+
+    def test_nested_and_concurrent_spans(self):
+        """Los spans anidados registran su ruta y los concurrentes con el mismo nombre no se pisan."""
+        @self.monitor.timed("fetch")
+        async def fetch(delay):
+            await asyncio.sleep(delay)
+
+        async def cycle():
+            with self.monitor.span("cycle"):
+                await asyncio.gather(fetch(0.05), fetch(0.1))
+
+        asyncio.run(cycle())
+        fetches = self.monitor.spans["cycle/fetch"]
+        self.assertEqual(fetches.count, 2)
+        self.assertGreaterEqual(fetches.min, 0.04)
+        self.assertGreaterEqual(fetches.max, 0.09)
+        self.assertEqual(self.monitor.spans["cycle"].count, 1)
+
+    def test_interleaved_operations_are_paired_by_token(self):
+        """Dos ejecuciones solapadas del mismo nombre terminan en cualquier orden con su propia duración."""
+        slow = self.monitor.start_operation("sync")
+        time.sleep(0.05)
+        fast = self.monitor.start_operation("sync")
+        self.assertGreaterEqual(self.monitor.end_operation(slow), 0.05)
+        self.assertLess(self.monitor.end_operation(fast), 0.05)
+        self.assertEqual(self.monitor.operation_times["sync"].count, 2)
+
+    def test_errors_are_counted_and_exported(self):
+        """Las excepciones incrementan un contador y la exportación Prometheus es coherente."""
+        with self.assertRaises(ValueError):
+            with self.monitor.span("db.save"):
+                raise ValueError("fallo")
+
+        text = self.monitor.export_prometheus()
+        self.assertIn('dca_span_duration_seconds_count{span="db.save",path="db.save"} 1', text)
+        self.assertIn('dca_span_duration_seconds_bucket{span="db.save",path="db.save",le="+Inf"} 1', text)
+        self.assertIn('dca_events_total{name="db.save.errors"} 1', text)
+        self.assertEqual(self.monitor.export_json()["spans"]["db.save"]["count"], 1)
+
+class TestBoundedStorage(unittest.TestCase):
+    def test_running_stats_match_numpy(self):
+        """Media y varianza acumuladas coinciden con el cálculo sobre todo el historial."""
+        values = np.random.default_rng(5).normal(2.0, 0.5, 1000)
+        stats = RunningStats()
+        for value in values:
+            stats.update(value)
+        self.assertAlmostEqual(stats.mean, values.mean(), places=9)
+        self.assertAlmostEqual(stats.variance, values.var(ddof=1), places=9)
+        self.assertEqual((stats.min, stats.max, stats.last), (values.min(), values.max(), values[-1]))
+
+    def test_history_is_bounded_and_rolled_up(self):
+        """Las ventanas no crecen y el volcado periódico se puede recargar."""
+        with tempfile.TemporaryDirectory() as tmp:
+            monitor = PerformanceMonitor(
+                history_size=10,
+                rollup_path=os.path.join(tmp, "rollup.jsonl"),
+                metrics_file=os.path.join(tmp, "metrics.json")
+            )
+            for i in range(500):
+                monitor.end_operation(monitor.start_operation("cycle"))
+                monitor.record_success(i % 10 != 0)
+            self.assertEqual(len(monitor.metrics["execution_times"]), 10)
+            self.assertEqual(monitor.operation_times["cycle"].count, 500)
+            self.assertAlmostEqual(monitor.metric_stats["success_rates"].mean, 90.0)
+
+            self.assertTrue(monitor.maybe_rollup(force=True))
+            self.assertFalse(monitor.maybe_rollup())
+            with open(os.path.join(tmp, "rollup.jsonl")) as f:
+                self.assertEqual(len(f.readlines()), 1)
+
+            restored = PerformanceMonitor(history_size=10, metrics_file=os.path.join(tmp, "metrics.json"))
+            restored.load_metrics()
+            self.assertEqual(restored.operation_times["cycle"].count, 500)
+            self.assertEqual(len(restored.metrics["execution_times"]), 10)
+            self.assertAlmostEqual(restored.metric_stats["success_rates"].mean, 90.0)
+            self.assertEqual(restored.spans["cycle"].summary(), monitor.spans["cycle"].summary())
+            restored.spans["cycle"].record(1.0)
+            self.assertEqual(restored.spans["cycle"].count, 501)
+
+    def test_rollup_log_is_rotated(self):
+        """El histórico JSONL se rota al superar su tamaño máximo y conserva un número fijo de copias."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rollup.jsonl")
+            monitor = PerformanceMonitor(
+                rollup_path=path, metrics_file=os.path.join(tmp, "metrics.json"),
+                rollup_max_bytes=1, rollup_backups=2
+            )
+            for _ in range(4):
+                monitor.maybe_rollup(force=True)
+            self.assertEqual(sorted(os.listdir(tmp)), ["metrics.json", "rollup.jsonl", "rollup.jsonl.1", "rollup.jsonl.2"])
+            with open(path) as f:
+                self.assertEqual(len(f.readlines()), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from dca_schedule import PurchaseSchedule
+from portfolio_evaluator import PortfolioBatchEvaluator, stack_allocations
+
+DATES = pd.date_range("2024-01-01", periods=20, freq="D")
+
+class FakePriceStore:
+    """Almacén de precios en memoria: OLD cotiza desde el inicio y NEW desde el día 10."""
+
+    def __init__(self):
+        self.calls = []
+        new = np.full(20, np.nan)
+        new[10:15], new[15:] = 20.0, 40.0
+        self.prices = pd.DataFrame({"OLD": 10.0, "NEW": new}, index=DATES)
+
+    def get_price_matrix(self, symbols, start_date=None, end_date=None, common_window=True):
+        self.calls.append(common_window)
+        prices = self.prices.reindex(columns=symbols)
+        if common_window:
+            prices = prices.dropna()
+        return prices
+
+def definition(portfolio_id, allocation):
+    return SimpleNamespace(id=portfolio_id, name=portfolio_id.upper(), allocation=allocation)
+
+class TestStackAllocations(unittest.TestCase):
+    def test_weights_matrix_is_aligned(self):
+        """Las asignaciones se apilan en una matriz (portafolios × activos) con ceros donde faltan."""
+        weights = stack_allocations([definition("a", {"OLD": 1.0}), definition("b", {"NEW": 0.4, "OLD": 0.6})])
+        self.assertEqual(list(weights.columns), ["NEW", "OLD"])
+        self.assertEqual(weights.loc["a"].tolist(), [0.0, 1.0])
+        self.assertEqual(weights.loc["b"].tolist(), [0.4, 0.6])
+
+class TestPortfolioBatchEvaluator(unittest.TestCase):
+    def test_young_asset_is_held_as_cash_without_cutting_the_window(self):
+        """Un activo joven no recorta la ventana de los demás: su parte se mantiene en efectivo hasta que cotiza."""
+        store = FakePriceStore()
+        evaluator = PortfolioBatchEvaluator(
+            definitions=[
+                definition("old", {"OLD": 1.0}),
+                definition("mixed", {"OLD": 0.5, "NEW": 0.5}),
+                definition("new", {"NEW": 1.0}),
+            ],
+            price_store=store,
+            schedule=PurchaseSchedule(frequency="custom", dates=[DATES[0], DATES[5], DATES[10], DATES[15]]),
+            weekly_investment=100.0
+        )
+        result = evaluator.evaluate()
+
+        self.assertEqual(store.calls, [False])
+        self.assertEqual(len(result.equity_curves), 20)
+        self.assertEqual(result.invested.iloc[-1], 400.0)
+        final = result.equity_curves.iloc[-1]
+        # OLD a precio constante conserva lo invertido
+        self.assertAlmostEqual(final["old"], 400.0)
+        # mixed: 200 en OLD, 100 en efectivo de NEW (días 0 y 5) y 2.5 + 1.25 NEW valorados a 40
+        self.assertAlmostEqual(final["mixed"], 200.0 + 100.0 + 3.75 * 40.0)
+        # new: 200 en efectivo y 5 + 2.5 NEW valorados a 40
+        self.assertAlmostEqual(final["new"], 200.0 + 7.5 * 40.0)
+        # Antes de cotizar NEW no tiene precio: su parte vale exactamente lo aportado
+        self.assertAlmostEqual(result.equity_curves["new"].iloc[9], 200.0)
+        self.assertEqual(result.summary.index[0], "new")
+
+if __name__ == "__main__":
+    unittest.main()
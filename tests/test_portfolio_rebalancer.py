@@ -0,0 +1,91 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from price_feed import StaticPriceProvider
+from snapshot_store import SnapshotStore
+
+try:
+    from portfolio_manager import PortfolioDefinition, PortfolioSnapshot
+    from portfolio_rebalancer import PortfolioRebalancer
+except Exception:  # config_models valida la configuración por defecto al importarse
+    PortfolioRebalancer = None
+
+@unittest.skipIf(PortfolioRebalancer is None, "config_models no se puede importar")
+class TestComputeDrift(unittest.TestCase):
+    def setUp(self):
+        """Tres portafolios 50/50 o 100% ETH con BTC subiendo de 100 a 150 desde julio."""
+        self.tmp = tempfile.TemporaryDirectory()
+        now = datetime.now()
+        half = {"BTC": 0.5, "ETH": 0.5}
+        self.portfolios = {
+            "drift": PortfolioDefinition("drift", "Drift", "balanced", "", half, last_rebalance="2025-07-01T00:00:00"),
+            "recent": PortfolioDefinition("recent", "Recent", "balanced", "", half,
+                                          last_rebalance=(now - timedelta(days=2)).isoformat()),
+            "calm": PortfolioDefinition("calm", "Calm", "conservative", "", {"ETH": 1.0},
+                                        created_date=(now - timedelta(days=40)).isoformat()),
+        }
+        store = SnapshotStore(os.path.join(self.tmp.name, "snapshots.db"))
+        store.save_snapshots([PortfolioSnapshot(
+            "recent", now.isoformat(), 12500.0,
+            {"BTC": {"amount": 50.0}, "ETH": {"amount": 500.0}}, 0.0, 0.0, 0.0, {}
+        )])
+        pm = SimpleNamespace(
+            portfolios=self.portfolios,
+            snapshot_store=store,
+            get_active_portfolios=lambda: list(self.portfolios.values())
+        )
+        history = pd.DataFrame({"BTC": [100.0], "ETH": [10.0]}, index=pd.to_datetime(["2025-07-01"]))
+        config = SimpleNamespace(trading=SimpleNamespace(weekly_investment=100.0))
+
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        try:
+            with patch("portfolio_rebalancer.load_config", return_value=config), \
+                 patch("portfolio_rebalancer.PortfolioManager", return_value=pm):
+                self.rebalancer = PortfolioRebalancer(StaticPriceProvider({"BTC": 150.0, "ETH": 10.0}, history))
+        finally:
+            os.chdir(cwd)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_drift_and_classification(self):
+        """Los pesos derivan con los precios y cada portafolio se clasifica por su regla."""
+        report = self.rebalancer.compute_drift()
+        summary = report.summary
+
+        self.assertAlmostEqual(report.current_weights.loc["drift", "BTC"], 0.6)
+        self.assertAlmostEqual(report.current_weights.loc["recent", "BTC"], 0.6)
+        self.assertAlmostEqual(report.total_values["drift"], 12500.0)
+        self.assertAlmostEqual(summary.loc["drift", "max_deviation"], 0.1)
+        self.assertAlmostEqual(summary.loc["calm", "max_deviation"], 0.0)
+
+        self.assertTrue(summary.loc["drift", "needs_rebalance"])
+        self.assertTrue(summary.loc["drift", "reason"].startswith("Desviación máxima"))
+        self.assertFalse(summary.loc["recent", "needs_rebalance"])
+        self.assertTrue(summary.loc["recent", "reason"].startswith("Intervalo mínimo no cumplido"))
+        self.assertTrue(summary.loc["calm", "needs_rebalance"])
+        self.assertTrue(summary.loc["calm", "reason"].startswith("Tiempo desde último rebalanceo"))
+        self.assertEqual(list(summary.index[:2]), ["drift", "calm"])
+
+    def test_days_since_matches_time_since_last_rebalance(self):
+        """compute_drift y _time_since_last_rebalance usan la misma referencia y el mismo 999 por defecto."""
+        self.portfolios["calm"].created_date = ""
+        summary = self.rebalancer.compute_drift().summary
+        for pid in self.portfolios:
+            self.assertEqual(summary.loc[pid, "days_since_last_rebalance"],
+                             self.rebalancer._time_since_last_rebalance(pid).days)
+        self.assertEqual(summary.loc["calm", "days_since_last_rebalance"], 999)
+        self.assertEqual(summary.loc["recent", "days_since_last_rebalance"], 2)
+        self.assertEqual(self.rebalancer._time_since_last_rebalance("missing").days, 999)
+
+if __name__ == "__main__":
+    unittest.main()
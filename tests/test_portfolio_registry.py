@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from dataclasses import dataclass
+from typing import Dict
+
+from src.portfolio_registry import PortfolioRegistry
+
+@dataclass
+class Definition:
+    """Definición mínima con los campos que usan los tests."""
+    id: str
+    allocation: Dict[str, float]
+    status: str = "active"
+
+class TestPortfolioRegistry(unittest.TestCase):
+    def setUp(self):
+        """Directorio temporal con dos definiciones."""
+        self.tmp = tempfile.TemporaryDirectory()
+        for pid in ("portfolio_001", "portfolio_002"):
+            self._write(pid, {"BTC": 1.0})
+        self.registry = PortfolioRegistry(self.tmp.name, Definition, check_interval=0.0)
+
+    def tearDown(self):
+        self.registry.stop_watching()
+        self.tmp.cleanup()
+
+    def _write(self, portfolio_id: str, allocation: Dict[str, float]):
+        path = os.path.join(self.tmp.name, f"{portfolio_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"id": portfolio_id, "allocation": allocation}, f)
+        # Garantizar un mtime distinto aunque el sistema de archivos tenga poca resolución
+        stamp = time.time_ns() + 10_000_000
+        os.utime(path, ns=(stamp, stamp))
+
+    def test_lazy_load_and_read_only_view(self):
+        """La vista se carga al primer acceso y no admite escrituras."""
+        self.assertEqual(self.registry.version, 0)
+        view = self.registry.view()
+        self.assertEqual(sorted(view), ["portfolio_001", "portfolio_002"])
+        with self.assertRaises(TypeError):
+            view["portfolio_003"] = None
+
+    def test_only_modified_files_are_reparsed(self):
+        """Solo se vuelven a parsear los archivos cuyo mtime cambió."""
+        untouched = self.registry.get("portfolio_002")
+        self._write("portfolio_001", {"ETH": 1.0})
+
+        changed, removed = self.registry.refresh(force=True)
+        self.assertEqual(changed, ["portfolio_001"])
+        self.assertEqual(removed, [])
+        self.assertEqual(self.registry.get("portfolio_001").allocation, {"ETH": 1.0})
+        self.assertIs(self.registry.get("portfolio_002"), untouched)
+
+    def test_removed_files_leave_the_view(self):
+        """Los archivos eliminados desaparecen de la vista."""
+        self.registry.view()
+        os.remove(os.path.join(self.tmp.name, "portfolio_002.json"))
+        _, removed = self.registry.refresh(force=True)
+        self.assertEqual(removed, ["portfolio_002"])
+        self.assertNotIn("portfolio_002", self.registry.view())
+
+    def test_watch_notifies_changes(self):
+        """La vigilancia en segundo plano notifica los cambios."""
+        self.registry.view()
+        notified = []
+        self.registry.watch(lambda changed, removed: notified.append(changed), interval=0.05)
+        self._write("portfolio_003", {"SOL": 1.0})
+
+        deadline = time.time() + 2
+        while not notified and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(notified[0], ["portfolio_003"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from price_feed import StaticPriceProvider
+
+class TestStaticPriceProvider(unittest.TestCase):
+    def setUp(self):
+        """Proveedor con dos días de histórico."""
+        history = pd.DataFrame(
+            {"BTC": [50000.0, 60000.0], "ETH": [3000.0, np.nan]},
+            index=pd.to_datetime(["2025-07-01", "2025-07-03"])
+        )
+        self.provider = StaticPriceProvider({"BTC": 100000.0, "ETH": 3500.0}, history)
+
+    def test_price_vector_marks_missing_symbols(self):
+        """Los símbolos sin precio quedan como NaN en el vector."""
+        vector = self.provider.get_price_vector(["BTC", "SOL"])
+        self.assertEqual(vector[0], 100000.0)
+        self.assertTrue(np.isnan(vector[1]))
+
+    def test_reference_prices_use_last_close_before_date(self):
+        """Cada fecha toma el último cierre disponible; sin fecha no hay referencia."""
+        matrix = self.provider.get_reference_prices(
+            ["BTC", "ETH", "USDT"], ["2025-07-02T10:00:00", "2025-06-01", None]
+        )
+        np.testing.assert_array_equal(matrix[0], [50000.0, 3000.0, 1.0])
+        self.assertTrue(np.isnan(matrix[1, :2]).all())
+        self.assertTrue(np.isnan(matrix[2]).all())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+
+from src.profiler import _stages, current_stage, profile_session, stage
+
+def busy_loop(seconds: float) -> int:
+    """Consume CPU durante el tiempo indicado."""
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(200))
+    return total
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_samples_are_tagged_with_stage(self):
+        """Las muestras se etiquetan con la etapa y se escriben en collapsed y speedscope."""
+        with tempfile.TemporaryDirectory() as tmp:
+            with profile_session("test", output_dir=tmp, enabled=True, rate=1.0, interval=0.002) as profiler:
+                with stage("analyze"):
+                    busy_loop(0.3)
+            paths = profiler.write("test")
+
+            with open(paths["collapsed"]) as f:
+                lines = f.read().splitlines()
+            hot = [l for l in lines if l.startswith("stage:analyze;") and "busy_loop" in l]
+            self.assertTrue(hot)
+            self.assertTrue(all(l.rsplit(" ", 1)[1].isdigit() for l in lines))
+
+            with open(paths["speedscope"]) as f:
+                speedscope = json.load(f)
+            names = [p["name"] for p in speedscope["profiles"]]
+            self.assertIn("test [analyze]", names)
+            frames = speedscope["shared"]["frames"]
+            for profile in speedscope["profiles"]:
+                self.assertEqual(len(profile["samples"]), len(profile["weights"]))
+                self.assertTrue(all(i < len(frames) for s in profile["samples"] for i in s))
+
+    def test_stages_from_many_threads_leave_no_entries(self):
+        """Las etapas de hilos concurrentes se registran sin carreras y no dejan entradas al terminar."""
+        def worker():
+            for _ in range(200):
+                with stage("outer"), stage("inner"):
+                    current_stage()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with profile_session("threads", output_dir=tmp, enabled=True, rate=1.0, interval=0.0005):
+                threads = [threading.Thread(target=worker) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        self.assertEqual(_stages, {})
+
+    def test_disabled_or_unsampled_sessions_do_nothing(self):
+        """Sin activar, o fuera del sorteo, no se arranca el profiler."""
+        with profile_session("off", enabled=False) as profiler:
+            self.assertIsNone(profiler)
+        with profile_session("unsampled", enabled=True, rate=0.0) as profiler:
+            self.assertIsNone(profiler)
+
+if __name__ == "__main__":
+    unittest.main()
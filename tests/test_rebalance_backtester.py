@@ -0,0 +1,98 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from rebalance_backtester import RebalanceBacktester, RebalancePolicy
+from rebalance_planner import FeeModel
+
+class FakePriceStore:
+    """Almacén de precios en memoria con una rejilla de cinco días"""
+
+    def __init__(self, prices=None):
+        self.prices = prices if prices is not None else pd.DataFrame(
+            {"A": [10.0, 10.0, 10.1, 20.0, 10.0], "B": 10.0},
+            index=pd.date_range("2024-01-01", periods=5, freq="D")
+        )
+
+    def get_price_matrix(self, symbols, start_date=None, end_date=None, common_window=True):
+        prices = self.prices.reindex(columns=symbols)
+        return prices.dropna() if common_window else prices
+
+class TestRebalanceBacktester(unittest.TestCase):
+    def test_rebalance_counts_only_executed_trades(self):
+        """Un rebalanceo cuyas órdenes caen bajo el nocional mínimo no cuenta ni reinicia el intervalo."""
+        backtester = RebalanceBacktester(
+            definitions=[SimpleNamespace(id="p1", allocation={"A": 0.5, "B": 0.5}, rebalance_threshold=0.05)],
+            policies=[
+                RebalancePolicy("sin_rebalanceo"),
+                RebalancePolicy("umbral", threshold=0.001, min_interval_days=2),
+            ],
+            price_store=FakePriceStore(),
+            fee_model=FeeModel(taker_rate=0.0, min_notional=10.0),
+            initial_capital=1000.0
+        )
+        result = backtester.run()
+        final = result.equity_curves.iloc[-1]
+
+        # Sin rebalanceo: 50 A + 50 B valorados a 10
+        self.assertAlmostEqual(final[("sin_rebalanceo", "p1")], 1000.0)
+        self.assertEqual(result.summary.loc[("sin_rebalanceo", "p1"), "rebalances"], 0)
+
+        # Día 2: desviación de 0.25% con órdenes de 2.5 < 10, descartadas.
+        # Día 3: A vale 1000 y B 500 -> se venden 250 de A y se compran 250 de B (37.5 A, 75 B)
+        self.assertAlmostEqual(result.equity_curves[("umbral", "p1")].iloc[3], 1500.0)
+        self.assertAlmostEqual(final[("umbral", "p1")], 37.5 * 10 + 75 * 10)
+        self.assertEqual(result.summary.loc[("umbral", "p1"), "rebalances"], 1)
+
+    def test_unlisted_assets_are_held_as_cash(self):
+        """Sin recortar al activo más joven: su parte queda en efectivo hasta que cotiza y se rebalancea."""
+        prices = pd.DataFrame(
+            {"A": [10.0, 10.0, 20.0, 20.0], "B": [np.nan, np.nan, 10.0, 10.0]},
+            index=pd.date_range("2024-01-01", periods=4, freq="D")
+        )
+        backtester = RebalanceBacktester(
+            definitions=[SimpleNamespace(id="p1", allocation={"A": 0.5, "B": 0.5}, rebalance_threshold=0.05)],
+            policies=[RebalancePolicy("sin_rebalanceo"), RebalancePolicy("umbral", threshold=0.05)],
+            price_store=FakePriceStore(prices),
+            fee_model=FeeModel(taker_rate=0.0, min_notional=1.0),
+            initial_capital=1000.0
+        )
+        result = backtester.run()
+        curves = result.equity_curves
+
+        self.assertEqual(len(curves), 4)
+        # 50 A y 500 en efectivo; al doblar A, 1500
+        self.assertEqual(curves[("sin_rebalanceo", "p1")].tolist(), [1000.0, 1000.0, 1500.0, 1500.0])
+        self.assertEqual(result.summary.loc[("sin_rebalanceo", "p1"), "rebalances"], 0)
+        # Al cotizar B el umbral compra B con el efectivo y ajusta A hasta 750/750
+        self.assertEqual(result.summary.loc[("umbral", "p1"), "rebalances"], 1)
+        self.assertAlmostEqual(curves[("umbral", "p1")].iloc[-1], 1500.0)
+
+    def test_total_deviation_rule(self):
+        """Como el rebalanceador, la política actual dispara si la desviación total supera 2 × umbral."""
+        prices = pd.DataFrame(
+            {"A": [10.0, 11.6], "B": [10.0, 11.6], "C": [10.0, 8.4], "D": [10.0, 8.4]},
+            index=pd.date_range("2024-01-01", periods=2, freq="D")
+        )
+        backtester = RebalanceBacktester(
+            definitions=[SimpleNamespace(id="p1", allocation=dict.fromkeys("ABCD", 0.25), rebalance_threshold=0.05)],
+            policies=[
+                RebalancePolicy("solo_maxima", threshold=None),
+                RebalancePolicy("maxima_y_total", threshold=None, total_threshold_ratio=2.0),
+            ],
+            price_store=FakePriceStore(prices),
+            fee_model=FeeModel(taker_rate=0.0, min_notional=1.0),
+            initial_capital=1000.0
+        )
+        # Pesos 0.29/0.29/0.21/0.21: desviación máxima 0.04 < 0.05, total 0.16 > 0.10
+        rebalances = backtester.run().summary["rebalances"]
+        self.assertEqual(rebalances[("solo_maxima", "p1")], 0)
+        self.assertEqual(rebalances[("maxima_y_total", "p1")], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from rebalance_planner import FeeModel, RebalancePlanner
+
+class TestRebalancePlanner(unittest.TestCase):
+    def setUp(self):
+        """Planificador sin comisiones para comprobar importes exactos."""
+        self.planner = RebalancePlanner(FeeModel(taker_rate=0.0, min_notional=10.0))
+        self.targets = pd.DataFrame({"BTC": [0.5], "ETH": [0.5]}, index=["p1"])
+
+    def test_inflow_absorbs_drift_without_selling(self):
+        """La aportación DCA corrige una desviación pequeña sin vender."""
+        values = pd.DataFrame({"BTC": [550.0], "ETH": [450.0]}, index=["p1"])
+        plan = self.planner.plan(values, self.targets, bands=0.05, inflows=100.0)
+        self.assertEqual(plan.sells.to_numpy().sum(), 0.0)
+        self.assertAlmostEqual(plan.buys.at["p1", "ETH"], 100.0)
+        self.assertAlmostEqual(plan.post_weights.at["p1", "ETH"], 0.5)
+
+    def test_trades_only_to_band_edge(self):
+        """Sin aportación se vende solo hasta el borde de la banda."""
+        values = pd.DataFrame({"BTC": [700.0], "ETH": [300.0]}, index=["p1"])
+        plan = self.planner.plan(values, self.targets, bands=0.05)
+        self.assertAlmostEqual(plan.sells.at["p1", "BTC"], 150.0)
+        self.assertAlmostEqual(plan.buys.at["p1", "ETH"], 150.0)
+        self.assertAlmostEqual(plan.post_weights.at["p1", "BTC"], 0.55)
+
+    def test_orders_below_min_notional_are_dropped(self):
+        """Las órdenes menores que el nocional mínimo se descartan."""
+        values = pd.DataFrame({"BTC": [56.0], "ETH": [44.0]}, index=["p1"])
+        plan = self.planner.plan(values, self.targets, bands=0.05)
+        self.assertEqual(plan.order_count, 0)
+
+    def test_batch_plans_and_liquidates_unallocated(self):
+        """Varios portafolios en una llamada; los activos fuera de la asignación se venden."""
+        targets = pd.DataFrame({"BTC": [0.5, 1.0], "ETH": [0.5, 0.0]}, index=["p1", "p2"])
+        values = pd.DataFrame({"BTC": [500.0, 800.0], "ETH": [500.0, 200.0]}, index=["p1", "p2"])
+        plan = self.planner.plan(values, targets, bands=0.05)
+        self.assertEqual(len(plan.orders("p1")), 0)
+        self.assertAlmostEqual(plan.sells.at["p2", "ETH"], 200.0)
+        self.assertAlmostEqual(plan.buys.at["p2", "BTC"], 200.0)
+
+if __name__ == "__main__":
+    unittest.main()
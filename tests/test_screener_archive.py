@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from src.screener_archive import ScreenerArchive
+from src.tradingview_ingest import find_all_exports
+from tests.test_tradingview_ingest import write_exports
+
+class TestScreenerArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, "TradingViewData")
+        for day, cap in (("20250101", "1.000.000.000"), ("20250102", "2.000.000.000"), ("20250103", "3.000.000.000")):
+            write_exports(os.path.join(self.base, f"TradingView_data_{day}"), market_cap_btc=cap)
+        self.archive_dir = os.path.join(self.tmp.name, "archive")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ingests_every_snapshot_once(self):
+        """Se archivan todas las fotos fechadas y las ya archivadas no se reprocesan."""
+        self.assertEqual(list(find_all_exports(self.base)), ["2025-01-01", "2025-01-02", "2025-01-03"])
+        archive = ScreenerArchive(self.archive_dir)
+        self.assertEqual(len(archive.ingest_all(self.base)), 3)
+        self.assertEqual(ScreenerArchive(self.archive_dir).ingest_all(self.base), [])
+
+    def test_time_travel_queries(self):
+        """Las consultas devuelven solo las fotos, monedas y campos pedidos."""
+        archive = ScreenerArchive(self.archive_dir)
+        archive.ingest_all(self.base)
+
+        result = archive.query(["Capitalización de mercado", "Rating técnico 1 día"], coins=["BTC"], last_n=2)
+        self.assertEqual(result.index.get_level_values("date").tolist(), ["2025-01-02", "2025-01-03"])
+        self.assertEqual(result["Capitalización de mercado"].tolist(), [2e9, 3e9])
+        self.assertEqual(result["Rating técnico 1 día"].tolist(), ["Compra fuerte", "Compra fuerte"])
+
+        history = archive.field_history("Direcciones de beneficios %", coins=["BTC", "ETH"])
+        self.assertEqual(history.shape, (3, 2))
+        self.assertAlmostEqual(history.loc["2025-01-01", "ETH"], 64.0)
+
+        snapshot = archive.snapshot("2025-01-01").set_index("Moneda")
+        self.assertTrue(snapshot.loc["DOGE", ["Direcciones activas diarias"]].isna().all())
+        self.assertAlmostEqual(snapshot.loc["ETH", "Momentum (10) 1 día"], -35.2)
+
+if __name__ == "__main__":
+    unittest.main()
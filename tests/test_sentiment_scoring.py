@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+from src.collectors import content_hash
+from src.sentiment_scoring import (
+    HashedLinearModel, SentimentScorer, lexicon_score, recent_news_sentiment, relevance_score,
+    score_pending_insights, tokenize
+)
+from src.storage import SQLiteStorage
+
+class TestLexicon(unittest.TestCase):
+    def test_polarity_negation_and_intensifiers(self):
+        """El léxico distingue polaridad, invierte con negaciones y refuerza con intensificadores."""
+        self.assertGreater(lexicon_score(tokenize("Bitcoin rally: nuevo máximo, ETF aprobado")), 0.3)
+        self.assertLess(lexicon_score(tokenize("Exchange hackeo y desplome del mercado")), -0.3)
+        self.assertLess(lexicon_score(tokenize("El ETF no fue aprobado")), 0)
+        self.assertGreater(lexicon_score(tokenize("very bullish")), lexicon_score(tokenize("bullish")))
+        self.assertEqual(lexicon_score(tokenize("Reunión del comité el martes")), 0)
+
+    def test_relevance_counts_symbols_and_crypto_terms(self):
+        tokens = tokenize("SOL y BTC suben tras el halving")
+        self.assertGreater(relevance_score(tokens, ["sol"]), relevance_score(tokens))
+        self.assertEqual(relevance_score(tokenize("El tiempo en Madrid")), 0)
+
+class TestModel(unittest.TestCase):
+    def test_fit_and_round_trip(self):
+        model = HashedLinearModel(1 << 12).fit(
+            ["gran subida", "token despega", "fuerte caida", "token se hunde"] * 10, [1, 1, -1, -1] * 10
+        )
+        self.assertGreater(model.predict_tokens(tokenize("despega")), 0)
+        self.assertLess(model.predict_tokens(tokenize("se hunde")), 0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.npz")
+            model.save(path)
+            self.assertEqual(HashedLinearModel.load(path).version, model.version)
+            scorer = SentimentScorer(model_path=path)
+            self.assertIn(model.version, scorer.version)
+
+class TestScorePendingInsights(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = SQLiteStorage(os.path.join(self.tmp.name, "insights.db"))
+        self.storage.writer.execute("""
+            CREATE TABLE market_insights (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, insight_type TEXT NOT NULL,
+                content TEXT NOT NULL, sentiment_score REAL, relevance_score REAL, url TEXT, tags TEXT,
+                collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, content_hash TEXT
+            )
+        """)
+        self.scorer = SentimentScorer(model_path=None, workers=2, batch_size=50, min_parallel=200)
+
+    def tearDown(self):
+        self.scorer.close()
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def insert(self, rows):
+        self.storage.writer.executemany(
+            "INSERT INTO market_insights (source, insight_type, content, sentiment_score, content_hash) "
+            "VALUES ('rss', 'news', ?, ?, ?)",
+            [(content, score, content_hash(content)) for content, score in rows]
+        )
+
+    def scores(self):
+        return self.storage.reader().execute(
+            "SELECT sentiment_score, relevance_score FROM market_insights ORDER BY id"
+        ).fetchall()
+
+    def test_bulk_write_back_keeps_existing_scores_and_uses_cache(self):
+        """Se puntúan en paralelo cientos de insights, se respetan las puntuaciones previas y se reutiliza la caché."""
+        rows = [(f"Bitcoin rally {i}: ETF aprobado", None) for i in range(150)]
+        rows += [(f"Exchange hackeo {i}, desplome de ETH", None) for i in range(150)]
+        rows.append(("Fear & Greed Index: 75 (Greed)", 0.5))
+        self.insert(rows)
+
+        summary = score_pending_insights(self.storage, self.scorer)
+        self.assertEqual(summary, {'pending': 301, 'cached': 0, 'scored': 301, 'updated': 301})
+        self.assertEqual(self.scorer._pool._mp_context.get_start_method(), "spawn")
+        scores = self.scores()
+        self.assertTrue(all(s > 0 and r > 0 for s, r in scores[:150]))
+        self.assertTrue(all(s < 0 for s, _ in scores[150:300]))
+        self.assertEqual(scores[300][0], 0.5)
+        self.assertIsNotNone(scores[300][1])
+
+        # Reprocesar no hace nada y un contenido ya visto sale de la caché persistente
+        self.assertEqual(score_pending_insights(self.storage, self.scorer)['pending'], 0)
+        self.storage.writer.execute("UPDATE market_insights SET sentiment_score = NULL WHERE id = 1")
+        summary = score_pending_insights(self.storage, SentimentScorer(model_path=None))
+        self.assertEqual((summary['cached'], summary['scored']), (1, 0))
+        self.assertEqual(self.scores()[0], scores[0])
+
+        news = recent_news_sentiment(self.storage)
+        self.assertTrue(0 < news < 1)
+
+if __name__ == "__main__":
+    unittest.main()
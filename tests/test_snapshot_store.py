@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.snapshot_store import SnapshotStore
+
+def make_snapshot(portfolio_id: str, timestamp: str, total_value: float) -> dict:
+    """Snapshot mínimo con el formato de PortfolioSnapshot."""
+    return {
+        "portfolio_id": portfolio_id,
+        "timestamp": timestamp,
+        "total_value": total_value,
+        "positions": {"BTC": {"amount": 0.1, "value": total_value, "weight": 1.0}},
+        "cash_balance": 0.0,
+        "daily_pnl": 0.0,
+        "total_pnl": 0.0,
+        "metrics": {}
+    }
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        """Almacén en un directorio temporal."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(os.path.join(self.tmp.name, "snapshots.db"))
+        self.store.save_snapshots([
+            make_snapshot(pid, f"2025-07-0{day}T09:00:00", 100.0 * day)
+            for pid in ("portfolio_001", "portfolio_002")
+            for day in range(1, 6)
+        ])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_range_query(self):
+        """La consulta por rango incluye el día final completo."""
+        df = self.store.get_history("portfolio_001", "2025-07-02", "2025-07-04")
+        self.assertEqual(list(df["total_value"]), [200.0, 300.0, 400.0])
+        self.assertEqual(df["positions"].iloc[0]["BTC"]["amount"], 0.1)
+
+    def test_rewrite_same_timestamp_replaces(self):
+        """Reescribir el mismo (portfolio_id, timestamp) no duplica filas."""
+        self.store.save_snapshots([make_snapshot("portfolio_001", "2025-07-01T09:00:00", 999.0)])
+        df = self.store.get_history("portfolio_001")
+        self.assertEqual(len(df), 5)
+        self.assertEqual(df["total_value"].iloc[0], 999.0)
+
+    def test_latest_per_portfolio(self):
+        """get_latest devuelve el último snapshot de cada portafolio."""
+        latest = self.store.get_latest()
+        self.assertEqual(sorted(latest.index), ["portfolio_001", "portfolio_002"])
+        self.assertTrue((latest["total_value"] == 500.0).all())
+
+    def test_import_json_snapshots(self):
+        """Los snapshots JSON antiguos se migran al almacén."""
+        day_dir = os.path.join(self.tmp.name, "daily_snapshots", "2025-07-06")
+        os.makedirs(day_dir)
+        with open(os.path.join(day_dir, "portfolio_003_snapshot.json"), "w", encoding="utf-8") as f:
+            json.dump(make_snapshot("portfolio_003", "2025-07-06T09:48:35.450447", 0.0), f)
+
+        imported = self.store.import_json_snapshots(os.path.join(self.tmp.name, "daily_snapshots"))
+        self.assertEqual(imported, 1)
+        self.assertEqual(len(self.store.get_history("portfolio_003")), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from src.database_manager import DatabaseManager
+from src.storage import SQLiteStorage, get_default_storage, get_storage
+
+class TestSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "test.db")
+        self.storage = SQLiteStorage(self.path)
+        self.storage.writer.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, thread TEXT)")
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp.cleanup()
+
+    def test_pragmas_and_read_only_readers(self):
+        """Las conexiones usan WAL y los lectores no pueden escribir."""
+        reader = self.storage.reader()
+        self.assertEqual(reader.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(reader.execute("PRAGMA synchronous").fetchone()[0], 1)
+        with self.assertRaises(Exception):
+            reader.execute("INSERT INTO items (thread) VALUES ('x')")
+
+    def test_writes_from_threads_and_event_loop_are_serialized(self):
+        """Hilos y corrutinas escriben por la misma cola sin errores de bloqueo."""
+        def worker(name):
+            for _ in range(50):
+                self.storage.writer.execute("INSERT INTO items (thread) VALUES (?)", (name,))
+
+        async def async_writer():
+            await asyncio.gather(*[
+                self.storage.writer.run_async(lambda conn: conn.execute("INSERT INTO items (thread) VALUES ('loop')"))
+                for _ in range(50)
+            ])
+
+        threads = [threading.Thread(target=worker, args=(f"t{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        asyncio.run(async_writer())
+        for thread in threads:
+            thread.join()
+        count = self.storage.reader().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        self.assertEqual(count, 250)
+
+    def test_failed_job_rolls_back(self):
+        """Un trabajo que falla no deja escrituras parciales."""
+        def failing(conn):
+            conn.execute("INSERT INTO items (thread) VALUES ('partial')")
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            self.storage.writer.run(failing)
+        count = self.storage.reader().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        self.assertEqual(count, 0)
+
+    def test_database_manager_shares_storage(self):
+        """DatabaseManager usa la instancia compartida de DATABASE_URL y su engine aplica los pragmas."""
+        with patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{self.path}"}):
+            db = DatabaseManager()
+            self.assertIs(get_default_storage(), db.storage)
+        self.assertIs(db.storage, get_storage(self.path))
+        with db.engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql("PRAGMA journal_mode").scalar(), "wal")
+        asyncio.run(db.log_trading_session({"symbol_data": {"BTCUSDT": {"price": 1.0, "volume": 2.0}}},
+                                           {"portfolio_value": 10.0, "positions": {}, "weights": {}}))
+        self.assertEqual(len(db.get_market_data_history("BTCUSDT")), 1)
+        db.storage.close()
+
+    def test_database_manager_writes_only_through_the_writer(self):
+        """Todas las escrituras de DatabaseManager pasan por el hilo escritor; su engine es de solo lectura."""
+        with patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{self.path}"}):
+            db = DatabaseManager()
+        threads = []
+        original = db._writer_job
+        def spy(conn, fn):
+            threads.append(threading.current_thread().name)
+            return original(conn, fn)
+
+        with patch.object(db, "_writer_job", spy):
+            db.record_transaction("BTCUSDT", "buy", 1.0, 100.0)
+            db.save_portfolio_state(100.0, {"BTCUSDT": 1.0}, {"BTCUSDT": 1.0})
+            db.save_portfolio_state_with_metrics(100.0, {}, {}, {"risk": 1})
+            db.save_market_data_bulk([{"timestamp": datetime.now(), "symbol": "ETHUSDT", "price": 1.0, "volume": 1.0}])
+        self.assertEqual(len(threads), 4)
+        self.assertTrue(all(name.startswith("sqlite-writer") for name in threads))
+        self.assertEqual(len(db.get_transaction_history()), 1)
+        self.assertEqual(len(db.get_portfolio_history()), 2)
+
+        with self.assertRaises(Exception):
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql("DELETE FROM transactions")
+        db.storage.close()
+
+if __name__ == "__main__":
+    unittest.main()
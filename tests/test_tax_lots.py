@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.tax_lots import ReplayRequiredError, TaxLotEngine
+
+def fills(rows):
+    """Fills en formato de la tabla transactions."""
+    return pd.DataFrame(rows, columns=["id", "timestamp", "symbol", "type", "amount", "price"])
+
+BUYS_THEN_SELL = fills([
+    (1, "2024-01-01", "BTCUSDT", "buy", 1.0, 100.0),
+    (2, "2024-01-02", "BTCUSDT", "buy", 1.0, 300.0),
+    (3, "2024-01-03", "BTCUSDT", "buy", 1.0, 200.0),
+    (4, "2024-01-11", "BTCUSDT", "sell", 1.5, 400.0),
+])
+
+class TestTaxLotEngine(unittest.TestCase):
+    def test_policies_choose_lots(self):
+        """FIFO vende los lotes más antiguos, LIFO los más recientes y HIFO los más caros."""
+        expected_cost = {"fifo": 100 + 0.5 * 300, "lifo": 200 + 0.5 * 300, "hifo": 300 + 0.5 * 200}
+        for policy, cost in expected_cost.items():
+            engine = TaxLotEngine(policy, initial_capacity=2)
+            sale = engine.process(BUYS_THEN_SELL).iloc[0]
+            self.assertAlmostEqual(sale["cost_basis"], cost, msg=policy)
+            self.assertAlmostEqual(sale["gain"], 1.5 * 400 - cost, msg=policy)
+            self.assertAlmostEqual(engine.positions()["BTCUSDT"]["quantity"], 1.5)
+
+        fifo = TaxLotEngine("fifo")
+        sale = fifo.process(BUYS_THEN_SELL).iloc[0]
+        self.assertAlmostEqual(sale["holding_days"], (10 + 0.5 * 9) / 1.5)
+        self.assertEqual(fifo.open_lots()["unit_cost"].tolist(), [300.0, 200.0])
+
+    def test_exchange_export_with_fees_and_unmatched_sales(self):
+        """Se aceptan exports del exchange; las comisiones ajustan coste e ingresos."""
+        export = pd.DataFrame({
+            "Data": ["2024-01-01", "2024-01-02", "2024-01-03"],
+            "Pair": ["ETH/USDT"] * 3,
+            "Type": ["SELL", "BUY", "SELL"],
+            "Amount": ["1", "2", "1"],
+            "Price": ["50", "10", "20"],
+            "Fee": ["0", "2", "1"],
+        })
+        realized = TaxLotEngine().process(export)
+        self.assertAlmostEqual(realized.loc[0, "unmatched_qty"], 1)
+        self.assertAlmostEqual(realized.loc[1, "gain"], (20 - 1) - 11)
+
+    def test_checkpoint_resume_matches_full_replay(self):
+        """Reanudar desde un checkpoint da el mismo resultado que reprocesar todo."""
+        more = pd.concat([BUYS_THEN_SELL, fills([
+            (5, "2024-01-12", "BTCUSDT", "sell", 1.0, 500.0),
+            (6, "2024-01-13", "ETHUSDT", "buy", 2.0, 10.0),
+        ])], ignore_index=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "lots.npz")
+            first = TaxLotEngine("hifo")
+            first.process(BUYS_THEN_SELL)
+            first.save_checkpoint(path)
+
+            resumed = TaxLotEngine.load_checkpoint(path)
+            resumed.process(more)
+
+        replay = TaxLotEngine("hifo")
+        replay.process(more)
+        pd.testing.assert_frame_equal(resumed.realized_gains(), replay.realized_gains())
+        self.assertEqual(resumed.positions(), replay.positions())
+        self.assertEqual(resumed.last_id, 6)
+
+    def test_refed_export_after_checkpoint_is_not_double_counted(self):
+        """Un export sin id ya procesado se salta por clave natural, también tras un checkpoint."""
+        export = pd.DataFrame({
+            "Data": ["2024-01-01", "2024-01-01", "2024-01-02"],
+            "Pair": ["BTCUSDT"] * 3,
+            "Type": ["BUY", "BUY", "SELL"],
+            "Amount": [1.0, 1.0, 1.5],
+            "Price": [100.0, 100.0, 200.0],
+        })
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "lots.npz")
+            first = TaxLotEngine()
+            first.process(export.iloc[:2])
+            first.save_checkpoint(path)
+            resumed = TaxLotEngine.load_checkpoint(path)
+
+        # El export completo se vuelve a leer: solo la venta es nueva (las dos compras idénticas ya cuentan)
+        realized = resumed.process(export)
+        self.assertEqual(len(realized), 1)
+        self.assertTrue(resumed.process(export).empty)
+        self.assertAlmostEqual(resumed.positions()["BTCUSDT"]["quantity"], 0.5)
+
+    def test_fills_older_than_watermark_require_replay(self):
+        """Un fill nuevo anterior a la marca de agua (por id o sin id) exige reprocesar."""
+        engine = TaxLotEngine()
+        engine.process(BUYS_THEN_SELL)
+        backfill = fills([(7, "2024-01-05", "BTCUSDT", "buy", 1.0, 50.0)])
+        with self.assertRaises(ReplayRequiredError):
+            engine.process(backfill)
+        self.assertEqual(engine.last_id, 4)
+
+        export = BUYS_THEN_SELL.drop(columns="id")
+        engine = TaxLotEngine()
+        engine.process(export)
+        with self.assertRaises(ReplayRequiredError):
+            engine.process(pd.concat([export, backfill.drop(columns="id")], ignore_index=True))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from src.ticker_snapshot import TickerSnapshotProvider
+
+class FakeFetcher:
+    """Fetcher que cuenta las peticiones batch realizadas."""
+    def __init__(self, known):
+        self.known = known
+        self.calls = []
+
+    def __call__(self, symbols):
+        self.calls.append(symbols)
+        wanted = symbols or list(self.known)
+        return [
+            {"symbol": s, "lastPrice": str(self.known[s]), "quoteVolume": "1000000", "priceChangePercent": "1.5"}
+            for s in wanted if s in self.known
+        ]
+
+class TestTickerSnapshotProvider(unittest.TestCase):
+    def setUp(self):
+        self.fetcher = FakeFetcher({"BTCUSDT": 42000.0, "ETHUSDT": 2200.0, "SOLUSDT": 98.0})
+        self.provider = TickerSnapshotProvider(max_age_seconds=60, fetcher=self.fetcher)
+
+    def test_single_batch_request_is_shared(self):
+        """Varios consumidores con los mismos símbolos comparten una sola petición."""
+        prices = self.provider.get_prices(["BTCUSDT", "ETHUSDT"])
+        self.assertEqual(prices, {"BTCUSDT": 42000.0, "ETHUSDT": 2200.0})
+        self.provider.get_snapshot(["ETHUSDT"])
+        self.assertEqual(len(self.fetcher.calls), 1)
+
+    def test_new_symbols_and_staleness_trigger_refetch(self):
+        """Símbolos nuevos o una foto caducada provocan una nueva petición con la unión."""
+        self.provider.get_prices(["BTCUSDT"])
+        self.provider.get_prices(["SOLUSDT"])
+        self.assertEqual(self.fetcher.calls[-1], ["BTCUSDT", "SOLUSDT"])
+        self.provider.get_prices(["BTCUSDT"], max_age=0)
+        self.assertEqual(len(self.fetcher.calls), 3)
+
+    def test_unknown_symbols_are_not_refetched(self):
+        """Un símbolo sin ticker no provoca peticiones repetidas."""
+        self.provider.get_prices(["BTCUSDT", "FOOUSDT"])
+        self.provider.get_prices(["FOOUSDT"])
+        self.assertEqual(len(self.fetcher.calls), 1)
+
+    def test_stream_ticks_update_snapshot(self):
+        """Los ticks de streaming actualizan la foto sin peticiones REST."""
+        self.provider.update_tick("BTCUSDT", 43000.0)
+        self.assertEqual(self.provider.get_prices(["BTCUSDT"]), {"BTCUSDT": 43000.0})
+        self.assertEqual(self.fetcher.calls, [])
+
+    def test_tick_refreshes_only_its_symbol(self):
+        """Un tick mantiene fresco su símbolo pero no oculta que el resto de la foto ha caducado."""
+        snapshot = self.provider.get_snapshot(["BTCUSDT", "ETHUSDT"])
+        # Envejecer la captura REST más allá de max_age
+        snapshot.taken_at -= 120
+        for symbol in snapshot.symbol_taken_at:
+            snapshot.symbol_taken_at[symbol] -= 120
+        self.provider.update_tick("BTCUSDT", 43000.0)
+
+        self.assertEqual(self.provider.get_prices(["BTCUSDT"]), {"BTCUSDT": 43000.0})
+        self.assertEqual(len(self.fetcher.calls), 1)
+        self.assertEqual(self.provider.get_prices(["ETHUSDT"]), {"ETHUSDT": 2200.0})
+        self.assertEqual(len(self.fetcher.calls), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+import pandas as pd
+
+from src.trade_analytics import pair_analytics
+
+class TestPairAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.transactions = pd.DataFrame({
+            "Data": pd.to_datetime(["2024-01-01", "2024-01-11", "2024-01-21", "2024-01-05", "2024-01-06", "2024-01-07"]),
+            "Pair": ["BTC/USDT", "BTC/USDT", "BTC/USDT", "ETH/USDT", "ETH/USDT", "ETH/USDT"],
+            "Type": ["BUY", "BUY", "SELL", "SELL", "BUY", "SELL"],
+            "Amount": ["1,0", "1,0", "1,5", "2", "1", "0,5"],
+            "Price": ["100", "200", "300", "50", "10", "20"],
+            "Fee": ["0,1", "0,2", "0,3", "0", "0,05", "0"],
+        })
+
+    def test_fifo_and_weighted_metrics(self):
+        """FIFO casa primero las compras más antiguas; el método ponderado usa el precio medio de compra."""
+        stats = pair_analytics(self.transactions, prices={"BTC/USDT": 400}, as_of=pd.Timestamp("2024-01-31"))
+        btc = stats.loc["BTC/USDT"]
+        # Venta de 1,5: 1 a coste 100 y 0,5 a coste 200
+        self.assertAlmostEqual(btc["fifo_realized_pnl"], 1.5 * 300 - 200)
+        self.assertAlmostEqual(btc["fifo_open_qty"], 0.5)
+        self.assertAlmostEqual(btc["fifo_avg_cost"], 200)
+        self.assertAlmostEqual(btc["fifo_unrealized_pnl"], 0.5 * (400 - 200))
+        self.assertAlmostEqual(btc["realized_pnl"], (300 - 150) * 1.5)
+        self.assertAlmostEqual(btc["fees"], 0.6)
+        # 1 unidad tenida 20 días y 0,5 tenidas 10 días
+        self.assertAlmostEqual(btc["avg_holding_days"], (20 + 0.5 * 10) / 1.5)
+        self.assertAlmostEqual(btc["open_age_days"], 20)
+
+    def test_sales_without_inventory_are_not_matched(self):
+        """Las ventas sin compras previas no consumen compras posteriores."""
+        eth = pair_analytics(self.transactions).loc["ETH/USDT"]
+        self.assertAlmostEqual(eth["unmatched_sell_qty"], 2)
+        self.assertAlmostEqual(eth["fifo_realized_pnl"], 0.5 * (20 - 10))
+        self.assertAlmostEqual(eth["fifo_open_qty"], 0.5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.tradingview_ingest import clean_numeric_series, find_latest_exports, load_screener
+
+def write_exports(directory: str, market_cap_btc: str = "1.234.567.890,5"):
+    """Crea tres exportaciones mínimas con formato numérico español."""
+    os.makedirs(directory, exist_ok=True)
+    pd.DataFrame({
+        "Moneda": ["BTC", "ETH", "DOGE"],
+        "Rating técnico 1 día": ["Compra fuerte", "Neutral", "Vender"],
+        "Índice de fuerza relativa (14) 1 día": ["55,2", "71,8", "28,1"],
+        "Momentum (10) 1 día": ["1.250,4", "−35,2", "0,01"],
+    }).to_csv(os.path.join(directory, "Datostecnicos_2025-02-03.csv"), index=False)
+    pd.DataFrame({
+        "Moneda": ["BTC", "ETH", "DOGE"],
+        "Capitalización de mercado": [market_cap_btc, "250,3 B", "12 B"],
+        "Direcciones activas diarias": ["900.123", "450.000", ""],
+    }).to_csv(os.path.join(directory, "Direcciones_2025-02-03.csv"), index=False)
+    pd.DataFrame({
+        "Moneda": ["BTC", "ETH", "DOGE"],
+        "Direcciones de beneficios %": ["91,5 %", "64 %", "48,2 %"],
+    }).to_csv(os.path.join(directory, "Perdidas&ganancias_2025-02-03.csv"), index=False)
+
+class TestCleanNumericSeries(unittest.TestCase):
+    def test_spanish_and_english_formats(self):
+        """Se interpretan separadores españoles e ingleses, signos y sufijos de magnitud."""
+        spanish = clean_numeric_series(pd.Series(
+            ["1.234.567,89", "12,5", "1.234", "0,123", "−3,2 %", "4,5 M", "$ 100", "n/a", None]
+        ))
+        self.assertEqual(spanish[:7].tolist(), [1234567.89, 12.5, 1234.0, 0.123, -3.2, 4.5e6, 100.0])
+        self.assertTrue(spanish[7:].isna().all())
+
+        english = clean_numeric_series(pd.Series(["1,234,567.89", "1,234", "0.5", "2.5K"]))
+        self.assertEqual(english.tolist(), [1234567.89, 1234.0, 0.5, 2500.0])
+
+    def test_ambiguous_column_uses_export_locale(self):
+        """Una columna solo con valores ambiguos usa el formato español de la exportación."""
+        self.assertEqual(clean_numeric_series(pd.Series(["900.123", "450.000"])).tolist(), [900123.0, 450000.0])
+        self.assertEqual(clean_numeric_series(pd.Series(["0,123", "1,234"])).tolist(), [0.123, 1.234])
+        self.assertEqual(clean_numeric_series(pd.Series(["450.000"]), decimal=".").tolist(), [450.0])
+
+class TestLoadScreener(unittest.TestCase):
+    def test_merges_types_and_caches_by_content(self):
+        """Las exportaciones se combinan y tipan una vez y la caché depende del contenido."""
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, "TradingViewData")
+            export_dir = os.path.join(base, "TradingView_data_20250203")
+            cache = os.path.join(tmp, "cache")
+            write_exports(export_dir)
+
+            screener = load_screener(base, cache_dir=cache)
+            self.assertEqual(len(screener), 3)
+            btc = screener.set_index("Moneda").loc["BTC"]
+            self.assertAlmostEqual(btc["Capitalización de mercado"], 1234567890.5)
+            self.assertAlmostEqual(btc["Direcciones de beneficios %"], 91.5)
+            eth = screener.set_index("Moneda").loc["ETH"]
+            self.assertEqual(eth["Direcciones activas diarias"], 450000.0)
+            self.assertEqual(btc["Direcciones activas diarias"], 900123.0)
+            self.assertEqual(screener["Momentum (10) 1 día"].dtype, "float64")
+            self.assertEqual(str(screener["Rating técnico 1 día"].dtype), "category")
+            self.assertEqual(len(os.listdir(cache)), 1)
+
+            # Misma fuente: se reutiliza la caché; contenido distinto: nueva entrada
+            pd.testing.assert_frame_equal(load_screener(base, cache_dir=cache), screener)
+            self.assertEqual(len(os.listdir(cache)), 1)
+            write_exports(export_dir, market_cap_btc="2.000.000.000")
+            self.assertEqual(load_screener(base, cache_dir=cache).loc[0, "Capitalización de mercado"], 2e9)
+            self.assertEqual(len(os.listdir(cache)), 2)
+
+    def test_latest_export_directory_is_used(self):
+        """Se usan las exportaciones del subdirectorio más reciente."""
+        with tempfile.TemporaryDirectory() as tmp:
+            write_exports(os.path.join(tmp, "TradingView_data_20250101"))
+            write_exports(os.path.join(tmp, "TradingView_data_20250203"))
+            paths = find_latest_exports(tmp)
+            self.assertTrue(all("20250203" in p for p in paths.values()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import importlib.util
+import unittest
+
+import numpy as np
+import pandas as pd
+
+RATING, RSI, MOMENTUM = 'Rating técnico 1 día', 'Índice de fuerza relativa (14) 1 día', 'Momentum (10) 1 día'
+
+def row_technical_score(row):
+    """Reglas fila a fila previas a la versión vectorizada, como referencia."""
+    score = 0
+    if 'Compra fuerte' in str(row[RATING]):
+        score += 2
+    elif 'Comprar' in str(row[RATING]):
+        score += 1
+    elif 'Venta fuerte' in str(row[RATING]):
+        score -= 2
+    elif 'Vender' in str(row[RATING]):
+        score -= 1
+
+    rsi = float(row[RSI])
+    if 40 <= rsi <= 60:
+        score += 1
+    elif rsi > 70 or rsi < 30:
+        score -= 1
+
+    momentum = float(row[MOMENTUM])
+    if momentum > 0:
+        score += 1
+    else:
+        score -= 1
+    return score
+
+@unittest.skipUnless(
+    importlib.util.find_spec("matplotlib") and importlib.util.find_spec("seaborn"),
+    "matplotlib/seaborn no instalados"
+)
+class TestTechnicalScores(unittest.TestCase):
+    def setUp(self):
+        from scripts.tradingview_optimizer import TradingViewOptimizer
+        self.optimizer = TradingViewOptimizer()
+
+    def test_edge_cases_match_row_rules(self):
+        """Límites de RSI, RSI o momentum NaN y rating ausente puntúan como las reglas fila a fila."""
+        metrics = pd.DataFrame({
+            RATING: ['Compra fuerte', 'Comprar', 'Venta fuerte', 'Vender', 'Neutral', None, np.nan, 'Compra fuerte'],
+            RSI: [40.0, 60.0, 70.0, 30.0, np.nan, 29.9, 70.1, 50.0],
+            MOMENTUM: [1.0, 0.0, -1.0, np.nan, 2.0, np.nan, 0.5, np.nan],
+        })
+        expected = metrics.apply(row_technical_score, axis=1)
+        pd.testing.assert_series_equal(
+            self.optimizer.calculate_technical_scores(metrics), expected.astype(float), check_names=False
+        )
+        self.assertEqual(self.optimizer.calculate_technical_scores(metrics).tolist(),
+                         [4.0, 1.0, -3.0, -2.0, 1.0, -2.0, 0.0, 2.0])
+
+    def test_random_screener_matches_row_rules(self):
+        """En un screener aleatorio con huecos los scores coinciden con la versión fila a fila."""
+        rng = np.random.default_rng(0)
+        n = 2000
+        labels = np.array(['Compra fuerte', 'Comprar', 'Neutral', 'Vender', 'Venta fuerte', None], dtype=object)
+        rsi = rng.uniform(0, 100, n).round(0)
+        momentum = rng.normal(0, 1, n).round(1)
+        rsi[rng.random(n) < 0.1] = np.nan
+        momentum[rng.random(n) < 0.1] = np.nan
+        metrics = pd.DataFrame({RATING: rng.choice(labels, n), RSI: rsi, MOMENTUM: momentum},
+                               index=pd.RangeIndex(10, 10 + n))
+
+        scores = self.optimizer.calculate_technical_scores(metrics)
+        expected = metrics.apply(row_technical_score, axis=1).astype(float)
+        pd.testing.assert_series_equal(scores, expected, check_names=False)
+
+if __name__ == "__main__":
+    unittest.main()